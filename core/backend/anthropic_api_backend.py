@@ -1,10 +1,14 @@
 import json
+import asyncio
 import logging
 import os
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 
-from .llm_backend import LLMBackend
+from .limits import LLM_LIMIT
+from .llm_backend import LLMBackend, AsyncLLMBackend
+from .streaming import IncrementalFilesParser, StreamProgress, StreamEvent
+from .run_log_store import read_log
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +20,39 @@ class FileReference:
     content: str
 
 
-class AnthropicAPIBackend(LLMBackend):
+class _ResponseStream:
+    """
+    Feeds streamed response text to an IncrementalFilesParser and StreamProgress.
+    
+    Completed files go to on_file when one is given; otherwise they are
+    collected and put back into the "files" list of the final response.
+    """
+    
+    def __init__(self, callback: Optional[Callable[[StreamEvent], None]],
+                 on_file: Optional[Callable[[Dict[str, Any]], None]]):
+        self.parser = IncrementalFilesParser()
+        self.progress = StreamProgress(callback)
+        self.on_file = on_file
+        self.files: List[Dict[str, Any]] = []
+    
+    def feed(self, chunk: str) -> None:
+        self.progress.text(chunk)
+        for file_data in self.parser.feed(chunk):
+            self.progress.file(file_data)
+            if self.on_file is not None:
+                self.on_file(file_data)
+            else:
+                self.files.append(file_data)
+    
+    def finish(self) -> Dict[str, Any]:
+        self.progress.done()
+        response = self.parser.result()
+        if self.files:
+            response["files"] = self.files
+        return response
+
+
+class AnthropicAPIBackend(LLMBackend, AsyncLLMBackend):
     """
     Anthropic API backend implementation that uses the standard Anthropic client.
     
@@ -28,17 +64,24 @@ class AnthropicAPIBackend(LLMBackend):
     DEFAULT_MAX_TOKENS = 10000
     CLIENT_INSTRUCTIONS_FILE = "client_instructions_with_json_anthropic.txt"
     
-    def __init__(self, model_name: str = "claude-3-7-sonnet-20250219", client=None):
+    def __init__(self, model_name: str = "claude-3-7-sonnet-20250219", client=None, async_client=None,
+                 stream: bool = False, stream_callback: Optional[Callable[[StreamEvent], None]] = None):
         """
         Initialize the Anthropic API backend.
         
         Args:
             model_name: The model name (without anthropic/ prefix for standard API)
             client: Optional pre-configured client. If None, will be provided by replay context.
+            async_client: Optional anthropic.AsyncAnthropic used by the async request path
+            stream: Use the Messages streaming API and hand out files as soon as they are complete
+            stream_callback: Receives StreamEvents while streaming (default: log them)
         """
         super().__init__(model_name)
         
         self.client = client  # Will be set by replay context
+        self.async_client = async_client
+        self.stream = stream
+        self.stream_callback = stream_callback
         
         logger.info(f"Initialized AnthropicAPIBackend with model: {self.model_name}")
     
@@ -101,20 +144,14 @@ class AnthropicAPIBackend(LLMBackend):
     def _read_file_safely(self, file_path: str, last_n_lines: int = None) -> str:
         """Read a file safely with proper encoding handling."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if last_n_lines is not None:
-                    return '\n'.join(f.readlines()[-last_n_lines:])
-                else:
-                    return f.read()
+            return read_log(file_path, last_n_lines)
         except Exception as e:
             logger.error(f"Error reading file {file_path}: {e}")
             return ""
     
-    def send_request(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
+    def _build_request_kwargs(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
         """
-        Send a request to the Anthropic API.
-        
-        This follows the pattern established in the origin/main processors.
+        Build the keyword arguments for client.messages.create.
         
         Args:
             prompt: The user prompt
@@ -122,13 +159,8 @@ class AnthropicAPIBackend(LLMBackend):
             system_prompt: Optional system prompt
             
         Returns:
-            Dict containing the parsed LLM response
+            Dict of keyword arguments for the Messages API
         """
-        if not self.client:
-            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
-        
-        logger.info(f"Sending request to {self.model_name}")
-        
         # Build the message content - either just the prompt or prompt + files
         if files_json and files_json.strip():
             try:
@@ -144,19 +176,128 @@ class AnthropicAPIBackend(LLMBackend):
         else:
             content = prompt
         
+        return {
+            "model": self.model_name,
+            "max_tokens": self.DEFAULT_MAX_TOKENS,
+            "system": system_prompt or self.get_generic_prompt_template(),
+            "messages": [{"role": "user", "content": content}],
+        }
+
+    def send_request(self, prompt: str, files_json: str, system_prompt: str = None,
+                     on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Send a request to the Anthropic API.
+        
+        This follows the pattern established in the origin/main processors.
+        
+        Args:
+            prompt: The user prompt
+            files_json: JSON string containing the request data with full file contents
+            system_prompt: Optional system prompt
+            on_file: Called with each {"path_and_filename", "contents"} object as soon
+                as it has been received, when streaming is enabled; those files are
+                left out of the returned response
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        if not self.client:
+            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
+        
+        logger.info(f"Sending request to {self.model_name}")
+        kwargs = self._build_request_kwargs(prompt, files_json, system_prompt)
+        
         # Send to LLM using the same pattern as origin/main processors
-        response = self.client.messages.create(
-            model=self.model_name,
-            max_tokens=self.DEFAULT_MAX_TOKENS,
-            system=system_prompt or self.get_generic_prompt_template(),
-            messages=[{"role": "user", "content": content}]
-        )
+        with LLM_LIMIT:
+            if self.stream:
+                return self._send_streaming_request(kwargs, on_file)
+            response = self.client.messages.create(**kwargs)
         
-        logger.info(f"LLM usage: {response.usage}")
+        return self._parse_response(response)
+    
+    def _send_streaming_request(self, kwargs: Dict[str, Any],
+                                on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Stream a response and hand out every file of it as soon as it is complete.
         
-        # Extract and parse the response
-        response_text = response.content[0].text
-        return self.extract_json_response(response_text)
+        Clients without a streaming API (mock, cache, cassette) return the whole
+        text at once; it goes through the same parser so callers see the same events.
+        
+        Args:
+            kwargs: Keyword arguments for the Messages API
+            on_file: Called with each completed file object
+            
+        Returns:
+            Dict containing the parsed LLM response; files handed to on_file are not repeated in it
+        """
+        stream = _ResponseStream(self.stream_callback, on_file)
+        messages = self.client.messages
+        if hasattr(messages, "stream"):
+            self._consume_stream(messages, kwargs, stream)
+        else:
+            response = messages.create(**kwargs)
+            logger.info(f"LLM usage: {response.usage}")
+            stream.feed(response.content[0].text)
+        return stream.finish()
+    
+    @staticmethod
+    def _consume_stream(messages, kwargs: Dict[str, Any], stream: "_ResponseStream") -> None:
+        """Feed the text of a blocking messages.stream call into a _ResponseStream."""
+        with messages.stream(**kwargs) as message_stream:
+            for chunk in message_stream.text_stream:
+                stream.feed(chunk)
+            logger.info(f"LLM usage: {message_stream.get_final_message().usage}")
+    
+    async def send_request_async(self, prompt: str, files_json: str, system_prompt: str = None,
+                                 on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Async counterpart of send_request, streaming the response when enabled.
+        
+        See send_request for the arguments.
+        
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        if not self.stream:
+            return await super().send_request_async(prompt, files_json, system_prompt)
+        if not self.client:
+            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
+        
+        logger.info(f"Sending async request to {self.model_name}")
+        kwargs = self._build_request_kwargs(prompt, files_json, system_prompt)
+        async with LLM_LIMIT:
+            return await self._send_streaming_request_async(kwargs, on_file)
+    
+    async def _send_streaming_request_async(self, kwargs: Dict[str, Any],
+                                            on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Async variant of _send_streaming_request, using the transports of _create_message_async.
+        
+        Our client wrappers (acreate) don't stream and return the whole text at once.
+        Otherwise the async client streams natively, and a blocking client's
+        stream is consumed in the default executor.
+        """
+        stream = _ResponseStream(self.stream_callback, on_file)
+        messages = self.client.messages
+        async_messages = getattr(self.async_client, "messages", None)
+        if hasattr(messages, "acreate"):
+            response = await messages.acreate(**kwargs)
+        elif async_messages is not None and hasattr(async_messages, "stream"):
+            async with async_messages.stream(**kwargs) as message_stream:
+                async for chunk in message_stream.text_stream:
+                    stream.feed(chunk)
+                logger.info(f"LLM usage: {(await message_stream.get_final_message()).usage}")
+            return stream.finish()
+        elif hasattr(messages, "stream"):
+            await asyncio.to_thread(self._consume_stream, messages, kwargs, stream)
+            return stream.finish()
+        elif async_messages is not None:
+            response = await async_messages.create(**kwargs)
+        else:
+            response = await asyncio.to_thread(messages.create, **kwargs)
+        logger.info(f"LLM usage: {response.usage}")
+        stream.feed(response.content[0].text)
+        return stream.finish()
     
     def extract_json_response(self, response_text: str) -> Dict[str, Any]:
         """
@@ -176,13 +317,13 @@ class AnthropicAPIBackend(LLMBackend):
             # Return empty response if JSON extraction fails
             return {}
     
-    def send_fix_request(self, run_logs_files: List[FileReference], 
+    def _build_fix_request(self, run_logs_files: List[FileReference], 
                         code_files: List[FileReference],
                         read_only_files: List[str] = None,
                         memory: List[str] = None,
-                        replay_dir: str = None) -> Dict[str, Any]:
+                        replay_dir: str = None) -> Tuple[str, Optional[str]]:
         """
-        Send a fix request following the origin/main FixNodeProcessor pattern.
+        Build a fix request following the origin/main FixNodeProcessor pattern.
         
         Args:
             run_logs_files: Run log files with content
@@ -192,7 +333,7 @@ class AnthropicAPIBackend(LLMBackend):
             replay_dir: Directory containing system instructions
             
         Returns:
-            Dict containing the parsed LLM response
+            Tuple of the request JSON and the system prompt
         """
         # For anthropic_api backend, read_only_files should be empty array (as per requirement)
         if read_only_files is None:
@@ -216,14 +357,30 @@ class AnthropicAPIBackend(LLMBackend):
         if replay_dir:
             system_prompt = self.get_prompt_node_system_instructions(replay_dir)
         
-        # Send request
-        return self.send_request("", request_json, system_prompt)
+        return request_json, system_prompt
     
-    def send_prompt_request(self, prompt: str, code_files: List[FileReference],
+    def send_fix_request(self, run_logs_files: List[FileReference], 
+                        code_files: List[FileReference],
+                        read_only_files: List[str] = None,
+                        memory: List[str] = None,
+                        replay_dir: str = None,
+                        on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Send a fix request following the origin/main FixNodeProcessor pattern.
+        
+        See _build_fix_request for the arguments and send_request for on_file.
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        request_json, system_prompt = self._build_fix_request(run_logs_files, code_files, read_only_files, memory, replay_dir)
+        return self.send_request("", request_json, system_prompt, on_file=on_file)
+    
+    def _build_prompt_request(self, prompt: str, code_files: List[FileReference],
                           read_only_files: List[FileReference],
-                          replay_dir: str) -> Dict[str, Any]:
+                          replay_dir: str) -> Tuple[str, Optional[str]]:
         """
-        Send a prompt request following the origin/main PromptNodeProcessor pattern.
+        Build a prompt request following the origin/main PromptNodeProcessor pattern.
         
         Note: origin/main doesn't include memory in PROMPT requests.
         
@@ -234,7 +391,7 @@ class AnthropicAPIBackend(LLMBackend):
             replay_dir: Directory containing system instructions
             
         Returns:
-            Dict containing the parsed LLM response
+            Tuple of the request JSON and the system prompt
         """
         # Build request following origin/main PromptNodeProcessor pattern (no memory)
         request_dict = {
@@ -250,8 +407,22 @@ class AnthropicAPIBackend(LLMBackend):
         # Get system instructions
         system_prompt = self.get_prompt_node_system_instructions(replay_dir)
         
-        # Send request
-        return self.send_request("", request_json, system_prompt)
+        return request_json, system_prompt
+    
+    def send_prompt_request(self, prompt: str, code_files: List[FileReference],
+                          read_only_files: List[FileReference],
+                          replay_dir: str,
+                          on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Send a prompt request following the origin/main PromptNodeProcessor pattern.
+        
+        See _build_prompt_request for the arguments and send_request for on_file.
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        request_json, system_prompt = self._build_prompt_request(prompt, code_files, read_only_files, replay_dir)
+        return self.send_request("", request_json, system_prompt, on_file=on_file)
     
     def get_fix_node_prompt_with_commands(self) -> str:
         """
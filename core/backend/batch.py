@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from core.backend.jobserver import Jobserver
+from core.backend.limits import RunLimits, configure_limits
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchEntry:
+    """One line of a batch manifest: a prompt file to run as a project, repeat times."""
+    prompt_file: str
+    project_name: str
+    llm_backend: str = "claude_code"
+    repeat: int = 1
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a single run of a BatchEntry."""
+    project_name: str
+    version: Optional[str]
+    status: str
+    steps: int
+    duration: float
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def load_manifest(manifest_path: str) -> List[BatchEntry]:
+    """
+    Load a batch manifest.
+
+    The manifest is a JSON list of objects with the keys of BatchEntry, e.g.
+
+        [
+            {"prompt_file": "prompts/cosh.txt", "project_name": "cosh"},
+            {"prompt_file": "prompts/acos.txt", "project_name": "acos",
+             "llm_backend": "anthropic_api", "repeat": 3}
+        ]
+
+    Relative prompt file paths are resolved against the manifest's directory.
+
+    Args:
+        manifest_path: Path to the manifest file
+
+    Returns:
+        List[BatchEntry]: The entries in manifest order
+
+    Raises:
+        ValueError: If the manifest is malformed or project names repeat
+    """
+    with open(manifest_path, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"Batch manifest must be a JSON list, got {type(data).__name__}")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    seen = set()
+    for i, item in enumerate(data):
+        try:
+            entry = BatchEntry(**item)
+        except TypeError as e:
+            raise ValueError(f"Invalid batch manifest entry {i}: {e}") from e
+        if entry.repeat < 1:
+            raise ValueError(f"Invalid batch manifest entry {i}: repeat must be at least 1")
+        if entry.project_name in seen:
+            raise ValueError(f"Project {entry.project_name} appears more than once in the batch manifest")
+        seen.add(entry.project_name)
+        if not os.path.isabs(entry.prompt_file):
+            entry.prompt_file = os.path.join(base_dir, entry.prompt_file)
+        entries.append(entry)
+    return entries
+
+
+def _run_entry(entry: BatchEntry, output_dir: str, use_mock: bool, disable_git: bool, jobs: int,
+               cache_mode: str, cache_dir: Optional[str]) -> List[BatchResult]:
+    """
+    Run all repeats of one manifest entry inside a pool worker.
+
+    Repeats of the same project run back to back because each of them
+    allocates the next version directory of the project.
+    """
+    from core.backend.replay import Replay, InputConfig
+
+    results = []
+    for _ in range(entry.repeat):
+        started = time.monotonic()
+        replay = None
+        try:
+            input_config = InputConfig(
+                input_prompt_file=entry.prompt_file,
+                project_name=entry.project_name,
+                output_dir=output_dir
+            )
+            replay = Replay.from_recipe(input_config, use_mock=use_mock, llm_backend=entry.llm_backend, disable_git=disable_git,
+                                        cache_mode=cache_mode, cache_dir=cache_dir)
+            replay.run_all(max_workers=jobs)
+            replay.save_state()
+            replay.close()
+            results.append(BatchResult(
+                project_name=entry.project_name,
+                version=os.path.basename(replay.version_dir),
+                status=replay.status.value,
+                steps=replay.state.execution.step_count,
+                duration=time.monotonic() - started
+            ))
+        except Exception as e:
+            logger.error(f"Batch run of {entry.project_name} failed: {e}")
+            if replay is not None:
+                replay.close()
+            results.append(BatchResult(
+                project_name=entry.project_name,
+                version=os.path.basename(replay.version_dir) if replay is not None and replay.version_dir else None,
+                status="failed",
+                steps=replay.state.execution.step_count if replay is not None else 0,
+                duration=time.monotonic() - started,
+                error=str(e)
+            ))
+    return results
+
+
+def run_batch(
+    entries: List[BatchEntry],
+    output_dir: str,
+    workers: int = 4,
+    max_llm_requests: Optional[int] = None,
+    max_run_commands: Optional[int] = None,
+    use_mock: bool = False,
+    disable_git: bool = False,
+    jobs: int = 1,
+    cache_mode: str = "off",
+    cache_dir: Optional[str] = None,
+    run_defaults: Optional[RunLimits] = None,
+    build_slots: Optional[int] = None
+) -> List[BatchResult]:
+    """
+    Run a batch of projects across a process pool.
+
+    Every worker shares two semaphores created here: one caps the number of
+    in-flight LLM requests and one caps the number of RUN subprocesses across
+    the whole batch (see core.backend.limits). With build_slots the workers
+    also share one make jobserver (see core.backend.jobserver).
+
+    Args:
+        entries: Manifest entries to run
+        output_dir: Output directory shared by all projects
+        workers: Number of worker processes
+        max_llm_requests: Global cap on concurrent LLM requests (None for no cap)
+        max_run_commands: Global cap on concurrent RUN subprocesses (None for no cap)
+        use_mock: Use the mock client instead of a real backend
+        disable_git: Disable git commits in the project directories
+        jobs: Concurrent nodes within each project (see Replay.run_all)
+        cache_mode: LLM response cache mode shared by all projects ("read", "write" or "off")
+        cache_dir: LLM response cache directory
+        run_defaults: Limits of RUN commands that don't set their own
+        build_slots: Build slots shared by all RUN commands of the batch (None for no jobserver)
+
+    Returns:
+        List[BatchResult]: One result per run, in manifest order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    llm_semaphore = multiprocessing.Semaphore(max_llm_requests) if max_llm_requests else None
+    run_semaphore = multiprocessing.Semaphore(max_run_commands) if max_run_commands else None
+
+    logger.info(f"Running batch of {len(entries)} projects with {workers} workers "
+                f"(llm cap: {max_llm_requests or 'none'}, run cap: {max_run_commands or 'none'})")
+    results_by_entry = {}
+    jobserver = Jobserver.create(build_slots) if build_slots else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_limits,
+                                 initargs=(llm_semaphore, run_semaphore, run_defaults,
+                                           jobserver.path if jobserver else None)) as pool:
+            futures = {
+                pool.submit(_run_entry, entry, output_dir, use_mock, disable_git, jobs, cache_mode, cache_dir): i
+                for i, entry in enumerate(entries)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                results_by_entry[i] = future.result()
+                for result in results_by_entry[i]:
+                    logger.info(f"Finished {result.project_name} v{result.version}: {result.status} "
+                                f"({result.steps} steps, {result.duration:.1f}s)")
+    finally:
+        if jobserver is not None:
+            jobserver.close()
+
+    return [result for i in range(len(entries)) for result in results_by_entry[i]]
+
+
+def format_summary(results: List[BatchResult]) -> str:
+    """
+    Format batch results as a plain text table.
+
+    Args:
+        results: Results returned by run_batch
+
+    Returns:
+        str: The summary table
+    """
+    headers = ["project", "version", "status", "steps", "duration"]
+    rows = [[r.project_name, r.version or "-", r.status, str(r.steps), f"{r.duration:.1f}s"] for r in results]
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+
+    def format_row(row):
+        return "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+
+    lines = [format_row(headers), format_row(["-" * width for width in widths])]
+    lines.extend(format_row(row) for row in rows)
+    failed = sum(1 for r in results if r.status == "failed")
+    lines.append(f"\n{len(results)} runs, {failed} failed, total {sum(r.duration for r in results):.1f}s")
+    return "\n".join(lines)
@@ -0,0 +1,240 @@
+import os
+import json
+import stat
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409  # ioctl request number of Linux reflinks (_IOW(0x94, 9, int))
+
+# Errors meaning "this kind of link doesn't work here", as opposed to real I/O failures
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK, errno.ENOSYS}
+
+
+@dataclass
+class TreeEntry:
+    """One file of a stored tree."""
+    path: str  # relative path, "/"-separated
+    sha: str
+    executable: bool = False
+
+
+@dataclass
+class Tree:
+    """Manifest of a stored directory (or of a single file, with path "")."""
+    sha: str
+    entries: List[TreeEntry] = field(default_factory=list)
+    dirs: List[str] = field(default_factory=list)  # every directory, including empty ones
+
+
+class BlobStore:
+    """
+    Project-level content-addressed store for /TEMPLATE and /DOCS content.
+
+    Every file is stored once under objects/ by the sha256 of its contents,
+    and every directory as a manifest under trees/. A stat cache of the
+    sources (mtime, size and inode per file) lets unchanged sources be
+    ingested without reading them again, so creating version 500 of a
+    project costs the same as creating version 2.
+
+    Versions get the content through the cheapest safe link:
+    - shared (replay/template, replay/docs): a reflink, or else a hardlink to
+      the read-only stored object, or else a copy
+    - private (code/): a reflink (copy-on-write), or else a copy
+
+    Example:
+        store = BlobStore("replay_output/cosh/replay/blobs")
+        tree = store.ingest("prompts/templates/cosh")
+        store.materialize(tree, "replay_output/cosh/3/replay/template/cosh")
+        store.materialize(tree, "replay_output/cosh/3/code", private=True)
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory of the store, normally <project_dir>/replay/blobs
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.trees_dir = os.path.join(root, "trees")
+        self.sources_path = os.path.join(root, "sources.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.trees_dir, exist_ok=True)
+        self._sources = self._load_sources()
+        self._lock = threading.Lock()
+        self._reflinks = True
+        self._hardlinks = True
+        self.stats = {"hashed": 0, "reused": 0, "reflinked": 0, "hardlinked": 0, "copied": 0}
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def _load_sources(self) -> Dict[str, list]:
+        try:
+            with open(self.sources_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_sources(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._sources, f)
+        os.replace(tmp_path, self.sources_path)
+
+    def _object_path(self, sha: str, executable: bool) -> str:
+        name = sha + ("-x" if executable else "")
+        return os.path.join(self.objects_dir, sha[:2], name)
+
+    def _ingest_file(self, path: str) -> Tuple[str, bool]:
+        """Store one source file and return its sha and executable bit."""
+        st = os.stat(path)
+        executable = bool(st.st_mode & stat.S_IXUSR)
+        key = os.path.realpath(path)
+        cached = self._sources.get(key)
+        if (cached and cached[:3] == [st.st_mtime_ns, st.st_size, st.st_ino]
+                and os.path.exists(self._object_path(cached[3], executable))):
+            self.stats["reused"] += 1
+            return cached[3], executable
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        self.stats["hashed"] += 1
+
+        object_path = self._object_path(sha, executable)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(path, tmp_path)
+            # Stored objects are shared by hardlinks and must never change
+            os.chmod(tmp_path, 0o555 if executable else 0o444)
+            os.replace(tmp_path, object_path)
+        self._sources[key] = [st.st_mtime_ns, st.st_size, st.st_ino, sha]
+        return sha, executable
+
+    def ingest(self, src_path: str) -> Tree:
+        """
+        Store a file or directory.
+
+        Args:
+            src_path: Source file or directory; symlinks are followed like shutil.copytree does
+
+        Returns:
+            Tree: Manifest of the stored content
+        """
+        with self._lock:
+            entries, dirs = [], []
+            if os.path.isdir(src_path):
+                for root, dir_names, file_names in os.walk(src_path, followlinks=True):
+                    dir_names.sort()
+                    rel_root = os.path.relpath(root, src_path).replace(os.sep, "/")
+                    rel_root = "" if rel_root == "." else rel_root
+                    if rel_root:
+                        dirs.append(rel_root)
+                    for name in sorted(file_names):
+                        rel_path = f"{rel_root}/{name}" if rel_root else name
+                        sha, executable = self._ingest_file(os.path.join(root, name))
+                        entries.append(TreeEntry(rel_path, sha, executable))
+            else:
+                sha, executable = self._ingest_file(src_path)
+                entries.append(TreeEntry("", sha, executable))
+            self._save_sources()
+
+            manifest = {"entries": [[e.path, e.sha, e.executable] for e in entries], "dirs": dirs}
+            encoded = json.dumps(manifest, sort_keys=True).encode("utf-8")
+            tree = Tree(hashlib.sha256(encoded).hexdigest(), entries, dirs)
+            tree_path = os.path.join(self.trees_dir, f"{tree.sha}.json")
+            if not os.path.exists(tree_path):
+                fd, tmp_path = tempfile.mkstemp(dir=self.trees_dir, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(encoded)
+                os.replace(tmp_path, tree_path)
+            return tree
+
+    def load_tree(self, sha: str) -> Tree:
+        """
+        Read a stored manifest.
+
+        Raises:
+            FileNotFoundError: If there is no such tree
+        """
+        with open(os.path.join(self.trees_dir, f"{sha}.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return Tree(sha, [TreeEntry(*entry) for entry in manifest["entries"]], manifest["dirs"])
+
+    # ------------------------------------------------------------------
+    # Materialize
+    # ------------------------------------------------------------------
+
+    def materialize(self, tree: Tree, dest: str, private: bool = False) -> None:
+        """
+        Create the content of a tree at dest.
+
+        Args:
+            tree: Manifest returned by ingest
+            dest: Destination directory, or destination file for a single-file tree
+            private: The copy will be modified (code/): never hardlink it
+        """
+        for rel_dir in tree.dirs:
+            os.makedirs(os.path.join(dest, rel_dir), exist_ok=True)
+        for entry in tree.entries:
+            target = os.path.join(dest, entry.path) if entry.path else dest
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            self._place(entry, target, private)
+
+    def _place(self, entry: TreeEntry, target: str, private: bool) -> None:
+        source = self._object_path(entry.sha, entry.executable)
+        if os.path.lexists(target):
+            os.remove(target)
+        writable_mode = 0o755 if entry.executable else 0o644
+
+        if self._reflinks and self._reflink(source, target):
+            os.chmod(target, writable_mode)
+            self.stats["reflinked"] += 1
+            return
+        if not private and self._hardlinks:
+            try:
+                os.link(source, target)
+                self.stats["hardlinked"] += 1
+                return
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                logger.info(f"Hardlinks unavailable in {os.path.dirname(target)} ({e.strerror}), copying instead")
+                self._hardlinks = False
+        shutil.copyfile(source, target)
+        os.chmod(target, writable_mode)
+        self.stats["copied"] += 1
+
+    def _reflink(self, source: str, target: str) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            self._reflinks = False
+            return False
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError as e:
+            if os.path.exists(target):
+                os.remove(target)
+            if e.errno not in _UNSUPPORTED:
+                raise
+            # The filesystem can't clone; don't try again for every file
+            self._reflinks = False
+            return False
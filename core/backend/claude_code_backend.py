@@ -1,11 +1,13 @@
 import json
 import logging
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 
-from .llm_backend import LLMBackend
+from .limits import LLM_LIMIT
+from .llm_backend import LLMBackend, AsyncLLMBackend
 from .claude_code_config import ClaudeCodeConfig
+from .run_log_store import read_log
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +19,7 @@ class FileReference:
     content: str
 
 
-class ClaudeCodeBackend(LLMBackend):
+class ClaudeCodeBackend(LLMBackend, AsyncLLMBackend):
     """
     Claude Code backend implementation that uses the configured Claude Code client.
     
@@ -111,21 +113,14 @@ class ClaudeCodeBackend(LLMBackend):
     def _read_file_safely(self, file_path: str, last_n_lines: int = None) -> str:
         """Read a file safely with proper encoding handling."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if last_n_lines is not None:
-                    return '\n'.join(f.readlines()[-last_n_lines:])
-                else:
-                    return f.read()
+            return read_log(file_path, last_n_lines)
         except Exception as e:
             logger.error(f"Error reading file {file_path}: {e}")
             return ""
     
-    def send_request(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
+    def _build_request_kwargs(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
         """
-        Send a request to the Claude Code LLM.
-        
-        This follows the pattern established in the processors where the client
-        is accessed from the replay context.
+        Build the keyword arguments for client.messages.create.
         
         Args:
             prompt: The user prompt
@@ -133,13 +128,8 @@ class ClaudeCodeBackend(LLMBackend):
             system_prompt: Optional system prompt
             
         Returns:
-            Dict containing the parsed LLM response
+            Dict of keyword arguments for the Messages API
         """
-        if not self.client:
-            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
-        
-        logger.info(f"Sending request to {self.model_name}")
-        
         # Build the message content - either just the prompt or prompt + files
         if files_json and files_json.strip():
             try:
@@ -155,19 +145,38 @@ class ClaudeCodeBackend(LLMBackend):
         else:
             content = prompt
         
+        return {
+            "model": self.model_name,
+            "max_tokens": self.DEFAULT_MAX_TOKENS,
+            "system": system_prompt or self.get_generic_prompt_template(),
+            "messages": [{"role": "user", "content": content}],
+        }
+
+    def send_request(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
+        """
+        Send a request to the Claude Code LLM.
+        
+        This follows the pattern established in the processors where the client
+        is accessed from the replay context.
+        
+        Args:
+            prompt: The user prompt
+            files_json: JSON string containing the request data
+            system_prompt: Optional system prompt
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        if not self.client:
+            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
+        
+        logger.info(f"Sending request to {self.model_name}")
+        
         # Send to LLM using the same pattern as processors
-        response = self.client.messages.create(
-            model=self.model_name,
-            max_tokens=self.DEFAULT_MAX_TOKENS,
-            system=system_prompt or self.get_generic_prompt_template(),
-            messages=[{"role": "user", "content": content}]
-        )
-        
-        logger.info(f"LLM usage: {response.usage}")
-        
-        # Extract and parse the response
-        response_text = response.content[0].text
-        return self.extract_json_response(response_text)
+        with LLM_LIMIT:
+            response = self.client.messages.create(**self._build_request_kwargs(prompt, files_json, system_prompt))
+        
+        return self._parse_response(response)
     
     def extract_json_response(self, response_text: str) -> Dict[str, Any]:
         """
@@ -188,13 +197,13 @@ class ClaudeCodeBackend(LLMBackend):
             # Return empty response if JSON extraction fails
             return {}
     
-    def send_fix_request(self, run_logs_files: List[FileReference], 
+    def _build_fix_request(self, run_logs_files: List[FileReference], 
                         code_files: List[FileReference],
                         read_only_files: List[str] = None,
                         memory: List[str] = None,
-                        replay_dir: str = None) -> Dict[str, Any]:
+                        replay_dir: str = None) -> Tuple[str, Optional[str]]:
         """
-        Send a fix request following the Claude Code pattern.
+        Build a fix request following the Claude Code pattern.
         
         Args:
             run_logs_files: Run log files with content
@@ -204,7 +213,7 @@ class ClaudeCodeBackend(LLMBackend):
             replay_dir: Directory containing system instructions
             
         Returns:
-            Dict containing the parsed LLM response
+            Tuple of the request JSON and the system prompt
         """
         # Ensure defaults are set
         if read_only_files is None:
@@ -231,15 +240,30 @@ class ClaudeCodeBackend(LLMBackend):
         if replay_dir:
             system_prompt = self.get_prompt_node_system_instructions(replay_dir)
         
-        # Send request
+        return request_json, system_prompt
+    
+    def send_fix_request(self, run_logs_files: List[FileReference], 
+                        code_files: List[FileReference],
+                        read_only_files: List[str] = None,
+                        memory: List[str] = None,
+                        replay_dir: str = None) -> Dict[str, Any]:
+        """
+        Send a fix request following the Claude Code pattern.
+        
+        See _build_fix_request for the arguments.
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        request_json, system_prompt = self._build_fix_request(run_logs_files, code_files, read_only_files, memory, replay_dir)
         return self.send_request("", request_json, system_prompt)
     
-    def send_prompt_request(self, prompt: str, code_files: List[FileReference],
+    def _build_prompt_request(self, prompt: str, code_files: List[FileReference],
                           read_only_files: List[FileReference],
                           memory: List[str],
-                          replay_dir: str) -> Dict[str, Any]:
+                          replay_dir: str) -> Tuple[str, Optional[str]]:
         """
-        Send a prompt request following the PromptNodeProcessor pattern.
+        Build a prompt request following the PromptNodeProcessor pattern.
         
         Args:
             prompt: The user prompt
@@ -249,7 +273,7 @@ class ClaudeCodeBackend(LLMBackend):
             replay_dir: Directory containing system instructions
             
         Returns:
-            Dict containing the parsed LLM response
+            Tuple of the request JSON and the system prompt
         """
         # Build request following PromptNodeProcessor pattern
         request_dict = {
@@ -266,5 +290,19 @@ class ClaudeCodeBackend(LLMBackend):
         # Get system instructions
         system_prompt = self.get_prompt_node_system_instructions(replay_dir)
         
-        # Send request
+        return request_json, system_prompt
+    
+    def send_prompt_request(self, prompt: str, code_files: List[FileReference],
+                          read_only_files: List[FileReference],
+                          memory: List[str],
+                          replay_dir: str) -> Dict[str, Any]:
+        """
+        Send a prompt request following the PromptNodeProcessor pattern.
+        
+        See _build_prompt_request for the arguments.
+            
+        Returns:
+            Dict containing the parsed LLM response
+        """
+        request_json, system_prompt = self._build_prompt_request(prompt, code_files, read_only_files, memory, replay_dir)
         return self.send_request("", request_json, system_prompt)
\ No newline at end of file
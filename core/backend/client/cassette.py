@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from core.backend.client.response_cache import CachedResponse
+from core.backend.client.transcript_store import TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+# Run log file names carry the time they were written (see RunNodeProcessor)
+TIMESTAMP_PATTERN = re.compile(r"\d{2}-\d{2}-\d{2}-\d{6}")
+VERSION_DIR_PLACEHOLDER = "<version_dir>"
+
+
+class CassetteMismatchError(RuntimeError):
+    """Raised when a request does not match the recorded transcript."""
+
+
+@dataclass
+class RecordedExchange:
+    """One recorded request and the text the LLM answered with."""
+    number: int
+    request: Dict[str, Any]
+    response_text: str
+    model: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+
+
+def _request_fields(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract model, system and messages from either wrapper's saved request format."""
+    if "original_kwargs" in request:
+        # ClaudeCodeClientWrapper saves the create() kwargs next to the SDK options
+        request = request["original_kwargs"]
+    return {
+        "model": request.get("model"),
+        "system": request.get("system"),
+        "messages": request.get("messages", []),
+    }
+
+
+def _response_text(response: Dict[str, Any]) -> str:
+    """Recover the text the wrappers returned to the backend from a saved response."""
+    if response.get("content"):
+        # ClientWrapper: Anthropic content blocks
+        return response["content"][0].get("text", "")
+    # ClaudeCodeClientWrapper: the last assistant message with text wins
+    text = ""
+    for message in response.get("messages", []):
+        if message.get("type") == "assistant" and message.get("content"):
+            text = message["content"]
+    return text
+
+
+def load_exchanges(client_dir: str) -> List[RecordedExchange]:
+    """
+    Load the recorded exchanges of a version, in request order.
+
+    Args:
+        client_dir: The <version>/client directory of a previous run
+
+    Returns:
+        List[RecordedExchange]: The recorded exchanges
+
+    Raises:
+        FileNotFoundError: If the directory holds no transcripts
+    """
+    exchanges = []
+    for record in TranscriptReader(client_dir):
+        response = record.get("response", {})
+        result = response.get("result") or {}
+        exchanges.append(RecordedExchange(
+            number=record.get("request_number", 0),
+            request=_request_fields(record.get("request", {})),
+            response_text=_response_text(response),
+            model=response.get("model"),
+            usage=response.get("usage") or result.get("usage"),
+        ))
+    if not exchanges:
+        raise FileNotFoundError(f"No recorded transcripts found in {client_dir}")
+    exchanges.sort(key=lambda exchange: exchange.number)
+    return exchanges
+
+
+class CassetteClient:
+    """
+    Serves LLM responses from the transcripts of a previous version.
+
+    Requests are answered in the order they were recorded. Every request is
+    compared with its recorded counterpart after normalizing what legitimately
+    differs between runs (the version directory and run log timestamps). If
+    the next recorded request doesn't match, an unused recording with the same
+    request is served instead, so runs with concurrent nodes still replay.
+    Otherwise the run fails with CassetteMismatchError, or, with
+    on_mismatch="warn", logs the difference and serves the next recording.
+
+    Only the returned text is replayed; edits a Claude Code agent made with its
+    own tools during the recorded session are not.
+
+    Example:
+        client = CassetteClient("replay_output/cosh/3", current_version_dir)
+        response = client.messages.create(model=..., system=..., messages=...)
+    """
+
+    def __init__(self, source_version_dir: str, version_dir: Optional[str] = None, on_mismatch: str = "error"):
+        """
+        Initialize the cassette.
+
+        Args:
+            source_version_dir: Version directory whose client/ transcripts are replayed
+            version_dir: Version directory of the current run, used to normalize paths
+            on_mismatch: "error" to fail on a differing request, "warn" to serve it anyway
+        """
+        if on_mismatch not in ("error", "warn"):
+            raise ValueError(f"on_mismatch must be 'error' or 'warn', got {on_mismatch}")
+        self.source_version_dir = os.path.realpath(source_version_dir)
+        self.version_dir = os.path.realpath(version_dir) if version_dir else None
+        self.on_mismatch = on_mismatch
+        self.exchanges = load_exchanges(os.path.join(self.source_version_dir, "client"))
+        # Normalized recorded requests, computed once; _by_key lists the exchanges recorded for each
+        self._keys = [self._normalize(exchange.request, self.source_version_dir) for exchange in self.exchanges]
+        self._by_key: Dict[str, List[int]] = {}
+        for index, key in enumerate(self._keys):
+            self._by_key.setdefault(key, []).append(index)
+        self._used = [False] * len(self.exchanges)
+        self._next = 0
+        self._lock = threading.Lock()
+        self.messages = self.Messages(self)
+        logger.info(f"Replaying {len(self.exchanges)} recorded LLM exchanges from {self.source_version_dir}")
+
+    def remaining(self) -> int:
+        """Number of recorded exchanges not served yet."""
+        return self._used.count(False)
+
+    def _normalize(self, request: Dict[str, Any], version_dir: Optional[str]) -> str:
+        text = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        if version_dir:
+            text = text.replace(version_dir, VERSION_DIR_PLACEHOLDER)
+        return TIMESTAMP_PATTERN.sub("<timestamp>", text)
+
+    def match(self, request: Dict[str, Any]) -> RecordedExchange:
+        """
+        Pick the recorded exchange answering a request.
+
+        Args:
+            request: The create() keyword arguments
+
+        Returns:
+            RecordedExchange: The exchange to serve
+
+        Raises:
+            CassetteMismatchError: If the cassette is exhausted, or the request
+                matches no recording and on_mismatch is "error"
+        """
+        key = self._normalize(_request_fields(request), self.version_dir)
+        with self._lock:
+            while self._next < len(self.exchanges) and self._used[self._next]:
+                self._next += 1
+            if self._next >= len(self.exchanges):
+                raise CassetteMismatchError(
+                    f"Cassette exhausted: all {len(self.exchanges)} recorded exchanges were already served")
+
+            index = self._next
+            if self._keys[index] != key:
+                index = next((i for i in self._by_key.get(key, ()) if not self._used[i]), None)
+                if index is None:
+                    expected = self._keys[self._next]
+                    message = (f"Request does not match recorded exchange {self.exchanges[self._next].number}: "
+                               f"{_first_difference(expected, key)}")
+                    if self.on_mismatch == "error":
+                        raise CassetteMismatchError(message)
+                    logger.warning(message)
+                    index = self._next
+
+            self._used[index] = True
+            return self.exchanges[index]
+
+    class Messages:
+        """Anthropic-compatible messages interface backed by the cassette."""
+
+        def __init__(self, cassette):
+            self.cassette = cassette
+
+        def create(self, **kwargs):
+            exchange = self.cassette.match(kwargs)
+            logger.info(f"📼 Serving recorded exchange {exchange.number}")
+            return CachedResponse([exchange.response_text], exchange.model, exchange.usage)
+
+        async def acreate(self, **kwargs):
+            return self.create(**kwargs)
+
+
+def _first_difference(expected: str, actual: str, context: int = 60) -> str:
+    """Describe where two normalized requests first differ."""
+    position = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+    start = max(0, position - context)
+    return (f"first difference at character {position}: "
+            f"recorded ...{expected[start:position + context]!r}... "
+            f"got ...{actual[start:position + context]!r}...")
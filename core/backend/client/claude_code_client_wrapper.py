@@ -1,29 +1,62 @@
 import os
 import json
 import logging
+import threading
 import asyncio
+import contextlib
+import contextvars
 from datetime import datetime
-from typing import Any, Dict, List, Optional, AsyncIterator
+from typing import Any, Callable, Dict, List, Optional, AsyncIterator
 from claude_code_sdk import query, ClaudeCodeOptions, UserMessage, AssistantMessage, SystemMessage, ResultMessage, TextBlock
 from claude_code_sdk.types import PermissionMode
-from claude_code_sdk._errors import ProcessError, CLINotFoundError, CLIConnectionError, CLIJSONDecodeError
+from claude_code_sdk import ProcessError, CLINotFoundError, CLIConnectionError, CLIJSONDecodeError
+
+from core.backend.client.claude_session_pool import ClaudeSessionPool, SessionStartError
+from core.backend.client.transcript_store import TranscriptWriter
 
 logger = logging.getLogger(__name__)
 
 class ClaudeCodeClientWrapper:
     """
-    A wrapper around claude_code_sdk.query that provides similar functionality to the
+    A wrapper around Claude Code that provides similar functionality to the
     standard Anthropic client but uses Claude Code's enhanced capabilities.
     Handles async operations internally to provide a synchronous interface.
+    Requests run on warm CLI sessions from a ClaudeSessionPool; if the CLI
+    can't keep a session open, each request uses claude_code_sdk.query.
     """
     
-    def __init__(self, version_dir: str, claude_config=None):
+    # Conversation branch of the requests made in the current thread or task
+    _branch: contextvars.ContextVar = contextvars.ContextVar("claude_code_session_branch", default=None)
+    
+    def __init__(self, version_dir: str, claude_config=None, session_pool: bool = True,
+                 max_session_turns: int = 20, session_id: Optional[str] = None,
+                 branch_session_ids: Optional[Dict[str, str]] = None,
+                 on_session_id: Optional[Callable[[Optional[str], str], None]] = None):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            version_dir: Version directory; requests run with it as working directory
+            claude_config: Optional ClaudeCodeConfig
+            session_pool: Keep warm CLI sessions between requests instead of starting
+                the CLI for every request (see ClaudeSessionPool)
+            max_session_turns: Requests a pooled session serves before it is replaced
+            session_id: Session to resume, e.g. saved by a previous process
+            branch_session_ids: Sessions to resume per conversation branch
+            on_session_id: Called with (branch, session_id) whenever a request
+                ends in a session, so the caller can persist it
+        """
         self.version_dir = version_dir
         self.claude_config = claude_config
         self.client_dir = os.path.join(version_dir, "client")
-        self.request_counter = 0
-        self.session_id = None
+        self._lock = threading.Lock()  # guards the background event loop
+        self.transcript = TranscriptWriter(self.client_dir)
+        self.session_id = session_id
+        self.branch_session_ids = dict(branch_session_ids or {})
+        self.on_session_id = on_session_id
         self._loop = None
+        # Sessions live on the background loop, whatever loop a request comes from
+        self.session_pool = ClaudeSessionPool(max_turns=max_session_turns) if session_pool else None
         
         # Create client directory if it doesn't exist
         os.makedirs(self.client_dir, exist_ok=True)
@@ -37,38 +70,40 @@ class ClaudeCodeClientWrapper:
             request_data: The request data sent to Claude Code
             response_data: The response data received from Claude Code
         """
-        self.request_counter += 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Create filename with counter and timestamp
-        filename_base = f"request_{self.request_counter:03d}_{timestamp}"
-        
-        # Save request
-        request_file = os.path.join(self.client_dir, f"{filename_base}_request.json")
-        with open(request_file, 'w', encoding='utf-8') as f:
-            json.dump(request_data, f, indent=2, ensure_ascii=False)
-        
-        # Save response
-        response_file = os.path.join(self.client_dir, f"{filename_base}_response.json")
-        with open(response_file, 'w', encoding='utf-8') as f:
-            json.dump(response_data, f, indent=2, ensure_ascii=False)
+        request_number = self.transcript.append(request_data, response_data)
+        logger.info(f"Saved request-response pair {request_number} to {self.transcript.transcript_path}")
+    
+    @contextlib.contextmanager
+    def session_branch(self, branch: Optional[str]):
+        """
+        Run the requests made inside the block in their own conversation branch.
         
-        # Save combined request-response for easier analysis
-        combined_file = os.path.join(self.client_dir, f"{filename_base}_combined.json")
-        combined_data = {
-            "request": request_data,
-            "response": response_data,
-            "metadata": {
-                "request_number": self.request_counter,
-                "timestamp": timestamp,
-                "request_file": os.path.basename(request_file),
-                "response_file": os.path.basename(response_file)
-            }
-        }
-        with open(combined_file, 'w', encoding='utf-8') as f:
-            json.dump(combined_data, f, indent=2, ensure_ascii=False)
+        A branch starts from the main conversation and then continues its own
+        session, so e.g. the FIX iterations of a DEBUG_LOOP see each other but
+        don't grow the conversation later PROMPTs resume.
         
-        logger.info(f"Saved request-response pair {self.request_counter} to {filename_base}")
+        Args:
+            branch: Branch name, e.g. the FIX node id; None for the main conversation
+        """
+        token = self._branch.set(branch)
+        try:
+            yield
+        finally:
+            self._branch.reset(token)
+    
+    def _resume_id(self, branch: Optional[str]) -> Optional[str]:
+        """Session a request of the branch continues."""
+        if branch is not None and branch in self.branch_session_ids:
+            return self.branch_session_ids[branch]
+        return self.session_id
+    
+    def _record_session_id(self, branch: Optional[str], session_id: str) -> None:
+        if branch is None:
+            self.session_id = session_id
+        else:
+            self.branch_session_ids[branch] = session_id
+        if self.on_session_id is not None:
+            self.on_session_id(branch, session_id)
     
     @property
     def messages(self):
@@ -76,40 +111,49 @@ class ClaudeCodeClientWrapper:
         return self.MessagesWrapper(self)
     
     def _run_async(self, coro):
-        """Run an async coroutine in a synchronous context."""
+        """
+        Run an async coroutine in a synchronous context.
+        
+        All blocking calls share one event loop running on a daemon thread owned
+        by this wrapper, instead of creating a loop (and, inside a running loop,
+        a throwaway thread pool) per request. Async callers should await
+        messages.acreate on their own loop instead.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
         try:
-            # Try to get the current event loop
-            loop = asyncio.get_running_loop()
-            # If we're already in an event loop, we need to run in a thread
-            import concurrent.futures
-            
-            def run_in_thread():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
+            return future.result()
+        except Exception as e:
+            logger.error(f"Error running async coroutine: {e}")
+            raise
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the wrapper's background event loop, starting it on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="claude-code-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+    
+    async def _on_own_loop(self, coro):
+        """Await a coroutine on the wrapper's background loop, from any loop."""
+        loop = self._get_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    def close(self):
+        """Close pooled sessions and stop the background event loop, if one was started."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and not loop.is_closed():
+            if self.session_pool is not None:
                 try:
-                    return new_loop.run_until_complete(coro)
+                    asyncio.run_coroutine_threadsafe(self.session_pool.close(), loop).result(timeout=30)
                 except Exception as e:
-                    logger.error(f"Error running async coroutine: {e}")
-                    raise e
-                finally:
-                    new_loop.close()
-                    asyncio.set_event_loop(None)
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_thread)
-                return future.result()
-        except RuntimeError:
-            # No event loop running, we can create one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                return loop.run_until_complete(coro)
-            except Exception as e:
-                logger.error(f"Error running async coroutine: {e}")
-                raise e
-            finally:
-                loop.close()
-                asyncio.set_event_loop(None)
+                    logger.warning(f"Failed to close Claude Code sessions: {e}")
+            loop.call_soon_threadsafe(loop.stop)
     
     class MessagesWrapper:
         """Wrapper to provide compatibility with the standard Anthropic client interface."""
@@ -121,6 +165,28 @@ class ClaudeCodeClientWrapper:
             """
             Create a message using claude_code_sdk.query with compatibility for standard Anthropic interface.
             """
+            prompt, options, request_data = self._prepare_request(kwargs)
+            branch = self.wrapper._branch.get()
+            
+            # Run the async query using our helper method
+            try:
+                response = self.wrapper._run_async(self._query_claude_code(prompt, options, branch))
+            except Exception as e:
+                logger.error(f"Error during _run_async execution: {type(e).__name__}: {e}")
+                logger.error(f"This may be related to asyncio event loop handling or Claude CLI issues")
+                raise
+            return self._finish_request(request_data, response)
+        
+        async def acreate(self, **kwargs):
+            """
+            Async variant of create that runs the query on the caller's event loop.
+            """
+            prompt, options, request_data = self._prepare_request(kwargs)
+            response = await self._query_claude_code(prompt, options, self.wrapper._branch.get())
+            return self._finish_request(request_data, response)
+        
+        def _prepare_request(self, kwargs):
+            """Translate Anthropic-style kwargs into a Claude Code prompt, options and log record."""
             # Extract standard parameters
             model = kwargs.get("model")
             system = kwargs.get("system")
@@ -139,12 +205,14 @@ class ClaudeCodeClientWrapper:
             
             prompt = "\n\n".join(prompt_parts)
             
-            # Create Claude Code options
+            # Create Claude Code options; resume the known session rather than
+            # --continue, which picks whatever conversation ran last in cwd
+            resume = self.wrapper._resume_id(self.wrapper._branch.get())
             options = ClaudeCodeOptions(
                 system_prompt=system,
                 model=model,
                 max_thinking_tokens=max_tokens or 8000,
-                continue_conversation=self.wrapper.session_id is not None,
+                resume=resume,
                 permission_mode='bypassPermissions',  # Allow all tools for automated execution
                 cwd=self.wrapper.version_dir
             )
@@ -156,7 +224,8 @@ class ClaudeCodeClientWrapper:
                     "system_prompt": system,
                     "model": model,
                     "max_thinking_tokens": options.max_thinking_tokens,
-                    "continue_conversation": options.continue_conversation,
+                    "resume": options.resume,
+                    "branch": self.wrapper._branch.get(),
                     "permission_mode": options.permission_mode,
                     "cwd": str(options.cwd)
                 },
@@ -165,14 +234,10 @@ class ClaudeCodeClientWrapper:
             }
 
             logger.info(f"prompt: {prompt}")
-            
-            # Run the async query using our helper method
-            try:
-                response = self.wrapper._run_async(self._query_claude_code(prompt, options))
-            except Exception as e:
-                logger.error(f"Error during _run_async execution: {type(e).__name__}: {e}")
-                logger.error(f"This may be related to asyncio event loop handling or Claude CLI issues")
-                raise
+            return prompt, options, request_data
+        
+        def _finish_request(self, request_data, response):
+            """Save the exchange and return an Anthropic-compatible response."""
             response_data = self._format_response_data(response)
             
             # Save the request-response pair
@@ -181,17 +246,17 @@ class ClaudeCodeClientWrapper:
             # Return a compatible response object
             return self._create_compatible_response(response)
         
-        async def _query_claude_code(self, prompt: str, options: ClaudeCodeOptions):
+        async def _query_claude_code(self, prompt: str, options: ClaudeCodeOptions, branch: Optional[str] = None):
             """Execute the claude_code_sdk.query and collect results."""
             messages = []
             result_message = None
             
             try:
-                async for message in query(prompt=prompt, options=options):
+                for message in await self._collect_messages(prompt, options, branch):
                     messages.append(message)
                     if isinstance(message, ResultMessage):
                         result_message = message
-                        self.wrapper.session_id = message.session_id
+                        self.wrapper._record_session_id(branch, message.session_id)
                 
                 return {
                     "messages": messages,
@@ -234,6 +299,19 @@ class ClaudeCodeClientWrapper:
                 logger.error(f"Options: {options}")
                 raise
         
+        async def _collect_messages(self, prompt: str, options: ClaudeCodeOptions, branch: Optional[str] = None) -> List[Any]:
+            """Run the query on a pooled session, or as a one-shot CLI process without a pool."""
+            wrapper = self.wrapper
+            if wrapper.session_pool is not None:
+                try:
+                    return await wrapper._on_own_loop(
+                        wrapper.session_pool.query(prompt, options, resume=options.resume, branch=branch))
+                except SessionStartError as e:
+                    # Older CLIs can't keep a session open; use one process per request from now on
+                    logger.warning(f"Persistent Claude Code sessions unavailable, falling back to one-shot queries: {e}")
+                    wrapper.session_pool = None
+            return [message async for message in query(prompt=prompt, options=options)]
+        
         def _format_response_data(self, response):
             """Format the response data for logging."""
             response_data = {
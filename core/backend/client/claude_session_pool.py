@@ -0,0 +1,351 @@
+import json
+import shutil
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from claude_code_sdk import (AssistantMessage, ClaudeCodeOptions, CLIConnectionError, CLIJSONDecodeError,
+                             CLINotFoundError, Message, ResultMessage, SystemMessage, TextBlock, ToolResultBlock,
+                             ToolUseBlock, UserMessage)
+
+logger = logging.getLogger(__name__)
+
+# Lines of the CLI's stream-json output can hold whole files
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def parse_message(data: Dict[str, Any]) -> Optional[Message]:
+    """
+    One line of the CLI's stream-json output as an SDK message.
+
+    Built from the SDK's public message types only; message and content
+    block types this code doesn't know are skipped.
+    """
+    kind = data.get("type")
+    if kind == "user":
+        return UserMessage(content=data["message"]["content"])
+    if kind == "assistant":
+        blocks = []
+        for block in data["message"]["content"]:
+            if block["type"] == "text":
+                blocks.append(TextBlock(text=block["text"]))
+            elif block["type"] == "tool_use":
+                blocks.append(ToolUseBlock(id=block["id"], name=block["name"], input=block["input"]))
+            elif block["type"] == "tool_result":
+                blocks.append(ToolResultBlock(tool_use_id=block["tool_use_id"], content=block.get("content"),
+                                              is_error=block.get("is_error")))
+        return AssistantMessage(content=blocks)
+    if kind == "system":
+        return SystemMessage(subtype=data.get("subtype", ""), data=data)
+    if kind == "result":
+        return ResultMessage(subtype=data.get("subtype", ""), duration_ms=data.get("duration_ms", 0),
+                             duration_api_ms=data.get("duration_api_ms", 0), is_error=data.get("is_error", False),
+                             num_turns=data.get("num_turns", 0), session_id=data.get("session_id", ""),
+                             total_cost_usd=data.get("total_cost_usd"), usage=data.get("usage"),
+                             result=data.get("result"))
+    return None
+
+
+class SessionStartError(CLIConnectionError):
+    """Raised when a persistent CLI session can't be started (e.g. the CLI lacks --input-format)."""
+
+
+class SessionExitedError(CLIConnectionError):
+    """Raised when a session exits before printing anything in reply to a request."""
+
+
+class ClaudeSession:
+    """
+    One long-lived Claude Code CLI process.
+
+    The CLI runs with --input-format stream-json, so it stays up between
+    requests: every send() writes one user message to its stdin and reads its
+    stdout up to the matching result message. Node startup, authentication and
+    tool initialization are paid once per session instead of once per request.
+    The conversation carries over between the requests of a session.
+
+    Example:
+        session = ClaudeSession(cli_path, options)
+        await session.start()
+        messages = await session.send("Fix the failing test")
+    """
+
+    def __init__(self, cli_path: str, options: ClaudeCodeOptions, branch: Optional[str] = None):
+        """
+        Initialize the session.
+
+        Args:
+            cli_path: Path to the claude executable
+            options: Options the process is started with; only process-wide options are used
+            branch: Conversation branch the session serves (see ClaudeCodeClientWrapper.session_branch)
+        """
+        self.cli_path = cli_path
+        self.options = options
+        self.branch = branch
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.turns = 0
+        self.session_id: Optional[str] = None
+        self.broken = False
+        self._stderr = deque(maxlen=50)
+        self._stderr_task = None
+
+    def _build_command(self) -> List[str]:
+        options = self.options
+        cmd = [self.cli_path, "--print", "--verbose",
+               "--input-format", "stream-json", "--output-format", "stream-json"]
+        if options.system_prompt:
+            cmd.extend(["--system-prompt", options.system_prompt])
+        if options.model:
+            cmd.extend(["--model", options.model])
+        if options.permission_mode:
+            cmd.extend(["--permission-mode", options.permission_mode])
+        if options.resume:
+            cmd.extend(["--resume", options.resume])
+        return cmd
+
+    async def start(self) -> None:
+        """
+        Start the CLI process.
+
+        Raises:
+            CLINotFoundError: If the executable doesn't exist
+            SessionStartError: If the process exits right away
+        """
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self._build_command(),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(self.options.cwd) if self.options.cwd else None,
+                limit=_STREAM_LIMIT,
+            )
+        except FileNotFoundError as e:
+            raise CLINotFoundError(f"Claude Code not found at: {self.cli_path}") from e
+        self._stderr_task = asyncio.ensure_future(self._drain_stderr())
+        # A CLI without stream-json input support exits on its usage error immediately
+        try:
+            await asyncio.wait_for(asyncio.shield(self.process.wait()), timeout=0.2)
+        except asyncio.TimeoutError:
+            logger.info(f"Started Claude Code session (pid {self.process.pid}) in {self.options.cwd}")
+            return
+        await self._stderr_task
+        raise SessionStartError(f"Claude Code session exited with code {self.process.returncode}: {self.stderr_tail()}")
+
+    async def _drain_stderr(self) -> None:
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                return
+            self._stderr.append(line.decode("utf-8", errors="replace").rstrip())
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr)
+
+    def is_healthy(self) -> bool:
+        """True if the process is running and its last exchange completed."""
+        return self.process is not None and self.process.returncode is None and not self.broken
+
+    async def send(self, prompt: str) -> List[Message]:
+        """
+        Send one user message and collect the reply up to its result message.
+
+        Args:
+            prompt: The user message
+
+        Returns:
+            List[Message]: The parsed messages of the reply
+
+        Raises:
+            CLIConnectionError: If the process dies before answering
+            CLIJSONDecodeError: If the process prints malformed JSON
+        """
+        request = {
+            "type": "user",
+            "message": {"role": "user", "content": prompt},
+            "parent_tool_use_id": None,
+            "session_id": self.session_id or "default",
+        }
+        # Until the result arrives the session is in an unknown state
+        self.broken = True
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise SessionExitedError(f"Claude Code session exited: {self.stderr_tail()}") from e
+
+        messages = []
+        received = False
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                await self.process.wait()
+                error = CLIConnectionError if received else SessionExitedError
+                raise error(f"Claude Code session exited with code {self.process.returncode}: {self.stderr_tail()}")
+            received = True
+            line = line.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise CLIJSONDecodeError(line, e) from e
+            message = parse_message(data)
+            if message is None:
+                continue
+            messages.append(message)
+            if data["type"] == "result":
+                self.session_id = data.get("session_id")
+                self.turns += 1
+                self.broken = False
+                return messages
+
+    async def close(self) -> None:
+        """Close stdin and wait for the process, killing it if it doesn't exit."""
+        if self.process is None or self.process.returncode is not None:
+            return
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), timeout=5.0)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            self.process.kill()
+            await self.process.wait()
+        if self._stderr_task is not None:
+            await self._stderr_task
+
+
+class ClaudeSessionPool:
+    """
+    Pool of warm Claude Code CLI sessions, reused across requests.
+
+    Sessions are keyed by working directory, system prompt and model, since
+    those are fixed when the process starts, and by conversation branch, since
+    a session carries its conversation from one request to the next. There is
+    at most one live session per key: concurrent requests with the same key
+    queue for it, so their conversation stays one conversation. A session
+    goes back to the pool after each request and is recycled once it has
+    served max_turns requests or stopped being healthy; its replacement
+    resumes the conversation of the session it replaces, like the resume
+    option does for one-shot queries.
+
+    All methods must be called from the same event loop.
+
+    Example:
+        pool = ClaudeSessionPool(max_turns=20)
+        messages = await pool.query(prompt, options)
+        await pool.close()
+    """
+
+    def __init__(self, max_turns: int = 20, cli_path: Optional[str] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            max_turns: Requests a session serves before it is replaced
+            cli_path: Path to the claude executable (default: found on PATH)
+        """
+        self.max_turns = max_turns
+        self.cli_path = cli_path
+        self._idle: Dict[Tuple, ClaudeSession] = {}
+        self._locks: Dict[Tuple, asyncio.Lock] = {}  # one request per key at a time
+        self._sessions: List[ClaudeSession] = []
+        self.started = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(options: ClaudeCodeOptions, branch: Optional[str] = None) -> Tuple:
+        return (str(options.cwd), options.system_prompt, options.model, options.permission_mode, branch)
+
+    def _find_cli(self) -> str:
+        if self.cli_path is None:
+            self.cli_path = shutil.which("claude")
+            if self.cli_path is None:
+                raise CLINotFoundError("Claude Code not found. Install with:\n  npm install -g @anthropic-ai/claude-code")
+        return self.cli_path
+
+    async def acquire(self, options: ClaudeCodeOptions, resume: Optional[str] = None,
+                      branch: Optional[str] = None) -> ClaudeSession:
+        """
+        Take the idle session for the options if it is healthy, or start a new one.
+
+        query() calls this with the key's lock held, so a key never has two live sessions.
+
+        Args:
+            options: Options of the request
+            resume: Session id a new session should continue
+            branch: Conversation branch of the request
+
+        Returns:
+            ClaudeSession: A session owned by the caller until release()
+        """
+        session = self._idle.pop(self.key(options, branch), None)
+        if session is not None:
+            if session.is_healthy():
+                self.reused += 1
+                return session
+            logger.warning(f"Discarding unhealthy Claude Code session: {session.stderr_tail()}")
+            await self._discard(session)
+
+        session = ClaudeSession(self._find_cli(), ClaudeCodeOptions(
+            system_prompt=options.system_prompt,
+            model=options.model,
+            permission_mode=options.permission_mode,
+            resume=resume,
+            cwd=options.cwd,
+        ), branch=branch)
+        await session.start()
+        self._sessions.append(session)
+        self.started += 1
+        return session
+
+    async def release(self, session: ClaudeSession) -> None:
+        """Return a session to the pool, or close it if it is used up or unhealthy."""
+        if not session.is_healthy() or session.turns >= self.max_turns:
+            if session.turns >= self.max_turns:
+                logger.info(f"Recycling Claude Code session after {session.turns} requests")
+            await self._discard(session)
+            return
+        self._idle[self.key(session.options, session.branch)] = session
+
+    async def query(self, prompt: str, options: ClaudeCodeOptions, resume: Optional[str] = None,
+                    branch: Optional[str] = None) -> List[Message]:
+        """
+        Run one request on the pooled session of its key, waiting for the key's previous request.
+
+        Args:
+            prompt: The user message
+            options: Options of the request
+            resume: Session id a newly started session should continue
+            branch: Conversation branch of the request
+
+        Returns:
+            List[Message]: The parsed messages of the reply
+        """
+        async with self._locks.setdefault(self.key(options, branch), asyncio.Lock()):
+            while True:
+                session = await self.acquire(options, resume, branch)
+                reused = session.turns > 0
+                try:
+                    return await session.send(prompt)
+                except SessionExitedError:
+                    if not reused:
+                        raise
+                    # An idle session died before the request reached it; retry on a fresh one
+                    logger.warning(f"Claude Code session exited while idle, starting a new one: {session.stderr_tail()}")
+                    resume = session.session_id or resume
+                finally:
+                    await self.release(session)
+
+    async def _discard(self, session: ClaudeSession) -> None:
+        if session in self._sessions:
+            self._sessions.remove(session)
+        await session.close()
+
+    async def close(self) -> None:
+        """Close every session of the pool."""
+        sessions, self._sessions, self._idle = self._sessions, [], {}
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"started": self.started, "reused": self.reused, "open": len(self._sessions)}
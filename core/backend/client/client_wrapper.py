@@ -1,9 +1,13 @@
 import os
 import json
+import asyncio
+import contextlib
 import logging
 from datetime import datetime
 from typing import Any, Dict, List
 
+from core.backend.client.transcript_store import TranscriptWriter
+
 logger = logging.getLogger(__name__)
 
 class ClientWrapper:
@@ -16,7 +20,7 @@ class ClientWrapper:
         self.client = client
         self.version_dir = version_dir
         self.client_dir = os.path.join(version_dir, "client")
-        self.request_counter = 0
+        self.transcript = TranscriptWriter(self.client_dir)
         
         # Create client directory if it doesn't exist
         os.makedirs(self.client_dir, exist_ok=True)
@@ -30,38 +34,8 @@ class ClientWrapper:
             request_data: The request data sent to the client
             response_data: The response data received from the client
         """
-        self.request_counter += 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Create filename with counter and timestamp
-        filename_base = f"request_{self.request_counter:03d}_{timestamp}"
-        
-        # Save request
-        request_file = os.path.join(self.client_dir, f"{filename_base}_request.json")
-        with open(request_file, 'w', encoding='utf-8') as f:
-            json.dump(request_data, f, indent=2, ensure_ascii=False)
-        
-        # Save response
-        response_file = os.path.join(self.client_dir, f"{filename_base}_response.json")
-        with open(response_file, 'w', encoding='utf-8') as f:
-            json.dump(response_data, f, indent=2, ensure_ascii=False)
-        
-        # Save combined request-response for easier analysis
-        combined_file = os.path.join(self.client_dir, f"{filename_base}_combined.json")
-        combined_data = {
-            "request": request_data,
-            "response": response_data,
-            "metadata": {
-                "request_number": self.request_counter,
-                "timestamp": timestamp,
-                "request_file": os.path.basename(request_file),
-                "response_file": os.path.basename(response_file)
-            }
-        }
-        with open(combined_file, 'w', encoding='utf-8') as f:
-            json.dump(combined_data, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved request-response pair {self.request_counter} to {filename_base}")
+        request_number = self.transcript.append(request_data, response_data)
+        logger.info(f"Saved request-response pair {request_number} to {self.transcript.transcript_path}")
     
     @property
     def messages(self):
@@ -79,18 +53,57 @@ class ClientWrapper:
             """
             Intercept the create call, save request/response, and return the response.
             """
+            request_data = self._request_data(kwargs)
+            
+            # Make the actual request
+            response = self.messages.create(**kwargs)
+            
+            self._save(request_data, response)
+            return response
+        
+        async def acreate(self, **kwargs):
+            """
+            Async variant of create. Awaits the underlying client natively when it
+            supports it, otherwise runs the blocking call in the default executor.
+            """
+            request_data = self._request_data(kwargs)
+            
+            if hasattr(self.messages, "acreate"):
+                response = await self.messages.acreate(**kwargs)
+            else:
+                response = await asyncio.to_thread(self.messages.create, **kwargs)
+            
+            self._save(request_data, response)
+            return response
+        
+        @property
+        def stream(self):
+            """
+            Streaming variant of create, available when the underlying client streams.
+            The exchange is saved once the stream has been consumed.
+            """
+            if not hasattr(self.messages, "stream"):
+                raise AttributeError("stream")
+            return self._stream
+        
+        @contextlib.contextmanager
+        def _stream(self, **kwargs):
+            request_data = self._request_data(kwargs)
+            with self.messages.stream(**kwargs) as stream:
+                yield stream
+                self._save(request_data, stream.get_final_message())
+        
+        def _request_data(self, kwargs) -> Dict[str, Any]:
             # Extract the request data
-            request_data = {
+            return {
                 "model": kwargs.get("model"),
                 "system": kwargs.get("system"),
                 "messages": kwargs.get("messages", []),
                 "max_tokens": kwargs.get("max_tokens"),
                 "timestamp": datetime.now().isoformat()
             }
-            
-            # Make the actual request
-            response = self.messages.create(**kwargs)
-            
+        
+        def _save(self, request_data: Dict[str, Any], response) -> None:
             # Extract response data
             response_data = {
                 "content": [{"text": content.text} for content in response.content] if hasattr(response, 'content') else [],
@@ -101,5 +114,3 @@ class ClientWrapper:
             
             # Save the request-response pair
             self.wrapper.save_request_response(request_data, response_data)
-            
-            return response 
\ No newline at end of file
@@ -0,0 +1,309 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from enum import Enum
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMode(Enum):
+    """How the response cache is used."""
+    READ = "read"    # serve hits from the cache, store misses
+    WRITE = "write"  # always call the LLM, store (refresh) every response
+    OFF = "off"      # bypass the cache
+
+
+class CachedTextBlock:
+    """Text block of a cached response, shaped like anthropic's TextBlock."""
+
+    def __init__(self, text: str):
+        self.type = "text"
+        self.text = text
+
+
+class CachedResponse:
+    """A response served from the cache, shaped like an Anthropic Messages API response."""
+
+    def __init__(self, content: List[str], model: Optional[str] = None, usage: Optional[Dict[str, Any]] = None):
+        self.content = [CachedTextBlock(text) for text in content]
+        self.model = model
+        self.usage = usage or {}
+
+
+def _usage_to_dict(usage) -> Dict[str, Any]:
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return usage
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    if hasattr(usage, "__dict__"):
+        return dict(usage.__dict__)
+    return {"value": str(usage)}
+
+
+def digest_directories(directories: List[str]) -> str:
+    """
+    Hash the relative paths and contents of every file under the given directories.
+
+    Args:
+        directories: Directories to hash; missing ones are skipped
+
+    Returns:
+        str: Hex sha256 digest
+    """
+    digest = hashlib.sha256()
+    for directory in directories:
+        if not directory or not os.path.isdir(directory):
+            continue
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != ".git")
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, directory).encode("utf-8") + b"\0")
+                try:
+                    with open(path, "rb") as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b""):
+                            digest.update(chunk)
+                except OSError as e:
+                    digest.update(f"<unreadable: {e}>".encode("utf-8"))
+                digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed, size-bounded on-disk store of LLM responses.
+
+    Entries are JSON files sharded by key prefix (<cache_dir>/ab/cd/<key>.json)
+    and written atomically, so several processes can share one cache. A hit
+    touches the entry's mtime; when the store grows past max_bytes the least
+    recently used entries are evicted down to 90% of the limit.
+
+    Example:
+        cache = ResponseCache("replay_output/.cache")
+        key = cache.key({"model": ..., "system": ..., "messages": ...})
+        entry = cache.get(key)
+    """
+
+    DEFAULT_MAX_BYTES = 1 << 30  # 1 GiB
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Root directory of the store
+            max_bytes: Size limit that triggers LRU eviction
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # computed on first write
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(request: Dict[str, Any], files_digest: Optional[str] = None) -> str:
+        """
+        Compute the cache key of a Messages API request.
+
+        Args:
+            request: The create() keyword arguments (model, system, messages, max_tokens)
+            files_digest: Digest of files the request refers to by path only
+
+        Returns:
+            str: Hex sha256 key
+        """
+        material = {
+            "model": request.get("model"),
+            "system": request.get("system"),
+            "messages": request.get("messages", []),
+            "max_tokens": request.get("max_tokens"),
+            "files": files_digest,
+        }
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key[2:4], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an entry.
+
+        Args:
+            key: Key returned by ResponseCache.key
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored entry, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """
+        Store an entry, evicting old entries if the store is over its size limit.
+
+        Args:
+            key: Key returned by ResponseCache.key
+            entry: JSON serializable entry
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the store is at 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        logger.info(f"Evicted {evicted} cached responses, cache size is now {size} bytes")
+
+
+class CachingClient:
+    """
+    Wraps an Anthropic-compatible client with a ResponseCache.
+
+    Only messages.create (and acreate) are intercepted; every other attribute
+    is forwarded to the wrapped client. For backends that send file paths
+    instead of file contents (claude_code) pass content_dirs, whose contents
+    are hashed into the key.
+
+    Example:
+        client = CachingClient(anthropic.Anthropic(), ResponseCache(cache_dir), CacheMode.READ)
+    """
+
+    def __init__(self, client, cache: ResponseCache, mode: CacheMode = CacheMode.READ,
+                 content_dirs: Optional[List[str]] = None, async_client=None):
+        """
+        Initialize the caching client.
+
+        Args:
+            client: The client to wrap
+            cache: The response store
+            mode: READ serves hits and stores misses, WRITE only stores
+            content_dirs: Directories whose contents are part of every key
+            async_client: Optional native async client used by acreate
+        """
+        self.client = client
+        self.cache = cache
+        self.mode = mode
+        self.content_dirs = content_dirs or []
+        self.async_client = async_client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @property
+    def messages(self):
+        return self.MessagesWrapper(self)
+
+    class MessagesWrapper:
+        """Intercepts create calls and serves them from the cache when possible."""
+
+        def __init__(self, wrapper):
+            self.wrapper = wrapper
+            self.messages = wrapper.client.messages
+
+        def create(self, **kwargs):
+            key, response = self._lookup(kwargs)
+            if response is not None:
+                return response
+            response = self.messages.create(**kwargs)
+            self._store(key, kwargs, response)
+            return response
+
+        async def acreate(self, **kwargs):
+            key, response = await asyncio.to_thread(self._lookup, kwargs)
+            if response is not None:
+                return response
+            if hasattr(self.messages, "acreate"):
+                response = await self.messages.acreate(**kwargs)
+            elif self.wrapper.async_client is not None:
+                response = await self.wrapper.async_client.messages.create(**kwargs)
+            else:
+                response = await asyncio.to_thread(self.messages.create, **kwargs)
+            await asyncio.to_thread(self._store, key, kwargs, response)
+            return response
+
+        def _lookup(self, kwargs):
+            wrapper = self.wrapper
+            files_digest = digest_directories(wrapper.content_dirs) if wrapper.content_dirs else None
+            key = wrapper.cache.key(kwargs, files_digest)
+            if wrapper.mode != CacheMode.READ:
+                return key, None
+            entry = wrapper.cache.get(key)
+            if entry is None:
+                logger.info(f"LLM cache miss {key[:12]}")
+                return key, None
+            logger.info(f"💾 LLM cache hit {key[:12]}")
+            return key, CachedResponse(entry["content"], entry.get("model"), entry.get("usage"))
+
+        def _store(self, key: str, kwargs, response) -> None:
+            try:
+                entry = {
+                    "content": [block.text for block in response.content if hasattr(block, "text")],
+                    "model": getattr(response, "model", None) or kwargs.get("model"),
+                    "usage": _usage_to_dict(getattr(response, "usage", None)),
+                    "stored_at": datetime.now().isoformat(),
+                }
+                self.wrapper.cache.put(key, entry)
+            except Exception as e:
+                # A broken cache must never fail the run
+                logger.warning(f"Failed to store LLM response in cache: {e}")
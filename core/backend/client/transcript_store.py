@@ -0,0 +1,280 @@
+import os
+import re
+import json
+import glob
+import gzip
+import zlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_FILE = "transcript.jsonl.gz"
+INDEX_FILE = "transcript.idx"
+
+
+class TranscriptWriter:
+    """
+    Append-only, gzip-framed transcript of the LLM exchanges of one version.
+
+    Every exchange is one compact JSON record compressed as its own gzip
+    member and appended to <client_dir>/transcript.jsonl.gz, so the file as a
+    whole is a regular gzip stream (`zcat transcript.jsonl.gz` prints one
+    record per line). A small JSONL index next to it records the byte offset
+    and length of every member for random access (see TranscriptReader).
+
+    Example:
+        writer = TranscriptWriter(client_dir)
+        number = writer.append(request_data, response_data)
+    """
+
+    def __init__(self, client_dir: str):
+        """
+        Initialize the writer, continuing an existing transcript if there is one.
+
+        Args:
+            client_dir: Directory holding the transcript and its index
+        """
+        self.client_dir = client_dir
+        self.transcript_path = os.path.join(client_dir, TRANSCRIPT_FILE)
+        self.index_path = os.path.join(client_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(client_dir, exist_ok=True)
+        self.count = len(TranscriptReader(client_dir).index()) if os.path.exists(self.transcript_path) else 0
+
+    def append(self, request_data: Dict[str, Any], response_data: Dict[str, Any]) -> int:
+        """
+        Append one exchange.
+
+        Args:
+            request_data: The request data sent to the client
+            response_data: The response data received from the client
+
+        Returns:
+            int: The 1-based number of the exchange
+        """
+        with self._lock:
+            self.count += 1
+            number = self.count
+            record = {
+                "request_number": number,
+                "timestamp": datetime.now().isoformat(),
+                "request": request_data,
+                "response": response_data,
+            }
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+            member = gzip.compress(line.encode("utf-8"))
+            with open(self.transcript_path, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+            entry = {
+                "request_number": number,
+                "offset": offset,
+                "length": len(member),
+                "timestamp": record["timestamp"],
+                "model": request_data.get("model") or request_data.get("options", {}).get("model"),
+            }
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return number
+
+
+class TranscriptReader:
+    """
+    Random access reader for the transcript of a version.
+
+    Reads the index written by TranscriptWriter; a missing or stale index is
+    rebuilt by scanning the gzip members. Versions recorded before the
+    transcript store existed (request_NNN_*_combined.json files) are read
+    through the same API.
+
+    Example:
+        reader = TranscriptReader("replay_output/cosh/3/client")
+        for record in reader:
+            print(record["request_number"], record["request"].get("model"))
+    """
+
+    def __init__(self, client_dir: str):
+        """
+        Initialize the reader.
+
+        Args:
+            client_dir: Directory holding the transcript and its index
+        """
+        self.client_dir = client_dir
+        self.transcript_path = os.path.join(client_dir, TRANSCRIPT_FILE)
+        self.index_path = os.path.join(client_dir, INDEX_FILE)
+        self._index = None
+        self._by_number = None  # index entries by request_number
+        self._legacy_files = None
+
+    @property
+    def is_legacy(self) -> bool:
+        """True if the directory only holds per-request JSON files."""
+        return not os.path.exists(self.transcript_path)
+
+    def index(self) -> List[Dict[str, Any]]:
+        """
+        Return the index entries, in request order.
+
+        Returns:
+            List[Dict[str, Any]]: Entries with request_number, offset, length, timestamp and model
+        """
+        if self._index is not None:
+            return self._index
+        if self.is_legacy:
+            self._index = [{"request_number": number, "timestamp": None, "model": None}
+                           for number in sorted(self._legacy())]
+            return self._index
+
+        entries = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            entries.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            break
+        size = os.path.getsize(self.transcript_path)
+        indexed_end = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+        if indexed_end != size:
+            logger.warning(f"Transcript index out of date in {self.client_dir}, rebuilding it")
+            entries = self._rebuild_index()
+        self._index = entries
+        return entries
+
+    def _rebuild_index(self) -> List[Dict[str, Any]]:
+        """Scan the gzip members of the transcript and rewrite the index."""
+        with open(self.transcript_path, "rb") as f:
+            data = f.read()
+        entries = []
+        offset = 0
+        while offset < len(data):
+            decompressor = zlib.decompressobj(wbits=31)
+            try:
+                line = decompressor.decompress(data[offset:])
+            except zlib.error:
+                logger.warning(f"Truncated transcript member at byte {offset} in {self.transcript_path}")
+                break
+            if not decompressor.eof:
+                logger.warning(f"Truncated transcript member at byte {offset} in {self.transcript_path}")
+                break
+            length = len(data) - offset - len(decompressor.unused_data)
+            record = json.loads(line)
+            entries.append({
+                "request_number": record.get("request_number"),
+                "offset": offset,
+                "length": length,
+                "timestamp": record.get("timestamp"),
+                "model": record.get("request", {}).get("model"),
+            })
+            offset += length
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        return entries
+
+    def _legacy(self) -> Dict[int, str]:
+        if self._legacy_files is None:
+            self._legacy_files = {}
+            for path in glob.glob(os.path.join(self.client_dir, "request_*_combined.json")):
+                match = re.match(r"request_(\d+)_", os.path.basename(path))
+                if match:
+                    self._legacy_files[int(match.group(1))] = path
+        return self._legacy_files
+
+    def __len__(self) -> int:
+        return len(self.index())
+
+    def get(self, request_number: int) -> Dict[str, Any]:
+        """
+        Read one exchange.
+
+        Args:
+            request_number: The 1-based number of the exchange
+
+        Returns:
+            Dict[str, Any]: Record with request_number, timestamp, request and response
+
+        Raises:
+            KeyError: If there is no such exchange
+        """
+        if self.is_legacy:
+            path = self._legacy().get(request_number)
+            if path is None:
+                raise KeyError(request_number)
+            with open(path, "r", encoding="utf-8") as f:
+                combined = json.load(f)
+            return {
+                "request_number": request_number,
+                "timestamp": combined.get("metadata", {}).get("timestamp"),
+                "request": combined.get("request", {}),
+                "response": combined.get("response", {}),
+            }
+
+        if self._by_number is None:
+            self._by_number = {entry["request_number"]: entry for entry in self.index()}
+        entry = self._by_number.get(request_number)
+        if entry is None:
+            raise KeyError(request_number)
+        with open(self.transcript_path, "rb") as f:
+            return self._read(f, entry)
+
+    @staticmethod
+    def _read(f, entry: Dict[str, Any]) -> Dict[str, Any]:
+        f.seek(entry["offset"])
+        return json.loads(gzip.decompress(f.read(entry["length"])))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.is_legacy:
+            for entry in self.index():
+                yield self.get(entry["request_number"])
+            return
+        # One pass over the file, in index order
+        with open(self.transcript_path, "rb") as f:
+            for entry in self.index():
+                yield self._read(f, entry)
+
+    def grep(self, pattern: str, ignore_case: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the exchanges whose request or response matches a regular expression.
+
+        Args:
+            pattern: Regular expression searched in the JSON text of each exchange
+            ignore_case: Match case-insensitively
+
+        Returns:
+            Iterator[Dict[str, Any]]: Matching records
+        """
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        for record in self:
+            if regex.search(json.dumps(record, ensure_ascii=False)):
+                yield record
+
+
+def summarize(record: Dict[str, Any], width: int = 80) -> str:
+    """
+    One line description of an exchange, used by `replay.py transcripts list|grep`.
+
+    Args:
+        record: Record returned by TranscriptReader
+        width: Maximum length of the prompt excerpt
+
+    Returns:
+        str: The summary line
+    """
+    request = record.get("request", {})
+    kwargs = request.get("original_kwargs", request)
+    messages = kwargs.get("messages") or []
+    prompt = messages[-1].get("content", "") if messages else request.get("prompt", "")
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt)
+    prompt = " ".join(prompt.split())
+    if len(prompt) > width:
+        prompt = prompt[:width - 3] + "..."
+    model = kwargs.get("model") or "-"
+    return f"{record.get('request_number', '?'):>4}  {record.get('timestamp') or '-':<26}  {model:<28}  {prompt}"
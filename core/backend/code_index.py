@@ -0,0 +1,290 @@
+import os
+import re
+import logging
+import posixpath
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from core.backend.ignore_rules import IgnoreRules
+
+logger = logging.getLogger(__name__)
+
+IGNORE_FILES = (".gitignore", ".replayignore")
+# Ignored before the ignore files are read: VCS data (.git is a file in a worktree), caches, build trees, binaries
+DEFAULT_IGNORES = (".git", "__pycache__/", ".pytest_cache/", "node_modules/", ".venv/", "build/", "CMakeFiles/",
+                   "*.pyc", "*.o", "*.so", "*.a", "*.obj", "*.exe", "*.bin", "*.whl", "*.zip", "*.gz", "*.tar")
+MAX_INDEXED_BYTES = 1024 * 1024
+
+PYTHON_SYMBOL = re.compile(r"^\s*(?:async\s+)?(?:def|class)\s+(\w+)", re.MULTILINE)
+PYTHON_IMPORT = re.compile(r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+([\w*, ()]+)|import\s+([\w., ]+))", re.MULTILINE)
+C_SYMBOL = re.compile(
+    r"^\s*(?:(?:class|struct|enum(?:\s+class)?|union|namespace)\s+(\w+)"  # type and namespace definitions
+    r"|#\s*define\s+(\w+)"  # macros
+    r"|(?!(?:return|else|throw|delete|new|co_return)\b)(?:[A-Za-z_:][\w:<>,*&~]*[ \t]+)+[*&]*(?:\w+::)*(~?\w+)[ \t]*\([^;\n]*$)",  # function definitions (no ; on the line)
+    re.MULTILINE)
+C_INCLUDE = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+C_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof", "else", "do", "case", "catch", "static_assert"}
+IDENTIFIER = re.compile(r"[A-Za-z_]\w{2,}")
+PATH_LIKE = re.compile(r"[\w./-]+\.\w+")
+
+PYTHON_EXTENSIONS = {".py"}
+C_EXTENSIONS = {".c", ".cc", ".cpp", ".cxx", ".cu", ".h", ".hh", ".hpp", ".hxx", ".cuh", ".inl"}
+
+# Scores of the ways a diagnostic can point at a file
+SCORE_PATH = 10.0        # the diagnostic's file, matched by path
+SCORE_BASENAME = 4.0     # the diagnostic's file, matched by basename only
+SCORE_MENTION = 3.0      # a path or file name in the message
+SCORE_SYMBOL = 2.0       # defines a symbol the message names
+
+
+@dataclass
+class IndexedFile:
+    """What the index knows about one file of the code directory."""
+    path: str
+    mtime_ns: int
+    size: int
+    symbols: Set[str] = field(default_factory=set)
+    imports: List[str] = field(default_factory=list)  # resolved paths of included/imported files
+
+
+@dataclass
+class Selection:
+    """Files chosen for a FIX: the ones to edit, by score, and their direct include/import neighbours."""
+    editable: List[str]
+    neighbours: List[str]
+    scores: Dict[str, float]
+
+
+class CodeIndex:
+    """
+    Index of a code directory for picking the files a failure is about.
+
+    The directory is walked recursively, skipping what .gitignore and
+    .replayignore files (and DEFAULT_IGNORES) exclude. Every file is indexed
+    by path and basename; Python and C/C++ sources also by the symbols they
+    define and the files they import or #include. refresh() only re-reads
+    files whose mtime or size changed, so a DEBUG_LOOP pays for the files
+    its FIX changed, not for the whole template every iteration.
+
+    Example:
+        index = CodeIndex(replay.code_dir)
+        selection = index.select(run_node['contents'].get('diagnostics', []))
+        selection.editable    # ["device/kernels/compute/dropout_kernel.cpp"]
+        selection.neighbours  # files those #include, read-only context
+    """
+
+    def __init__(self, root: str):
+        """
+        Create an empty index; the first refresh() (or select()) walks the directory.
+
+        Args:
+            root: The code directory
+        """
+        self.root = root
+        self.files: Dict[str, IndexedFile] = {}
+        self.by_basename: Dict[str, Set[str]] = defaultdict(set)
+        self.by_symbol: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the directory.
+
+        Returns:
+            int: Number of files (re)indexed or dropped
+        """
+        with self._lock:
+            seen = {}
+            for path, stat in self._walk():
+                seen[path] = stat
+            changes = 0
+            for path in list(self.files):
+                if path not in seen:
+                    self._drop(path)
+                    changes += 1
+            changed = [path for path, stat in seen.items()
+                       if path not in self.files
+                       or (self.files[path].mtime_ns, self.files[path].size) != (stat.st_mtime_ns, stat.st_size)]
+            for path in changed:
+                self._drop(path)
+                stat = seen[path]
+                self.files[path] = IndexedFile(path, stat.st_mtime_ns, stat.st_size)
+                self.by_basename[posixpath.basename(path)].add(path)
+            # Imports resolve against the full set of paths, so parse once every file is known
+            for path in changed:
+                self._parse(self.files[path])
+            changes += len(changed)
+            if changes:
+                logger.debug(f"Code index of {self.root}: {changes} files updated, {len(self.files)} indexed")
+            return changes
+
+    def _walk(self):
+        rules = IgnoreRules()
+        rules.add("", DEFAULT_IGNORES)
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            base = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            base = "" if base == "." else base
+            for ignore_file in IGNORE_FILES:
+                if ignore_file in filenames:
+                    with open(os.path.join(dirpath, ignore_file), 'r', encoding='utf-8', errors='replace') as f:
+                        rules.add(base, f)
+            dirnames[:] = sorted(name for name in dirnames
+                                 if not rules.ignored(posixpath.join(base, name), is_dir=True))
+            for name in sorted(filenames):
+                path = posixpath.join(base, name)
+                if name in IGNORE_FILES or rules.ignored(path, is_dir=False):
+                    continue
+                full_path = os.path.join(dirpath, name)
+                if os.path.isfile(full_path):
+                    yield path, os.stat(full_path)
+
+    def _drop(self, path: str) -> None:
+        indexed = self.files.pop(path, None)
+        if indexed is None:
+            return
+        self.by_basename[posixpath.basename(path)].discard(path)
+        for symbol in indexed.symbols:
+            self.by_symbol[symbol].discard(path)
+
+    def _parse(self, indexed: IndexedFile) -> None:
+        extension = posixpath.splitext(indexed.path)[1].lower()
+        if extension not in PYTHON_EXTENSIONS | C_EXTENSIONS or indexed.size > MAX_INDEXED_BYTES:
+            return
+        try:
+            with open(os.path.join(self.root, indexed.path), 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError as e:
+            logger.warning(f"Can't index {indexed.path}: {e}")
+            return
+        if extension in PYTHON_EXTENSIONS:
+            indexed.symbols = set(PYTHON_SYMBOL.findall(text))
+            indexed.imports = self._python_imports(indexed.path, text)
+        else:
+            indexed.symbols = {name for match in C_SYMBOL.findall(text) for name in match
+                               if name and name not in C_KEYWORDS}
+            indexed.imports = [resolved for include in C_INCLUDE.findall(text)
+                               if (resolved := self._resolve_include(indexed.path, include)) is not None]
+        for symbol in indexed.symbols:
+            self.by_symbol[symbol].add(indexed.path)
+
+    def _python_imports(self, path: str, text: str) -> List[str]:
+        package = posixpath.dirname(path)
+        modules = []
+        for from_module, names, plain in PYTHON_IMPORT.findall(text):
+            if plain:
+                modules.extend(name.split(" as ")[0].strip() for name in plain.split(","))
+                continue
+            dots = len(from_module) - len(from_module.lstrip("."))
+            module = from_module[dots:]
+            if dots:
+                # Relative import: start from this package, one level up per extra dot
+                base = package
+                for _ in range(dots - 1):
+                    base = posixpath.dirname(base)
+                module = ".".join(part for part in (base.replace("/", "."), module) if part)
+            # `from pkg import module` imports a module as often as a name
+            modules.append(module)
+            modules.extend(f"{module}.{name.strip()}" for name in names.strip("() ").split(",")
+                           if name.strip() and name.strip() != "*")
+        imports = []
+        for module in modules:
+            module_path = module.split(" as ")[0].strip().replace(".", "/")
+            for candidate in (f"{module_path}.py", f"{module_path}/__init__.py",
+                              posixpath.join(package, f"{module_path}.py")):
+                if candidate in self.files and candidate != path and candidate not in imports:
+                    imports.append(candidate)
+                    break
+        return imports
+
+    def _resolve_include(self, path: str, include: str) -> Optional[str]:
+        """The indexed file an #include "..." names: next to the includer, else the best path-suffix match."""
+        beside = posixpath.normpath(posixpath.join(posixpath.dirname(path), include))
+        if beside in self.files:
+            return beside
+        return self.resolve(include)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        The indexed path a file name from a log refers to.
+
+        The name may be absolute, relative to the code directory or to some
+        build directory; the indexed file sharing the longest path suffix
+        with it wins, and a bare basename only matches if it is unique.
+        """
+        name = name.replace("\\", "/")
+        root = self.root.replace(os.sep, "/").rstrip("/") + "/"
+        if name.startswith(root):
+            name = name[len(root):]
+        parts = [part for part in name.split("/") if part not in ("", ".", "..")]
+        if not parts:
+            return None
+        candidates = self.by_basename.get(parts[-1])
+        if not candidates:
+            return None
+
+        def common_suffix(path: str) -> int:
+            length = 0
+            for ours, theirs in zip(reversed(path.split("/")), reversed(parts)):
+                if ours != theirs:
+                    break
+                length += 1
+            return length
+
+        best = max(candidates, key=lambda path: (common_suffix(path), -len(path)))
+        if common_suffix(best) == 1 and len(candidates) > 1:
+            return None
+        return best
+
+    def select(self, diagnostics: Iterable[dict] = (), log_text: str = "", max_files: int = 8) -> Selection:
+        """
+        Rank the files a failure is about.
+
+        Args:
+            diagnostics: Diagnostic dicts of the failing RUN node (see failure_extractors.py)
+            log_text: Raw log output, used for path and symbol mentions when there are no diagnostics
+            max_files: Most files to return as editable
+
+        Returns:
+            Selection: Editable files with a positive score, best first, and their direct neighbours
+        """
+        self.refresh()
+        scores: Dict[str, float] = defaultdict(float)
+        texts = []
+        for diagnostic in diagnostics:
+            for name in (diagnostic.get('file'), (diagnostic.get('test_id') or "").split("::")[0]):
+                if name:
+                    path = self.resolve(name)
+                    if path is not None:
+                        whole_path = "/" in name and name.replace("\\", "/").endswith(path)
+                        scores[path] += SCORE_PATH if whole_path else SCORE_BASENAME
+            texts.append(diagnostic.get('message', ""))
+        if not texts and log_text:
+            texts.append(log_text)
+
+        for text in texts:
+            mentioned = set()
+            for name in PATH_LIKE.findall(text):
+                path = self.resolve(name)
+                if path is not None:
+                    mentioned.add(path)
+            for path in mentioned:
+                scores[path] += SCORE_MENTION
+            symbol_files = set()
+            for identifier in set(IDENTIFIER.findall(text)):
+                defining = self.by_symbol.get(identifier, ())
+                # Symbols defined all over the place (main, run, ...) say nothing about where the failure is
+                if 0 < len(defining) <= 3:
+                    symbol_files.update(defining)
+            for path in symbol_files:
+                scores[path] += SCORE_SYMBOL
+
+        ranked = sorted((path for path, score in scores.items() if score > 0), key=lambda path: (-scores[path], path))
+        editable = ranked[:max_files]
+        neighbours = []
+        for path in editable:
+            for neighbour in self.files[path].imports:
+                if neighbour not in editable and neighbour not in neighbours:
+                    neighbours.append(neighbour)
+        return Selection(editable, neighbours, dict(scores))
@@ -0,0 +1,352 @@
+import os
+import json
+import stat
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.backend.ignore_rules import IgnoreRules
+
+logger = logging.getLogger(__name__)
+
+STAT_CACHE_FILE = "replay_stat_cache.json"
+AUTHOR = b"Replay System <replay@system.local>"
+# Files modified this recently may change again without a visible mtime change
+RACY_SECONDS = 2.0
+
+
+@dataclass
+class CachedEntry:
+    """What the last commit recorded for a path."""
+    mtime_ns: int
+    size: int
+    mode: str
+    sha: str  # git blob id of the committed contents
+    racy: bool = False
+
+    def matches(self, st: os.stat_result, mode: str) -> bool:
+        return not self.racy and self.mtime_ns == st.st_mtime_ns and self.size == st.st_size and self.mode == mode
+
+
+def blob_sha(data: bytes) -> str:
+    """Git object id of a blob with the given contents."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _quote_path(path: str) -> bytes:
+    encoded = path.encode("utf-8", errors="surrogateescape")
+    if b"\n" in encoded or encoded.startswith(b'"'):
+        encoded = b'"' + encoded.replace(b"\\", b"\\\\").replace(b'"', b'\\"').replace(b"\n", b"\\n") + b'"'
+    return encoded
+
+
+class FastImportCommitEngine:
+    """
+    Commits snapshots of a version directory through one long-lived `git fast-import`.
+
+    Instead of `git add .`, `git status` and `git commit` per step, every commit
+    stats the tree against a cache of the last committed state, reads only the
+    files whose mtime, size or mode changed (or whose contents can't be trusted
+    yet because they were written in the last two seconds), and streams those
+    to fast-import. Streaming and object packing happen on a background thread,
+    so they overlap with the next step; only the stat walk and the reads of
+    changed files happen on the caller's thread.
+
+    Every commit is followed by a fast-import checkpoint, so the branch
+    moves forward with the steps (written in the background, like the
+    commits themselves). flush() waits until everything queued is written. close() also resets the index to the new HEAD
+    and saves the stat cache, so the next process can continue incrementally.
+
+    Example:
+        engine = FastImportCommitEngine(version_dir)
+        engine.start()
+        engine.commit("Step 1: LLM prompt")
+        engine.close()
+    """
+
+    def __init__(self, version_dir: str):
+        """
+        Initialize the engine.
+
+        Args:
+            version_dir: Root of the git working tree
+        """
+        self.version_dir = version_dir
+        # Resolved in start(): a worktree's .git is a file pointing into the shared repository
+        self.git_dir = os.path.join(version_dir, ".git")
+        self.common_dir = self.git_dir
+        self.cache_path = os.path.join(self.git_dir, STAT_CACHE_FILE)
+        self.cache: Dict[str, CachedEntry] = {}
+        self.full_snapshot = True  # the next commit lists every file (the cache isn't known to match HEAD)
+        self.ref = None
+        self.parent = None
+        self.commits = 0
+        self.error: Optional[str] = None
+        self._process = None
+        self._stderr = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sync_count = 0
+
+    @property
+    def has_commits(self) -> bool:
+        return self.parent is not None or self.commits > 0
+
+    def start(self) -> None:
+        """
+        Start git fast-import and load the stat cache.
+
+        Raises:
+            subprocess.CalledProcessError: If the branch can't be determined
+            FileNotFoundError: If git isn't installed
+        """
+        dirs = self._git("rev-parse", "--git-dir", "--git-common-dir").splitlines()
+        if len(dirs) == 2:
+            self.git_dir, self.common_dir = (os.path.join(self.version_dir, d) for d in dirs)
+            self.cache_path = os.path.join(self.git_dir, STAT_CACHE_FILE)
+        self.ref = self._git("symbolic-ref", "-q", "HEAD").strip() or "refs/heads/master"
+        head = subprocess.run(["git", "rev-parse", "--verify", "-q", "HEAD"], cwd=self.version_dir,
+                              capture_output=True, text=True)
+        self.parent = head.stdout.strip() if head.returncode == 0 else None
+        self._load_cache()
+
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=self.version_dir,
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr)
+        self._thread = threading.Thread(target=self._writer, name="git-fast-import", daemon=True)
+        self._thread.start()
+        logger.info(f"Started git fast-import commit engine for {self.version_dir}")
+
+    def _git(self, *args: str) -> str:
+        result = subprocess.run(["git", *args], cwd=self.version_dir, capture_output=True, text=True)
+        return result.stdout
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if self.parent is None or data.get("commit") != self.parent:
+            logger.info("Stat cache doesn't match HEAD, the next commit snapshots the whole tree")
+            return
+        self.cache = {path: CachedEntry(*entry) for path, entry in data.get("entries", {}).items()}
+        self.full_snapshot = False
+
+    def _save_cache(self, commit: str) -> None:
+        data = {
+            "commit": commit,
+            "entries": {path: [e.mtime_ns, e.size, e.mode, e.sha, e.racy] for path, e in self.cache.items()},
+        }
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _walk(self):
+        """Yield (relative path, stat) of every file git add . would pick up."""
+        rules = IgnoreRules()
+        rules.load(os.path.join(self.common_dir, "info", "exclude"), "")
+        stack = [("", self.version_dir)]
+        while stack:
+            rel_dir, abs_dir = stack.pop()
+            rules.load(os.path.join(abs_dir, ".gitignore"), rel_dir)
+            try:
+                entries = list(os.scandir(abs_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.name == ".git":
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                is_dir = stat.S_ISDIR(st.st_mode)
+                if rules.ignored(rel_path, is_dir):
+                    continue
+                if is_dir:
+                    if os.path.exists(os.path.join(entry.path, ".git")):
+                        continue  # nested repositories aren't part of the snapshot
+                    stack.append((rel_path, entry.path))
+                elif stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                    yield rel_path, entry.path, st
+
+    @staticmethod
+    def _mode(st: os.stat_result) -> str:
+        if stat.S_ISLNK(st.st_mode):
+            return "120000"
+        return "100755" if st.st_mode & stat.S_IXUSR else "100644"
+
+    def _snapshot_changes(self) -> Tuple[List[Tuple[str, str, bytes]], List[str]]:
+        """Stat the tree against the cache; return the changed files with contents and the deleted paths."""
+        now_ns = time.time_ns()
+        changed = []
+        seen = set()
+        for rel_path, abs_path, st in self._walk():
+            seen.add(rel_path)
+            mode = self._mode(st)
+            cached = self.cache.get(rel_path)
+            if cached is not None and cached.matches(st, mode) and not self.full_snapshot:
+                continue
+            try:
+                data = os.readlink(abs_path).encode("utf-8") if mode == "120000" else open(abs_path, "rb").read()
+            except OSError:
+                continue
+            sha = blob_sha(data)
+            racy = now_ns - st.st_mtime_ns < RACY_SECONDS * 1e9
+            self.cache[rel_path] = CachedEntry(st.st_mtime_ns, st.st_size, mode, sha, racy)
+            if self.full_snapshot or cached is None or cached.sha != sha or cached.mode != mode:
+                changed.append((rel_path, mode, data))
+        deleted = [path for path in self.cache if path not in seen]
+        for path in deleted:
+            del self.cache[path]
+        return changed, deleted
+
+    def commit(self, message: str) -> bool:
+        """
+        Commit the current state of the tree.
+
+        Args:
+            message: The commit message
+
+        Returns:
+            bool: True if the commit was queued (or there was nothing to commit)
+        """
+        with self._lock:
+            if self.error:
+                return False
+            full_snapshot = self.full_snapshot
+            changed, deleted = self._snapshot_changes()
+            if not changed and not deleted:
+                logger.debug("No changes to commit")
+                self.full_snapshot = False
+                return True
+            if full_snapshot and self.parent is not None and not deleted and self._same_as_parent(changed):
+                self.full_snapshot = False
+                logger.debug("No changes to commit")
+                return True
+            self.full_snapshot = False
+
+            timestamp = f"{int(time.time())} {time.strftime('%z')}".encode()
+            encoded_message = message.encode("utf-8")
+            parts = [
+                b"commit " + self.ref.encode() + b"\n",
+                b"author " + AUTHOR + b" " + timestamp + b"\n",
+                b"committer " + AUTHOR + b" " + timestamp + b"\n",
+                b"data %d\n" % len(encoded_message), encoded_message, b"\n",
+            ]
+            if self.commits == 0 and self.parent is not None:
+                parts.append(b"from " + self.parent.encode() + b"\n")
+            if full_snapshot:
+                parts.append(b"deleteall\n")
+            for path in deleted:
+                parts.append(b"D " + _quote_path(path) + b"\n")
+            for path, mode, data in changed:
+                parts.append(b"M " + mode.encode() + b" inline " + _quote_path(path) + b"\n")
+                parts.append(b"data %d\n" % len(data))
+                parts.append(data)
+                parts.append(b"\n")
+            parts.append(b"\n")
+            # Move the branch with every step: a crashed run keeps the commits its journal refers to
+            parts.append(b"checkpoint\n\n")
+            self.commits += 1
+            self._queue.put(b"".join(parts))
+        logger.info(f"Git commit: {message} ({len(changed)} changed, {len(deleted)} deleted)")
+        return True
+
+    def _same_as_parent(self, files: List[Tuple[str, str, bytes]]) -> bool:
+        """True if a full snapshot equals the parent commit's tree (e.g. right after loading a checkpoint)."""
+        listing = self._git("ls-tree", "-r", "--full-tree", self.parent)
+        parent_files = {}
+        for line in listing.splitlines():
+            meta, _, path = line.partition("\t")
+            mode, _, sha = meta.split(" ")
+            parent_files[path] = (mode, sha)
+        return parent_files == {path: (mode, blob_sha(data)) for path, mode, data in files}
+
+    def _writer(self) -> None:
+        """Background thread: stream queued commits and answer flush requests."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                if isinstance(item, threading.Event):
+                    self._sync_count += 1
+                    marker = f"sync-{self._sync_count}".encode()
+                    self._process.stdin.write(b"checkpoint\n\nprogress " + marker + b"\n\n")
+                    self._process.stdin.flush()
+                    while True:
+                        line = self._process.stdout.readline()
+                        if not line or line.strip() == b"progress " + marker:
+                            break
+                    if not line:
+                        self._fail("git fast-import exited")
+                    item.set()
+                else:
+                    self._process.stdin.write(item)
+                    self._process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self._fail(f"git fast-import stream failed: {e}")
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _fail(self, message: str) -> None:
+        if self.error is None:
+            self._stderr.seek(0)
+            details = self._stderr.read().decode("utf-8", errors="replace").strip()
+            self.error = f"{message}: {details}" if details else message
+            logger.error(self.error)
+
+    def flush(self) -> bool:
+        """
+        Wait until every queued commit is in the repository and refs are updated.
+
+        Returns:
+            bool: True if all commits were written
+        """
+        if self._process is None:
+            return self.error is None
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        return self.error is None
+
+    def close(self) -> bool:
+        """
+        Finish the stream, reset the index to the new HEAD and save the stat cache.
+
+        Returns:
+            bool: True if all commits were written
+        """
+        if self._process is None:
+            return self.error is None
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        returncode = self._process.wait()
+        if returncode != 0:
+            self._fail(f"git fast-import exited with code {returncode}")
+        self._process = None
+        if self.error is None and self.commits:
+            # fast-import doesn't touch the index; make `git status` agree with the new HEAD
+            subprocess.run(["git", "read-tree", "HEAD"], cwd=self.version_dir, capture_output=True)
+            head = self._git("rev-parse", "HEAD").strip()
+            if head:
+                self._save_cache(head)
+        elif self.error is None and self.parent is not None and not self.full_snapshot:
+            self._save_cache(self.parent)
+        self._stderr.close()
+        return self.error is None
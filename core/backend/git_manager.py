@@ -1,23 +1,36 @@
 import os
+import shutil
+import fcntl
 import subprocess
 import logging
+from collections.abc import Mapping
 from typing import Optional
 from core.prompt_preprocess2.ir.ir import Opcode
+from core.backend.git_commit_engine import FastImportCommitEngine
 
 logger = logging.getLogger(__name__)
 
 class GitManager:
     """Manages git operations for replay session folders."""
     
-    def __init__(self, version_dir: str):
+    BASE_BRANCH = "base"
+    
+    def __init__(self, version_dir: str, fast_import: bool = True, shared_repo: Optional[str] = None):
         """
         Initialize GitManager for a specific version directory.
         
         Args:
             version_dir: Path to the version directory that should be a git repository
+            fast_import: Commit through a long-lived git fast-import stream (see
+                FastImportCommitEngine) instead of git add/status/commit per step
+            shared_repo: Path of a project-level bare repository; the version becomes a
+                worktree of it on branch v<version>, forked from the empty "base" commit
         """
         self.version_dir = version_dir
+        self.shared_repo = shared_repo
         self._initialized = False
+        self.fast_import = fast_import
+        self._engine = None
     
     def initialize_repo(self) -> bool:
         """
@@ -33,6 +46,11 @@ class GitManager:
                 self._initialized = True
                 return True
 
+            if self.shared_repo:
+                self._add_worktree()
+                self._initialized = True
+                return True
+
             # Initialize git repository
             subprocess.run(["git", "init"], cwd=self.version_dir, check=True)
             logger.info(f"Initialized git repository in {self.version_dir}")
@@ -54,6 +72,54 @@ class GitManager:
             logger.error("Git not found on system, skipping git initialization")
             return False
     
+    @property
+    def branch(self) -> str:
+        """Branch of the version in the shared repository."""
+        return f"v{os.path.basename(os.path.normpath(self.version_dir))}"
+    
+    def _ensure_shared_repo(self) -> None:
+        """Create the project's bare repository and its empty base commit, once."""
+        if os.path.exists(os.path.join(self.shared_repo, "HEAD")):
+            return
+        git = ["git", "--git-dir", self.shared_repo]
+        subprocess.run(["git", "init", "--bare", "-q", self.shared_repo], check=True)
+        subprocess.run(git + ["config", "user.name", "Replay System"], check=True)
+        subprocess.run(git + ["config", "user.email", "replay@system.local"], check=True)
+        empty_tree = subprocess.run(git + ["hash-object", "-t", "tree", "-w", "--stdin"], input="",
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        base = subprocess.run(git + ["commit-tree", empty_tree, "-m", "Base of all versions"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+        subprocess.run(git + ["update-ref", f"refs/heads/{self.BASE_BRANCH}", base], check=True)
+        logger.info(f"Initialized shared project repository in {self.shared_repo}")
+    
+    def _add_worktree(self) -> None:
+        """
+        Attach the version directory to the shared repository as a worktree on its own branch.
+        
+        git worktree add needs an empty directory, while the version directory
+        already holds the prompt and references. The worktree is therefore
+        created in a scratch directory without a checkout, its .git file is moved
+        into the version directory, and git worktree repair fixes the links.
+        """
+        scratch_root = self.shared_repo + ".tmp"
+        os.makedirs(scratch_root, exist_ok=True)
+        with open(os.path.join(scratch_root, "lock"), "w") as lock:
+            # Versions of a project may be created by concurrent processes
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._ensure_shared_repo()
+            git = ["git", "--git-dir", self.shared_repo]
+            scratch = os.path.join(scratch_root, os.path.basename(os.path.normpath(self.version_dir)))
+            if os.path.exists(scratch):
+                shutil.rmtree(scratch)
+            subprocess.run(git + ["worktree", "prune"], check=True)
+            # -B: a version number can be reused after its directory was deleted
+            subprocess.run(git + ["worktree", "add", "-q", "--no-checkout", "-B", self.branch, scratch, self.BASE_BRANCH],
+                           check=True, capture_output=True, text=True)
+            os.replace(os.path.join(scratch, ".git"), os.path.join(self.version_dir, ".git"))
+            os.rmdir(scratch)
+            subprocess.run(git + ["worktree", "repair", os.path.abspath(self.version_dir)], check=True, capture_output=True)
+        logger.info(f"Added {self.version_dir} as worktree of {self.shared_repo} on branch {self.branch}")
+    
     def load_existing_repo(self) -> bool:
         """
         Load an existing git repository without reinitializing.
@@ -89,9 +155,18 @@ class GitManager:
         Returns:
             bool: True if successful, False otherwise
         """
-        # Check if this is a new repository (no commits yet)
+        engine = self._get_engine()
+        if engine is not None and not self.shared_repo:
+            if engine.has_commits:
+                logger.info("Repository already has commits, skipping initial commit")
+                return True
+            return engine.commit("Initial project setup")
+        
+        # Check if this is a new repository (no commits yet); in a shared
+        # repository the branch always starts at the base commit
+        revisions = f"{self.BASE_BRANCH}..HEAD" if self.shared_repo else "HEAD"
         try:
-            result = subprocess.run(["git", "rev-list", "--count", "HEAD"], 
+            result = subprocess.run(["git", "rev-list", "--count", revisions], 
                                   cwd=self.version_dir, capture_output=True, text=True, check=True)
             commit_count = int(result.stdout.strip())
             if commit_count > 0:
@@ -101,6 +176,8 @@ class GitManager:
             # If we can't get commit count, assume it's a new repo
             pass
         
+        if engine is not None:
+            return engine.commit("Initial project setup")
         return self._commit_changes("Initial project setup")
     
     def commit_step(self, node_data: dict, opcode: Opcode, step_count: int) -> bool:
@@ -116,8 +193,49 @@ class GitManager:
             bool: True if successful, False otherwise
         """
         commit_message = self._generate_commit_message(node_data, opcode, step_count)
+        engine = self._get_engine()
+        if engine is not None:
+            return engine.commit(commit_message)
         return self._commit_changes(commit_message)
     
+    def _get_engine(self) -> Optional[FastImportCommitEngine]:
+        """Return the fast-import engine, starting it on first use; None to commit with git subprocesses."""
+        if not self.fast_import or not self._initialized:
+            return None
+        if self._engine is None:
+            engine = FastImportCommitEngine(self.version_dir)
+            try:
+                engine.start()
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"git fast-import unavailable, committing with git add/commit: {e}")
+                self.fast_import = False
+                return None
+            self._engine = engine
+        elif self._engine.error:
+            return None
+        return self._engine
+    
+    def flush(self) -> bool:
+        """
+        Wait until all commits made so far are written and refs are updated.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self._engine.flush() if self._engine is not None else True
+    
+    def close(self) -> bool:
+        """
+        Write outstanding commits and stop the commit engine.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self._engine is None:
+            return True
+        engine, self._engine = self._engine, None
+        return engine.close()
+    
     def _commit_changes(self, commit_message: str) -> bool:
         """
         Commit all changes with the given message.
@@ -173,7 +291,7 @@ class GitManager:
         node_description = ""
         if 'contents' in node_data:
             contents = node_data['contents']
-            if isinstance(contents, dict):
+            if isinstance(contents, Mapping):
                 if 'path' in contents:
                     node_description = f" - {contents['path']}"
                 elif 'content' in contents:
@@ -250,6 +368,14 @@ class MockGitManager:
         logger.info("Git operations disabled - skipping initial commit")
         return True
     
+    def flush(self) -> bool:
+        """Mock flush of outstanding commits."""
+        return True
+    
+    def close(self) -> bool:
+        """Mock shutdown of the commit engine."""
+        return True
+    
     def commit_step(self, node_data: dict, opcode: Opcode, step_count: int) -> bool:
         """Mock commit after step execution."""
         commit_message = self._generate_commit_message(node_data, opcode, step_count)
@@ -264,7 +390,7 @@ class MockGitManager:
         node_description = ""
         if 'contents' in node_data:
             contents = node_data['contents']
-            if isinstance(contents, dict):
+            if isinstance(contents, Mapping):
                 if 'path' in contents:
                     node_description = f" - {contents['path']}"
                 elif 'content' in contents:
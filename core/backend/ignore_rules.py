@@ -0,0 +1,81 @@
+import re
+from typing import Iterable, List, Tuple
+
+
+class IgnoreRules:
+    """
+    The patterns of .gitignore-style files, as git applies them.
+
+    Supports comments, `!` negation, trailing `/` for directories only,
+    patterns anchored by a `/`, and `*`, `?`, `[...]` and `**`. The last
+    matching pattern wins. Used by CodeIndex and by FastImportCommitEngine,
+    which walk the tree the same way git add does.
+    """
+
+    def __init__(self):
+        self._rules: List[Tuple[str, re.Pattern, bool, bool]] = []  # (base, regex, negated, dir_only)
+
+    def add(self, base: str, lines: Iterable[str]) -> None:
+        """Add the patterns of an ignore file in directory base ("" for the root)."""
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            regex = self._translate(line)
+            if not anchored:
+                regex = r"(?:.*/)?" + regex
+            self._rules.append((base, re.compile(regex + r"\Z"), negated, dir_only))
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        regex, i = "", 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith("**/", i):
+                regex, i = regex + r"(?:.*/)?", i + 3
+            elif pattern.startswith("**", i):
+                regex, i = regex + r".*", i + 2
+            elif char == "*":
+                regex, i = regex + r"[^/]*", i + 1
+            elif char == "?":
+                regex, i = regex + r"[^/]", i + 1
+            elif char == "[":
+                end = pattern.find("]", i + 1)
+                if end == -1:
+                    regex, i = regex + re.escape(char), i + 1
+                else:
+                    regex, i = regex + "[" + pattern[i + 1:end].replace("!", "^", 1) + "]", end + 1
+            else:
+                regex, i = regex + re.escape(char), i + 1
+        return regex
+
+    def load(self, path: str, base: str) -> None:
+        """Add the patterns of the ignore file at path, if it exists, relative to directory base."""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                self.add(base, f.read().splitlines())
+        except OSError:
+            return
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """Whether a "/"-separated path relative to the root is ignored."""
+        ignored = False
+        for base, regex, negated, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+            if regex.match(relative):
+                ignored = not negated
+        return ignored
@@ -0,0 +1,163 @@
+import os
+import fcntl
+import shutil
+import logging
+import tempfile
+import termios
+import threading
+import array
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN = b"+"
+
+
+class Jobserver:
+    """
+    GNU make compatible jobserver shared by RUN commands.
+
+    A FIFO holds one token byte per build slot. Every RUN command takes a
+    token before it starts and puts it back when it exits, and its
+    environment points MAKEFLAGS at the FIFO so a `make` (or cargo, ninja
+    with jobserver support, ...) it runs takes further tokens for its
+    parallel jobs. Parallel RUN nodes, and the builds inside them, then
+    share a fixed pool of slots instead of each starting `make -j$(nproc)`.
+
+    Builds only take part when they run plain `make`: a -j on make's
+    command line leaves the jobserver and sets the job count on its own.
+
+    Example:
+        jobserver = Jobserver.create(8)
+        configure_jobserver(jobserver)
+        ...
+        jobserver.close()
+    """
+
+    def __init__(self, path: str, slots: Optional[int] = None, owner: bool = False):
+        """
+        Open the jobserver FIFO at path; use create() or attach() instead.
+
+        Args:
+            path: Path of the FIFO
+            slots: Number of build slots, if known (only the creating process knows it)
+            owner: Whether this process created the FIFO and removes it on close()
+        """
+        self.path = path
+        self.slots = slots
+        self.owner = owner
+        # O_RDWR keeps the FIFO open for writing too, so reads block for a token instead of seeing EOF
+        self.read_fd = os.open(path, os.O_RDWR)
+        self.write_fd = os.open(path, os.O_WRONLY)
+        self._lock = threading.Lock()
+        self._held = 0
+        self._pending = 0  # acquire() calls waiting for, or just past, their read
+        self._temp_dir: Optional[str] = None
+
+    @classmethod
+    def create(cls, slots: int, path: Optional[str] = None) -> "Jobserver":
+        """
+        Create a jobserver with the given number of build slots.
+
+        Args:
+            slots: Number of tokens in the pool
+            path: Where to create the FIFO (default: a new temporary directory)
+        """
+        if slots < 1:
+            raise ValueError(f"A jobserver needs at least one slot, got {slots}")
+        temp_dir = None
+        if path is None:
+            temp_dir = tempfile.mkdtemp(prefix="replay-jobserver-")
+            path = os.path.join(temp_dir, "fifo")
+        os.mkfifo(path, 0o600)
+        jobserver = cls(path, slots, owner=True)
+        jobserver._temp_dir = temp_dir
+        os.write(jobserver.write_fd, TOKEN * slots)
+        logger.info(f"Started jobserver with {slots} build slots at {path}")
+        return jobserver
+
+    @classmethod
+    def attach(cls, path: str) -> "Jobserver":
+        """Use the jobserver another process created, e.g. in a batch worker."""
+        return cls(path)
+
+    @property
+    def available(self) -> int:
+        """Tokens currently in the FIFO."""
+        count = array.array("i", [0])
+        fcntl.ioctl(self.read_fd, termios.FIONREAD, count)
+        return count[0]
+
+    def acquire(self) -> bytes:
+        """Take a token, blocking until one is free."""
+        # Counted before the read: a token taken from the FIFO but not yet held must not look lost
+        with self._lock:
+            self._pending += 1
+        try:
+            token = os.read(self.read_fd, 1)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        with self._lock:
+            self._pending -= 1
+            self._held += 1
+        return token
+
+    def release(self, token: bytes = TOKEN) -> None:
+        """Return a token, refilling the pool if a killed build lost some of its tokens."""
+        os.write(self.write_fd, token)
+        with self._lock:
+            self._held -= 1
+            if self.owner and self._held == 0 and self._pending == 0:
+                self._replenish()
+
+    def _replenish(self) -> None:
+        # With no command of ours running or acquiring every token should be back in the FIFO; a make that was
+        # killed while holding tokens never returns them. Only the owner knows the slot count,
+        # so pools shared by batch workers aren't refilled.
+        missing = self.slots - self.available
+        if missing > 0:
+            logger.warning(f"Jobserver lost {missing} tokens to killed builds, refilling")
+            os.write(self.write_fd, TOKEN * missing)
+
+    @contextmanager
+    def slot(self):
+        """Hold one token for the duration of the block."""
+        token = self.acquire()
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    def environ(self, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """A copy of env (default: os.environ) whose MAKEFLAGS point make at this jobserver."""
+        env = dict(os.environ if env is None else env)
+        auth = f"--jobserver-auth={self.read_fd},{self.write_fd}"
+        env["MAKEFLAGS"] = f"{env.get('MAKEFLAGS', '')} -j {auth}".strip()
+        return env
+
+    @property
+    def fds(self) -> Tuple[int, int]:
+        """File descriptors a command needs to inherit (Popen pass_fds)."""
+        return self.read_fd, self.write_fd
+
+    def close(self) -> None:
+        """Close the FIFO; the creating process also removes it."""
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+        elif self.owner:
+            os.unlink(self.path)
+
+
+# Build slots shared by the RUN commands of this process, None when not configured
+JOBSERVER: Optional[Jobserver] = None
+
+
+def configure_jobserver(jobserver: Optional[Jobserver]) -> None:
+    """Install the jobserver RUN commands in this process take their build slots from."""
+    global JOBSERVER
+    JOBSERVER = jobserver
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimit:
+    """
+    Process-wide cap on a kind of expensive operation.
+
+    A limit wraps a semaphore that may be shared between processes (a
+    multiprocessing.Semaphore handed to pool workers by the batch runner), so
+    one cap applies across every Replay running in a batch. Until a semaphore
+    is configured the limit is a no-op, which keeps single-project runs
+    unaffected.
+
+    Example:
+        with LLM_LIMIT:
+            response = client.messages.create(**kwargs)
+
+        async with RUN_LIMIT:
+            proc = await asyncio.create_subprocess_shell(command)
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize an unconfigured limit.
+
+        Args:
+            name: Human readable name used in log messages
+        """
+        self.name = name
+        self.semaphore = None
+
+    def configure(self, semaphore) -> None:
+        """
+        Set the semaphore backing this limit.
+
+        Args:
+            semaphore: Any object with acquire()/release(), or None to disable the limit
+        """
+        self.semaphore = semaphore
+
+    def __enter__(self):
+        if self.semaphore is not None:
+            self.semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.semaphore is not None:
+            self.semaphore.release()
+        return False
+
+    async def __aenter__(self):
+        if self.semaphore is not None:
+            # The semaphore may be a cross-process one, so wait for it off the event loop
+            semaphore = self.semaphore
+            acquire = asyncio.ensure_future(asyncio.to_thread(semaphore.acquire))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                # The thread can't be interrupted; hand the slot back once it gets it
+                acquire.add_done_callback(
+                    lambda future: future.cancelled() or future.exception() or semaphore.release())
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self.semaphore is not None:
+            self.semaphore.release()
+        return False
+
+
+# Concurrent requests to the LLM backend
+LLM_LIMIT = ConcurrencyLimit("llm")
+# Concurrent RUN node subprocesses
+RUN_LIMIT = ConcurrencyLimit("run")
+
+
+@dataclass(frozen=True)
+class RunLimits:
+    """
+    Resource limits of a RUN command.
+
+    timeout is wall-clock time for the whole process group; cpu_limit and
+    memory_limit are rlimits (CPU seconds and address space) applied to every
+    process the command starts. None means unlimited.
+    """
+    timeout: Optional[float] = None
+    cpu_limit: Optional[int] = None
+    memory_limit: Optional[int] = None
+
+    @classmethod
+    def from_contents(cls, contents) -> "RunLimits":
+        """The @timeout:, @cpu_limit: and @memory_limit: values of a RUN node."""
+        return cls(contents.get('timeout'), contents.get('cpu_limit'), contents.get('memory_limit'))
+
+    def override(self, other: "RunLimits") -> "RunLimits":
+        """These limits with the values set in other taking precedence."""
+        return replace(self, **{field: value for field, value in vars(other).items() if value is not None})
+
+
+# Limits of RUN commands that don't set their own
+RUN_DEFAULTS = RunLimits()
+
+
+def configure_run_defaults(limits: Optional[RunLimits] = None) -> None:
+    """Set the limits applied to RUN commands without their own @timeout:, @cpu_limit: or @memory_limit:."""
+    global RUN_DEFAULTS
+    RUN_DEFAULTS = limits or RunLimits()
+
+
+def run_limits_for(contents) -> RunLimits:
+    """The limits of a RUN node: its own values over RUN_DEFAULTS."""
+    return RUN_DEFAULTS.override(RunLimits.from_contents(contents))
+
+
+def configure_limits(llm_semaphore: Optional[object] = None, run_semaphore: Optional[object] = None,
+                     run_defaults: Optional[RunLimits] = None, jobserver_path: Optional[str] = None) -> None:
+    """
+    Install the semaphores for LLM_LIMIT and RUN_LIMIT in this process.
+
+    Used as a process pool initializer so every worker shares the parent's
+    semaphores, RUN defaults and build jobserver.
+
+    Args:
+        llm_semaphore: Semaphore capping concurrent LLM requests, or None for no cap
+        run_semaphore: Semaphore capping concurrent RUN subprocesses, or None for no cap
+        run_defaults: Limits of RUN commands that don't set their own
+        jobserver_path: FIFO of a jobserver created by the parent (see core.backend.jobserver)
+    """
+    LLM_LIMIT.configure(llm_semaphore)
+    RUN_LIMIT.configure(run_semaphore)
+    configure_run_defaults(run_defaults)
+    if jobserver_path is not None:
+        from core.backend.jobserver import Jobserver, configure_jobserver
+        configure_jobserver(Jobserver.attach(jobserver_path))
+    logger.debug(f"Configured concurrency limits: llm={llm_semaphore}, run={run_semaphore}, "
+                 f"run defaults={run_defaults}, jobserver={jobserver_path}")
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
 import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 
 class LLMBackend(ABC):
     """
@@ -170,6 +174,22 @@ class LLMBackend(ABC):
         # Send request
         return self.send_request(prompt, files_json, system_prompt)
     
+    def _parse_response(self, response) -> Dict[str, Any]:
+        """
+        Log usage and parse the JSON payload out of a Messages API response.
+        
+        Args:
+            response: The response object returned by client.messages.create
+            
+        Returns:
+            Dict[str, Any]: The parsed response from the LLM
+        """
+        logger.info(f"LLM usage: {response.usage}")
+        
+        # Extract and parse the response
+        response_text = response.content[0].text
+        return self.extract_json_response(response_text)
+    
     # Abstract methods that concrete implementations must provide
     
     @abstractmethod
@@ -198,4 +218,99 @@ class LLMBackend(ABC):
         Returns:
             Dict[str, Any]: The parsed JSON response
         """
-        pass
\ No newline at end of file
+        pass
+
+
+class AsyncLLMBackend(ABC):
+    """
+    Asyncio-native request interface for LLM backends.
+    
+    Mixed into concrete LLMBackend implementations next to their blocking
+    methods. Request payloads are built by the same _build_request_kwargs,
+    _build_prompt_request and _build_fix_request helpers the blocking path
+    uses, so both paths always send identical requests; only the transport
+    differs. Many Replay instances can share one event loop and await their
+    LLM calls concurrently.
+    
+    The client is awaited natively when it exposes messages.acreate (our
+    client wrappers) or when an async client (anthropic.AsyncAnthropic) was
+    configured; otherwise the blocking create call runs in the default executor.
+    """
+    
+    client = None
+    async_client = None
+    
+    @abstractmethod
+    def _build_request_kwargs(self, prompt: str, files_json: str, system_prompt: str = None) -> Dict[str, Any]:
+        """Build the keyword arguments for client.messages.create."""
+        pass
+    
+    @abstractmethod
+    def _build_prompt_request(self, *args, **kwargs) -> Tuple[str, Optional[str]]:
+        """Build the request JSON and system prompt for a PROMPT node."""
+        pass
+    
+    @abstractmethod
+    def _build_fix_request(self, *args, **kwargs) -> Tuple[str, Optional[str]]:
+        """Build the request JSON and system prompt for a FIX node."""
+        pass
+    
+    async def _create_message_async(self, **kwargs):
+        """
+        Await a Messages API call on whichever async transport is available.
+        
+        Returns:
+            The response object, shaped like the Anthropic client response
+        """
+        from .limits import LLM_LIMIT
+        messages = self.client.messages
+        async with LLM_LIMIT:
+            if hasattr(messages, "acreate"):
+                return await messages.acreate(**kwargs)
+            if self.async_client is not None:
+                return await self.async_client.messages.create(**kwargs)
+            return await asyncio.to_thread(messages.create, **kwargs)
+    
+    async def send_request_async(self, prompt: str, files_json: str, system_prompt: str = None,
+                                 on_file: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Send a request to the LLM backend without blocking the event loop.
+        
+        Args:
+            prompt (str): The user prompt
+            files_json (str): JSON string containing files data
+            system_prompt (str, optional): System prompt/instructions
+            on_file (callable, optional): Receives each file as soon as it has been
+                received, for backends that stream; ignored here
+            
+        Returns:
+            Dict[str, Any]: The parsed response from the LLM
+        """
+        if not self.client:
+            raise RuntimeError("Client not configured. This backend should be used within a replay context.")
+        
+        logger.info(f"Sending async request to {self.model_name}")
+        response = await self._create_message_async(**self._build_request_kwargs(prompt, files_json, system_prompt))
+        return self._parse_response(response)
+    
+    async def send_prompt_request_async(self, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Async counterpart of send_prompt_request, taking the same arguments and on_file.
+        
+        Returns:
+            Dict[str, Any]: The parsed response from the LLM
+        """
+        on_file = kwargs.pop("on_file", None)
+        request_json, system_prompt = self._build_prompt_request(*args, **kwargs)
+        return await self.send_request_async("", request_json, system_prompt, on_file=on_file)
+    
+    async def send_fix_request_async(self, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Async counterpart of send_fix_request, taking the same arguments and on_file.
+        
+        Returns:
+            Dict[str, Any]: The parsed response from the LLM
+        """
+        on_file = kwargs.pop("on_file", None)
+        request_json, system_prompt = self._build_fix_request(*args, **kwargs)
+        return await self.send_request_async("", request_json, system_prompt, on_file=on_file)
@@ -0,0 +1,64 @@
+import contextlib
+import contextvars
+from typing import List
+
+# Memory buffer of the node processed in the current thread or task, see ExecutionState.memory
+NODE_MEMORY: contextvars.ContextVar = contextvars.ContextVar("replay_node_memory", default=None)
+
+
+class NodeMemory:
+    """
+    Private copy of the replay memory for one node run by a DagScheduler.
+
+    While the node is processed (inside active()), replay.state.execution.memory
+    reads and writes this buffer instead of the shared memory, so nodes that
+    run at the same time don't see each other's half-done updates. Once the
+    node has completed, the scheduler merges the buffer into the shared
+    memory, in completion order: entries the node appended are appended, and
+    if the node replaced the memory (PROMPT and FIX take it from the LLM
+    response) its list replaces the memory it started from, keeping what
+    other nodes appended since. Of two replacements the one that completes
+    last wins.
+
+    Example:
+        memory = NodeMemory(execution.memory)
+        with memory.active():
+            processor.process(replay, node)
+        execution.memory = memory.merge(execution.memory)
+    """
+
+    def __init__(self, memory: List[str]):
+        """
+        Initialize the buffer.
+
+        Args:
+            memory: The shared memory when the node is dispatched
+        """
+        self.base = list(memory)
+        self.entries = list(memory)
+
+    @contextlib.contextmanager
+    def active(self):
+        """Route replay.state.execution.memory to this buffer inside the block."""
+        token = NODE_MEMORY.set(self)
+        try:
+            yield self
+        finally:
+            NODE_MEMORY.reset(token)
+
+    def merge(self, shared: List[str]) -> List[str]:
+        """
+        Apply the node's changes to the shared memory.
+
+        Args:
+            shared: The shared memory now, possibly changed by nodes that completed first
+
+        Returns:
+            List[str]: The new shared memory
+        """
+        base = self.base
+        if self.entries[:len(base)] == base:
+            return shared + self.entries[len(base):]
+        others = shared[len(base):] if shared[:len(base)] == base else []
+        return self.entries + others
+
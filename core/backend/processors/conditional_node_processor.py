@@ -1,6 +1,5 @@
 import os
 import logging
-from core.prompt_preprocess2.ir.control_flow import cfg_traversal_step
 
 logger = logging.getLogger(__name__)
 
@@ -9,7 +8,7 @@ class ConditionalNodeProcessor:
     
     def process(self, replay, node):
         """
-        Process a CONDITIONAL node by reading the condition file and determining the next step.
+        Process a CONDITIONAL node by evaluating the exit code of its RUN node into contents['condition'].
         
         Args:
             replay: The Replay instance
@@ -57,14 +56,8 @@ class ConditionalNodeProcessor:
         # Increment the iteration count
         contents['iteration_count'] = iteration_count + 1
         
-        next_node = None
+        # Replay._advance jumps to the branch target the program precomputed
         if condition_result:
-            next_node = contents['true_node_target']
-            logger.info(f"✅ True branch")
+            logger.info(f"✅ True branch: {contents['true_node_target']}")
         else:
-            next_node = contents['false_node_target']
-            logger.info(f"❌ False branch")
-
-        queue, next_node = cfg_traversal_step(replay.state.execution.epic, [next_node])
-        replay.state.execution.control_flow_graph_queue = queue
-        replay.state.execution.current_node_id = next_node
+            logger.info(f"❌ False branch: {contents['false_node_target']}")
@@ -0,0 +1,286 @@
+import os
+import re
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+MAX_DIAGNOSTICS = 50
+MAX_MESSAGE_CHARS = 500
+
+
+@dataclass
+class Diagnostic:
+    """One failure found in the output of a RUN command."""
+    kind: str
+    message: str
+    file: Optional[str] = None
+    line: Optional[int] = None
+    column: Optional[int] = None
+    test_id: Optional[str] = None
+
+    def key(self) -> tuple:
+        """
+        What makes two diagnostics the same failure (the same error printed twice, a test
+        in both pytest's summary and the JUnit report, ...). Tools spell test ids differently
+        (`tests/test_a.py::TestB::test_c`, `tests.test_a.TestB::test_c`), so tests compare by name.
+        """
+        if self.test_id:
+            return ("test", self.test_id.rsplit("::", 1)[-1], self.message)
+        return (self.file, self.line, self.message)
+
+    def merge(self, other: "Diagnostic") -> None:
+        """Fill in the location from another report of the same failure."""
+        for name in ("file", "line", "column"):
+            if getattr(self, name) is None:
+                setattr(self, name, getattr(other, name))
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+    def format(self) -> str:
+        """One line for the FIX prompt, e.g. `kernel.cpp:12:5: error: unknown type`."""
+        location = ":".join(str(part) for part in (self.file, self.line, self.column) if part is not None)
+        where = self.test_id or location
+        if self.test_id and location:
+            where = f"{self.test_id} ({location})"
+        return f"{where}: {self.message}" if where else self.message
+
+
+class FailureExtractor:
+    """
+    Turns output lines of a RUN command into Diagnostics.
+
+    Extractors are fed every line of stdout and then of stderr, one line at
+    a time, so a multi-megabyte log is read once for all of them. Register
+    a new one with @extractor.
+    """
+
+    def feed(self, line: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> List[Diagnostic]:
+        """The diagnostics found, once all lines were fed."""
+        raise NotImplementedError
+
+
+EXTRACTORS: Dict[str, Type[FailureExtractor]] = {}
+
+
+def extractor(name: str):
+    """Register a FailureExtractor class under a name."""
+    def register(cls: Type[FailureExtractor]) -> Type[FailureExtractor]:
+        EXTRACTORS[name] = cls
+        return cls
+    return register
+
+
+@extractor("pytest")
+class PytestExtractor(FailureExtractor):
+    """
+    The short test summary of pytest (`FAILED tests/test_a.py::test_b - AssertionError: ...`),
+    with the file and line taken from the `tests/test_a.py:12: AssertionError` line of the
+    test's failure section.
+    """
+
+    SUMMARY = re.compile(r"^(FAILED|ERROR) (\S+::\S+|\S+\.py)(?: - (.*))?$")
+    SECTION = re.compile(r"^_{3,} (?:ERROR at \w+ of )?(.+?) _{3,}$")
+    LOCATION = re.compile(r"^(\S+\.py):(\d+): (\w+)$")
+
+    def __init__(self):
+        self.section: Optional[str] = None
+        self.locations: Dict[str, tuple] = {}
+        self.failures: List[Diagnostic] = []
+
+    def feed(self, line: str) -> None:
+        match = self.SECTION.match(line)
+        if match:
+            self.section = match.group(1)
+            return
+        match = self.LOCATION.match(line)
+        if match and self.section is not None:
+            self.locations[self.section] = (match.group(1), int(match.group(2)), match.group(3))
+            return
+        match = self.SUMMARY.match(line)
+        if match:
+            outcome, test_id, message = match.groups()
+            self.failures.append(Diagnostic("pytest", message or outcome.lower(), test_id=test_id))
+
+    def close(self) -> List[Diagnostic]:
+        for failure in self.failures:
+            # Sections are titled by the test's name within its file (`TestCase.test_b`, `test_b[1]`)
+            name = failure.test_id.split("::", 1)[-1].replace("::", ".")
+            location = self.locations.get(name)
+            if location is not None:
+                failure.file, failure.line, error = location
+                if failure.message in ("failed", "error"):
+                    failure.message = error
+        return self.failures
+
+
+@extractor("compiler")
+class CompilerExtractor(FailureExtractor):
+    """gcc/clang (and nvcc, rustc-style) `file:line:col: error: message` diagnostics and linker errors."""
+
+    DIAGNOSTIC = re.compile(r"^(?P<file>[^\s:][^:]*):(?P<line>\d+):(?:(?P<column>\d+):)? (?:fatal )?error: (?P<message>.+)$")
+    LINKER = re.compile(r"^(?:\S*/)?(?:ld|ld\.lld|ld\.gold|collect2|lld)(?:\.exe)?: (?:error: )?(?P<message>.+)$")
+    UNDEFINED = re.compile(r"^(?P<file>[^\s:][^:]*):(?:\(.*\)|\S*): (?P<message>undefined reference to .+)$")
+    CONTEXT = re.compile(r"in function .*:$|returned \d+ exit status")
+
+    def __init__(self):
+        self.diagnostics: List[Diagnostic] = []
+
+    def feed(self, line: str) -> None:
+        match = self.DIAGNOSTIC.match(line)
+        if match:
+            column = match.group("column")
+            self.diagnostics.append(Diagnostic("compiler", match.group("message"), match.group("file"),
+                                               int(match.group("line")), int(column) if column else None))
+            return
+        match = self.UNDEFINED.match(line)
+        if match:
+            self.diagnostics.append(Diagnostic("linker", match.group("message"), match.group("file")))
+            return
+        match = self.LINKER.match(line)
+        # Skip the linker's context lines (`in function `main':`) and collect2's summary
+        if match and not self.CONTEXT.search(line):
+            self.diagnostics.append(Diagnostic("linker", match.group("message")))
+
+    def close(self) -> List[Diagnostic]:
+        return self.diagnostics
+
+
+@extractor("cmake")
+class CMakeExtractor(FailureExtractor):
+    """`CMake Error at CMakeLists.txt:12 (find_package):` and the first paragraph of the indented message below it."""
+
+    ERROR = re.compile(r"^CMake Error(?: at (?P<file>.+?):(?P<line>\d+)(?: \(.*\))?)?:\s*(?P<message>.*)$")
+
+    def __init__(self):
+        self.diagnostics: List[Diagnostic] = []
+        self.current: Optional[Diagnostic] = None
+
+    def feed(self, line: str) -> None:
+        match = self.ERROR.match(line)
+        if match:
+            line_number = match.group("line")
+            self.current = Diagnostic("cmake", match.group("message").strip(), match.group("file"),
+                                      int(line_number) if line_number else None)
+            self.diagnostics.append(self.current)
+        elif self.current is not None and line.startswith(" ") and line.strip():
+            self.current.message = f"{self.current.message} {line.strip()}".strip()
+        elif self.current is not None and (line.strip() or self.current.message):
+            self.current = None
+
+    def close(self) -> List[Diagnostic]:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.message]
+
+
+@extractor("traceback")
+class TracebackExtractor(FailureExtractor):
+    """Python tracebacks: the exception line, located at the innermost frame."""
+
+    START = re.compile(r"^\s*Traceback \(most recent call last\):$")
+    FRAME = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)')
+
+    def __init__(self):
+        self.diagnostics: List[Diagnostic] = []
+        self.frame: Optional[tuple] = None
+        self.in_traceback = False
+        self.indent = ""
+
+    def feed(self, line: str) -> None:
+        if self.START.match(line):
+            self.in_traceback, self.frame = True, None
+            self.indent = line[:len(line) - len(line.lstrip())]
+            return
+        if not self.in_traceback:
+            return
+        match = self.FRAME.match(line)
+        if match:
+            self.frame = (match.group("file"), int(match.group("line")))
+            return
+        body = line[len(self.indent):]
+        if body and not body[0].isspace():
+            # The first line back at the traceback's indentation is the exception
+            self.in_traceback = False
+            file, line_number = self.frame or (None, None)
+            self.diagnostics.append(Diagnostic("traceback", body.strip(), file, line_number))
+
+    def close(self) -> List[Diagnostic]:
+        return self.diagnostics
+
+
+def parse_junit(path: str) -> List[Diagnostic]:
+    """The failed and errored test cases of a JUnit XML report (pytest --junitxml, ctest, gtest, ...)."""
+    diagnostics = []
+    for _, element in ET.iterparse(path):
+        if element.tag != "testcase":
+            continue
+        for outcome in ("failure", "error"):
+            result = element.find(outcome)
+            if result is None:
+                continue
+            classname, name = element.get("classname"), element.get("name", "")
+            message = result.get("message")
+            if not message:
+                # Without a message attribute the last line of the details is the error
+                details = (result.text or "").strip().splitlines()
+                message = details[-1] if details else outcome
+            line = element.get("line")
+            diagnostics.append(Diagnostic("junit", message, file=element.get("file"),
+                                          line=int(line) if line and line.isdigit() else None,
+                                          test_id=f"{classname}::{name}" if classname else name))
+            break
+        element.clear()
+    return diagnostics
+
+
+def extract_failures(log_paths: Iterable[str], junit_path: Optional[str] = None,
+                     extractors: Optional[Iterable[str]] = None) -> List[Diagnostic]:
+    """
+    Run the failure extractors over the logs of a command.
+
+    Args:
+        log_paths: Log files, read line by line in order (stdout, then stderr)
+        junit_path: JUnit XML report written by the command, if any
+        extractors: Names of the extractors to run (default: all registered)
+
+    Returns:
+        List[Diagnostic]: Deduplicated diagnostics in the order they were found, at most MAX_DIAGNOSTICS
+    """
+    active = [EXTRACTORS[name]() for name in (extractors if extractors is not None else EXTRACTORS)]
+    for path in log_paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                for failure_extractor in active:
+                    failure_extractor.feed(line)
+
+    found = []
+    for failure_extractor in active:
+        found.extend(failure_extractor.close())
+    if junit_path is not None and os.path.exists(junit_path):
+        try:
+            found.extend(parse_junit(junit_path))
+        except ET.ParseError as e:
+            logger.warning(f"Can't parse JUnit report {junit_path}: {e}")
+
+    diagnostics: Dict[tuple, Diagnostic] = {}
+    for diagnostic in found:
+        diagnostic.message = diagnostic.message.strip()[:MAX_MESSAGE_CHARS]
+        key = diagnostic.key()
+        if key in diagnostics:
+            diagnostics[key].merge(diagnostic)
+        else:
+            diagnostics[key] = diagnostic
+    return list(diagnostics.values())[:MAX_DIAGNOSTICS]
+
+
+def format_diagnostics(command: str, exit_code: int, diagnostics: List[Diagnostic]) -> str:
+    """The diagnostics as the text FIX gets instead of the raw log tails."""
+    lines = [f"Command `{command}` failed with exit code {exit_code}. Failures found in its output:"]
+    lines.extend(f"- {diagnostic.format()}" for diagnostic in diagnostics)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+import os
+import re
+import math
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from core.backend import jobserver
+from core.backend.limits import RUN_LIMIT, run_limits_for
+from core.backend.processors.run_output import kill_group, run_streaming
+
+logger = logging.getLogger(__name__)
+
+# Lines that look like a diagnostic; fewer of them means a candidate got closer
+ERROR_LINE_PATTERN = re.compile(r"error|fail|exception|traceback", re.IGNORECASE)
+
+
+@dataclass
+class CandidateResult:
+    """Outcome of one best-of-N FIX candidate."""
+    index: int
+    code_dir: str
+    response_data: Optional[Dict[str, Any]] = None
+    exit_code: Optional[int] = None
+    passed: bool = False
+    score: float = float("-inf")
+    error: Optional[str] = None
+    files: List[str] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        """Return a JSON serializable summary, stored on the FIX node."""
+        return {
+            "index": self.index,
+            "exit_code": self.exit_code,
+            "passed": self.passed,
+            "score": self.score if math.isfinite(self.score) else None,
+            "files": self.files,
+            "error": self.error,
+        }
+
+
+def score_output(stdout: str, stderr: str) -> float:
+    """
+    Score a failing check; higher is better.
+
+    Args:
+        stdout: Captured standard output of the check command
+        stderr: Captured standard error of the check command
+
+    Returns:
+        float: Negated number of diagnostic-looking lines
+    """
+    lines = (stdout + "\n" + stderr).splitlines()
+    return -float(sum(1 for line in lines if ERROR_LINE_PATTERN.search(line)))
+
+
+class CandidateCancelled(Exception):
+    """A candidate stopped because another one already passed."""
+
+
+class FixCandidates:
+    """
+    Best-of-N FIX: request several fixes at once and keep the one that works.
+
+    Each candidate gets its own scratch copy of code_dir under
+    replay/candidates/<fix node>_<round>/<index>/. The LLM request is sent N
+    times concurrently, each with a note naming its candidate index so the
+    requests don't collapse into one cached answer, each response is applied to its candidate copy and the
+    check command of the DEBUG_LOOP is run there. The first candidate that
+    passes is promoted; if none pass, the best-scoring one is. Promotion
+    applies the winning response to the real code_dir exactly like a regular
+    FIX, so the following RUN/CONDITIONAL nodes behave as before.
+
+    Once a candidate passes, the others are cancelled: their running checks
+    are killed (process group and all), they stop before their next step and
+    remove their copies. Candidates only see edits returned in the "files"
+    list of the response, so the claude_code backend, whose agent edits
+    code_dir itself, can't run them.
+    """
+
+    def __init__(self, processor, replay, node: dict, count: int):
+        """
+        Initialize the candidate set.
+
+        Args:
+            processor: The FixNodeProcessor that builds, sends and applies requests
+            replay: The replay instance
+            node: The FIX node data dictionary
+            count: Number of candidates to try
+        """
+        if getattr(replay, 'llm_backend_name', None) == "claude_code":
+            raise ValueError("FIX candidates need an LLM backend that returns the edited files; "
+                             "the claude_code agent edits code_dir in place, use @candidates:1 or anthropic_api")
+        self.processor = processor
+        self.replay = replay
+        self.node = node
+        self.count = count
+        contents = node['contents']
+        run_node = replay.state.execution.epic.graph.nodes[contents['run_ref']]
+        self.command = run_node['contents']['command']
+        self.limits = run_limits_for(run_node['contents'])
+        self.should_fail = contents.get('should_fail', False)
+        fix_round = len(contents.get('candidate_rounds', []))
+        self.work_dir = os.path.join(replay.replay_dir, "candidates", f"{contents['run_ref']}_{fix_round}")
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._groups: Dict[int, int] = {}  # candidate index -> process group of its running check
+
+    def run(self, llm_request) -> CandidateResult:
+        """
+        Try all candidates and promote the winner.
+
+        Args:
+            llm_request: The prepared LLMRequest shared by all candidates
+
+        Returns:
+            CandidateResult: The promoted candidate
+
+        Raises:
+            RuntimeError: If every candidate failed before its check could run
+        """
+        logger.info(f"🎲 Trying {self.count} FIX candidates for `{self.command}`")
+        os.makedirs(self.work_dir, exist_ok=True)
+        # Candidates abandoned after an early pass may still be writing here; keep them out of step commits
+        with open(os.path.join(os.path.dirname(self.work_dir), ".gitignore"), "w") as f:
+            f.write("*\n")
+        results = []
+        winner = None
+        pool = ThreadPoolExecutor(max_workers=self.count, thread_name_prefix="fix-candidate")
+        try:
+            futures = [pool.submit(self._try_candidate, i, llm_request) for i in range(self.count)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                logger.info(f"Candidate {result.index}: exit code {result.exit_code}, score {result.score}")
+                if result.passed:
+                    winner = result
+                    self._cancel()
+                    break
+        finally:
+            # Don't wait for the remaining candidates once one has passed
+            pool.shutdown(wait=winner is None, cancel_futures=True)
+        # The promoted response is applied from response_data, so no copy is needed once its candidate is done
+        for index, future in enumerate(futures):
+            future.add_done_callback(lambda _, index=index: self._discard(index))
+
+        if winner is None:
+            scored = [r for r in results if r.response_data is not None]
+            if not scored:
+                raise RuntimeError(f"All {self.count} FIX candidates failed: {[r.error for r in results]}")
+            winner = max(scored, key=lambda r: (r.score, -r.index))
+
+        logger.info(f"🏆 Promoting candidate {winner.index} ({'passed' if winner.passed else 'best score'})")
+        self.processor._process_generic_llm_response(winner.response_data, self.replay)
+        self._record(results, winner)
+        return winner
+
+    def _cancel(self) -> None:
+        """Stop the candidates still running: kill their checks and make them skip the rest."""
+        with self._lock:
+            self._cancelled.set()
+            groups = list(self._groups.values())
+        for pid in groups:
+            kill_group(pid)
+        if groups:
+            logger.info(f"Stopped {len(groups)} FIX candidate checks")
+
+    def _check_started(self, index: int, pid: int) -> None:
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._groups[index] = pid
+                return
+        kill_group(pid)
+
+    def _try_candidate(self, index: int, llm_request) -> CandidateResult:
+        """Request a fix, apply it to a scratch copy of code_dir and run the check there."""
+        candidate_dir = os.path.join(self.work_dir, str(index))
+        code_dir = os.path.join(candidate_dir, "code")
+        result = CandidateResult(index=index, code_dir=code_dir)
+        try:
+            if os.path.exists(candidate_dir):
+                shutil.rmtree(candidate_dir)
+            shutil.copytree(self.replay.code_dir, code_dir, symlinks=True)
+
+            # Each candidate continues its own conversation from round to round
+            with self.processor._session_branch(self.replay, self.node, f"_candidate_{index}"):
+                result.response_data = self.processor._send_llm_request(self.replay, self._candidate_request(index, llm_request))
+            if self._cancelled.is_set():
+                raise CandidateCancelled()
+            result.files = self.processor._save_response_files(result.response_data, code_dir)
+
+            # The check gets the RUN node's timeout and rlimits, so a hanging candidate can't stall the round
+            with RUN_LIMIT:
+                if self._cancelled.is_set():
+                    raise CandidateCancelled()
+                output = run_streaming(self.command, code_dir, os.path.join(candidate_dir, "stdout.txt"),
+                                       os.path.join(candidate_dir, "stderr.txt"), limits=self.limits,
+                                       jobserver=jobserver.JOBSERVER,
+                                       on_start=lambda pid: self._check_started(index, pid))
+            with self._lock:
+                self._groups.pop(index, None)
+            if self._cancelled.is_set():
+                raise CandidateCancelled()
+            result.exit_code = 124 if output.timed_out else output.exit_code
+            if self.should_fail:
+                result.passed = result.exit_code == 1
+            else:
+                result.passed = result.exit_code == 0
+            result.score = float("inf") if result.passed else score_output(output.stdout.tail.text(), output.stderr.tail.text())
+        except CandidateCancelled:
+            logger.info(f"FIX candidate {index} cancelled, another one passed")
+            result.error = "cancelled"
+        except Exception as e:
+            logger.error(f"FIX candidate {index} failed: {e}")
+            result.error = str(e)
+        return result
+
+    def _candidate_request(self, index: int, llm_request):
+        """
+        Make the request of one candidate distinct from the others.
+
+        Identical requests would all be answered by the same ResponseCache entry
+        or cassette interaction, so every candidate would get the same fix.
+        """
+        note = f"This is fix candidate {index + 1} of {self.count}; other candidates are tried in parallel, so an alternative approach is welcome."
+        return replace(llm_request, memory=list(llm_request.memory) + [note])
+
+    def _discard(self, index: int) -> None:
+        """Remove the copy of a finished candidate; the last one out removes the round's directory."""
+        shutil.rmtree(os.path.join(self.work_dir, str(index)), ignore_errors=True)
+        try:
+            os.rmdir(self.work_dir)
+        except OSError:
+            pass  # other candidates are still running
+
+    def _record(self, results: List[CandidateResult], winner: CandidateResult) -> None:
+        """Keep a summary of this round on the FIX node and in replay memory."""
+        contents = self.node['contents']
+        contents.setdefault('candidate_rounds', []).append({
+            "promoted": winner.index,
+            "passed": winner.passed,
+            "candidates": [r.summary() for r in sorted(results, key=lambda r: r.index)],
+        })
+        passed = sum(1 for r in results if r.passed)
+        self.replay.state.execution.memory.append(
+            f"Tried {len(results)} fix candidates for `{self.command}`, {passed} passed; kept candidate {winner.index}"
+        )
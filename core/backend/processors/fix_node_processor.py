@@ -1,9 +1,13 @@
 import json
+import asyncio
+import contextlib
 import logging
 import os
 from typing import Dict, List, Any
 from dataclasses import dataclass
 from core.prompt_preprocess2.ir.ir import Opcode
+from .fix_candidates import FixCandidates
+from core.backend.code_index import CodeIndex
 
 logger = logging.getLogger(__name__)
 
@@ -40,58 +44,47 @@ class FixNodeProcessor:
         try:
             logger.info(f"Processing FIX node {node}")
             
-            # Extract the run reference from node contents
-            contents = node.get('contents', {})
-            run_ref = contents.get('run_ref', None)
-            
-            if run_ref is None:
-                raise ValueError(f"No run_ref found in FIX node: {node}")
+            llm_request = self._prepare_llm_request(replay, node)
+            candidates = node.get('contents', {}).get('candidates', 1)
+            if candidates > 1:
+                # Best-of-N: the candidates check themselves and the winner is applied
+                FixCandidates(self, replay, node, candidates).run(llm_request)
+            else:
+                # When streaming, fixed files are saved as soon as they arrive
+                with self._session_branch(replay, node):
+                    response_data = self._send_llm_request(replay, llm_request,
+                                                           on_file=self._streamed_file_saver(replay))
+                
+                # Apply fixes based on LLM response
+                self._process_generic_llm_response(response_data, replay)
             
-            # Get the referenced RUN node
-            run_node = replay.state.execution.epic.graph.nodes[run_ref]
-            run_node_opcode = run_node.get('opcode')
-            if run_node_opcode != Opcode.RUN:
-                raise ValueError(f"Referenced node {run_ref} is not a RUN node but {run_node_opcode}")
+            logger.info(f"Processed FIX node {node}")
             
-            # Extract run logs from the RUN node
-            stderr_file, stdout_file = self._extract_run_log_files(run_node, replay)
-            stderr_file_content = self._load_files_from_directory([f for f in [stdout_file] if f is not None], replay.run_logs_dir, "run log file", last_n_lines=self.LAST_N_ERROR_LINES)
-            run_logs_files = self._load_files_from_directory([f for f in [stderr_file, stdout_file] if f is not None], replay.run_logs_dir, "stderr file", last_n_lines=self.LAST_N_ERROR_LINES)
-            logger.debug(f"Found attached run logs files: {run_logs_files}")
-
-            # Get relevant code files mentioned in the logs
-            # Use stderr for error analysis, but could be enhanced to use both
-            log_file_for_analysis = stderr_file if stderr_file else stdout_file            
-            relevant_code_files_contents = []
-            ro_files = [
-                "kernel_api_compute_operations.md",
-                "kernel_api_circular_buffers.md",
-                "example_compute_llk_where.cpp",
-                "tt-metal-kernel-apis.md",
-                "tt-metal-api-reference.xml",
-            ]
-            if log_file_for_analysis:
-                relevant_code_files = self._get_relevant_code_files(log_file_for_analysis, replay)
-                relevant_code_files_contents = self._load_files_from_directory(relevant_code_files, replay.code_dir, "code file")            
-
-                # strip writer, reader, lowered files from editable files
-                strip_files = ["tt_writer.cpp", "tt_reader.cpp", "test_lowered_{}.py"]
-                pop_idxs = []
-                for i, ref in enumerate(relevant_code_files_contents):
-                    if ref.path in strip_files or ref.path.startswith('test_lowered'):
-                        ro_files.append(relevant_code_files_contents[i].path)
-                        pop_idxs.append(i)
-
-                relevant_code_files_contents = [relevant_code_files_contents[i] for i in range(len(relevant_code_files_contents)) if i not in pop_idxs]
-
-                
+        except Exception as e:
+            logger.error(f"Error processing FIX node {node}: {e}")
+            raise
 
-            # Build and send LLM request
-            llm_request = self._build_llm_request(run_logs_files, relevant_code_files_contents, ro_files, replay)
-            response_data = self._send_llm_request(replay, llm_request)
+    async def process_async(self, replay, node: dict) -> None:
+        """
+        Async variant of process; the LLM round trip doesn't block the event loop.
+        
+        Args:
+            replay: The replay instance containing state and client
+            node: The node data dictionary to process
+        """
+        try:
+            logger.info(f"Processing FIX node {node}")
             
-            # Apply fixes based on LLM response
-            self._process_generic_llm_response(response_data, replay)
+            llm_request = self._prepare_llm_request(replay, node)
+            candidates = node.get('contents', {}).get('candidates', 1)
+            if candidates > 1:
+                await asyncio.to_thread(FixCandidates(self, replay, node, candidates).run, llm_request)
+            else:
+                with self._session_branch(replay, node):
+                    response_data = await self._send_llm_request_async(replay, llm_request,
+                                                                       on_file=self._streamed_file_saver(replay))
+                
+                self._process_generic_llm_response(response_data, replay)
             
             logger.info(f"Processed FIX node {node}")
             
@@ -99,6 +92,64 @@ class FixNodeProcessor:
             logger.error(f"Error processing FIX node {node}: {e}")
             raise
 
+    def _prepare_llm_request(self, replay, node: dict) -> LLMRequest:
+        """Collect run logs and code files referenced by a FIX node and build the LLM request."""
+        # Extract the run reference from node contents
+        contents = node.get('contents', {})
+        run_ref = contents.get('run_ref', None)
+        
+        if run_ref is None:
+            raise ValueError(f"No run_ref found in FIX node: {node}")
+        
+        # Get the referenced RUN node
+        run_node = replay.state.execution.epic.graph.nodes[run_ref]
+        run_node_opcode = run_node.get('opcode')
+        if run_node_opcode != Opcode.RUN:
+            raise ValueError(f"Referenced node {run_ref} is not a RUN node but {run_node_opcode}")
+        
+        # Extract run logs from the RUN node
+        stderr_file, stdout_file = self._extract_run_log_files(run_node, replay)
+        stderr_file_content = self._load_run_logs([f for f in [stdout_file] if f is not None], replay, "run log file", last_n_lines=self.LAST_N_ERROR_LINES)
+        diagnostics_file = run_node.get('contents', {}).get('diagnostics_file')
+        if diagnostics_file:
+            # The failures extracted from the output (see failure_extractors.py) instead of the raw log tails
+            run_logs_files = self._load_run_logs([diagnostics_file], replay, "diagnostics file")
+        else:
+            run_logs_files = self._load_run_logs([f for f in [stderr_file, stdout_file] if f is not None], replay, "stderr file", last_n_lines=self.LAST_N_ERROR_LINES)
+        logger.debug(f"Found attached run logs files: {run_logs_files}")
+
+        # Get relevant code files mentioned in the logs
+        # Use stderr for error analysis, but could be enhanced to use both
+        log_file_for_analysis = stderr_file if stderr_file else stdout_file            
+        relevant_code_files_contents = []
+        ro_files = [
+            "kernel_api_compute_operations.md",
+            "kernel_api_circular_buffers.md",
+            "example_compute_llk_where.cpp",
+            "tt-metal-kernel-apis.md",
+            "tt-metal-api-reference.xml",
+        ]
+        if log_file_for_analysis:
+            relevant_code_files, neighbour_files = self._get_relevant_code_files(
+                log_file_for_analysis, replay, run_node.get('contents', {}).get('diagnostics', []))
+            relevant_code_files_contents = self._load_files_from_directory(relevant_code_files, replay.code_dir, "code file")
+            # The files the editable ones include or import, for context
+            ro_files.extend(neighbour_files)
+
+            # strip writer, reader, lowered files from editable files
+            strip_files = ["tt_writer.cpp", "tt_reader.cpp", "test_lowered_{}.py"]
+            pop_idxs = []
+            for i, ref in enumerate(relevant_code_files_contents):
+                file_name = os.path.basename(ref.path)
+                if file_name in strip_files or file_name.startswith('test_lowered'):
+                    ro_files.append(relevant_code_files_contents[i].path)
+                    pop_idxs.append(i)
+
+            relevant_code_files_contents = [relevant_code_files_contents[i] for i in range(len(relevant_code_files_contents)) if i not in pop_idxs]
+
+        # Build the LLM request
+        return self._build_llm_request(run_logs_files, relevant_code_files_contents, ro_files, replay)
+
     # returns a tuple of two lists: [stderr_file, stdout_file]
     def _extract_run_log_files(self, run_node: dict, replay) -> tuple[str, str]:
         """Extract run logs from a RUN node."""
@@ -110,42 +161,40 @@ class FixNodeProcessor:
         
         return stderr_file, stdout_file
 
-    # returns a list of file names that are mentioned in the log file
-    def _get_relevant_code_files(self, log_file: str, replay) -> List[str]:
-        """Get code files that are mentioned in the run logs."""
-        # Get all file names from code folder
-        all: bool = True
+    # returns the files to edit and their include/import neighbours, relative to code_dir
+    def _get_relevant_code_files(self, log_file: str, replay, diagnostics: List[dict] = ()) -> tuple[List[str], List[str]]:
+        """
+        Get the code files a failed run is about, ranked by the code index (see code_index.py).
 
+        Files are matched by the diagnostics of the RUN node and, without any,
+        by the paths and symbols in the tail of its log. When nothing matches,
+        every top-level file of code_dir is sent so FIX still has something to edit.
+        """
         code_dir = replay.code_dir
-        run_logs_dir = replay.run_logs_dir
-        code_files = []        
+        code_index = getattr(replay, 'code_index', None)
+        if code_index is None:
+            code_index = replay.code_index = CodeIndex(code_dir)
+
+        log_content = ""
+        if not diagnostics:
+            try:
+                log_content = replay.run_logs.read(log_file, last_n_lines=self.LAST_N_ERROR_LINES)
+            except OSError as e:
+                logger.error(f"Error reading run log {log_file}: {e}")
+        selection = code_index.select(diagnostics, log_content)
+        if selection.editable:
+            logger.info(f"Selected code files {selection.editable} with neighbours {selection.neighbours}")
+            return selection.editable, selection.neighbours
 
+        code_files = []
         if os.path.exists(code_dir):
-            logger.debug(f"Found code files in {code_dir}")
             for file_name in os.listdir(code_dir):
-                logger.debug(f"Found code file: {file_name}")
-                if os.path.isfile(os.path.join(code_dir, file_name)):
-                    logger.debug(f"Its a file: {file_name}")
+                if os.path.isfile(os.path.join(code_dir, file_name)) and not file_name.startswith('.'):
                     code_files.append(file_name)
+        logger.info(f"No code files matched the run logs, sending all {len(code_files)} top-level files")
+        return code_files, []
 
-        code_files = [f for f in code_files if not f.startswith('.')] # exclude files/folders starting with .
-        if all:
-            return code_files
-
-        relevant_code_files = []
-        log_content = self._read_file_safely(os.path.join(run_logs_dir, log_file), last_n_lines=self.LAST_N_ERROR_LINES)
-        logger.debug(f"Log content: {log_content}")
-        for file_name in code_files:
-            logger.debug(f"Checking if {file_name} is in log content")
-            if file_name in log_content:
-                logger.debug(f"Found {file_name} in log content")
-                relevant_code_files.append(file_name)
-            else:
-                logger.debug(f"Did not find {file_name} in log content")
-        
-        return relevant_code_files
-
-    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str) -> List[FileReference]:
         """Load files from a directory and return FileReference objects."""
         files = []
         
@@ -155,7 +204,7 @@ class FixNodeProcessor:
             
             if os.path.exists(file_path):
                 try:
-                    content = self._read_file_safely(file_path, last_n_lines)
+                    content = self._read_file_safely(file_path)
                     files.append(FileReference(path=file_ref, content=content))
                     logger.info(f"Added {file_type} file: {file_ref}")
                 except Exception as e:
@@ -165,6 +214,22 @@ class FixNodeProcessor:
         
         return files
 
+    def _load_run_logs(self, log_refs: List[str], replay, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+        """Load run logs through the version's RunLogStore, which also finds the gzipped logs of earlier iterations."""
+        files = []
+
+        for log_ref in log_refs:
+            if replay.run_logs.path(log_ref) is None:
+                logger.warning(f"{file_type.title()} not found: {os.path.join(replay.run_logs_dir, log_ref)}")
+                continue
+            try:
+                files.append(FileReference(path=log_ref, content=replay.run_logs.read(log_ref, last_n_lines)))
+                logger.info(f"Added {file_type}: {log_ref}")
+            except Exception as e:
+                logger.error(f"Error reading {file_type} {log_ref}: {e}")
+
+        return files
+
     def _build_llm_request(self, run_logs_files: List[FileReference], code_files: List[FileReference], ro_files: List[FileReference], replay) -> LLMRequest:
         """Build the LLM request for analysis."""
         prompt = """
@@ -186,8 +251,45 @@ class FixNodeProcessor:
         json_end = response.rfind("}")
         return json.loads(response[json_start:json_end + 1])
 
-    def _send_llm_request(self, replay, llm_request: LLMRequest) -> Dict[str, Any]:
+    def _send_llm_request(self, replay, llm_request: LLMRequest, on_file=None) -> Dict[str, Any]:
         """Send the LLM request and return the parsed response using the configured backend."""
+        kwargs = self._fix_request_kwargs(replay, llm_request)
+        if on_file is not None and getattr(replay.llm_backend, 'stream', False):
+            kwargs['on_file'] = on_file
+        return replay.llm_backend.send_fix_request(**kwargs)
+
+    def _session_branch(self, replay, node: dict, suffix: str = ""):
+        """
+        Keep the conversation of a DEBUG_LOOP's FIX iterations in its own branch, for
+        clients that hold sessions (see ClaudeCodeClientWrapper.session_branch).
+        """
+        session_branch = getattr(replay.client, 'session_branch', None)
+        if session_branch is None:
+            return contextlib.nullcontext()
+        return session_branch(f"fix_{node.get('id', 'UNKNOWN')}{suffix}")
+
+    def _streamed_file_saver(self, replay):
+        """
+        Return an on_file callback that writes streamed files to code_dir.
+        
+        Streaming backends don't repeat the files handed to on_file in the response.
+        """
+        def save(file_data: Dict[str, Any]) -> None:
+            file_path = file_data.get('path_and_filename', '')
+            file_content = file_data.get('contents', '')
+            if file_path and file_content:
+                self._save_generated_file(file_path, file_content, replay.code_dir)
+        return save
+
+    async def _send_llm_request_async(self, replay, llm_request: LLMRequest, on_file=None) -> Dict[str, Any]:
+        """Async variant of _send_llm_request."""
+        kwargs = self._fix_request_kwargs(replay, llm_request)
+        if on_file is not None and getattr(replay.llm_backend, 'stream', False):
+            kwargs['on_file'] = on_file
+        return await replay.llm_backend.send_fix_request_async(**kwargs)
+
+    def _fix_request_kwargs(self, replay, llm_request: LLMRequest) -> Dict[str, Any]:
+        """Build the backend-specific arguments for send_fix_request."""
         logger.info(f"⚒️ Sending FIX request to LLM with {len(llm_request.run_logs_files)} run logs files and {len(llm_request.code_to_edit)} code files")
         
         # Use the backend to send the fix request
@@ -195,7 +297,7 @@ class FixNodeProcessor:
             raise RuntimeError("Replay instance must have a configured llm_backend. This indicates a configuration error.")
         
         if replay.llm_backend_name == "claude_code":
-            return replay.llm_backend.send_fix_request(
+            return dict(
                 run_logs_files=llm_request.run_logs_files,
                 code_files=llm_request.code_to_edit,
                 read_only_files=llm_request.read_only_files,
@@ -203,7 +305,7 @@ class FixNodeProcessor:
                 replay_dir=replay.replay_dir
             )
         elif replay.llm_backend_name == "anthropic_api":
-            return replay.llm_backend.send_fix_request(
+            return dict(
                 run_logs_files=llm_request.run_logs_files,
                 code_files=llm_request.code_to_edit,
                 memory=llm_request.memory,
@@ -228,13 +330,7 @@ sfpi::vFloat one = sfpi::vFloat(1.0f);  // Convert to vFloat first
 
     def _process_generic_llm_response(self, response_data: Dict[str, Any], replay) -> None:
         """Process the LLM response and save generated files."""
-        if 'files' in response_data:
-            for file_data in response_data['files']:
-                file_path = file_data.get('path_and_filename', '')
-                file_content = file_data.get('contents', '')
-                
-                if file_path and file_content:
-                    self._save_generated_file(file_path, file_content, replay.code_dir)
+        self._save_response_files(response_data, replay.code_dir)
         if 'memory' in response_data:
             replay.state.execution.memory = response_data['memory']
             logger.info(f"🧠 Updated memory: \n{replay.state.execution.memory}")
@@ -244,6 +340,19 @@ sfpi::vFloat one = sfpi::vFloat(1.0f);  // Convert to vFloat first
             if hasattr(replay.llm_backend, 'process_commands_in_response'):
                 replay.llm_backend.process_commands_in_response(response_data, replay)
 
+    def _save_response_files(self, response_data: Dict[str, Any], code_dir: str) -> List[str]:
+        """Save the files of an LLM response into code_dir and return their paths."""
+        saved = []
+        if 'files' in response_data:
+            for file_data in response_data['files']:
+                file_path = file_data.get('path_and_filename', '')
+                file_content = file_data.get('contents', '')
+                
+                if file_path and file_content:
+                    self._save_generated_file(file_path, file_content, code_dir)
+                    saved.append(file_path)
+        return saved
+
     def _save_generated_file(self, file_path: str, content: str, code_dir: str) -> None:
         """Save a generated file to the code directory."""
         full_path = os.path.join(code_dir, file_path)
@@ -262,14 +371,11 @@ sfpi::vFloat one = sfpi::vFloat(1.0f);  // Convert to vFloat first
             logger.error(f"Error saving generated file {full_path}: {e}")
             raise     
 
-    def _read_file_safely(self, file_path: str, last_n_lines: int = None) -> str:
+    def _read_file_safely(self, file_path: str) -> str:
         """Read a file safely with proper encoding handling."""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                if last_n_lines is not None:
-                    return '\n'.join(f.readlines()[-last_n_lines:])
-                else:
-                    return f.read()
+                return f.read()
         except Exception as e:
             logger.error(f"Error reading file {file_path}: {e}")
             return ""
@@ -33,12 +33,23 @@ class PromptNodeProcessor:
         node_data = self._extract_node_data_for_generic_prompt(replay, node)
         llm_request = self._build_generic_llm_request(node_data, replay)
         
-        # Send request to LLM
-        response_data = self._send_generic_llm_request(replay, node_data, llm_request)
+        # Send request to LLM; when streaming, files are saved as soon as they arrive
+        response_data = self._send_generic_llm_request(replay, node_data, llm_request,
+                                                       on_file=self._streamed_file_saver(replay))
         
         # Process and save response
         self._process_generic_llm_response(response_data, replay)
 
+    async def process_generic_prompt_async(self, replay, node):
+        """Process a generic prompt, awaiting the LLM request."""
+        node_data = self._extract_node_data_for_generic_prompt(replay, node)
+        llm_request = self._build_generic_llm_request(node_data, replay)
+        
+        response_data = await self._send_generic_llm_request_async(replay, node_data, llm_request,
+                                                                   on_file=self._streamed_file_saver(replay))
+        
+        self._process_generic_llm_response(response_data, replay)
+
     def process(self, replay, node: dict) -> None:
         """
         Process a PROMPT node by sending the prompt to the LLM and saving the response.
@@ -59,6 +70,22 @@ class PromptNodeProcessor:
             logger.error(f"Error processing PROMPT node {node}: {e}")
             raise
 
+    async def process_async(self, replay, node: dict) -> None:
+        """
+        Async variant of process; the LLM round trip doesn't block the event loop.
+        
+        Args:
+            replay: The replay instance containing state and client
+            node: The node data dictionary to process
+        """
+        try:
+            logger.info(f"Processing PROMPT node {node}")
+            await self.process_generic_prompt_async(replay, node)
+            logger.info(f"Successfully processed PROMPT node {node}")
+        except Exception as e:
+            logger.error(f"Error processing PROMPT node {node}: {e}")
+            raise
+
     def _extract_node_data_for_generic_prompt(self, replay, node: dict) -> Dict[str, Any]:
         """Extract data from the node."""
         contents = node.get('contents', {})
@@ -79,7 +106,7 @@ class PromptNodeProcessor:
             node_data['docs_refs'], 
             node_data['template_refs'], 
             node_data['run_logs_refs'],
-            replay.replay_dir
+            replay
         )
         
         return LLMRequest(
@@ -94,9 +121,10 @@ class PromptNodeProcessor:
         """Load code files that can be edited."""
         return self._load_files_from_directory(code_refs, code_dir, "code file")
 
-    def _load_read_only_files(self, docs_refs: List[str], template_refs: List[str], run_logs_refs: List[str], base_dir: str) -> List[FileReference]:
-        """Load read-only files (docs and templates)."""
+    def _load_read_only_files(self, docs_refs: List[str], template_refs: List[str], run_logs_refs: List[str], replay) -> List[FileReference]:
+        """Load read-only files (docs, templates and run logs)."""
         all_files = []
+        base_dir = replay.replay_dir
         
         # Load docs files from the docs subdirectory
         docs_dir = os.path.join(base_dir, "docs")
@@ -108,14 +136,13 @@ class PromptNodeProcessor:
         template_files = self._load_files_from_directory(template_refs, template_dir, "template file")
         all_files.extend(template_files)
         
-        # Load run logs files from the run_logs subdirectory
-        run_logs_dir = os.path.join(base_dir, "run_logs")
-        run_logs_files = self._load_files_from_directory(run_logs_refs, run_logs_dir, "run logs file", last_n_lines=100)
+        # Load run logs files from the run log store
+        run_logs_files = self._load_run_logs(run_logs_refs, replay, "run logs file", last_n_lines=100)
         all_files.extend(run_logs_files)
         
         return all_files
 
-    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str) -> List[FileReference]:
         """Load files from a directory and return FileReference objects."""
         files = []
         
@@ -124,7 +151,7 @@ class PromptNodeProcessor:
             
             if os.path.exists(file_path):
                 try:
-                    content = self._read_file_safely(file_path, last_n_lines)
+                    content = self._read_file_safely(file_path)
                     files.append(FileReference(path=file_ref, content=content))
                     logger.info(f"Added {file_type} to edit: {file_ref}")
                 except Exception as e:
@@ -134,13 +161,26 @@ class PromptNodeProcessor:
         
         return files
 
-    def _read_file_safely(self, file_path: str, last_n_lines: int = None) -> str:
-        """Read a file safely with proper encoding handling."""        
+    def _load_run_logs(self, log_refs: List[str], replay, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+        """Load run logs through the version's RunLogStore, which also finds the gzipped logs of earlier iterations."""
+        files = []
+
+        for log_ref in log_refs:
+            if replay.run_logs.path(log_ref) is None:
+                logger.warning(f"{file_type.title()} not found: {os.path.join(replay.run_logs_dir, log_ref)}")
+                continue
+            try:
+                files.append(FileReference(path=log_ref, content=replay.run_logs.read(log_ref, last_n_lines)))
+                logger.info(f"Added {file_type}: {log_ref}")
+            except Exception as e:
+                logger.error(f"Error reading {file_type} {log_ref}: {e}")
+
+        return files
+
+    def _read_file_safely(self, file_path: str) -> str:
+        """Read a file safely with proper encoding handling."""
         with open(file_path, 'r', encoding='utf-8') as f:
-            if last_n_lines is not None:
-                return '\n'.join(f.readlines()[-last_n_lines:])
-            else:
-                return f.read()
+            return f.read()
             
     def _get_client_instructions(self, replay_dir: str) -> str:
         """Load client instructions from the replay directory."""
@@ -162,8 +202,35 @@ class PromptNodeProcessor:
         except:
             return {}
 
-    def _send_generic_llm_request(self, replay, node_data: Dict[str, Any], llm_request: LLMRequest) -> Dict[str, Any]:
+    def _send_generic_llm_request(self, replay, node_data: Dict[str, Any], llm_request: LLMRequest, on_file=None) -> Dict[str, Any]:
         """Send the LLM request and return the parsed response using the configured backend."""
+        kwargs = self._prompt_request_kwargs(replay, llm_request)
+        if on_file is not None and getattr(replay.llm_backend, 'stream', False):
+            kwargs['on_file'] = on_file
+        return replay.llm_backend.send_prompt_request(**kwargs)
+
+    def _streamed_file_saver(self, replay):
+        """
+        Return an on_file callback that writes streamed files to code_dir.
+        
+        Streaming backends don't repeat the files handed to on_file in the response.
+        """
+        def save(file_data: Dict[str, Any]) -> None:
+            file_path = file_data.get('path_and_filename', '')
+            file_content = file_data.get('contents', '')
+            if file_path and file_content:
+                self._save_generated_file(file_path, file_content, replay.code_dir)
+        return save
+
+    async def _send_generic_llm_request_async(self, replay, node_data: Dict[str, Any], llm_request: LLMRequest, on_file=None) -> Dict[str, Any]:
+        """Async variant of _send_generic_llm_request."""
+        kwargs = self._prompt_request_kwargs(replay, llm_request)
+        if on_file is not None and getattr(replay.llm_backend, 'stream', False):
+            kwargs['on_file'] = on_file
+        return await replay.llm_backend.send_prompt_request_async(**kwargs)
+
+    def _prompt_request_kwargs(self, replay, llm_request: LLMRequest) -> Dict[str, Any]:
+        """Build the backend-specific arguments for send_prompt_request."""
         logger.info(
             f"📝 Sending PROMPT request to LLM with {len(llm_request.code_to_edit)} code files "
             f"and {len(llm_request.read_only_files)} read-only files"
@@ -174,7 +241,7 @@ class PromptNodeProcessor:
             raise RuntimeError("Replay instance must have a configured llm_backend. This indicates a configuration error.")
         
         if replay.llm_backend_name == "claude_code":
-            return replay.llm_backend.send_prompt_request(
+            return dict(
                 prompt=llm_request.prompt,
                 code_files=llm_request.code_to_edit,
                 read_only_files=llm_request.read_only_files,
@@ -182,7 +249,7 @@ class PromptNodeProcessor:
                 replay_dir=replay.replay_dir
             )
         elif replay.llm_backend_name == "anthropic_api":
-            return replay.llm_backend.send_prompt_request(
+            return dict(
                 prompt=llm_request.prompt,
                 code_files=llm_request.code_to_edit,
                 read_only_files=llm_request.read_only_files,
@@ -1,7 +1,12 @@
 import os
-import subprocess
+import time
 import logging
-from datetime import datetime
+
+from core.backend import jobserver
+from core.backend.limits import RUN_LIMIT, run_limits_for
+from core.backend.run_log_store import RunRecord
+from core.backend.processors.run_output import RunOutput, run_streaming, run_streaming_async
+from core.backend.processors.failure_extractors import extract_failures, format_diagnostics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -16,13 +21,19 @@ class RunNodeProcessor:
     
     Key responsibilities:
     - Execute shell commands in the specified working directory
-    - Capture stdout and stderr streams
+    - Stream stdout and stderr to log files, keeping only their tails in memory
+    - Stop the command at the first line matching a @fail_fast: pattern
+    - Kill the command's process group once it runs past its @timeout:, and
+      cap its CPU time and memory (@cpu_limit:, @memory_limit:)
+    - Take a build slot from the shared jobserver, if one is configured
     - Record exit codes for conditional branching
-    - Save command output to timestamped log files
+    - Extract structured failures (pytest, JUnit XML, compiler, CMake, tracebacks)
+      from the output of failed commands, for FIX
+    - Save command output to log files named by node and iteration
     - Update replay memory with execution results
     
-    The processor saves all command output to timestamped files in the run_logs directory
-    for later analysis and debugging.
+    The processor saves all command output to the replay's RunLogStore (the run_logs
+    directory), which indexes every run for later analysis and debugging.
     """
     
     def process(self, replay, node: dict) -> None:
@@ -30,8 +41,8 @@ class RunNodeProcessor:
         Process a RUN node by executing the specified command.
         
         This method extracts the command from the node contents, executes it in the
-        replay's code directory, and captures all output. The results are saved to
-        log files and the node contents are updated with the exit code and file paths.
+        replay's code directory and streams its output to log files. The node
+        contents are updated with the exit code and file paths.
         
         Args:
             replay: The Replay instance containing execution state and directories
@@ -41,71 +52,164 @@ class RunNodeProcessor:
             ValueError: If no command is found in the node contents
             
         Side Effects:
-            - Updates node contents with exit_code, stdout_file, stderr_file
-            - Creates timestamped log files in replay.run_logs_dir
+            - Updates node contents with exit_code, stdout_file, stderr_file, timed_out and rusage
+            - Creates log files and an index record in replay.run_logs
             - Updates replay.state.execution.memory with execution results
         """
         node_id = node.get('id', 'UNKNOWN')
-        
-        # Get the command from node contents
         contents = node['contents']
-        command_to_run = contents.get('command', '')
-        if not command_to_run:
-            raise ValueError(f"No command found in node contents: {node_id}")      
-            
-        logger.info(f"Running command {node_id}: \n{command_to_run} \nin {replay.code_dir}")
+        command_to_run = self._get_command(node)
         
         # Run the command and capture the exit code
         try:
             logger.info(f"🧑‍💻 Running command {node_id}: \n{command_to_run} \nin {replay.code_dir}")
-            result = subprocess.run(command_to_run, shell=True, cwd=replay.code_dir, 
-                                  capture_output=True, text=True)
-            exit_code = result.returncode
-            
-            # Store the exit code in node contents
-            contents['exit_code'] = exit_code
+            run = replay.run_logs.start(node_id)
+            stdout_path, stderr_path = replay.run_logs.log_paths(run)
+            with RUN_LIMIT:
+                output = run_streaming(command_to_run, replay.code_dir, stdout_path, stderr_path,
+                                       fail_fast=contents.get('fail_fast', ()), limits=run_limits_for(contents),
+                                       jobserver=jobserver.JOBSERVER)
+            self._record_result(replay, node, command_to_run, output, run)
             
-            def write_to_file(result_text: str, node: dict, suffix: str) -> str:
-                """
-                Write command output to a timestamped file.
-                
-                Args:
-                    result_text (str): The command output to write
-                    node (dict): The node being processed (for filename generation)
-                    suffix (str): File suffix ('stdout' or 'stderr')
-                    
-                Returns:
-                    str: The filename of the created file (relative to run_logs_dir)
-                """
-                now = datetime.now().strftime("%H-%M-%S-%f")
-                file_name = f"{os.path.basename(str(node_id))}_{suffix}_{now}.txt"                
-                file_path = os.path.join(replay.run_logs_dir, file_name)
-                with open(file_path, "w") as f:
-                    f.write(result_text)
-                
-                logger.debug(f"Wrote {suffix} to file: {file_path}")
-                logger.debug(f"Contents of {suffix} file: \n{result_text}")
-
-                return file_name
-
-            # Save stdout if not empty
-            if result.stdout.strip() != "":
-                file_path = write_to_file(result.stdout, node, "stdout")
-                contents['stdout_file'] = file_path
+        except Exception as e:
+            logger.error(f"Error running command': {e}")
+            contents['exit_code'] = -1
 
-            # Save stderr if not empty
-            if result.stderr.strip() != "":
-                file_path = write_to_file(result.stderr, node, "stderr")
-                contents['stderr_file'] = file_path  
-            
-            # Update replay memory with execution results
-            if exit_code != 0:
-                replay.state.execution.memory.append(f"Command `{command_to_run}` failed with exit code {exit_code}. Stderr file: {file_path}")
-            else:
-                replay.state.execution.memory.append(f"Command `{command_to_run}` completed successfully")
+    async def process_async(self, replay, node: dict) -> None:
+        """
+        Async variant of process.
+        
+        The command runs on a worker thread, so the event loop keeps serving
+        other Replay instances while it executes.
+        
+        Args:
+            replay: The Replay instance containing execution state and directories
+            node (dict): The RUN node containing the command to execute
             
-            logger.info(f"Command completed with exit code: {exit_code}")
+        Raises:
+            ValueError: If no command is found in the node contents
+        """
+        node_id = node.get('id', 'UNKNOWN')
+        contents = node['contents']
+        command_to_run = self._get_command(node)
+        
+        try:
+            logger.info(f"🧑‍💻 Running command {node_id}: \n{command_to_run} \nin {replay.code_dir}")
+            run = replay.run_logs.start(node_id)
+            stdout_path, stderr_path = replay.run_logs.log_paths(run)
+            async with RUN_LIMIT:
+                output = await run_streaming_async(command_to_run, replay.code_dir, stdout_path, stderr_path,
+                                                   fail_fast=contents.get('fail_fast', ()),
+                                                   limits=run_limits_for(contents), jobserver=jobserver.JOBSERVER)
+            self._record_result(replay, node, command_to_run, output, run)
             
         except Exception as e:
             logger.error(f"Error running command': {e}")
-            contents['exit_code'] = -1
\ No newline at end of file
+            contents['exit_code'] = -1
+
+    def _get_command(self, node: dict) -> str:
+        """Return the command of a RUN node, raising ValueError if it has none."""
+        node_id = node.get('id', 'UNKNOWN')
+        command_to_run = node['contents'].get('command', '')
+        if not command_to_run:
+            raise ValueError(f"No command found in node contents: {node_id}")      
+        return command_to_run
+
+    def _record_result(self, replay, node: dict, command_to_run: str, output: RunOutput, run: RunRecord) -> None:
+        """
+        Store the outcome of a command on the node, in the run log index and in replay memory.
+        
+        Args:
+            replay: The Replay instance containing execution state and directories
+            node (dict): The RUN node that was executed
+            command_to_run (str): The command that was executed
+            output (RunOutput): Exit code and output streams of the command
+            run (RunRecord): The run allocated in replay.run_logs
+        """
+        contents = node['contents']
+        exit_code = output.exit_code
+        fail_fast_match = output.fail_fast_match
+        contents['rusage'] = output.rusage
+        contents['timed_out'] = output.timed_out
+        if output.timed_out:
+            # Same exit code as timeout(1)
+            exit_code = 124
+            fail_fast_match = None
+            contents.pop('fail_fast_match', None)
+        elif fail_fast_match is not None:
+            # The command was stopped (or printed the error last): it failed either way
+            exit_code = 1
+            contents['fail_fast_match'] = fail_fast_match
+        else:
+            contents.pop('fail_fast_match', None)
+        
+        # Store the exit code in node contents
+        contents['exit_code'] = exit_code
+        
+        # Keep log files with output; blank ones are removed
+        file_path = None
+        for suffix, sink in (("stdout", output.stdout), ("stderr", output.stderr)):
+            setattr(run, f'{suffix}_bytes', sink.size)
+            if sink.is_blank:
+                os.remove(sink.path)
+                contents.pop(f'{suffix}_file', None)
+                setattr(run, f'{suffix}_file', None)
+                continue
+            file_path = contents[f'{suffix}_file'] = os.path.basename(sink.path)
+            logger.debug(f"Wrote {sink.size} bytes of {suffix} to file: {sink.path}")
+        run.exit_code = exit_code
+        run.timed_out = output.timed_out
+        run.duration = output.rusage['wall_seconds'] if output.rusage else None
+        self._record_diagnostics(replay, node, command_to_run, exit_code, run)
+        replay.run_logs.finish(run)
+        if not output.stderr.is_blank:
+            logger.debug(f"Tail of stderr: \n{output.stderr.tail.text()[-2000:]}")
+        
+        # Update replay memory with execution results
+        if output.timed_out:
+            timeout = run_limits_for(contents).timeout
+            replay.state.execution.memory.append(f"Command `{command_to_run}` timed out after {timeout:g}s and was killed. Stderr file: {file_path}")
+        elif fail_fast_match is not None:
+            replay.state.execution.memory.append(f"Command `{command_to_run}` was stopped at the first error: {fail_fast_match}. Stderr file: {file_path}")
+        elif exit_code != 0:
+            replay.state.execution.memory.append(f"Command `{command_to_run}` failed with exit code {exit_code}. Stderr file: {file_path}")
+        else:
+            replay.state.execution.memory.append(f"Command `{command_to_run}` completed successfully")
+        
+        logger.info(f"Command completed with exit code: {exit_code}")
+
+    def _record_diagnostics(self, replay, node: dict, command_to_run: str, exit_code: int, run: RunRecord) -> None:
+        """
+        Store the failures found in the output of a failed command on the node.
+        
+        The diagnostics are kept in contents['diagnostics'] and, formatted for
+        FIX, in a <node>_<iteration>_diagnostics.txt run log (contents['diagnostics_file']).
+        
+        Args:
+            replay: The Replay instance containing execution state and directories
+            node (dict): The RUN node that was executed
+            command_to_run (str): The command that was executed
+            exit_code (int): Exit code recorded for the command
+            run (RunRecord): The run allocated in replay.run_logs
+        """
+        contents = node['contents']
+        contents.pop('diagnostics', None)
+        contents.pop('diagnostics_file', None)
+        if exit_code == 0:
+            return
+        try:
+            log_paths = [os.path.join(replay.run_logs.root, name) for name in (run.stdout_file, run.stderr_file) if name]
+            junit_path = os.path.join(replay.code_dir, contents['junit']) if contents.get('junit') else None
+            if junit_path and os.path.exists(junit_path) and os.path.getmtime(junit_path) < time.time() - (run.duration or 0) - 1:
+                # Left over from an earlier run; this one failed before writing its report
+                junit_path = None
+            diagnostics = extract_failures(log_paths, junit_path)
+        except Exception as e:
+            logger.warning(f"Failure extraction for `{command_to_run}` failed: {e}")
+            return
+        if not diagnostics:
+            return
+        contents['diagnostics'] = [diagnostic.to_dict() for diagnostic in diagnostics]
+        contents['diagnostics_file'] = replay.run_logs.attach(run, "diagnostics",
+                                                              format_diagnostics(command_to_run, exit_code, diagnostics))
+        logger.info(f"Extracted {len(diagnostics)} failures from the output of `{command_to_run}`")
@@ -0,0 +1,271 @@
+import os
+import re
+import time
+import signal
+import asyncio
+import logging
+import threading
+import subprocess
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Optional, Pattern, Sequence
+
+from core.backend.limits import RunLimits
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+TAIL_BYTES = 64 * 1024
+MAX_LINE_BYTES = 64 * 1024  # Of longer lines only the end is matched against fail-fast patterns
+
+
+class TailBuffer:
+    """
+    The last max_bytes bytes written to it, in a fixed-size ring.
+
+    Example:
+        tail = TailBuffer(4)
+        tail.write(b"abcdef")
+        tail.getvalue()  # b"cdef"
+    """
+
+    __slots__ = ("_ring", "_end", "_full")
+
+    def __init__(self, max_bytes: int = TAIL_BYTES):
+        self._ring = bytearray(max_bytes)
+        self._end = 0
+        self._full = False
+
+    def write(self, data: bytes) -> None:
+        size = len(self._ring)
+        if len(data) >= size:
+            self._ring[:] = data[-size:]
+            self._end, self._full = 0, True
+            return
+        first = min(len(data), size - self._end)
+        self._ring[self._end:self._end + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+        if self._end + len(data) >= size:
+            self._full = True
+        self._end = (self._end + len(data)) % size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._ring)
+
+    def getvalue(self) -> bytes:
+        if not self._full:
+            return bytes(self._ring[:self._end])
+        return bytes(self._ring[self._end:] + self._ring[:self._end])
+
+    def text(self) -> str:
+        return self.getvalue().decode(errors="replace")
+
+
+def compile_fail_fast(patterns: Sequence[str]) -> Optional[Pattern[bytes]]:
+    """One regular expression matching output lines that any of the patterns match, None without patterns."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns).encode())
+
+
+class OutputSink:
+    """
+    Destination of one output stream of a command.
+
+    Chunks go straight to the log file and into a TailBuffer, so memory use
+    doesn't grow with the output. Complete lines are matched against the
+    fail-fast pattern; the first matching line is kept in match.
+    """
+
+    def __init__(self, path: str, fail_fast: Optional[Pattern[bytes]] = None, tail_bytes: int = TAIL_BYTES):
+        self.path = path
+        self.file = open(path, "wb")
+        self.tail = TailBuffer(tail_bytes)
+        self.size = 0
+        self.fail_fast = fail_fast
+        self.match: Optional[str] = None
+        self._partial = b""
+
+    def feed(self, data: bytes) -> bool:
+        """Write a chunk; True if it completed the first line matching the fail-fast pattern."""
+        self.file.write(data)
+        self.tail.write(data)
+        self.size += len(data)
+        if self.fail_fast is None or self.match is not None:
+            return False
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()[-MAX_LINE_BYTES:]
+        for line in lines:
+            if self.fail_fast.search(line):
+                self.match = line.decode(errors="replace").strip()
+                return True
+        return False
+
+    def close(self) -> None:
+        if self._partial and self.fail_fast is not None and self.match is None and self.fail_fast.search(self._partial):
+            self.match = self._partial.decode(errors="replace").strip()
+        self.file.close()
+
+    @property
+    def is_blank(self) -> bool:
+        """Whether nothing but whitespace was written (judged from the tail for long output)."""
+        return self.size <= self.tail.capacity and not self.tail.getvalue().strip()
+
+
+@dataclass
+class RunOutput:
+    """Outcome of a streamed command."""
+    exit_code: int
+    stdout: OutputSink
+    stderr: OutputSink
+    timed_out: bool = False
+    rusage: Optional[dict] = None
+
+    @property
+    def fail_fast_match(self) -> Optional[str]:
+        return self.stderr.match or self.stdout.match
+
+
+def kill_group(pid: int) -> None:
+    """Kill the command's shell and everything it started."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def limit_command(command: str, limits: RunLimits) -> str:
+    """
+    Prefix a shell command with ulimit calls for the rlimits in limits.
+
+    The limits are set by the shell itself rather than in a preexec_fn,
+    which isn't safe while other threads run, and apply to every process
+    the command starts.
+    """
+    lines = []
+    if limits.cpu_limit:
+        lines.append(f"ulimit -t {int(limits.cpu_limit)}")
+    if limits.memory_limit:
+        lines.append(f"ulimit -v {max(1, int(limits.memory_limit) // 1024)}")
+    return "\n".join(lines + [command])
+
+
+def _rusage(usage, wall_seconds: float) -> dict:
+    """The resource use of a reaped command, as stored on its RUN node."""
+    return {
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "max_rss_kb": usage.ru_maxrss,
+    }
+
+
+def run_streaming(command: str, cwd: str, stdout_path: str, stderr_path: str,
+                  fail_fast: Sequence[str] = (), limits: Optional[RunLimits] = None, jobserver=None,
+                  tail_bytes: int = TAIL_BYTES, on_start: Optional[Callable[[int], None]] = None) -> RunOutput:
+    """
+    Run a shell command, streaming its output to log files.
+
+    The command runs in its own process group. When a line of either
+    stream matches a fail-fast pattern, or the command runs past its
+    timeout, the whole group is killed, so a build stops at its first error
+    and a hung test doesn't block the epic.
+
+    Args:
+        command: Shell command
+        cwd: Working directory
+        stdout_path: Log file for stdout
+        stderr_path: Log file for stderr
+        fail_fast: Regular expressions for lines that abort the command
+        limits: Wall-clock timeout and CPU and memory rlimits
+        jobserver: Jobserver to take a build slot from and hand to make (see core.backend.jobserver)
+        tail_bytes: Bytes of each stream kept in memory
+        on_start: Called with the id of the command's process group once it started, e.g. to kill_group it later
+
+    Returns:
+        RunOutput: Exit code, the two sinks (tails, sizes, fail-fast match), whether it timed out and its rusage
+    """
+    limits = limits or RunLimits()
+    with jobserver.slot() if jobserver is not None else nullcontext():
+        return _run_streaming(limit_command(command, limits), cwd, stdout_path, stderr_path, fail_fast,
+                              limits.timeout, jobserver, tail_bytes, on_start)
+
+
+def _run_streaming(command: str, cwd: str, stdout_path: str, stderr_path: str, fail_fast: Sequence[str],
+                   timeout: Optional[float], jobserver, tail_bytes: int,
+                   on_start: Optional[Callable[[int], None]]) -> RunOutput:
+    pattern = compile_fail_fast(fail_fast)
+    sinks = [OutputSink(stdout_path, pattern, tail_bytes), OutputSink(stderr_path, pattern, tail_bytes)]
+    started = time.monotonic()
+    try:
+        proc = subprocess.Popen(command, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                start_new_session=True,
+                                env=jobserver.environ() if jobserver is not None else None,
+                                pass_fds=jobserver.fds if jobserver is not None else ())
+    except BaseException:
+        for sink in sinks:
+            sink.close()
+        raise
+    killed = threading.Event()
+    timed_out = threading.Event()
+
+    def expire() -> None:
+        if not killed.is_set():
+            killed.set()
+            timed_out.set()
+            logger.info(f"Command timed out after {timeout}s, stopping it")
+            kill_group(proc.pid)
+
+    watchdog = threading.Timer(timeout, expire) if timeout else None
+
+    def pump(pipe, sink: OutputSink) -> None:
+        with pipe:
+            while True:
+                data = pipe.read1(CHUNK_SIZE)
+                if not data:
+                    break
+                if sink.feed(data) and not killed.is_set():
+                    killed.set()
+                    logger.info(f"Fail-fast pattern matched, stopping command: {sink.match}")
+                    kill_group(proc.pid)
+
+    readers = [threading.Thread(target=pump, args=(pipe, sink), daemon=True)
+               for pipe, sink in zip((proc.stdout, proc.stderr), sinks)]
+    try:
+        if on_start is not None:
+            on_start(proc.pid)
+        if watchdog is not None:
+            watchdog.daemon = True
+            watchdog.start()
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        # Reap the shell ourselves to get the resource use of it and everything it waited for
+        _, status, usage = os.wait4(proc.pid, 0)
+        exit_code = proc.returncode = os.waitstatus_to_exitcode(status)
+    except BaseException:
+        kill_group(proc.pid)
+        proc.wait()
+        raise
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        for sink in sinks:
+            sink.close()
+    return RunOutput(exit_code, *sinks, timed_out=timed_out.is_set(),
+                     rusage=_rusage(usage, time.monotonic() - started))
+
+
+async def run_streaming_async(command: str, cwd: str, stdout_path: str, stderr_path: str,
+                              fail_fast: Sequence[str] = (), limits: Optional[RunLimits] = None, jobserver=None,
+                              tail_bytes: int = TAIL_BYTES, on_start: Optional[Callable[[int], None]] = None) -> RunOutput:
+    """
+    Async variant of run_streaming.
+
+    The command runs on a worker thread: reaping it with wait4 for its rusage
+    can't share the child with asyncio's child watcher, and waiting for a
+    jobserver slot blocks.
+    """
+    return await asyncio.to_thread(run_streaming, command, cwd, stdout_path, stderr_path,
+                                   fail_fast, limits, jobserver, tail_bytes, on_start)
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    prompt_file TEXT,
+    llm_backend TEXT,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    version INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    node_id TEXT,
+    opcode TEXT,
+    duration REAL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (version, step)
+);
+CREATE INDEX IF NOT EXISTS versions_status ON versions (status);
+"""
+
+FINISHED = "finished_running_program"
+
+
+@dataclass
+class VersionRecord:
+    """One row of the versions table."""
+    version: int
+    status: str
+    prompt_file: Optional[str]
+    llm_backend: Optional[str]
+    step_count: int
+    created_at: float
+    updated_at: float
+    finished_at: Optional[float]
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds from creation to finish, or to the last update for unfinished versions."""
+        return (self.finished_at if self.finished_at is not None else self.updated_at) - self.created_at
+
+
+class ProjectIndex:
+    """
+    SQLite manifest of the versions of a project.
+
+    Lives in <project_dir>/replay/index.sqlite and is updated in one
+    transaction when a version is allocated, after every step and when the
+    status changes, so finding the next or latest version and reporting on
+    all versions never has to list the project directory or load any
+    replay_state.json. An index that doesn't exist yet is built once from the
+    version directories already on disk.
+
+    Example:
+        index = ProjectIndex("replay_output/cosh")
+        version = index.allocate_version(prompt_file="prompt.txt", llm_backend="claude_code")
+        index.record_step(version, 1, "prompt_1", "PROMPT", duration=12.5)
+        index.set_status(version, "finished_running_program")
+    """
+
+    def __init__(self, project_dir: str):
+        """
+        Open (and if needed create) the index of a project.
+
+        Args:
+            project_dir: Directory holding the numbered version directories
+        """
+        self.project_dir = project_dir
+        self.path = os.path.join(project_dir, "replay", "index.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        is_new = not os.path.exists(self.path)
+        # Steps may be completed on scheduler threads; all access goes through the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if is_new:
+            self.rebuild()
+
+    def _transaction(self, statements) -> None:
+        """Run (sql, params) pairs in one write transaction."""
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so concurrent processes allocating versions serialize
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def rebuild(self) -> int:
+        """
+        Re-create the versions table from the version directories on disk.
+
+        Returns:
+            int: Number of versions found
+        """
+        statements = [("DELETE FROM versions", ())]
+        found = 0
+        for name in os.listdir(self.project_dir):
+            if not name.isdigit():
+                continue
+            statements.append(self._row_from_disk(name, replace=False))
+            found += 1
+        self._transaction(statements)
+        logger.info(f"Indexed {found} existing versions of {self.project_dir}")
+        return found
+
+    def index_version(self, version: str) -> None:
+        """Replace the row of a version with what its directory on disk records."""
+        self._transaction([self._row_from_disk(version, replace=True)])
+
+    def _row_from_disk(self, version: str, replace: bool):
+        version_dir = os.path.join(self.project_dir, version)
+        state = _read_state(version_dir)
+        created = os.path.getctime(version_dir)
+        status = state.get("status", "uninitialized")
+        return (
+            f"INSERT {'OR REPLACE ' if replace else ''}INTO versions "
+            "(version, status, prompt_file, step_count, created_at, updated_at, finished_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (int(version), status, state.get("input_config", {}).get("input_prompt_file"),
+             state.get("execution", {}).get("step_count", 0), created, created,
+             created if status == FINISHED else None))
+
+    def allocate_version(self, prompt_file: Optional[str] = None, llm_backend: Optional[str] = None) -> str:
+        """
+        Reserve the next version number.
+
+        Returns:
+            str: The new version, e.g. "4"
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT MAX(version) FROM versions").fetchone()
+                version = (row[0] or 0) + 1
+                now = time.time()
+                self._conn.execute(
+                    "INSERT INTO versions (version, status, prompt_file, llm_backend, created_at, updated_at) "
+                    "VALUES (?, 'uninitialized', ?, ?, ?, ?)", (version, prompt_file, llm_backend, now, now))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return str(version)
+
+    def register_version(self, version: str, prompt_file: Optional[str] = None, llm_backend: Optional[str] = None) -> None:
+        """Add a version that was created without allocate_version (no-op if it is known)."""
+        now = time.time()
+        self._transaction([(
+            "INSERT OR IGNORE INTO versions (version, status, prompt_file, llm_backend, created_at, updated_at) "
+            "VALUES (?, 'uninitialized', ?, ?, ?, ?)", (int(version), prompt_file, llm_backend, now, now))])
+
+    def latest_version(self) -> Optional[str]:
+        """The highest version number, or None for a project without versions."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(version) FROM versions").fetchone()
+        return str(row[0]) if row[0] is not None else None
+
+    def set_status(self, version: str, status: str) -> None:
+        """Record a status change of a version."""
+        now = time.time()
+        self._transaction([(
+            "UPDATE versions SET status = ?, updated_at = ?, "
+            "finished_at = CASE WHEN ? THEN ? ELSE finished_at END WHERE version = ?",
+            (status, now, status == FINISHED, now, int(version)))])
+
+    def record_step(self, version: str, step: int, node_id: Optional[str], opcode: Optional[str],
+                    duration: Optional[float] = None) -> None:
+        """Record a completed step and the version's new step count."""
+        now = time.time()
+        self._transaction([
+            ("INSERT OR REPLACE INTO steps (version, step, node_id, opcode, duration, finished_at) "
+             "VALUES (?, ?, ?, ?, ?, ?)", (int(version), step, node_id, opcode, duration, now)),
+            ("UPDATE versions SET step_count = ?, updated_at = ? WHERE version = ?", (step, now, int(version))),
+        ])
+
+    def versions(self, status: Optional[str] = None) -> List[VersionRecord]:
+        """All versions in ascending order, optionally only those with a given status."""
+        sql = "SELECT * FROM versions" + (" WHERE status = ?" if status else "") + " ORDER BY version"
+        with self._lock:
+            rows = self._conn.execute(sql, (status,) if status else ()).fetchall()
+        return [VersionRecord(**dict(row)) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate figures over all versions and steps of the project."""
+        with self._lock:
+            by_status = {row["status"]: row["count"] for row in self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM versions GROUP BY status")}
+            totals = self._conn.execute(
+                "SELECT COUNT(*) AS versions, COALESCE(SUM(step_count), 0) AS steps, "
+                "AVG(CASE WHEN finished_at IS NOT NULL THEN finished_at - created_at END) AS mean_elapsed "
+                "FROM versions").fetchone()
+            by_opcode = {row["opcode"]: {"steps": row["steps"], "mean_duration": row["mean_duration"]}
+                         for row in self._conn.execute(
+                             "SELECT opcode, COUNT(*) AS steps, AVG(duration) AS mean_duration "
+                             "FROM steps GROUP BY opcode ORDER BY opcode")}
+        return {
+            "versions": totals["versions"],
+            "steps": totals["steps"],
+            "mean_elapsed": totals["mean_elapsed"],
+            "by_status": by_status,
+            "by_opcode": by_opcode,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _read_state(version_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(version_dir, "replay", "replay_state.json"), "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def format_versions(records: List[VersionRecord]) -> str:
+    """Render `replay.py list` output."""
+    lines = [f"{'VERSION':>7}  {'STATUS':<26}{'STEPS':>6}  {'CREATED':<19}  {'ELAPSED':>9}  PROMPT"]
+    for record in records:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created_at))
+        elapsed = f"{record.elapsed:.1f}s"
+        lines.append(f"{record.version:>7}  {record.status:<26}{record.step_count:>6}  {created:<19}  "
+                     f"{elapsed:>9}  {record.prompt_file or '-'}")
+    return "\n".join(lines)
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """Render `replay.py stats` output."""
+    mean_elapsed = f"{stats['mean_elapsed']:.1f}s" if stats["mean_elapsed"] is not None else "-"
+    lines = [f"Versions: {stats['versions']}", f"Steps: {stats['steps']}", f"Mean time to finish: {mean_elapsed}",
+             "By status:"]
+    lines += [f"  {status}: {count}" for status, count in sorted(stats["by_status"].items())]
+    lines.append("By opcode:")
+    for opcode, figures in stats["by_opcode"].items():
+        mean = f"{figures['mean_duration']:.2f}s" if figures["mean_duration"] is not None else "-"
+        lines.append(f"  {opcode}: {figures['steps']} steps, mean {mean}")
+    return "\n".join(lines)
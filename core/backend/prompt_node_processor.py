@@ -82,7 +82,7 @@ class PromptNodeProcessor:
             node_data['docs_refs'], 
             node_data['template_refs'], 
             node_data['run_logs_refs'],
-            replay.replay_dir
+            replay
         )
         
         return LLMRequest(
@@ -97,9 +97,10 @@ class PromptNodeProcessor:
         """Load code files that can be edited."""
         return self._load_files_from_directory(code_refs, code_dir, "code file")
 
-    def _load_read_only_files(self, docs_refs: List[str], template_refs: List[str], run_logs_refs: List[str], base_dir: str) -> List[FileReference]:
-        """Load read-only files (docs and templates)."""
+    def _load_read_only_files(self, docs_refs: List[str], template_refs: List[str], run_logs_refs: List[str], replay) -> List[FileReference]:
+        """Load read-only files (docs, templates and run logs)."""
         all_files = []
+        base_dir = replay.replay_dir
         
         # Load docs files from the docs subdirectory
         docs_dir = os.path.join(base_dir, "docs")
@@ -111,14 +112,13 @@ class PromptNodeProcessor:
         template_files = self._load_files_from_directory(template_refs, template_dir, "template file")
         all_files.extend(template_files)
         
-        # Load run logs files from the run_logs subdirectory
-        run_logs_dir = os.path.join(base_dir, "run_logs")
-        run_logs_files = self._load_files_from_directory(run_logs_refs, run_logs_dir, "run logs file", last_n_lines=100)
+        # Load run logs files from the run log store
+        run_logs_files = self._load_run_logs(run_logs_refs, replay, "run logs file", last_n_lines=100)
         all_files.extend(run_logs_files)
         
         return all_files
 
-    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+    def _load_files_from_directory(self, file_refs: List[str], base_dir: str, file_type: str) -> List[FileReference]:
         """Load files from a directory and return FileReference objects."""
         files = []
         
@@ -127,7 +127,7 @@ class PromptNodeProcessor:
             
             if os.path.exists(file_path):
                 try:
-                    content = self._read_file_safely(file_path, last_n_lines)
+                    content = self._read_file_safely(file_path)
                     files.append(FileReference(path=file_ref, content=content))
                     logger.info(f"Added {file_type} to edit: {file_ref}")
                 except Exception as e:
@@ -137,13 +137,26 @@ class PromptNodeProcessor:
         
         return files
 
-    def _read_file_safely(self, file_path: str, last_n_lines: int = None) -> str:
-        """Read a file safely with proper encoding handling."""        
+    def _load_run_logs(self, log_refs: List[str], replay, file_type: str, last_n_lines: int = None) -> List[FileReference]:
+        """Load run logs through the version's RunLogStore, which also finds the gzipped logs of earlier iterations."""
+        files = []
+
+        for log_ref in log_refs:
+            if replay.run_logs.path(log_ref) is None:
+                logger.warning(f"{file_type.title()} not found: {os.path.join(replay.run_logs_dir, log_ref)}")
+                continue
+            try:
+                files.append(FileReference(path=log_ref, content=replay.run_logs.read(log_ref, last_n_lines)))
+                logger.info(f"Added {file_type}: {log_ref}")
+            except Exception as e:
+                logger.error(f"Error reading {file_type} {log_ref}: {e}")
+
+        return files
+
+    def _read_file_safely(self, file_path: str) -> str:
+        """Read a file safely with proper encoding handling."""
         with open(file_path, 'r', encoding='utf-8') as f:
-            if last_n_lines is not None:
-                return '\n'.join(f.readlines()[-last_n_lines:])
-            else:
-                return f.read()
+            return f.read()
             
     def _get_client_instructions(self, replay_dir: str) -> str:
         """Load client instructions from the replay directory."""
@@ -1,15 +1,23 @@
 import os
 import json
+import fcntl
+import asyncio
 import networkx as nx
 import logging
 from dataclasses import dataclass, asdict, field
 from typing import Optional, List, Any, Dict
 from enum import Enum
-from core.dir_preprocessing import setup_project_directories, post_replay_dir_cleanup
+from core.dir_preprocessing import setup_project_directories, post_replay_dir_cleanup, create_symlink_safely
 from core.prompt_preprocess2.processor3 import prompt_preprocess3
 from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+from core.prompt_preprocess2.ir.bytecode import HALT, lower_to_bytecode
 from core.backend.processors import NodeProcessorRegistry
 from core.backend.git_manager import GitManager, MockGitManager
+from core.backend.project_index import ProjectIndex
+from core.backend.step_journal import StepJournal
+from core.backend.run_log_store import RunLogStore
+from core.backend.code_index import CodeIndex
+from core.backend.node_memory import NODE_MEMORY
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -32,33 +40,62 @@ class InputConfig:
 class ExecutionState:
     """Contains the runtime execution state (like CPU state with loaded program)"""
     current_node_id: Optional[str] = None
-    control_flow_graph_queue: List[Optional[str]] = field(default_factory=list)
+    pc: int = HALT  # Program counter into epic.program; current_node_id is the node at pc
     epic: Optional[EpicIR] = None  # The loaded program
-    memory: List[str] = field(default_factory=list)
+    shared_memory: List[str] = field(default_factory=list)  # Replay memory, see the memory property
     step_count: int = 0  # Track number of steps executed
+    session_id: Optional[str] = None  # Claude Code session of the main conversation
+    branch_session_ids: Dict[str, str] = field(default_factory=dict)  # Sessions of DEBUG_LOOP FIX branches
+    
+    @property
+    def memory(self) -> List[str]:
+        """
+        The replay memory, or the NodeMemory buffer of the node a DagScheduler
+        is processing in the current thread or task.
+        """
+        buffer = NODE_MEMORY.get()
+        return self.shared_memory if buffer is None else buffer.entries
+    
+    @memory.setter
+    def memory(self, value: List[str]) -> None:
+        buffer = NODE_MEMORY.get()
+        if buffer is None:
+            self.shared_memory = value
+        else:
+            buffer.entries = value
     
     def to_dict(self) -> dict:
         return {
             "current_node_id": self.current_node_id,
-            "control_flow_graph_queue": self.control_flow_graph_queue,
+            "pc": self.pc,
             "epic": self.epic.to_dict() if self.epic else None,
-            "memory": self.memory,
+            "memory": self.shared_memory,
             "step_count": self.step_count,
+            "session_id": self.session_id,
+            "branch_session_ids": self.branch_session_ids,
         }
     
     @classmethod
     def from_dict(cls, d: dict):        
         epic_data = d.get("epic")
         epic = EpicIR.from_dict(epic_data) if epic_data else None
+        if epic is not None and epic.program is None:
+            # Epics saved before the bytecode stage existed
+            epic.program = lower_to_bytecode(epic)
         current_node_id = d.get("current_node_id", None)
-        control_flow_graph_queue = d.get("control_flow_graph_queue", [])
+        pc = d.get("pc")
+        if pc is None:
+            # Checkpoints from before the bytecode program only stored the node
+            pc = epic.program.pc_of(current_node_id) if epic else HALT
 
         return cls(
             current_node_id=current_node_id,
-            control_flow_graph_queue=control_flow_graph_queue,
+            pc=pc,
             epic=epic,
-            memory=d.get("memory", []),
+            shared_memory=d.get("memory", []),
             step_count=d.get("step_count", 0),
+            session_id=d.get("session_id"),
+            branch_session_ids=d.get("branch_session_ids", {}),
         )
 
 @dataclass
@@ -86,9 +123,13 @@ class ReplayState:
         )
     
     def save(self, file_path: str):
-        """Save the state to a JSON file."""
-        with open(file_path, 'w') as f:
+        """Save the state to a JSON file, replacing the old file atomically."""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self.to_dict(), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
 
 class Replay:
     def __init__(
@@ -97,15 +138,30 @@ class Replay:
         client=None,
         use_mock: bool = False,
         llm_backend: str = "claude_code",
-        disable_git: bool = False
+        disable_git: bool = False,
+        cache_mode: str = "off",
+        cache_dir: Optional[str] = None,
+        replay_from: Optional[str] = None,
+        replay_mismatch: str = "error",
+        stream: bool = False,
+        shared_git: bool = False
     ):
         self.state = state
         self.client = client
+        self.async_client = None  # Native async client, if the backend has one
         self.use_mock = use_mock
         self.llm_backend_name = llm_backend
         self.disable_git = disable_git
+        self.cache_mode = cache_mode
+        self.cache_dir = cache_dir or os.path.join(self.state.input_config.output_dir, ".cache", "llm")
+        # Resolve before _setup_directories moves the `latest` symlink to the new version
+        self.replay_from = self._resolve_version_dir(replay_from) if replay_from else None
+        self.replay_mismatch = replay_mismatch
+        self.stream = stream
+        self.shared_git = shared_git
         self.llm_backend = None  # Will be initialized in _init_llm_backend
         self.project_dir = os.path.join(self.state.input_config.output_dir, self.state.input_config.project_name)
+        self.version = None
         self.version_dir = None
         self.replay_dir = None
         self.code_dir = None
@@ -115,13 +171,20 @@ class Replay:
         self.system_instructions = None
         self.node_processor_registry = NodeProcessorRegistry.create_registry()
         self.git_manager = MockGitManager(self.project_dir)  # Will be overridden in _setup_directories if git is enabled
+        self.project_index = ProjectIndex(self.project_dir)
+        self._version_lock = None  # Held from load_checkpoint(lock=True) until close()
+        self._node_durations: Dict[str, float] = {}  # Processing time of nodes not yet completed, by node id
 
         self._setup_directories()
+        self.journal = StepJournal(self.replay_dir)
+        self.journal.reset(self.state)
         self._init_client()
+        self._init_response_cache()
         self._init_llm_backend()
         self._load_system_instructions()              
 
-        if self.state.status not in (ReplayStatus.LOADED_PROGRAM, ReplayStatus.RUNNING_PROGRAM):
+        if self.state.status not in (ReplayStatus.LOADED_PROGRAM, ReplayStatus.RUNNING_PROGRAM,
+                                     ReplayStatus.FINISHED_RUNNING_PROGRAM):
             self.status = ReplayStatus.INITIALIZED
 
 
@@ -132,16 +195,24 @@ class Replay:
         client=None,
         use_mock: bool = False,
         llm_backend: str = "claude_code",
-        disable_git: bool = False
+        disable_git: bool = False,
+        cache_mode: str = "off",
+        cache_dir: Optional[str] = None,
+        replay_from: Optional[str] = None,
+        replay_mismatch: str = "error",
+        stream: bool = False,
+        shared_git: bool = False
     ) -> 'Replay':
         """Create a new Replay instance from input configuration (recipe), always creating a new version."""
         # Find next version number
         logger.info(f"Creating new Replay instance from input configuration: {input_config}")
         project_dir = os.path.join(input_config.output_dir, input_config.project_name)
         os.makedirs(project_dir, exist_ok=True)
-        version = cls._get_next_version(project_dir)
+        version = cls._get_next_version(project_dir, input_config.input_prompt_file, llm_backend)
         state = ReplayState(input_config=input_config, version=version)
-        return cls(state, client=client, use_mock=use_mock, llm_backend=llm_backend, disable_git=disable_git)
+        return cls(state, client=client, use_mock=use_mock, llm_backend=llm_backend, disable_git=disable_git,
+                   cache_mode=cache_mode, cache_dir=cache_dir, replay_from=replay_from, replay_mismatch=replay_mismatch,
+                   stream=stream, shared_git=shared_git)
 
     @classmethod
     def load_checkpoint(
@@ -152,9 +223,22 @@ class Replay:
         client=None,
         use_mock: bool = False,
         llm_backend: str = "claude_code",
-        disable_git: bool = False
+        disable_git: bool = False,
+        cache_mode: str = "off",
+        cache_dir: Optional[str] = None,
+        replay_from: Optional[str] = None,
+        replay_mismatch: str = "error",
+        stream: bool = False,
+        shared_git: bool = False,
+        lock: bool = False
     ) -> 'Replay':
-        """Load a Replay instance from a project directory checkpoint for a specific version (or latest)."""
+        """
+        Load a Replay instance from a project directory checkpoint for a specific version (or latest).
+
+        With lock=True the version's lock is held from before the state is read
+        until close(), so concurrent `--step` invocations of one version run one
+        after another instead of overwriting each other's state.
+        """
         logger.info(f"Creating new Replay instance from checkpoint: {output_dir} / {project_name} / {version}")
         project_dir = os.path.join(output_dir, project_name)
         if version == "latest":
@@ -165,17 +249,70 @@ class Replay:
         state_path = os.path.join(replay_dir, "replay_state.json")
         if not os.path.exists(state_path):
             raise FileNotFoundError(f"State file not found: {state_path}")
-        with open(state_path, 'r') as f:
-            loaded_state = ReplayState.from_dict(json.load(f))
-            logger.info(f"State loaded from {state_path}")
-            
-            return cls(loaded_state, client=client, use_mock=use_mock, llm_backend=llm_backend, disable_git=disable_git)
+        version_lock = cls._lock_version(project_dir, os.path.basename(version_dir)) if lock else None
+        try:
+            with open(state_path, 'r') as f:
+                loaded_state = ReplayState.from_dict(json.load(f))
+                logger.info(f"State loaded from {state_path}")
+            # Steps completed after the snapshot was written
+            journaled = StepJournal(replay_dir).apply(loaded_state)
+
+            replay = cls(loaded_state, client=client, use_mock=use_mock, llm_backend=llm_backend, disable_git=disable_git,
+                         cache_mode=cache_mode, cache_dir=cache_dir, replay_from=replay_from, replay_mismatch=replay_mismatch,
+                         stream=stream, shared_git=shared_git)
+            # They count towards compaction, or one `--step` per process would never compact the journal
+            replay.journal.pending = journaled
+        except BaseException:
+            if version_lock is not None:
+                version_lock.close()
+            raise
+        replay._version_lock = version_lock
+        return replay
+
+    @staticmethod
+    def _lock_version(project_dir: str, version: str):
+        """Take the exclusive lock of a version, waiting for its holder; closing the returned file releases it."""
+        lock_dir = os.path.join(project_dir, "replay", "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(os.path.join(lock_dir, f"{version}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Version {version} is locked by another process, waiting")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _resolve_version_dir(self, version_ref: str) -> str:
+        """Resolve "<project>/<version>" (relative to output_dir) or a path to a version directory."""
+        candidate = os.path.join(self.state.input_config.output_dir, version_ref)
+        if not os.path.isdir(candidate):
+            candidate = version_ref
+        if not os.path.isdir(os.path.join(candidate, "client")):
+            raise FileNotFoundError(f"No recorded client transcripts found for {version_ref}")
+        return os.path.realpath(candidate)
 
     @staticmethod
-    def _get_next_version(project_dir: str) -> str:
-        versions = [int(d) for d in os.listdir(project_dir) if d.isdigit()]
-        next_version = str(max(versions) + 1 if versions else 1)
-        return next_version
+    def _get_next_version(project_dir: str, prompt_file: Optional[str] = None, llm_backend: Optional[str] = None) -> str:
+        """
+        Reserve the next version number and create its directory.
+
+        The number comes from the project index and the directory is created
+        with mkdir, which fails if it exists, so concurrent from_recipe calls
+        never share a version, even with a stale index. A directory the
+        index didn't know about gets its row filled in from disk.
+        """
+        index = ProjectIndex(project_dir)
+        try:
+            while True:
+                version = index.allocate_version(prompt_file=prompt_file, llm_backend=llm_backend)
+                try:
+                    os.mkdir(os.path.join(project_dir, version))
+                    return version
+                except FileExistsError:
+                    logger.warning(f"Version directory {version} exists but was not indexed, skipping it")
+                    index.index_version(version)
+        finally:
+            index.close()
 
     @property
     def status(self) -> ReplayStatus:
@@ -189,73 +326,201 @@ class Replay:
         if old_status != new_status:
             logger.info(f"Replay status: {old_status.value} → {new_status.value}")
             self.state.status = new_status
+            self.project_index.set_status(self.version, new_status.value)
 
     def run_step(self):
-        if self.state.status == ReplayStatus.FINISHED_RUNNING_PROGRAM:
+        current_node = self._next_step_node()
+        if current_node is None:
+            return
+        
+        self._process_node(current_node)
+        self._complete_step(current_node)
+        self._advance(current_node['opcode'])
+        self._journal_step(current_node)
+
+    async def run_step_async(self):
+        """
+        Async variant of run_step.
+
+        LLM requests and RUN commands are awaited instead of blocking, so many
+        Replay instances can make progress on one event loop.
+        """
+        current_node = self._next_step_node()
+        if current_node is None:
             return
         
+        await self._process_node_async(current_node)
+        await asyncio.to_thread(self._complete_step, current_node)
+        self._advance(current_node['opcode'])
+        await asyncio.to_thread(self._journal_step, current_node)
+
+    def _next_step_node(self) -> Optional[dict]:
+        """Bring the replay into RUNNING_PROGRAM state and return the node to execute next, if any."""
+        if self.state.status == ReplayStatus.FINISHED_RUNNING_PROGRAM:
+            return None
+        
         if self.state.status == ReplayStatus.INITIALIZED:
             self.compile()
         if self.state.status == ReplayStatus.LOADED_PROGRAM:
             self.status = ReplayStatus.RUNNING_PROGRAM
         if self.state.status == ReplayStatus.RUNNING_PROGRAM and not self.has_steps():
-            return
+            return None
         
         assert self.state.execution.current_node_id is not None, "Current node can't be None here"
         
         current_node_id = self.state.execution.current_node_id
         if current_node_id is None:
             logger.warning("No steps to run")
-            return
+            return None
         current_node = self.state.execution.epic.graph.nodes[current_node_id]
         if current_node is None:
             logger.warning(f"Current node not found: {current_node_id}")
-            return
-        
-        opcode = current_node['opcode']
+            return None
+        return current_node
+
+    def _process_node(self, node: dict):
+        """Run the registered processor for a single node."""
+        processor = self._get_processor(node)
+        self.journal.watch(self.state.execution.epic, node)
+        started = datetime.now()
+        logger.info(f"\n\n--- RUNTIME: start {node['opcode'].name.lower()}: ---- ")
+        processor.process(self, node)
+        self._log_duration(node, started)
+
+    async def _process_node_async(self, node: dict):
+        """Run the registered processor for a single node without blocking the event loop."""
+        processor = self._get_processor(node)
+        self.journal.watch(self.state.execution.epic, node)
+        started = datetime.now()
+        logger.info(f"\n\n--- RUNTIME: start {node['opcode'].name.lower()}: ---- ")
+        if hasattr(processor, 'process_async'):
+            await processor.process_async(self, node)
+        else:
+            # Processors without I/O only touch in-memory state and are cheap to run inline
+            processor.process(self, node)
+        self._log_duration(node, started)
+
+    def _get_processor(self, node: dict):
+        opcode = node['opcode']
         processor = self.node_processor_registry.get(opcode)
         if processor is None:
             raise ValueError(f"No processor registered for opcode: {opcode}")
-        started = datetime.now()
-        logger.info(f"\n\n--- RUNTIME: start {opcode.name.lower()}: ---- ")
-        processor.process(self, current_node)
+        return processor
+
+    def _log_duration(self, node: dict, started: datetime):
         ended = datetime.now()
         duration = ended - started
 
-        logger.info(f"--- {opcode.name.lower()}: END | Took: {duration} ----")
+        logger.info(f"--- {node['opcode'].name.lower()}: END | Took: {duration} ----")
+        self._node_durations[node.get('id')] = duration.total_seconds()
 
+    def _complete_step(self, node: dict):
+        """Account for a processed node: bump the step counter and commit its changes."""
         # Increment step counter
         self.state.execution.step_count += 1
         
         # Commit changes after step execution
-        self.git_manager.commit_step(current_node, opcode, self.state.execution.step_count)
+        self.git_manager.commit_step(node, node['opcode'], self.state.execution.step_count)
+        self.project_index.record_step(self.version, self.state.execution.step_count, node.get('id'),
+                                       node['opcode'].name, self._node_durations.pop(node.get('id'), None))
+
+    def _journal_step(self, node: dict, resume_point: Optional[tuple] = None):
+        """
+        Persist a completed step: a delta in the step journal, or a new snapshot
+        if there is none yet or the journal has grown to journal.compact_every steps.
+
+        Args:
+            node: The node the step executed
+            resume_point: pc to resume from instead of the state's, which a
+                DagScheduler has moved past a node that failed
+        """
+        state_path = os.path.join(self.replay_dir, "replay_state.json")
+        if os.path.exists(state_path) and self.journal.pending + 1 < self.journal.compact_every:
+            self.journal.append(self.journal.delta(self.state, node, resume_point))
+            return
+        self.journal.delta(self.state, node, resume_point)  # drop the node's watched contents
+        if resume_point is None:
+            self.save_state()
+            return
+        execution = self.state.execution
+        pointer, status = (execution.current_node_id, execution.pc), self.state.status
+        execution.current_node_id, execution.pc = execution.epic.program.node_name(resume_point), resume_point
+        self.state.status = ReplayStatus.RUNNING_PROGRAM
+        try:
+            self.save_state()
+        finally:
+            (execution.current_node_id, execution.pc), self.state.status = pointer, status
+
+    def _advance(self, opcode: Opcode, finish: bool = True):
+        """
+        Move the program counter past a node with the given opcode.
 
-        # Check if this is a control flow node that determines its own next node
+        Args:
+            opcode: Opcode of the node at the program counter
+            finish: Finish the replay if the program halts. A DagScheduler
+                passes False and calls _finish_if_halted once no node is in flight.
+        """
+        execution = self.state.execution
+        program = execution.epic.program
+        condition = None
         if opcode == Opcode.CONDITIONAL:
-            # This is a hack to which I see 3 options:
-            # - this (I do prefer this for now)
-            # - let each node choose next node
-            # - switch to two phases
-            # For control flow nodes, let the processor set the next node
-            # The processor should have updated current_node_id appropriately
-            pass
-        else:
-            # Determine next node using CFG traversal
-            from core.prompt_preprocess2.ir.control_flow import cfg_traversal_step        
-            cfg_queue, next_node_id = cfg_traversal_step(self.state.execution.epic, self.state.execution.control_flow_graph_queue)
-            self.state.execution.control_flow_graph_queue = cfg_queue
-            self.state.execution.current_node_id = next_node_id
-
-        if len(self.state.execution.control_flow_graph_queue) and self.state.execution.current_node_id is None:            
-            self.status = ReplayStatus.FINISHED_RUNNING_PROGRAM
+            # Evaluated by ConditionalNodeProcessor; selects the jump target
+            condition = execution.epic.graph.nodes[execution.current_node_id]['contents'].get('condition')
+        execution.pc = program.step(execution.pc, condition)
+        execution.current_node_id = program.node_name(execution.pc)
+        if finish:
+            self._finish_if_halted()
+
+    def _finish_if_halted(self):
+        """Mark the replay finished and point latest at it once the program counter has halted."""
+        if self.state.execution.pc != HALT or self.state.status == ReplayStatus.FINISHED_RUNNING_PROGRAM:
+            return
+        self.status = ReplayStatus.FINISHED_RUNNING_PROGRAM
+        # A newer version may have been started while this one ran
+        if self.version == self.project_index.latest_version():
             post_replay_dir_cleanup(self.project_dir, self.latest_dir, self.version_dir)
 
-    def run_all(self):
+    def run_all(self, max_workers: int = 1):
+        """
+        Run the program until there are no steps left.
+
+        Args:
+            max_workers: Number of nodes that may execute concurrently. With the
+                default of 1 nodes run strictly one after another; larger values
+                hand execution to the DagScheduler, which overlaps independent nodes.
+        """
+        if self.state.status == ReplayStatus.INITIALIZED:
+            self.compile()
+
+        if max_workers > 1:
+            from core.backend.scheduler import DagScheduler
+            DagScheduler(self, max_workers=max_workers).run()
+        else:
+            while self.has_steps():
+                self.run_step()
+
+        # Step commits are written in the background; make them visible before returning
+        self.git_manager.flush()
+
+    async def run_all_async(self, max_workers: int = 1):
+        """
+        Async variant of run_all.
+
+        Args:
+            max_workers: Number of nodes that may execute concurrently. Values
+                larger than 1 use the AsyncDagScheduler.
+        """
         if self.state.status == ReplayStatus.INITIALIZED:
             self.compile()
 
-        while self.has_steps():
-            self.run_step()
+        if max_workers > 1:
+            from core.backend.scheduler import AsyncDagScheduler
+            await AsyncDagScheduler(self, max_workers=max_workers).run()
+        else:
+            while self.has_steps():
+                await self.run_step_async()
+
+        await asyncio.to_thread(self.git_manager.flush)
 
     def get_program(self) -> ExecutionState:
         """Return the program (graph) state."""
@@ -273,9 +538,22 @@ class Replay:
         """Return the complete state (program + execution + config)."""
         return self.state
 
+    def close(self):
+        """Write outstanding git commits and release resources held by the LLM client (e.g. pooled Claude Code sessions)."""
+        self.git_manager.close()
+        self.project_index.close()
+        if self._version_lock is not None:
+            self._version_lock.close()
+            self._version_lock = None
+        close = getattr(self.client, "close", None)
+        if callable(close):
+            close()
+
     def save_state(self):
         state_path = os.path.join(self.replay_dir, "replay_state.json")
         self.state.save(state_path)
+        # The snapshot includes every journaled step
+        self.journal.truncate(self.state)
         logger.info(f"State saved to {state_path}")
 
     def _copy_reference_content(self):
@@ -329,58 +607,54 @@ class Replay:
                 
                 raise ValueError(f"Path does not exist: {path}")                
 
+        store = self._get_blob_store()
+
         def copy_to_replay_only(src_path, replay_path):
-            """Copy file/directory to replay directory only (read-only resources)."""
+            """Link file/directory into the replay directory only (read-only resources)."""
             if not os.path.exists(src_path):
                 logger.warning(f"Path does not exist: {src_path}")
                 return False
-            
-            # Copy to replay directory only
-            if os.path.isdir(src_path):
-                if os.path.exists(replay_path):
-                    shutil.rmtree(replay_path)
-                shutil.copytree(src_path, replay_path)
-                logger.info(f"Copied directory to replay: {src_path} -> {replay_path}")
-            elif os.path.isfile(src_path):
-                os.makedirs(base_dir, exist_ok=True)
-                shutil.copy2(src_path, replay_path)
-                logger.info(f"Copied file to replay: {src_path} -> {replay_path}")
-            else:
+            if not (os.path.isdir(src_path) or os.path.isfile(src_path)):
                 logger.warning(f"Path is not a file or directory: {src_path}")
                 return False
             
+            # Link into the replay directory only
+            tree = store.ingest(src_path)
+            if os.path.isdir(replay_path) and not os.path.islink(replay_path):
+                shutil.rmtree(replay_path)
+            store.materialize(tree, replay_path)
+            logger.info(f"Linked {'directory' if os.path.isdir(src_path) else 'file'} to replay: {src_path} -> {replay_path}")
+            
             return True
 
         def copy_template_to_code(src_path, replay_path):
-            """Copy template to replay directory and also to code directory as initial structure."""
+            """Link template into the replay directory and copy it to the code directory as initial structure."""
             if not os.path.exists(src_path):
                 logger.warning(f"Path does not exist: {src_path}")
                 return False
+            if not (os.path.isdir(src_path) or os.path.isfile(src_path)):
+                logger.warning(f"Path is not a file or directory: {src_path}")
+                return False
             
-            # Copy to replay directory first
+            tree = store.ingest(src_path)
             if os.path.isdir(src_path):
                 if os.path.exists(replay_path):
                     shutil.rmtree(replay_path)
-                shutil.copytree(src_path, replay_path)
-                logger.info(f"Copied template directory to replay: {src_path} -> {replay_path}")
+                store.materialize(tree, replay_path)
+                logger.info(f"Linked template directory to replay: {src_path} -> {replay_path}")
                 
-                # Also copy to code directory as initial structure
+                # Also copy to code directory as initial structure (copy-on-write where possible)
                 if os.path.exists(self.code_dir):
                     shutil.rmtree(self.code_dir)
-                shutil.copytree(replay_path, self.code_dir)
+                store.materialize(tree, self.code_dir, private=True)
                 logger.info(f"Copied template directory to code: {replay_path} -> {self.code_dir}")
-            elif os.path.isfile(src_path):
-                os.makedirs(base_dir, exist_ok=True)
-                shutil.copy2(src_path, replay_path)
-                logger.info(f"Copied template file to replay: {src_path} -> {replay_path}")
+            else:
+                store.materialize(tree, replay_path)
+                logger.info(f"Linked template file to replay: {src_path} -> {replay_path}")
                 
                 # Also copy to code directory
-                os.makedirs(self.code_dir, exist_ok=True)
-                shutil.copy2(replay_path, os.path.join(self.code_dir, os.path.basename(src_path)))
+                store.materialize(tree, os.path.join(self.code_dir, os.path.basename(src_path)), private=True)
                 logger.info(f"Copied template file to code: {replay_path} -> {self.code_dir}")
-            else:
-                logger.warning(f"Path is not a file or directory: {src_path}")
-                return False
             
             return True
 
@@ -402,13 +676,18 @@ class Replay:
                     replay_path = os.path.join(self.docs_dir, os.path.basename(path))
                     copy_to_replay_only(src_path, replay_path)
 
-        logger.info("Reference content copy complete.")
+        logger.info(f"Reference content copy complete: {store.stats}")
+
+    def _get_blob_store(self):
+        """Return the project's content-addressed store of template and docs content."""
+        from core.backend.blob_store import BlobStore
+        return BlobStore(os.path.join(self.project_dir, "replay", "blobs"))
 
     def compile(self):
         self.status = ReplayStatus.COMPILING_PROGRAM
         self.state.execution.epic = prompt_preprocess3(self.state.input_config.input_prompt_file, self.replay_dir, save_passes=False)        
-        self.state.execution.control_flow_graph_queue = [self.state.execution.epic.first_node]
-        self.state.execution.current_node_id = self.state.execution.epic.first_node
+        self.state.execution.pc = 0
+        self.state.execution.current_node_id = self.state.execution.epic.program.node_name(0)
         
         # Print the parsed graph for debugging
         print("\n=== Parsed Graph Nodes ===")
@@ -433,7 +712,14 @@ class Replay:
         if self.client is not None:
             return
             
-        if self.use_mock:
+        if self.replay_from:
+            # Serve responses recorded by a previous version; still save this run's transcripts
+            from core.backend.client.cassette import CassetteClient
+            from core.backend.client.client_wrapper import ClientWrapper
+            logger.info(f"Replaying LLM responses recorded in {self.replay_from}")
+            cassette = CassetteClient(self.replay_from, self.version_dir, on_mismatch=self.replay_mismatch)
+            self.client = ClientWrapper(cassette, self.version_dir)
+        elif self.use_mock:
             from core.backend.client.mock_anthropic import MockAnthropicClient
             base_client = MockAnthropicClient()
             # Wrap the mock client to save all requests and responses
@@ -443,7 +729,12 @@ class Replay:
             # Use Claude Code SDK with async query wrapped for synchronous interface
             logger.info("Using Claude Code SDK with async query wrapper")
             from core.backend.client.claude_code_client_wrapper import ClaudeCodeClientWrapper
-            self.client = ClaudeCodeClientWrapper(self.version_dir)
+            # Resume the sessions of earlier steps, so --step continues the same conversation
+            execution = self.state.execution
+            self.client = ClaudeCodeClientWrapper(self.version_dir,
+                                                  session_id=execution.session_id,
+                                                  branch_session_ids=execution.branch_session_ids,
+                                                  on_session_id=self._record_session_id)
         elif self.llm_backend_name == "anthropic_api":
             # Use standard Anthropic API client
             logger.info("Using standard Anthropic API client")
@@ -451,6 +742,8 @@ class Replay:
                 import anthropic
                 # Create standard Anthropic client
                 self.client = anthropic.Anthropic()
+                # Used by the async execution path so requests don't hold a thread each
+                self.async_client = anthropic.AsyncAnthropic()
                 logger.info("Initialized standard Anthropic client")
             except ImportError as e:
                 raise RuntimeError("anthropic package is required for anthropic_api backend. Install with: pip install anthropic") from e
@@ -459,6 +752,33 @@ class Replay:
         else:
             raise ValueError(f"Unknown LLM backend: {self.llm_backend_name}")
 
+    def _init_response_cache(self):
+        """
+        Put the on-disk LLM response cache in front of the client, unless cache_mode is "off".
+        """
+        from core.backend.client.response_cache import ResponseCache, CachingClient, CacheMode
+        from core.backend.client.client_wrapper import ClientWrapper
+        mode = CacheMode(self.cache_mode)
+        if mode == CacheMode.OFF or self.replay_from:
+            return
+
+        cache = ResponseCache(self.cache_dir)
+        # Claude Code reads the referenced files itself, so their contents must be part of the key
+        content_dirs = [self.code_dir, self.docs_dir, self.template_dir] if self.llm_backend_name == "claude_code" else []
+        if isinstance(self.client, ClientWrapper):
+            # Cache below the transcript wrapper so cache hits are still saved under client/
+            self.client.client = CachingClient(self.client.client, cache, mode, content_dirs)
+        else:
+            self.client = CachingClient(self.client, cache, mode, content_dirs, async_client=self.async_client)
+        logger.info(f"LLM response cache enabled ({mode.value}) at {self.cache_dir}")
+
+    def _record_session_id(self, branch: Optional[str], session_id: str):
+        """Keep the client's latest session ids in the state, so checkpoints can resume them."""
+        if branch is None:
+            self.state.execution.session_id = session_id
+        else:
+            self.state.execution.branch_session_ids[branch] = session_id
+
     def _init_llm_backend(self):
         """
         Initialize the LLM backend based on configuration.
@@ -470,8 +790,9 @@ class Replay:
         elif self.llm_backend_name == "anthropic_api":
             from .anthropic_api_backend import AnthropicAPIBackend
             # For anthropic API, we need to use a standard model name
-            self.llm_backend = AnthropicAPIBackend(model_name="claude-3-7-sonnet-20250219", client=self.client)
-            logger.info("Initialized Anthropic API backend")
+            self.llm_backend = AnthropicAPIBackend(model_name="claude-3-7-sonnet-20250219", client=self.client, async_client=self.async_client,
+                                                   stream=self.stream)
+            logger.info(f"Initialized Anthropic API backend{' (streaming)' if self.stream else ''}")
         else:
             raise ValueError(f"Unknown LLM backend: {self.llm_backend_name}")
 
@@ -505,6 +826,7 @@ class Replay:
     def _setup_directories(self):
         # Set up all relevant directories for this version
         version = self.state.version or "1"
+        self.version = version
         self.version_dir = os.path.join(self.project_dir, version)
         self.replay_dir = os.path.join(self.version_dir, "replay")
         self.code_dir = os.path.join(self.version_dir, "code")
@@ -516,12 +838,16 @@ class Replay:
         os.makedirs(self.docs_dir, exist_ok=True)
         os.makedirs(self.run_logs_dir, exist_ok=True)
         os.makedirs(self.template_dir, exist_ok=True)
+        self.run_logs = RunLogStore(self.run_logs_dir)
+        self.code_index = CodeIndex(self.code_dir)
         
         self._copy_system_instructions()
         
         # Initialize git manager (real or mock based on disable_git setting)
         if not self.disable_git:
-            self.git_manager = GitManager(self.version_dir)
+            # With shared_git every version is a worktree of <project>/repo.git on branch v<version>
+            shared_repo = os.path.join(self.project_dir, "repo.git") if self.shared_git else None
+            self.git_manager = GitManager(self.version_dir, shared_repo=shared_repo)
             
             # Check if we're loading from a checkpoint (existing git repo)
             if os.path.exists(os.path.join(self.version_dir, ".git")):
@@ -533,15 +859,9 @@ class Replay:
         else:
             logger.info("Git operations disabled - using mock git manager")
         
+        # Versions allocated by _get_next_version are indexed already; this covers the rest
+        self.project_index.register_version(version, self.state.input_config.input_prompt_file, self.llm_backend_name)
+
         # Only update latest symlink if this is actually the latest version
-        # Check if this version is actually the latest
-        versions = [int(d) for d in os.listdir(self.project_dir) if d.isdigit()]
-        if versions and version.isdigit() and int(version) == max(versions):
-            if os.path.islink(self.latest_dir) or os.path.isfile(self.latest_dir):
-                os.unlink(self.latest_dir)
-            elif os.path.isdir(self.latest_dir):
-                import shutil
-                shutil.rmtree(self.latest_dir)
-            # Use relative path for the symlink
-            version_name = os.path.basename(self.version_dir)
-            os.symlink(version_name, self.latest_dir)
\ No newline at end of file
+        if version.isdigit() and version == self.project_index.latest_version():
+            create_symlink_safely(self.version_dir, self.latest_dir)
\ No newline at end of file
@@ -0,0 +1,226 @@
+import io
+import os
+import json
+import gzip
+import shutil
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+GZ_SUFFIX = ".gz"
+
+
+def tail_lines(path: str, last_n_lines: int, block_size: int = BLOCK_SIZE) -> List[str]:
+    """
+    The last lines of a text file, like readlines()[-last_n_lines:].
+
+    Plain files are read backwards block by block until enough lines have
+    been seen, so the cost depends on the length of the tail rather than of
+    the file. Gzipped files (.gz) can't be read backwards and are streamed
+    through a bounded deque instead.
+
+    Args:
+        path: Log file, plain or gzipped
+        last_n_lines: Number of lines to return
+        block_size: Bytes read per step
+
+    Returns:
+        List[str]: The lines with their line endings, newlines translated like text mode does
+    """
+    if last_n_lines <= 0:
+        return []
+    if path.endswith(GZ_SUFFIX):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return list(deque(f, maxlen=last_n_lines))
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        blocks: List[bytes] = []
+        newlines = 0
+        # One newline more than lines wanted: the last line may end with one, the first may be cut
+        while position > 0 and newlines <= last_n_lines:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    if position > 0:
+        # The first block may start inside a line (and inside a UTF-8 character): drop that partial line
+        data = data[data.find(b"\n") + 1:]
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').readlines()[-last_n_lines:]
+
+
+def read_log(path: str, last_n_lines: Optional[int] = None) -> str:
+    """
+    Read a log file, or only its last lines, whether it is plain or gzipped.
+
+    The last lines are joined with newlines like the readlines()-based
+    readers this replaces did, so requests built from them (and the LLM
+    cache and recordings keyed by those requests) don't change.
+
+    Args:
+        path: Log file
+        last_n_lines: Number of lines from the end, or None for the whole file
+
+    Returns:
+        str: The content
+    """
+    if last_n_lines is not None:
+        return '\n'.join(tail_lines(path, last_n_lines))
+    opener = gzip.open if path.endswith(GZ_SUFFIX) else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+@dataclass
+class RunRecord:
+    """Metadata of one execution of a RUN node."""
+    node: str
+    iteration: int
+    started: str
+    stdout_file: Optional[str] = None
+    stderr_file: Optional[str] = None
+    exit_code: Optional[int] = None
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    duration: Optional[float] = None
+    timed_out: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunRecord":
+        known = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+class RunLogStore:
+    """
+    The run_logs directory of a replay version: RUN output files plus an index.
+
+    Every execution of a RUN node gets log files named by node and
+    iteration (<node>_<iteration>_stdout.txt) and a RunRecord appended to
+    index.jsonl once it finishes. When a node runs again, as the RUN of a
+    DEBUG_LOOP does every round, the logs of its earlier iterations are
+    gzipped; path() and read() find a log either way.
+
+    Example:
+        store = RunLogStore(replay.run_logs_dir)
+        run = store.start("run_3")
+        stdout_path, stderr_path = store.log_paths(run)
+        ...
+        run.exit_code = 0
+        store.finish(run)
+        store.read(store.latest("run_3").stderr_file, last_n_lines=100)
+    """
+
+    INDEX_FILE = "index.jsonl"
+
+    def __init__(self, root: str, compress_previous: bool = True):
+        """
+        Open the store, loading its index if there is one.
+
+        Args:
+            root: The run_logs directory
+            compress_previous: Gzip the logs of a node's earlier iterations when it runs again
+        """
+        self.root = root
+        self.compress_previous = compress_previous
+        self.index_path = os.path.join(root, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._records: List[RunRecord] = []
+        self._next_iteration: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._add(RunRecord.from_dict(json.loads(line)))
+
+    def _add(self, record: RunRecord) -> None:
+        self._records.append(record)
+        self._next_iteration[record.node] = max(self._next_iteration.get(record.node, 0), record.iteration + 1)
+
+    def start(self, node_id: str) -> RunRecord:
+        """Allocate the next iteration of a node and the names of its log files."""
+        node = os.path.basename(str(node_id))
+        with self._lock:
+            iteration = self._next_iteration.get(node, 0)
+            self._next_iteration[node] = iteration + 1
+        return RunRecord(node=node, iteration=iteration, started=datetime.now().isoformat(timespec="milliseconds"),
+                         stdout_file=f"{node}_{iteration}_stdout.txt", stderr_file=f"{node}_{iteration}_stderr.txt")
+
+    def log_paths(self, record: RunRecord) -> tuple[str, str]:
+        """Paths to write the stdout and stderr of a started run to."""
+        return os.path.join(self.root, record.stdout_file), os.path.join(self.root, record.stderr_file)
+
+    def attach(self, record: RunRecord, suffix: str, text: str) -> str:
+        """Write another file for a run, <node>_<iteration>_<suffix>.txt, and return its name."""
+        name = f"{record.node}_{record.iteration}_{suffix}.txt"
+        with open(os.path.join(self.root, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        return name
+
+    def finish(self, record: RunRecord) -> None:
+        """Append a finished run to the index and compress the node's earlier logs."""
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record.to_dict()) + "\n")
+            self._add(record)
+            earlier = [run for run in self._records if run.node == record.node and run.iteration < record.iteration]
+        if self.compress_previous:
+            for run in earlier:
+                for name in (run.stdout_file, run.stderr_file):
+                    if name is not None:
+                        self._compress(os.path.join(self.root, name))
+
+    def _compress(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+        partial = path + GZ_SUFFIX + ".tmp"
+        with open(path, 'rb') as src, gzip.open(partial, 'wb') as dst:
+            shutil.copyfileobj(src, dst, BLOCK_SIZE)
+        os.replace(partial, path + GZ_SUFFIX)
+        os.remove(path)
+        logger.debug(f"Compressed run log {path}")
+
+    def runs(self, node_id: Optional[str] = None) -> List[RunRecord]:
+        """Finished runs in the order they finished, optionally only those of one node."""
+        with self._lock:
+            if node_id is None:
+                return list(self._records)
+            node = os.path.basename(str(node_id))
+            return [run for run in self._records if run.node == node]
+
+    def latest(self, node_id: str) -> Optional[RunRecord]:
+        """The last finished run of a node."""
+        runs = self.runs(node_id)
+        return runs[-1] if runs else None
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a log file in the store, compressed or not; None if it doesn't exist."""
+        path = os.path.join(self.root, name)
+        for candidate in (path, path + GZ_SUFFIX):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def read(self, name: str, last_n_lines: Optional[int] = None) -> str:
+        """
+        Read a log file of the store (see read_log).
+
+        Raises:
+            FileNotFoundError: If there is no such log
+        """
+        path = self.path(name)
+        if path is None:
+            raise FileNotFoundError(f"Run log not found: {os.path.join(self.root, name)}")
+        return read_log(path, last_n_lines)
@@ -0,0 +1,324 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+
+from core.backend.node_memory import NodeMemory
+
+from core.prompt_preprocess2.ir.ir import Opcode
+
+logger = logging.getLogger(__name__)
+
+# Resource keys are "<area>:<relative path>". A trailing "*" claims the whole area,
+# e.g. RUN and FIX nodes own all of code_dir because a build or a fix may touch any file.
+CODE_DIR_ALL = "code:*"
+RUN_LOGS_ALL = "run_logs:*"
+
+# Nodes that decide where execution continues, or end it, must see every
+# side effect of the nodes before them.
+BARRIER_OPCODES = (Opcode.CONDITIONAL, Opcode.EXIT)
+
+
+@dataclass(frozen=True)
+class NodeAccess:
+    """Resources a node reads and writes while it is processed."""
+    reads: FrozenSet[str] = field(default_factory=frozenset)
+    writes: FrozenSet[str] = field(default_factory=frozenset)
+    barrier: bool = False
+
+    def conflicts_with(self, other: 'NodeAccess') -> bool:
+        """
+        Check whether two nodes must not run at the same time.
+
+        Two nodes conflict on any read-after-write, write-after-read or
+        write-after-write hazard, or if either of them is a barrier.
+        """
+        if self.barrier or other.barrier:
+            return True
+        return (_overlaps(self.writes, other.writes)
+                or _overlaps(self.writes, other.reads)
+                or _overlaps(self.reads, other.writes))
+
+
+def _key_matches(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if a.endswith("*") and b.startswith(a[:-1]):
+        return True
+    if b.endswith("*") and a.startswith(b[:-1]):
+        return True
+    return False
+
+
+def _overlaps(left: FrozenSet[str], right: FrozenSet[str]) -> bool:
+    return any(_key_matches(a, b) for a in left for b in right)
+
+
+def node_access(node: dict) -> NodeAccess:
+    """
+    Derive the read and write sets of a node from its opcode and contents.
+
+    A PROMPT node reads and writes the files of its @code: references and
+    reads its docs, templates and run logs; without @code: references it
+    claims the whole code_dir. RUN and FIX nodes claim the whole code_dir,
+    since a build or a fix may touch any file, and RUN additionally writes
+    the run logs that PROMPT and FIX read. TEMPLATE, DOCS and READ_ONLY
+    content is copied at compile time, so those nodes touch nothing at
+    runtime. The replay memory isn't a resource: every node the scheduler
+    runs works on its own NodeMemory, merged when the node completes.
+
+    Args:
+        node: The node data dictionary
+
+    Returns:
+        NodeAccess: The resources the node touches
+    """
+    opcode = node.get('opcode')
+    contents = node.get('contents', {})
+
+    if opcode in BARRIER_OPCODES:
+        return NodeAccess(barrier=True)
+
+    if opcode == Opcode.PROMPT:
+        files = {f"code:{ref}" for ref in contents.get('code_refs', [])} or {CODE_DIR_ALL}
+        reads = set(files)
+        reads.update(f"docs:{ref}" for ref in contents.get('docs_refs', []))
+        reads.update(f"template:{ref}" for ref in contents.get('template_refs', []))
+        reads.update(f"run_logs:{ref}" for ref in contents.get('run_logs_refs', []))
+        if contents.get('run_refs'):
+            reads.add(RUN_LOGS_ALL)
+        return NodeAccess(reads=frozenset(reads), writes=frozenset(files))
+
+    if opcode == Opcode.RUN:
+        return NodeAccess(reads=frozenset({CODE_DIR_ALL}),
+                          writes=frozenset({CODE_DIR_ALL, RUN_LOGS_ALL}))
+
+    if opcode == Opcode.FIX:
+        return NodeAccess(reads=frozenset({CODE_DIR_ALL, RUN_LOGS_ALL}),
+                          writes=frozenset({CODE_DIR_ALL}))
+
+    if opcode in (Opcode.TEMPLATE, Opcode.DOCS, Opcode.READ_ONLY):
+        return NodeAccess()
+
+    # Unknown opcodes are serialized against everything
+    return NodeAccess(barrier=True)
+
+
+class _DagSchedulerBase:
+    """
+    Bookkeeping shared by DagScheduler and AsyncDagScheduler.
+
+    The subclasses own the transport (a thread pool or event loop tasks) and
+    the waiting; dispatch, conflict checks, merging node memory and
+    committing completed steps happen here.
+    """
+
+    def __init__(self, replay, max_workers: int = 4):
+        """
+        Initialize the scheduler.
+
+        Args:
+            replay: The Replay instance to execute
+            max_workers: Maximum number of nodes processed at the same time
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self.replay = replay
+        self.max_workers = max_workers
+        self._in_flight: Dict = {}  # future or task -> (node_id, node, access, memory, resume_point), in dispatch order
+        self._completed: List[dict] = []
+        self._failed_at = None  # pc of the first node that failed; a resumed run starts there
+
+    def _start(self) -> bool:
+        """Mark the replay as running; False if it has already finished."""
+        from core.backend.replay import ReplayStatus
+
+        replay = self.replay
+        if replay.status == ReplayStatus.FINISHED_RUNNING_PROGRAM:
+            return False
+        if replay.status == ReplayStatus.LOADED_PROGRAM:
+            replay.status = ReplayStatus.RUNNING_PROGRAM
+        logger.info(f"Running program with up to {self.max_workers} concurrent nodes")
+        return True
+
+    def _next_node(self):
+        """The node at the program counter, with its access sets."""
+        node_id = self.replay.state.execution.current_node_id
+        node = self.replay.state.execution.epic.graph.nodes[node_id]
+        return node_id, node, node_access(node)
+
+    def _must_wait(self, access: NodeAccess) -> bool:
+        return bool(self._in_flight) and (len(self._in_flight) >= self.max_workers or self._conflicts(access))
+
+    def _conflicts(self, access: NodeAccess) -> bool:
+        return any(access.conflicts_with(other) for _, _, other, _, _ in self._in_flight.values())
+
+    def _dispatched(self, handle, node_id, node: dict, access: NodeAccess, memory: NodeMemory) -> None:
+        """Record a node handed to a worker and move the program counter past it."""
+        logger.debug(f"Dispatching node {node_id} ({len(self._in_flight)} in flight)")
+        self._in_flight[handle] = (node_id, node, access, memory, self.replay.state.execution.pc)
+        self.replay._advance(node['opcode'], finish=False)
+
+    def _collect(self, done) -> Optional[Exception]:
+        """
+        Take finished nodes out of flight and merge their memory, in dispatch order.
+
+        Returns:
+            Optional[Exception]: The first error a node raised
+        """
+        error = None
+        execution = self.replay.state.execution
+        for handle in [handle for handle in self._in_flight if handle in done]:
+            node_id, node, _, memory, resume_point = self._in_flight.pop(handle)
+            try:
+                handle.result()
+            except Exception as e:
+                # The node runs again when the replay resumes, so its memory is dropped
+                logger.error(f"Node {node_id} failed: {e}")
+                error = error or e
+                if self._failed_at is None:
+                    self._failed_at = resume_point
+                continue
+            execution.memory = memory.merge(execution.memory)
+            self._completed.append(node)
+        return error
+
+    def _commit_completed(self) -> None:
+        """Commit and journal the nodes completed since the last time nothing was in flight."""
+        completed, self._completed = self._completed, []
+        for node in completed:
+            self.replay._complete_step(node)
+        if self._failed_at is None:
+            self.replay._finish_if_halted()
+        for node in completed:
+            self.replay._journal_step(node, self._failed_at)
+
+
+class DagScheduler(_DagSchedulerBase):
+    """
+    Runs a Replay program while overlapping nodes that don't depend on each other.
+
+    The scheduler walks the control flow graph in the same order as
+    Replay.run_step, but instead of waiting for every node to finish it hands
+    the node to a bounded worker pool as soon as it doesn't conflict with any
+    node still in flight (see node_access). CONDITIONAL and EXIT nodes are
+    barriers: all in-flight work is drained before they run on the calling
+    thread, so back-edges of lowered DEBUG_LOOPs observe the results they
+    depend on.
+
+    Each node works on its own copy of the replay memory (NodeMemory), which
+    is merged into the replay's memory when the node completes. Steps are
+    committed in completion order, on the calling thread, but only once no
+    node is in flight, so a commit never captures another node's
+    half-written files. Likewise the replay only finishes (and the latest
+    symlink is moved) after the last node has completed.
+
+    Example:
+        scheduler = DagScheduler(replay, max_workers=4)
+        scheduler.run()
+    """
+
+    def run(self) -> None:
+        """Execute the program until there are no steps left."""
+        if not self._start():
+            return
+
+        replay = self.replay
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="replay-node") as pool:
+            try:
+                while replay.has_steps():
+                    node_id, node, access = self._next_node()
+
+                    if access.barrier:
+                        self._drain()
+                        replay.run_step()
+                        continue
+
+                    while self._must_wait(access):
+                        self._wait_for_one()
+
+                    memory = NodeMemory(replay.state.execution.memory)
+                    self._dispatched(pool.submit(self._process_node, node, memory), node_id, node, access, memory)
+            finally:
+                self._drain()
+
+    def _process_node(self, node: dict, memory: NodeMemory) -> None:
+        with memory.active():
+            self.replay._process_node(node)
+
+    def _wait_for_one(self) -> None:
+        done, _ = wait(list(self._in_flight), return_when=FIRST_COMPLETED)
+        self._complete(done)
+
+    def _drain(self) -> None:
+        while self._in_flight:
+            self._wait_for_one()
+
+    def _complete(self, futures) -> None:
+        error = self._collect(futures)
+        if not self._in_flight:
+            self._commit_completed()
+        if error is not None:
+            # Let the nodes that are still running finish before propagating
+            self._drain()
+            raise error
+
+
+class AsyncDagScheduler(_DagSchedulerBase):
+    """
+    Asyncio counterpart of DagScheduler.
+
+    Nodes are dispatched with the same conflict and barrier rules, but each
+    node runs as a task on the current event loop (Replay._process_node_async)
+    instead of a worker thread, so many Replay instances can share one loop.
+
+    Example:
+        await AsyncDagScheduler(replay, max_workers=4).run()
+    """
+
+    async def run(self) -> None:
+        """Execute the program until there are no steps left."""
+        if not self._start():
+            return
+
+        replay = self.replay
+        try:
+            while replay.has_steps():
+                node_id, node, access = self._next_node()
+
+                if access.barrier:
+                    await self._drain()
+                    await replay.run_step_async()
+                    continue
+
+                while self._must_wait(access):
+                    await self._wait_for_one()
+
+                memory = NodeMemory(replay.state.execution.memory)
+                task = asyncio.ensure_future(self._process_node(node, memory))
+                self._dispatched(task, node_id, node, access, memory)
+        finally:
+            await self._drain()
+
+    async def _process_node(self, node: dict, memory: NodeMemory) -> None:
+        # Each task runs in its own copy of the context, so the buffer stays with this node
+        with memory.active():
+            await self.replay._process_node_async(node)
+
+    async def _wait_for_one(self) -> None:
+        done, _ = await asyncio.wait(list(self._in_flight), return_when=asyncio.FIRST_COMPLETED)
+        await self._complete(done)
+
+    async def _drain(self) -> None:
+        while self._in_flight:
+            await self._wait_for_one()
+
+    async def _complete(self, tasks) -> None:
+        error = self._collect(tasks)
+        if not self._in_flight:
+            await asyncio.to_thread(self._commit_completed)
+        if error is not None:
+            # Let the nodes that are still running finish before propagating
+            await self._drain()
+            raise error
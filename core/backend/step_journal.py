@@ -0,0 +1,200 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = "step_journal.jsonl"
+
+
+class StepJournal:
+    """
+    Append-only write-ahead journal of the steps executed since the last state snapshot.
+
+    replay_state.json is the snapshot. After every step one compact JSON line
+    is appended to replay/step_journal.jsonl and fsynced, holding only what
+    the step changed: the contents keys of the executed node, the memory
+    (appended entries, or the whole list if it was rewritten), the program
+    counter, the status and the session ids. Every compact_every
+    steps the state is saved as a new snapshot and the journal is emptied.
+
+    load_checkpoint applies the journal to the snapshot, so a run that
+    crashed resumes after its last completed step. Lines of steps the
+    snapshot already includes (a crash between writing the snapshot and
+    emptying the journal) and a torn last line are skipped.
+
+    Example:
+        journal = StepJournal(replay_dir)
+        journal.watch(state.execution.epic, node)    # before the node runs
+        journal.append(journal.delta(state, node))   # after the step completed
+        applied = StepJournal(replay_dir).apply(loaded_state)
+    """
+
+    def __init__(self, replay_dir: str, compact_every: int = 50):
+        """
+        Initialize the journal of a version.
+
+        Args:
+            replay_dir: The version's replay/ directory
+            compact_every: Steps after which the state is snapshotted and the journal emptied
+        """
+        self.path = os.path.join(replay_dir, JOURNAL_FILENAME)
+        self.compact_every = compact_every
+        self.pending = 0  # steps in the journal since the last snapshot
+        self._lock = threading.Lock()
+        self._before: Dict[int, Tuple[str, Dict[str, str]]] = {}
+        self._names: Dict[int, str] = {}
+        self._names_of = None
+        self._memory: Optional[List[str]] = None
+        self._sessions: Optional[Tuple] = None
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _node_name(self, epic, node: dict) -> str:
+        # Node attribute dicts don't know their own name; map them once per graph
+        if self._names_of is not epic.graph:
+            self._names = {id(attrs): name for name, attrs in epic.graph.nodes(data=True)}
+            self._names_of = epic.graph
+        return self._names[id(node)]
+
+    def watch(self, epic, node: dict) -> None:
+        """Remember the contents of a node before it is processed."""
+        contents = node.get('contents') or {}
+        encoded = {key: json.dumps(value, sort_keys=True) for key, value in contents.items()}
+        with self._lock:
+            self._before[id(node)] = (self._node_name(epic, node), encoded)
+
+    def reset(self, state) -> None:
+        """Take the state as the new snapshot the next deltas are relative to."""
+        with self._lock:
+            self._memory = list(state.execution.memory)
+            self._sessions = (state.execution.session_id, dict(state.execution.branch_session_ids))
+            self.pending = 0
+
+    def truncate(self, state) -> None:
+        """Empty the journal after the state has been saved as a snapshot."""
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, "w"):
+                    pass
+        self.reset(state)
+
+    def delta(self, state, node: dict, resume_point: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Describe what a completed step changed.
+
+        Args:
+            state: The ReplayState after the step
+            node: The executed node (passed to watch() before it ran)
+            resume_point: pc to resume from, when it isn't the state's
+                (nodes still running in a DagScheduler)
+        """
+        execution = state.execution
+        with self._lock:
+            name, before = self._before.pop(id(node), (None, {}))
+            contents = node.get('contents') or {}
+            changed = {key: value for key, value in contents.items()
+                       if before.get(key) != json.dumps(value, sort_keys=True)}
+            entry = {
+                "step": execution.step_count,
+                "node": name,
+                "set": changed,
+                "unset": [key for key in before if key not in contents],
+                "pc": execution.pc if resume_point is None else resume_point,
+                # With nodes still running the program can't have finished yet
+                "status": "running_program" if resume_point is not None else state.status.value,
+            }
+
+            memory = execution.memory
+            previous = self._memory if self._memory is not None else []
+            if memory[:len(previous)] == previous:
+                if len(memory) > len(previous):
+                    entry["memory_append"] = memory[len(previous):]
+            else:
+                entry["memory"] = list(memory)
+            self._memory = list(memory)
+
+            sessions = (execution.session_id, dict(execution.branch_session_ids))
+            if sessions != self._sessions:
+                entry["session_id"], entry["branch_session_ids"] = sessions
+                self._sessions = sessions
+        return entry
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Append a delta and force it to disk."""
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending += 1
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def entries(self, repair: bool = False) -> List[Dict[str, Any]]:
+        """
+        The journal's deltas in order, without a torn last line.
+
+        Args:
+            repair: Cut a torn last line off the file, so new deltas aren't appended to it
+        """
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("line is not terminated")
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Ignoring incomplete journal line {number} of {self.path}")
+                    if repair:
+                        os.truncate(self.path, valid_size)
+                    break
+                valid_size += len(line)
+        return entries
+
+    def apply(self, state) -> int:
+        """
+        Bring a state loaded from the snapshot up to the last journaled step.
+
+        Returns:
+            int: Number of steps applied
+        """
+        from core.backend.replay import ReplayStatus
+
+        execution = state.execution
+        applied = 0
+        for entry in self.entries(repair=True):
+            if entry["step"] <= execution.step_count:
+                continue
+            if entry["node"] is not None:
+                contents = execution.epic.graph.nodes[entry["node"]].setdefault('contents', {})
+                contents.update(entry["set"])
+                for key in entry["unset"]:
+                    contents.pop(key, None)
+            if "memory" in entry:
+                execution.memory = entry["memory"]
+            execution.memory.extend(entry.get("memory_append", []))
+            if "session_id" in entry:
+                execution.session_id = entry["session_id"]
+                execution.branch_session_ids = entry["branch_session_ids"]
+            execution.pc = entry["pc"]
+            execution.current_node_id = execution.epic.program.node_name(execution.pc)
+            execution.step_count = entry["step"]
+            state.status = ReplayStatus(entry["status"])
+            applied += 1
+        self.reset(state)
+        self.pending = applied
+        if applied:
+            logger.info(f"Recovered {applied} steps from {self.path}")
+        return applied
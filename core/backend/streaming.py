@@ -0,0 +1,188 @@
+import json
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamEvent:
+    """Progress of a streamed LLM response."""
+    kind: str  # "first_text", "file" or "done"
+    elapsed: float
+    received: int  # characters received so far
+    path: Optional[str] = None
+    size: int = 0
+
+
+class IncrementalFilesParser:
+    """
+    Incrementally parses a streamed {"files": [...], ...} response.
+
+    Text is fed chunk by chunk. The parser tracks JSON strings and nesting
+    while the text arrives and reports each element of the top-level "files"
+    array as soon as its closing brace has been received, long before the
+    whole response is complete. Reported files are not kept: only the text
+    around the "files" array is, so result() returns the rest of the response
+    with an empty "files" list. Anything before the first "{" or after the
+    matching "}" is ignored, like extract_json_response does.
+
+    Example:
+        parser = IncrementalFilesParser()
+        for chunk in stream:
+            for file_data in parser.feed(chunk):
+                save(file_data["path_and_filename"], file_data["contents"])
+        response = parser.result()
+    """
+
+    def __init__(self):
+        self._outline: List[str] = []  # response text outside the "files" array
+        self._finished = False
+        self._pending = ""      # text of the element being parsed, or of the key before it
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None   # last string seen at depth 1
+        self._files_depth = None  # depth of the "files" array while inside it
+        self._element_start = None
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Parse the response without the file objects already reported by feed.
+
+        Returns:
+            Dict[str, Any]: The parsed response, or an empty dict if it isn't valid JSON
+        """
+        try:
+            return json.loads("".join(self._outline))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse streamed response: {e}")
+            return {}
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Consume a chunk of text.
+
+        Args:
+            chunk: The next piece of the response text
+
+        Returns:
+            List[Dict[str, Any]]: File objects completed by this chunk
+        """
+        if self._finished:
+            return []
+        completed = []
+        base = len(self._pending)
+        self._pending += chunk
+        # Start of the text of this chunk that belongs to the outline, None while inside "files"
+        outline_start = base if self._started and self._files_depth is None else None
+        for i in range(base, len(self._pending)):
+            char = self._pending[i]
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    outline_start = i
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._string_start is not None:
+                        self._last_key = self._pending[self._string_start + 1:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i if self._element_start is None else None
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_key == "files":
+                    self._files_depth = 2
+                    self._outline.append(self._pending[outline_start:i + 1])
+                    outline_start = None
+                elif char == "{" and self._files_depth is not None and self._depth == self._files_depth + 1:
+                    self._element_start = i
+            elif char in "}]":
+                if (char == "}" and self._element_start is not None
+                        and self._depth == self._files_depth + 1):
+                    element = self._pending[self._element_start:i + 1]
+                    self._element_start = None
+                    try:
+                        completed.append(json.loads(element))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Could not parse streamed file object: {e}")
+                elif char == "]" and self._files_depth is not None and self._depth == self._files_depth:
+                    self._files_depth = None
+                    outline_start = i
+                self._depth -= 1
+                if self._depth == 0:
+                    self._outline.append(self._pending[outline_start:i + 1])
+                    self._finished = True
+                    self._pending = ""
+                    return completed
+
+        if outline_start is not None:
+            self._outline.append(self._pending[outline_start:])
+
+        # Only the element being parsed has to be kept around
+        if self._element_start is not None:
+            self._pending = self._pending[self._element_start:]
+            self._element_start = 0
+        elif self._in_string and self._string_start is not None:
+            self._pending = self._pending[self._string_start:]
+            self._string_start = 0
+        else:
+            self._pending = ""
+            self._string_start = None
+        return completed
+
+
+class StreamProgress:
+    """
+    Turns parser output into StreamEvents and hands them to a callback.
+
+    The default callback logs time-to-first-text and time-to-each-file.
+    """
+
+    def __init__(self, callback: Optional[Callable[[StreamEvent], None]] = None):
+        self.callback = callback or log_stream_event
+        self.started = time.monotonic()
+        self.received = 0
+        self.files = 0
+
+    def _emit(self, kind: str, path: Optional[str] = None, size: int = 0) -> None:
+        self.callback(StreamEvent(kind=kind, elapsed=time.monotonic() - self.started,
+                                  received=self.received, path=path, size=size))
+
+    def text(self, chunk: str) -> None:
+        if self.received == 0 and chunk:
+            self.received += len(chunk)
+            self._emit("first_text")
+        else:
+            self.received += len(chunk)
+
+    def file(self, file_data: Dict[str, Any]) -> None:
+        self.files += 1
+        self._emit("file", path=file_data.get("path_and_filename"), size=len(file_data.get("contents", "")))
+
+    def done(self) -> None:
+        self._emit("done", size=self.files)
+
+
+def log_stream_event(event: StreamEvent) -> None:
+    """Default StreamEvent callback."""
+    if event.kind == "first_text":
+        logger.info(f"📡 First text after {event.elapsed:.2f}s")
+    elif event.kind == "file":
+        logger.info(f"📄 Received {event.path} ({event.size} chars) after {event.elapsed:.2f}s")
+    elif event.kind == "done":
+        logger.info(f"📡 Response complete after {event.elapsed:.2f}s: {event.received} chars, {event.size} files")
@@ -1,6 +1,7 @@
 from typing import Tuple
 from .dir_preprocessing import setup_project_directories as _setup_project_directories
 from .dir_preprocessing import post_replay_dir_cleanup as _post_replay_dir_cleanup
+from .dir_preprocessing import create_symlink_safely
 
 def setup_project_directories(output_dir: str, project_name: str) -> Tuple[str, str]:
     """
@@ -24,4 +25,4 @@ def post_replay_dir_cleanup(project_dir: str, latest_dir: str, epic_dir: str):
     It will copy the latest epic in to latest/ directory. 
     """
     return _post_replay_dir_cleanup(project_dir, latest_dir, epic_dir)
-__all__ = ['setup_project_directories', 'post_replay_dir_cleanup'] 
\ No newline at end of file
+__all__ = ['setup_project_directories', 'post_replay_dir_cleanup', 'create_symlink_safely'] 
\ No newline at end of file
@@ -1,38 +1,38 @@
 import os
-import shutil
+import logging
+import threading
 from pathlib import Path
 from typing import Tuple    
 
+logger = logging.getLogger(__name__)
+
 def create_symlink_safely(target: str, link_path: str):
     """
-    Create a symlink safely with cross-platform support.
+    Point a symlink at target, replacing the link that is there.
+    
+    The new link is created under a temporary name and renamed over link_path,
+    so readers always see either the old or the new target, never a missing link.
     
     Args:
         target: The target path to link to
         link_path: The path where the symlink should be created
+
+    Raises:
+        OSError: If the symlink can't be created, or link_path is a directory
+            rather than a link (e.g. a copy made by older versions)
     """
+    # Create a relative symlink for better VSCode compatibility
+    target_path = Path(target)
+    link_path_obj = Path(link_path)
+    relative_target = os.path.relpath(target_path, link_path_obj.parent)
+    tmp_link = f"{link_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.symlink(relative_target, tmp_link)
     try:
-        # Remove existing link if it exists
-        if os.path.exists(link_path):
-            if os.path.islink(link_path):
-                os.unlink(link_path)
-            else:
-                shutil.rmtree(link_path)
-        
-        # Create a relative symlink for better VSCode compatibility
-        target_path = Path(target)
-        link_path_obj = Path(link_path)
-        relative_target = os.path.relpath(target_path, link_path_obj.parent)
-        
-        # Create the symlink with relative path
-        os.symlink(relative_target, link_path)
-        return True
-    except OSError as e:
-        print(f"Warning: Could not create symlink {link_path} -> {target}: {e}")
-        # Fallback: create a regular directory and copy contents
-        print("Falling back to directory copy...")
-        shutil.copytree(target, link_path, dirs_exist_ok=True)
-        return False
+        os.replace(tmp_link, link_path)
+    except OSError:
+        os.unlink(tmp_link)
+        raise
+    logger.debug(f"Linked {link_path} -> {relative_target}")
 
 def setup_project_directories(output_dir: str, project_name: str) -> Tuple[str, str, str, str]:
     """
@@ -0,0 +1,28 @@
+from typing import Any, Callable, Dict
+
+from .ir import EpicIR, Opcode
+
+ANALYSES: Dict[str, Callable[[EpicIR], Any]] = {}
+
+
+def analysis(name: str):
+    """Register a function computing an analysis of an EpicIR under a name (see EpicIR.analysis)."""
+    def register(func: Callable[[EpicIR], Any]) -> Callable[[EpicIR], Any]:
+        ANALYSES[name] = func
+        return func
+    return register
+
+
+@analysis("nodes_by_opcode")
+def nodes_by_opcode(epic: EpicIR) -> Dict[Opcode, Dict[str, None]]:
+    """
+    Node names by opcode, in graph order.
+
+    The inner dicts are used as ordered sets; EpicIR.add_node, insert_node
+    and remove_node keep them up to date.
+    """
+    index: Dict[Opcode, Dict[str, None]] = {}
+    for node_name, opcode in epic.graph.nodes(data='opcode'):
+        index.setdefault(opcode, {})[node_name] = None
+    return index
+
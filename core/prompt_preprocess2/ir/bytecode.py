@@ -0,0 +1,155 @@
+import base64
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .ir import EpicIR, Opcode
+
+HALT = -1
+OPCODES = list(Opcode)
+_CONDITIONAL = OPCODES.index(Opcode.CONDITIONAL)
+
+
+class Program:
+    """
+    Flat bytecode form of an EpicIR, executed with a program counter.
+
+    Instruction pc runs node names[nodes[pc]] (opcode OPCODES[ops[pc]]) and
+    continues at next[pc]. CONDITIONAL instructions branch: next[pc] when the
+    condition held, alt[pc] otherwise. HALT (-1) ends the program.
+
+    The instruction order is the order the old queue-based traversal
+    (cfg_traversal_step) visited nodes in, so the same node can appear at
+    several pcs. Stepping is a couple of array lookups, and a checkpoint
+    only has to store the pc.
+
+    Example:
+        program = lower_to_bytecode(epic)
+        pc = 0
+        while pc != HALT:
+            run(program.node_name(pc))
+            pc = program.step(pc, condition)
+    """
+
+    __slots__ = ("names", "ops", "nodes", "next", "alt", "_pcs")
+
+    def __init__(self, names: List[str], ops: array, nodes: array, next: array, alt: array):
+        self.names = names
+        self.ops = ops
+        self.nodes = nodes
+        self.next = next
+        self.alt = alt
+        self._pcs = None
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def opcode(self, pc: int) -> Opcode:
+        return OPCODES[self.ops[pc]]
+
+    def node_name(self, pc: int) -> Optional[str]:
+        """Name of the node at pc, None at HALT."""
+        return None if pc == HALT else self.names[self.nodes[pc]]
+
+    def step(self, pc: int, condition: Optional[bool] = None) -> int:
+        """The pc after executing pc; condition is the result of a CONDITIONAL."""
+        if self.ops[pc] == _CONDITIONAL and not condition:
+            return self.alt[pc]
+        return self.next[pc]
+
+    def pc_of(self, node_name: Optional[str]) -> int:
+        """First pc executing a node, HALT for None (to resume checkpoints saved before the program existed)."""
+        if node_name is None:
+            return HALT
+        if self._pcs is None:
+            self._pcs = {}
+            for pc in range(len(self.nodes) - 1, -1, -1):
+                self._pcs[self.names[self.nodes[pc]]] = pc
+        return self._pcs[node_name]
+
+    def to_dict(self) -> dict:
+        """Names plus the instructions packed as little-endian int32 quadruples, base64 encoded."""
+        code = array('i')
+        for pc in range(len(self.ops)):
+            code.extend((self.ops[pc], self.nodes[pc], self.next[pc], self.alt[pc]))
+        if sys.byteorder != "little":
+            code.byteswap()
+        return {"names": self.names, "code": base64.b64encode(code.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Program':
+        code = array('i')
+        code.frombytes(base64.b64decode(data["code"]))
+        if sys.byteorder != "little":
+            code.byteswap()
+        return cls(list(data["names"]), array('B', code[0::4]), array('i', code[1::4]),
+                   array('i', code[2::4]), array('i', code[3::4]))
+
+
+def lower_to_bytecode(epic: EpicIR) -> Program:
+    """
+    Final lowering stage: turn the graph into a Program.
+
+    Simulates the traversal statically. A state is a node plus the queue
+    left behind when it was taken off it; states are emitted once, and
+    reaching a known state again (a FIX looping back to its RUN) becomes a
+    jump. CONDITIONAL nodes end a straight-line run and start their true and
+    false targets with an empty queue, like ConditionalNodeProcessor used to.
+
+    Args:
+        epic: The graph after all passes
+
+    Returns:
+        Program: The program, starting at pc 0 with epic.first_node
+    """
+    graph = epic.graph
+    names: List[str] = []
+    name_index: Dict[str, int] = {}
+    ops, nodes, nexts, alts = array('B'), array('i'), array('i'), array('i')
+    state_pcs: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+    branches: List[Tuple[int, bool, str]] = []
+
+    def emit(node: Optional[str], queue: Tuple[str, ...] = ()) -> int:
+        """Emit the straight-line run starting at a state; return the state's pc."""
+        entry = HALT
+        previous = None
+        while node:
+            state = (node, queue)
+            pc = state_pcs.get(state)
+            joined = pc is not None
+            if not joined:
+                pc = state_pcs[state] = len(ops)
+                if node not in name_index:
+                    name_index[node] = len(names)
+                    names.append(node)
+                ops.append(OPCODES.index(graph.nodes[node]['opcode']))
+                nodes.append(name_index[node])
+                nexts.append(HALT)
+                alts.append(HALT)
+            if previous is None:
+                entry = pc
+            else:
+                nexts[previous] = pc
+            if joined:
+                break
+            if graph.nodes[node]['opcode'] == Opcode.CONDITIONAL:
+                contents = graph.nodes[node].get('contents', {})
+                branches.append((pc, True, contents.get('true_node_target')))
+                branches.append((pc, False, contents.get('false_node_target')))
+                break
+            queue = queue + tuple(graph.successors(node))
+            if not queue:
+                break
+            previous = pc
+            node, queue = queue[-1], queue[:-1]
+        return entry
+
+    emit(epic.first_node)
+    while branches:
+        pc, taken, target = branches.pop()
+        target_pc = emit(target) if target else HALT
+        if taken:
+            nexts[pc] = target_pc
+        else:
+            alts[pc] = target_pc
+    return Program(names, ops, nodes, nexts, alts)
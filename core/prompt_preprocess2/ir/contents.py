@@ -0,0 +1,158 @@
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class NodeContents(MutableMapping):
+    """
+    Typed, dict-compatible contents of an IR node.
+
+    Each opcode has a subclass whose known keys live in __slots__, so a node
+    costs a few pointers instead of a dict, and keys no subclass declares
+    (added by later passes) go to a small overflow dict. The full dict API
+    works (contents['exit_code'], .get, .setdefault, `in`, ==), so passes
+    and processors written against plain dicts keep working.
+
+    Example:
+        contents = RunContents({"command": "make test"})
+        contents['exit_code'] = 0
+        contents.to_dict()  # {'command': 'make test', 'exit_code': 0}
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS: Tuple[str, ...] = ()
+    _FIELD_SET = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, **kwargs):
+        self._extra = None
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(1 for field in self.FIELDS if hasattr(self, field)) + len(self._extra or ())
+
+    def __contains__(self, key) -> bool:
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def copy(self) -> 'NodeContents':
+        return type(self)(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict of the contents, for JSON serialization."""
+        data = {field: getattr(self, field) for field in self.FIELDS if hasattr(self, field)}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+class PathContents(NodeContents):
+    """TEMPLATE, DOCS and READ_ONLY nodes."""
+    __slots__ = FIELDS = ("path",)
+
+
+class PromptContents(NodeContents):
+    __slots__ = FIELDS = ("prompt", "docs_refs", "template_refs", "code_refs", "run_logs_refs", "run_refs", "ro_folder")
+
+
+class RunContents(NodeContents):
+    """RUN and DEBUG_LOOP nodes."""
+    __slots__ = FIELDS = ("command", "exit_code", "stdout_file", "stderr_file", "fail_fast", "fail_fast_match",
+                          "timeout", "cpu_limit", "memory_limit", "timed_out", "rusage",
+                          "junit", "diagnostics", "diagnostics_file")
+
+
+class ConditionalContents(NodeContents):
+    __slots__ = FIELDS = ("iteration_count", "run_node_id", "true_node_target", "false_node_target",
+                          "iteration_max", "condition", "should_fail")
+
+
+class FixContents(NodeContents):
+    __slots__ = FIELDS = ("run_ref", "candidates", "should_fail", "candidate_rounds")
+
+
+class ExitContents(NodeContents):
+    __slots__ = FIELDS = ()
+
+
+# Keyed by Opcode value, so this module doesn't depend on ir.py
+CONTENTS_TYPES = {
+    "TEMPLATE": PathContents,
+    "DOCS": PathContents,
+    "READ_ONLY": PathContents,
+    "PROMPT": PromptContents,
+    "RUN": RunContents,
+    "DEBUG_LOOP": RunContents,
+    "CONDITIONAL": ConditionalContents,
+    "FIX": FixContents,
+    "EXIT": ExitContents,
+}
+
+
+def make_contents(opcode, data: Optional[Dict[str, Any]] = None):
+    """
+    Build the typed contents of a node.
+
+    Args:
+        opcode: Opcode of the node; anything else (e.g. an unknown opcode string) gets a plain dict
+        data: Initial keys, copied
+
+    Returns:
+        NodeContents or dict
+    """
+    contents_type = CONTENTS_TYPES.get(getattr(opcode, "value", None))
+    if contents_type is None:
+        return dict(data or {})
+    return contents_type(data)
+
+
+def contents_to_dict(contents) -> Dict[str, Any]:
+    """Plain dict of typed or plain contents."""
+    if isinstance(contents, NodeContents):
+        return contents.to_dict()
+    return dict(contents or {})
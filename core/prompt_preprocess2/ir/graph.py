@@ -0,0 +1,205 @@
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import networkx as nx
+
+
+class _NodeIndex:
+    """Integer ids of an IRGraph's nodes and the attributes of its edges, shared by both adjacency maps."""
+
+    __slots__ = ("ids", "names", "edge_attrs")
+
+    def __init__(self):
+        self.ids: Dict[Any, int] = {}  # node name -> integer id, in insertion order
+        self.names: List[Any] = []     # integer id -> node name, None once removed
+        self.edge_attrs: Dict[Tuple[int, int], dict] = {}  # (source id, target id) -> attributes
+
+
+class _Neighbors(MutableMapping):
+    """Neighbor dict of one node: names of its neighbors to the attribute dicts of the edges."""
+
+    __slots__ = ("_adjacency", "_id")
+
+    def __init__(self, adjacency: '_Adjacency', node_id: int):
+        self._adjacency = adjacency
+        self._id = node_id
+
+    def _edge(self, neighbor_id: int) -> Tuple[int, int]:
+        if self._adjacency.reverse:
+            return neighbor_id, self._id
+        return self._id, neighbor_id
+
+    def _neighbor_id(self, name) -> Optional[int]:
+        neighbor_id = self._adjacency.index.ids.get(name)
+        if neighbor_id is None or neighbor_id not in self._adjacency.lists[self._id]:
+            return None
+        return neighbor_id
+
+    def __getitem__(self, name) -> dict:
+        neighbor_id = self._neighbor_id(name)
+        if neighbor_id is None:
+            raise KeyError(name)
+        # Edges without attributes have no dict until someone asks for one
+        return self._adjacency.index.edge_attrs.setdefault(self._edge(neighbor_id), {})
+
+    def __setitem__(self, name, attrs: dict) -> None:
+        neighbor_id = self._adjacency.index.ids[name]
+        neighbors = self._adjacency.lists[self._id]
+        if neighbor_id not in neighbors:
+            neighbors.append(neighbor_id)
+        edge = self._edge(neighbor_id)
+        if attrs or edge in self._adjacency.index.edge_attrs:
+            self._adjacency.index.edge_attrs[edge] = attrs
+
+    def __delitem__(self, name) -> None:
+        neighbor_id = self._neighbor_id(name)
+        if neighbor_id is None:
+            raise KeyError(name)
+        self._adjacency.lists[self._id].remove(neighbor_id)
+        self._adjacency.index.edge_attrs.pop(self._edge(neighbor_id), None)
+
+    def __contains__(self, name) -> bool:
+        return self._neighbor_id(name) is not None
+
+    def __iter__(self) -> Iterator:
+        names = self._adjacency.index.names
+        return (names[neighbor_id] for neighbor_id in self._adjacency.lists[self._id])
+
+    def __len__(self) -> int:
+        return len(self._adjacency.lists[self._id])
+
+
+class _Adjacency(MutableMapping):
+    """Successor (or predecessor) map of an IRGraph, stored as one array of neighbor ids per node."""
+
+    __slots__ = ("index", "lists", "reverse", "_count")
+
+    def __init__(self, index: _NodeIndex, reverse: bool):
+        self.index = index
+        self.lists: List[Optional[array]] = []  # integer id -> neighbor ids, None if not a node
+        self.reverse = reverse
+        self._count = 0
+
+    def _id(self, name) -> Optional[int]:
+        node_id = self.index.ids.get(name)
+        if node_id is None or node_id >= len(self.lists) or self.lists[node_id] is None:
+            return None
+        return node_id
+
+    def __getitem__(self, name) -> _Neighbors:
+        node_id = self._id(name)
+        if node_id is None:
+            raise KeyError(name)
+        return _Neighbors(self, node_id)
+
+    def __setitem__(self, name, neighbors) -> None:
+        node_id = self.index.ids.get(name)
+        if node_id is None:
+            node_id = self.index.ids[name] = len(self.index.names)
+            self.index.names.append(name)
+        if node_id >= len(self.lists):
+            self.lists.extend([None] * (node_id + 1 - len(self.lists)))
+        if self.lists[node_id] is None:
+            self._count += 1
+        self.lists[node_id] = array('I')
+        for neighbor, attrs in neighbors.items():
+            _Neighbors(self, node_id)[neighbor] = attrs
+
+    def __delitem__(self, name) -> None:
+        node_id = self._id(name)
+        if node_id is None:
+            raise KeyError(name)
+        self.lists[node_id] = None
+        self._count -= 1
+
+    def __contains__(self, name) -> bool:
+        return self._id(name) is not None
+
+    def __iter__(self) -> Iterator:
+        lists = self.lists
+        return (name for name, node_id in self.index.ids.items()
+                if node_id < len(lists) and lists[node_id] is not None)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self) -> None:
+        self.lists = []
+        self._count = 0
+
+
+class IRGraph(nx.DiGraph):
+    """
+    networkx DiGraph whose adjacency is stored as integer ids in arrays.
+
+    Every node gets a dense integer id when it's added, and the successors
+    and predecessors of a node are array('I') lists of those ids instead of
+    the dict-of-dicts networkx keeps. Edge attribute dicts only exist for
+    edges that have attributes (or were asked for theirs). The full DiGraph
+    API works on top, so passes, analyses, networkx algorithms and the
+    visualization keep using graph.add_edge, graph.successors and so on;
+    code that walks large graphs can use the ids directly.
+
+    Example:
+        graph = IRGraph()
+        graph.add_edge("run_1", "conditional_2")
+        node_id = graph.node_id("run_1")
+        [graph.node_name(i) for i in graph.successor_ids(node_id)]  # ['conditional_2']
+    """
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        super().__init__(**attr)
+        self._index = _NodeIndex()
+        self._adj = _Adjacency(self._index, reverse=False)
+        self._pred = _Adjacency(self._index, reverse=True)
+        if incoming_graph_data is not None:
+            nx.convert.to_networkx_graph(incoming_graph_data, create_using=self)
+
+    def remove_node(self, n) -> None:
+        super().remove_node(n)
+        self._release(n)
+
+    def remove_nodes_from(self, nodes) -> None:
+        nodes = list(nodes)
+        super().remove_nodes_from(nodes)
+        for n in nodes:
+            self._release(n)
+
+    def clear(self) -> None:
+        super().clear()
+        self._index.ids.clear()
+        self._index.names.clear()
+        self._index.edge_attrs.clear()
+
+    def _release(self, n) -> None:
+        """Forget the id of a removed node; ids are never reused."""
+        if n not in self._node:
+            node_id = self._index.ids.pop(n, None)
+            if node_id is not None:
+                self._index.names[node_id] = None
+
+    def node_id(self, n) -> int:
+        """Integer id of a node."""
+        return self._index.ids[n]
+
+    def node_name(self, node_id: int):
+        """Node with an integer id."""
+        return self._index.names[node_id]
+
+    def successor_ids(self, node_id: int) -> array:
+        """Integer ids of a node's successors, in edge order."""
+        return self._adj.lists[node_id]
+
+    def predecessor_ids(self, node_id: int) -> array:
+        """Integer ids of a node's predecessors, in edge order."""
+        return self._pred.lists[node_id]
+
+    def edge_list(self) -> Iterator[Tuple[Any, Any, dict]]:
+        """(source, target, attributes) of every edge, without creating empty attribute dicts."""
+        names, lists, edge_attrs = self._index.names, self._adj.lists, self._index.edge_attrs
+        for node_id, targets in enumerate(lists):
+            if targets is None:
+                continue
+            for target_id in targets:
+                yield names[node_id], names[target_id], edge_attrs.get((node_id, target_id), {})
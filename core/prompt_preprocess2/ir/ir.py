@@ -1,7 +1,9 @@
-import networkx as nx
 from enum import Enum
 import os
 import graphviz
+from .contents import make_contents, contents_to_dict
+from .graph import IRGraph
+from .markers import Span
 
 
 class Opcode(Enum):
@@ -24,9 +26,11 @@ class EpicIR():
     first_node = None
     graph = None
     node_counter = 0
+    program = None  # bytecode.Program, set by the final lowering stage
 
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.graph = IRGraph()
+        self._analyses = {}  # Cached analyses by name, see analysis()
     
     def set_first_node(self, first_node):
         self.first_node = first_node
@@ -35,33 +39,104 @@ class EpicIR():
         self.node_counter +=1
         return str(self.node_counter)
         
-    def add_node(self, opcode: Opcode, contents: dict = {}, name: str = None) -> str:
+    def add_node(self, opcode: Opcode, contents: dict = None, name: str = None) -> str:
         id = self.get_next_node_counter()
         if name is None:
             node_name = opcode.value.lower() + "_" + id
         else:
             node_name = name + "_" + id
 
-        self.graph.add_node(node_name, opcode=opcode, contents=contents, id=id)
+        self.insert_node(node_name, opcode, contents, id=id)
         if self.first_node is None:
             self.first_node = node_name
         return node_name
 
+    def insert_node(self, node_name: str, opcode: Opcode, contents: dict = None, **attrs) -> str:
+        """
+        Add a node under an exact name, keeping cached indexes up to date.
+
+        Passes should add and remove nodes through the EpicIR (add_node,
+        insert_node, remove_node) rather than epic.graph, or declare that they
+        don't preserve the nodes_by_opcode analysis.
+        """
+        # Typed contents (see contents.py); the caller's dict is copied, never shared
+        self.graph.add_node(node_name, opcode=opcode, contents=make_contents(opcode, contents), **attrs)
+        self._index_node(node_name, add=True)
+        return node_name
+
+    def remove_node(self, node_name: str) -> None:
+        """Remove a node and its edges, keeping cached indexes up to date."""
+        self._index_node(node_name, add=False)
+        self.graph.remove_node(node_name)
+
+    def _index_node(self, node_name: str, add: bool) -> None:
+        attrs = self.graph.nodes[node_name]
+        by_opcode = self._analyses.get("nodes_by_opcode")
+        if by_opcode is not None:
+            if add:
+                by_opcode.setdefault(attrs['opcode'], {})[node_name] = None
+            else:
+                by_opcode.get(attrs['opcode'], {}).pop(node_name, None)
+
+    def analysis(self, name: str):
+        """
+        Result of a registered analysis (ir/analysis.py), computed on first use and cached.
+
+        The cache holds until invalidate_analyses() drops it; PassRegistry.run_pass
+        does that after each pass for the analyses the pass doesn't preserve.
+        """
+        if name not in self._analyses:
+            from .analysis import ANALYSES
+            self._analyses[name] = ANALYSES[name](self)
+        return self._analyses[name]
+
+    def invalidate_analyses(self, preserved=()) -> None:
+        """Drop all cached analyses except the preserved ones."""
+        for name in list(self._analyses):
+            if name not in preserved:
+                del self._analyses[name]
+
+    def nodes_by_opcode(self, opcode: Opcode) -> list:
+        """Names of the nodes with an opcode, in graph order."""
+        return list(self.analysis("nodes_by_opcode").get(opcode, ()))
+
     def to_dict(self) -> dict:
         """
         Convert the EpicIR to a dictionary representation for JSON serialization.
+
+        Writes the node-link format of nx.node_link_data directly instead of
+        copying the graph first. The node counter id, which node-link data
+        stores under "id" together with the node name, goes to "node_id".
         """
-        # Make a copy of the graph with opcodes as strings
-        graph_copy = self.graph.copy()
-        for node in graph_copy.nodes:
-            opcode = graph_copy.nodes[node].get('opcode')
-            if isinstance(opcode, Opcode):
-                graph_copy.nodes[node]['opcode'] = opcode.value
-        return {
+        nodes = []
+        for node_name, attrs in self.graph.nodes(data=True):
+            data = {}
+            for key, value in attrs.items():
+                if key == 'opcode':
+                    data[key] = value.value if isinstance(value, Opcode) else value
+                elif key == 'contents':
+                    data[key] = contents_to_dict(value)
+                elif key == 'id':
+                    data['node_id'] = value
+                else:
+                    data[key] = value
+            data['id'] = node_name
+            nodes.append(data)
+        data = {
             'first_node': self.first_node,
             'node_counter': self.node_counter,
-            'graph': nx.node_link_data(graph_copy)
+            'graph': {
+                'directed': True,
+                'multigraph': False,
+                'graph': dict(self.graph.graph),
+                'nodes': nodes,
+                'edges': [{'source': source, 'target': target, **attrs}
+                          for source, target, attrs in self.graph.edge_list()],
+            }
         }
+        if self.program is not None:
+            data['program'] = self.program.to_dict()
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'EpicIR':
@@ -72,14 +147,33 @@ class EpicIR():
         instance.first_node = data.get('first_node')
         instance.node_counter = data.get('node_counter', 0)
         if 'graph' in data:
-            graph = nx.node_link_graph(data['graph'])
-            # Restore opcodes as enums
-            for node in graph.nodes:
-                opcode = graph.nodes[node].get('opcode')
+            graph_data = data['graph']
+            graph = IRGraph()
+            graph.graph.update(graph_data.get('graph', {}))
+            for node in graph_data.get('nodes', []):
+                attrs = dict(node)
+                node_name = attrs.pop('id')
+                # Restore opcodes as enums
+                opcode = attrs.get('opcode')
                 if isinstance(opcode, str):
                     try:
-                        graph.nodes[node]['opcode'] = Opcode(opcode)
+                        opcode = attrs['opcode'] = Opcode(opcode)
                     except ValueError:
                         pass  # Leave as string if not a valid Opcode
+                if 'contents' in attrs:
+                    attrs['contents'] = make_contents(opcode, attrs['contents'])
+                if 'node_id' in attrs:
+                    attrs['id'] = attrs.pop('node_id')
+                if 'span' in attrs:
+                    attrs['span'] = Span(*attrs['span'])
+                graph.add_node(node_name, **attrs)
+            # States written by nx.node_link_data before networkx 3.4 call the edges "links"
+            for edge in graph_data.get('edges', graph_data.get('links', [])):
+                attrs = dict(edge)
+                graph.add_edge(attrs.pop('source'), attrs.pop('target'), **attrs)
             instance.graph = graph
-        return instance
\ No newline at end of file
+        if 'program' in data:
+            from .bytecode import Program
+            instance.program = Program.from_dict(data['program'])
+        return instance
+
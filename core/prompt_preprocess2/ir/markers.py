@@ -1,3 +1,5 @@
+from typing import NamedTuple
+
 # Front End parser: parse User input prompt.txt file markers
 # ToDo: rensme to FE_MARKERS
 FE_MARKERS = [    "/TEMPLATE",      # 1 Specify dir with files to seed code folder
@@ -8,4 +10,12 @@ FE_MARKERS = [    "/TEMPLATE",      # 1 Specify dir with files to seed code fold
                   "/EXIT"]          # 6 
 
 # Markers within a node after the IR_MARKER parsing, that trigger second order effects
-INTRA_NODE_MARKERS = ["/RO"] 
\ No newline at end of file
+INTRA_NODE_MARKERS = ["/RO"]
+
+
+class Span(NamedTuple):
+    """1-based source position of a marker's token, from the marker to the last non-blank character of its text."""
+    line: int
+    column: int
+    end_line: int
+    end_column: int
@@ -0,0 +1,77 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from .ir.markers import FE_MARKERS, Span
+
+# A marker starts a line (after indentation) and ends at whitespace or the end of the line,
+# so /RUN inside /RUNNER, a path like src/RUN/x or the middle of a sentence is plain text
+MARKER_PATTERN = re.compile(
+    r"[ \t]*(" + "|".join(re.escape(marker) for marker in sorted(FE_MARKERS, key=len, reverse=True)) + r")(?=\s|$)")
+
+
+@dataclass
+class Token:
+    """A marker and the text following it up to the next marker."""
+    marker: str
+    text: str
+    span: Span
+    source: Optional[str] = None
+
+    @property
+    def section(self) -> str:
+        """Marker and text as one string, the format parse_ir_markers returns."""
+        return f"{self.marker} {self.text}" if self.text else self.marker
+
+    @property
+    def location(self) -> str:
+        """file:line:column of the marker, for error messages."""
+        return f"{self.source or '<prompt>'}:{self.span.line}:{self.span.column}"
+
+
+def tokenize_lines(lines: Iterable[str], source: Optional[str] = None) -> Iterator[Token]:
+    """
+    Split prompt text into marker tokens in one pass over its lines.
+
+    Text before the first marker is skipped without being kept. Each token's
+    text is collected as a list of lines and joined once, so the work is
+    linear in the size of the input.
+
+    Args:
+        lines: The prompt text, line by line (with line endings, like a file object yields them)
+        source: File name for Token.location
+
+    Yields:
+        Token: The markers in file order
+    """
+    marker = None
+    body: List[str] = []
+    start = (0, 0)
+    end = (0, 0)
+    for number, line in enumerate(lines, 1):
+        match = MARKER_PATTERN.match(line)
+        if match:
+            if marker is not None:
+                yield Token(marker, "".join(body).strip(), Span(*start, *end), source)
+            marker = match.group(1)
+            start = (number, match.start(1) + 1)
+            end = (number, match.end(1))
+            line = line[match.end(1):]
+            body = [line]
+            offset = match.end(1)
+        elif marker is None:
+            continue
+        else:
+            body.append(line)
+            offset = 0
+        stripped = line.rstrip()
+        if stripped:
+            end = (number, offset + len(stripped))
+    if marker is not None:
+        yield Token(marker, "".join(body).strip(), Span(*start, *end), source)
+
+
+def tokenize(input_file: str) -> Iterator[Token]:
+    """Stream the tokens of a prompt file (see tokenize_lines)."""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        yield from tokenize_lines(f, source=input_file)
@@ -1,11 +1,12 @@
+import re
 import shutil
 import json
 import networkx as nx
 import logging
 from typing import List
 
-from .ir.markers import FE_MARKERS
 from .ir.ir import Opcode, EpicIR
+from .lexer import tokenize
 
 # parse @command:"cli command with args to be run"
 def parse_command(extracted_config: str) -> str:    
@@ -15,6 +16,42 @@ def parse_command(extracted_config: str) -> str:
     command_to_run = command_to_run.strip('"').strip(" ")
     return command_to_run
 
+SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+def parse_size(text: str) -> int:
+    """
+    Parse a memory size such as 512M, 4G or 1.5GiB into bytes.
+
+    Raises:
+        ValueError: If the text isn't a size
+    """
+    match = SIZE_PATTERN.fullmatch(str(text).strip())
+    if not match:
+        raise ValueError(f"Invalid size: {text!r} (expected e.g. 512M or 4G)")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+# parse @fail_fast:"pattern" (or @fail_fast:word), any number of times,
+# and @timeout:SECONDS, @cpu_limit:SECONDS, @memory_limit:SIZE (e.g. 4G), @junit:REPORT.xml
+RUN_OPTION_PATTERN = re.compile(r'@(fail_fast|timeout|cpu_limit|memory_limit|junit):(?:"([^"]*)"|(\S+))')
+RUN_OPTION_KEYS = ("fail_fast", "timeout", "cpu_limit", "memory_limit", "junit")
+RUN_OPTION_TYPES = {"timeout": float, "cpu_limit": int, "memory_limit": parse_size, "junit": str}
+
+def parse_run_options(extracted_config: str) -> tuple[str, dict]:
+    """Split the @fail_fast:, @timeout:, @cpu_limit:, @memory_limit: and @junit: options off a /RUN or /DEBUG_LOOP marker's text."""
+    options = {}
+    for key, quoted, bare in RUN_OPTION_PATTERN.findall(extracted_config):
+        value = quoted or bare
+        if key == "fail_fast":
+            options.setdefault(key, []).append(value)
+            continue
+        try:
+            options[key] = RUN_OPTION_TYPES[key](value)
+        except ValueError:
+            raise ValueError(f"Invalid @{key}: value {value!r}")
+    return " ".join(RUN_OPTION_PATTERN.sub("", extracted_config).split()), options
+
 def add_simple_edge(epic: EpicIR, previous_node: str, new_node: str):
     if previous_node is not None:
         epic.graph.add_edge(previous_node, new_node)
@@ -26,47 +63,51 @@ def pass_build_epic_graph(epic: EpicIR, input_file: str = None) -> EpicIR:
     if input_file is None:
         raise ValueError("input_file is required for build_graph pass")
     
-    ir_marker_list = parse_ir_markers(input_file)
-    #print("\n\nir_marker_list:")
-    #print(ir_marker_list)
-
     previous_node = None
-    for ir_marker in ir_marker_list:
+    for token in tokenize(input_file):
         
         # Parsing the text         
-        ir_marker_first_word = ir_marker.split()[0]
-        ir_marker_without_first_word = " ".join(ir_marker.split()[1:])  # Join remaining words into a string
+        ir_marker_first_word = token.marker
+        ir_marker_without_first_word = " ".join(token.text.split())  # Join remaining words into a string
+
+        if ir_marker_first_word in ("/RUN", "/DEBUG_LOOP") and "@command:" not in ir_marker_without_first_word:
+            raise ValueError(f"{token.location}: {token.marker} needs an @command:")
 
         if ir_marker_first_word == "/TEMPLATE":
             new_node = epic.add_node(opcode=Opcode.TEMPLATE, contents={"path": ir_marker_without_first_word})
-            previous_node = add_simple_edge(epic, previous_node, new_node)
         
         elif ir_marker_first_word == "/DOCS":
             new_node = epic.add_node(opcode=Opcode.DOCS, contents={"path": ir_marker_without_first_word})
-            previous_node = add_simple_edge(epic, previous_node, new_node)
         
         elif ir_marker_first_word == "/PROMPT":
             new_node = epic.add_node(opcode=Opcode.PROMPT, contents={"prompt": ir_marker_without_first_word})
-            previous_node = add_simple_edge(epic, previous_node, new_node) 
        
-        elif ir_marker_first_word == "/RUN":
-            new_node = epic.add_node(opcode=Opcode.RUN, contents={"command": parse_command(ir_marker_without_first_word)})
-            previous_node = add_simple_edge(epic, previous_node, new_node)
-
-        elif ir_marker_first_word == "/DEBUG_LOOP":
-            new_node = epic.add_node(opcode=Opcode.DEBUG_LOOP, contents={"command": parse_command(ir_marker_without_first_word)})
-            previous_node = add_simple_edge(epic, previous_node, new_node)
+        elif ir_marker_first_word in ("/RUN", "/DEBUG_LOOP"):
+            try:
+                command, options = parse_run_options(ir_marker_without_first_word)
+            except ValueError as e:
+                raise ValueError(f"{token.location}: {e}")
+            contents = {"command": parse_command(command), **options}
+            opcode = Opcode.RUN if ir_marker_first_word == "/RUN" else Opcode.DEBUG_LOOP
+            new_node = epic.add_node(opcode=opcode, contents=contents)
 
         elif ir_marker_first_word == "/EXIT":
             new_node = epic.add_node(opcode=Opcode.EXIT, contents={})
-            previous_node = add_simple_edge(epic, previous_node, new_node)    
+
+        else:
+            continue
+
+        # Source position of the marker, for messages of later passes and the runtime
+        epic.graph.nodes[new_node]['span'] = token.span
+        previous_node = add_simple_edge(epic, previous_node, new_node)
 
     return epic
 
 def parse_ir_markers(input_file: str) -> List[str]:
     """
-    Parse a text file containing markers (/TEMPLATE, /PROMPT, /TEST_LOOP) and create a List of strings with the parsed sections.
-    Each section should be the text that comes after any of the markers, and until the next marker is found.
+    Parse a text file containing markers (/TEMPLATE, /PROMPT, /RUN, ...) and create a List of strings with the parsed sections.
+    Each section is a marker followed by the text up to the next marker (see lexer.py).
+    Markers are only recognized at the start of a line and when followed by whitespace.
     If there are no markers, return an empty list.
     Don't include the text before the first marker.
     Marker should be included in the list. 
@@ -74,35 +115,4 @@ def parse_ir_markers(input_file: str) -> List[str]:
     Args:
         input_file (str): Path to the input text file
     """
-    # Read the input file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Check if there are any markers
-    if not any(marker in content for marker in FE_MARKERS):
-        return []
-    
-    # Find all positions of markers in the content
-    marker_positions = []
-    for marker in FE_MARKERS:
-        pos = 0
-        while True:
-            pos = content.find(marker, pos)
-            if pos == -1:
-                break
-            marker_positions.append((pos, marker))
-            pos += len(marker)
-    
-    # Sort positions to maintain order
-    marker_positions.sort()
-    
-    # Extract sections between markers
-    sections = []
-    for i in range(len(marker_positions)):
-        start_pos = marker_positions[i][0]  # Changed to include marker
-        end_pos = marker_positions[i + 1][0] if i + 1 < len(marker_positions) else len(content)
-        section = content[start_pos:end_pos].strip()
-        if section:
-            sections.append(section)
-    
-    return sections
\ No newline at end of file
+    return [token.section for token in tokenize(input_file)]
@@ -1,51 +1,34 @@
 import shutil
 import json
-import networkx as nx
 import logging
-from typing import List
 
 from ..ir.markers import FE_MARKERS
 from ..ir.ir import Opcode, EpicIR
 
-def bfs_nodes(epic: EpicIR) -> List[str]:
+def last_node(epic: EpicIR) -> str:
     """
-    Get nodes in breadth-first search order using NetworkX's built-in BFS.
-    
-    Args:
-        epic: The EpicIR graph to traverse
-        
-    Returns:
-        List of node names in BFS order
+    The node the program ends on: the last node without successors.
+
+    Before DEBUG_LOOPs are lowered the graph is the chain of sections, so
+    this is its tail. networkx keeps the successors of every node indexed,
+    so this scans back from the newest node instead of traversing the graph.
     """
-    if not epic.graph.nodes():
-        return []
-        
-    # Get the first node (assuming it's the root)
-    start_node = next(iter(epic.graph.nodes()))
-    
-    # Use NetworkX's built-in BFS to get nodes in order
-    return list(nx.bfs_tree(epic.graph, start_node).nodes())
+    graph = epic.graph
+    return next(node for node in reversed(list(graph)) if not graph.succ[node])
 
 def pass_insert_exit_node(epic: EpicIR) -> EpicIR:
     """Add EXIT node at the end if not already present."""
     
-    # Make a node list based on Breadth First Search
-    node_list = bfs_nodes(epic)
-    print("Node list:")
-    print(node_list)
+    # Check the opcode index to see if Opcode.EXIT already exists
+    exit_nodes = epic.nodes_by_opcode(Opcode.EXIT)
+    if exit_nodes:
+        print(f"Exit node {exit_nodes[0]} already exists")
+        return epic
 
-    # Check all the nodes in the node_list to see if Opcode.EXIT already exists
-    for node in node_list:
-        if epic.graph.nodes[node]['opcode'] == Opcode.EXIT:
-            print(f"Exit node {node} already exists")
-            return epic
-    
-    # If Opcode.EXIT does not exist, add it to the graph
-    previous_node = node_list[-1]
+    # If Opcode.EXIT does not exist, add it after the last node
+    previous_node = last_node(epic)
     node_name = "exit_node_" + epic.get_next_node_counter()
-    epic.graph.add_node(node_name, 
-                        opcode=Opcode.EXIT, 
-                        contents={})
+    epic.insert_node(node_name, Opcode.EXIT)
     epic.graph.add_edge(previous_node, node_name)
     epic.node_counter += 1
     return epic
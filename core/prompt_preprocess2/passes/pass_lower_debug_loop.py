@@ -4,6 +4,7 @@ from typing import List
 import re
 
 from ..ir.ir import EpicIR, Opcode
+from ..pass_build_graph import RUN_OPTION_KEYS
 
 def get_run_exit_code(run_node: dict) -> str:
     """
@@ -46,31 +47,14 @@ def pass_lower_debug_loop(epic: EpicIR) -> EpicIR:
     Lower DEBUG_LOOP nodes into a retry loop with fix mechanism.
     """
 
-    while True:
-        debug_loop_node, debug_loop_node_id = find_first_debug_loop_node(epic)
-        if debug_loop_node is None:
-            break
-        replace_debug_loop_node(epic, debug_loop_node, debug_loop_node_id)
+    # Lowering only adds RUN, CONDITIONAL and FIX nodes, so the DEBUG_LOOP
+    # nodes can be taken from the opcode index once instead of rescanning
+    for debug_loop_node_id in epic.nodes_by_opcode(Opcode.DEBUG_LOOP):
+        replace_debug_loop_node(epic, epic.graph.nodes[debug_loop_node_id], debug_loop_node_id)
     
     return epic
 
 
-def find_first_debug_loop_node(epic: EpicIR) -> tuple[dict, str]:    
-    """
-    Returns:
-        tuple[dict, str]: A tuple containing the DEBUG_LOOP node and its ID, or None if not found
-    """
-    debug_loop_node = None
-    debug_loop_node_id = None
-
-    for node_id in epic.graph.nodes():
-        if epic.graph.nodes[node_id]['opcode'] == Opcode.DEBUG_LOOP:
-            debug_loop_node = epic.graph.nodes[node_id]
-            debug_loop_node_id = node_id
-            break;
-
-    return debug_loop_node, debug_loop_node_id
-
 def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node_id: str):
     """
     This pass transforms high-level DEBUG_LOOP nodes into a concrete implementation
@@ -92,6 +76,10 @@ def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node
     
     The DEBUG_LOOP node contains:
     - command: The shell command to execute repeatedly
+    - optional @should_fail: the loop exits once the command fails instead
+    - optional @candidates:N: the FIX node requests N fixes concurrently and
+      promotes the first one whose check passes (see fix_candidates.py)
+    - optional fail_fast, timeout, cpu_limit, memory_limit, junit: RUN options, copied to the RUN node
     
     The generated structure includes:
     - RUN node: Executes the command and captures results
@@ -116,7 +104,10 @@ def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node
     
     debug_loop_node_command = debug_loop_node.get('contents', {}).get('command', None)
     debug_loop_should_fail = '@should_fail' in debug_loop_node_command
-    debug_loop_node_command = re.sub(r'@should_fail', '', debug_loop_node_command).strip('" ')
+    debug_loop_node_command = re.sub(r'@should_fail', '', debug_loop_node_command)
+    candidates_match = re.search(r'@candidates:(\d+)', debug_loop_node_command)
+    debug_loop_candidates = int(candidates_match.group(1)) if candidates_match else 1
+    debug_loop_node_command = re.sub(r'@candidates:\d+', '', debug_loop_node_command).strip('" ')
     if debug_loop_node_command is None:
         raise ValueError(f"Command not found for DEBUG_LOOP node: {debug_loop_node}")
     else:
@@ -127,7 +118,7 @@ def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node
     debug_loop_predecessors = list(epic.graph.predecessors(debug_loop_node_id))
     debug_loop_successors = list(epic.graph.successors(debug_loop_node_id))
     
-    epic.graph.remove_node(debug_loop_node_id)
+    epic.remove_node(debug_loop_node_id)
     print(f"debug_loop_predecessors: {debug_loop_predecessors}")
     print(f"debug_loop_successors: {debug_loop_successors}")
     
@@ -135,10 +126,16 @@ def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node
     debug_loop_predecessor = debug_loop_predecessors[0]  
     debug_loop_successor = debug_loop_successors[0]
     if (len(debug_loop_predecessors) > 1 or len(debug_loop_successors) > 1):
-        raise ValueError(f"Taking a single predecessor and successor for the debug loop {debug_loop_node_command}" )
+        span = debug_loop_node.get('span')
+        where = f" at line {span[0]}" if span else ""
+        raise ValueError(f"Taking a single predecessor and successor for the debug loop {debug_loop_node_command}{where}" )
 
     # ----- Make a a RUN node -----    
-    run_check_node = epic.add_node(opcode=Opcode.RUN, contents={"command": debug_loop_node_command})        
+    run_contents = {"command": debug_loop_node_command}
+    for key in RUN_OPTION_KEYS:
+        if debug_loop_node.get('contents', {}).get(key):
+            run_contents[key] = debug_loop_node['contents'][key]
+    run_check_node = epic.add_node(opcode=Opcode.RUN, contents=run_contents)        
 
     # ----- Make a a CONDITIONAL node -----
     # Create a new node with the same contents as the DEBUG_LOOP node    
@@ -155,8 +152,13 @@ def replace_debug_loop_node(epic: EpicIR, debug_loop_node: dict, debug_loop_node
 
     # ----- Make a FIX node -----
     # This will analyze the RUN node's logs and suggest fixes
+    fix_contents = {"run_ref": run_check_node}
+    if debug_loop_candidates > 1:
+        # Best-of-N: the FIX node tries several fixes and checks them itself
+        fix_contents["candidates"] = debug_loop_candidates
+        fix_contents["should_fail"] = debug_loop_should_fail
     fix_node = epic.add_node(opcode=Opcode.FIX, 
-                            contents={"run_ref": run_check_node})
+                            contents=fix_contents)
         
     # Add edges for DEBUG_LOOP node
     epic.graph.add_edge(debug_loop_predecessor, run_check_node)    
@@ -15,7 +15,7 @@ def pass_lower_prompt_file_refs(epic: EpicIR) -> EpicIR:
     }
 
     # Find all PROMPT nodes
-    prompt_nodes = [node for node in epic.graph.nodes() if epic.graph.nodes[node]['opcode'] == Opcode.PROMPT]
+    prompt_nodes = epic.nodes_by_opcode(Opcode.PROMPT)
 
     for prompt_node in prompt_nodes:
         prompt_contents = epic.graph.nodes[prompt_node]['contents']
@@ -1,5 +1,7 @@
 import inspect
-from typing import Callable, Dict, Any, List
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Iterable
 from ..ir.ir import EpicIR
 
 class PassInfo:
@@ -14,9 +16,10 @@ class PassInfo:
         func (Callable): The pass function that transforms EpicIR
         name (str): The display name of the pass
         description (str): A description of what the pass does
+        preserves (frozenset): Analyses (ir/analysis.py) still valid after the pass
     """
     
-    def __init__(self, func: Callable, name: str, description: str = ""):
+    def __init__(self, func: Callable, name: str, description: str = "", preserves: Iterable[str] = ()):
         """
         Initialize pass information.
         
@@ -24,9 +27,11 @@ class PassInfo:
             func (Callable): Function that takes EpicIR and returns EpicIR
             name (str): Name for the pass (auto-generated if empty)
             description (str): Description of the pass (uses docstring if empty)
+            preserves (Iterable[str]): Analyses the pass keeps valid; all others are invalidated after it runs
         """
         self.func = func
         self.name = name
+        self.preserves = frozenset(preserves)
 
         # Auto-generate name from function name if not provided                
         # Generate name from function name if not provided        
@@ -39,6 +44,25 @@ class PassInfo:
         # Use provided description or extract from function docstring
         self.description = description or (func.__doc__ or "").strip()
 
+
+@dataclass
+class PassStats:
+    """Timing and size of the graph around one pass run."""
+    name: str
+    seconds: float
+    nodes_before: int
+    nodes_after: int
+    edges_before: int
+    edges_after: int
+
+    @property
+    def node_delta(self) -> int:
+        return self.nodes_after - self.nodes_before
+
+    @property
+    def edge_delta(self) -> int:
+        return self.edges_after - self.edges_before
+
 class PassRegistry:
     """
     Registry for managing preprocessing passes in the prompt preprocessing pipeline.
@@ -53,21 +77,29 @@ class PassRegistry:
     - Processing file references and markers
     - Optimizing graph structure
     
+    Passes share analyses cached on the EpicIR (EpicIR.analysis, e.g. the
+    nodes_by_opcode index). run_pass invalidates the analyses a pass doesn't
+    declare to preserve and records its timing and node and edge deltas in
+    stats.
+    
     Example:
         registry = PassRegistry()
-        registry.register(pass_lower_debug_loop)
+        registry.register(pass_lower_debug_loop, preserves=("nodes_by_opcode",))
         registry.register(pass_insert_exit_node)
         
         for pass_info in registry.get_all_passes():
-            epic = pass_info.func(epic)
+            epic = registry.run_pass(pass_info, epic)
+        print(registry.format_stats())
     """
     
     def __init__(self):
         """Initialize an empty pass registry."""
         self._registry = {}
         self._pass_order = []
+        self.stats: List[PassStats] = []
     
-    def register(self, pass_func: Callable, name: str = None, description: str = None) -> None:
+    def register(self, pass_func: Callable, name: str = None, description: str = None,
+                 preserves: Iterable[str] = ()) -> None:
         """
         Register a pass function in the registry.
         
@@ -75,8 +107,9 @@ class PassRegistry:
             pass_func (Callable): Function that takes EpicIR and returns EpicIR
             name (str, optional): Name for the pass (auto-generated if not provided)
             description (str, optional): Description (uses function docstring if not provided)
+            preserves (Iterable[str], optional): Analyses the pass keeps valid
         """
-        pass_info = PassInfo(pass_func, name, description)
+        pass_info = PassInfo(pass_func, name, description, preserves)
         # must use name from pass_info.name, which might be a generated name
         self._registry[pass_info.name] = pass_info
         self._pass_order.append(pass_info.name)
@@ -100,4 +133,26 @@ class PassRegistry:
         Returns:
             List[PassInfo]: All registered passes in the order they were registered
         """
-        return [self._registry[name] for name in self._pass_order] 
\ No newline at end of file
+        return [self._registry[name] for name in self._pass_order]
+
+    def run_pass(self, pass_info: PassInfo, epic: EpicIR) -> EpicIR:
+        """
+        Run one pass, invalidate the analyses it doesn't preserve and record its stats.
+
+        Returns:
+            EpicIR: The graph returned by the pass
+        """
+        nodes_before, edges_before = epic.graph.number_of_nodes(), epic.graph.number_of_edges()
+        started = time.perf_counter()
+        epic = pass_info.func(epic)
+        seconds = time.perf_counter() - started
+        epic.invalidate_analyses(pass_info.preserves)
+        self.stats.append(PassStats(pass_info.name, seconds, nodes_before, epic.graph.number_of_nodes(),
+                                    edges_before, epic.graph.number_of_edges()))
+        return epic
+
+    def format_stats(self) -> str:
+        """One line per pass run: time and node/edge deltas."""
+        return "\n".join(f"{stats.name:<28}{stats.seconds * 1000:>9.2f} ms  "
+                         f"nodes {stats.nodes_after:>5} ({stats.node_delta:+d})  "
+                         f"edges {stats.edges_after:>5} ({stats.edge_delta:+d})" for stats in self.stats)
@@ -5,6 +5,7 @@ import os
 from typing import List
 
 from .ir.ir import EpicIR
+from .ir.bytecode import lower_to_bytecode
 from .ir.graph_visualization import nx_draw_graph, print_graph, print_graph_to_file
 
 # Import passes
@@ -68,10 +69,11 @@ def prompt_preprocess3(input_file: str, replay_dir: str, save_passes: bool = Fal
     pass_registry = PassRegistry()
     
     # Register all passes in desired order
-    pass_registry.register(pass_insert_exit_node)
-    pass_registry.register(pass_lower_debug_loop)
-    pass_registry.register(pass_lower_prompt_file_refs)
-    pass_registry.register(pass_process_ro_markers)
+    # (with the analyses each keeps valid, see ir/analysis.py)
+    pass_registry.register(pass_insert_exit_node, preserves=("nodes_by_opcode",))
+    pass_registry.register(pass_lower_debug_loop, preserves=("nodes_by_opcode",))
+    pass_registry.register(pass_lower_prompt_file_refs, preserves=("nodes_by_opcode",))
+    pass_registry.register(pass_process_ro_markers, preserves=("nodes_by_opcode",))
     
     # Create passes subdirectory
     passes_dir = os.path.join(replay_dir, "passes")
@@ -95,13 +97,20 @@ def prompt_preprocess3(input_file: str, replay_dir: str, save_passes: bool = Fal
             print(f"Description: {description}")
         
         # Execute the pass
-        epic = pass_info.func(epic)
+        epic = pass_registry.run_pass(pass_info, epic)
         
         # Save graph after each pass in passes/ subdirectory
         if save_passes:
             _save_graph_pass(epic, passes_dir, f"pass{i}_{pass_info.name}")
     
-    # Step 3: Generate final graph visualization files (overwrite initial ones)
+    print("\nPASS STATS:")
+    print(pass_registry.format_stats())
+
+    # Step 3: Lower the final graph to the bytecode program the runtime executes
+    epic.program = lower_to_bytecode(epic)
+    print(f"\nLOWERED TO BYTECODE: {len(epic.program)} instructions")
+
+    # Step 4: Generate final graph visualization files (overwrite initial ones)
     _save_graph_pass(epic, replay_dir, "epic")
     
     return epic
\ No newline at end of file
@@ -1,14 +1,156 @@
 import os
 import json
+import atexit
 import argparse
 import sys
 import logging
+from dataclasses import asdict
 from core.backend.replay import Replay, InputConfig, ReplayState, ReplayStatus
+from core.backend.limits import RunLimits, configure_run_defaults
+from core.backend.jobserver import Jobserver, configure_jobserver
+from core.prompt_preprocess2.pass_build_graph import parse_size
+
+def add_run_limit_arguments(parser):
+    """Add the options limiting RUN commands, shared by a single run and a batch."""
+    parser.add_argument('--run-timeout', type=float, default=None, help='Kill RUN commands running longer than this many seconds, unless the node sets @timeout:')
+    parser.add_argument('--run-cpu-limit', type=int, default=None, help='CPU seconds per process of a RUN command, unless the node sets @cpu_limit:')
+    parser.add_argument('--run-memory-limit', type=parse_size, default=None, help='Memory per process of a RUN command, e.g. 4G, unless the node sets @memory_limit:')
+    parser.add_argument('--build-slots', type=int, default=None, help='Share this many build slots between RUN commands through a make jobserver')
+
+def run_limits(args) -> RunLimits:
+    """The RUN limits given on the command line."""
+    return RunLimits(timeout=args.run_timeout, cpu_limit=args.run_cpu_limit, memory_limit=args.run_memory_limit)
+
+def batch_main(argv):
+    """Entry point for `replay.py batch <manifest>`."""
+    from core.backend.batch import load_manifest, run_batch, format_summary
+    logger = logging.getLogger(__name__)
+    parser = argparse.ArgumentParser(prog='replay.py batch', description='Run many prompt files as separate projects across a process pool')
+    parser.add_argument('manifest', help='JSON list of {"prompt_file", "project_name", "llm_backend", "repeat"} entries')
+    parser.add_argument('--output_dir', default='replay_output', help='Output directory shared by all projects')
+    parser.add_argument('--workers', type=int, default=4, help='Number of projects to run at the same time (default: 4)')
+    parser.add_argument('--max-llm-requests', type=int, default=None, help='Global cap on concurrent LLM requests across the batch')
+    parser.add_argument('--max-run-commands', type=int, default=None, help='Global cap on concurrent RUN commands across the batch')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of independent nodes to run concurrently within each project (default: 1)')
+    parser.add_argument('--mock', action='store_true', help='Use mock client instead of real Anthropic API')
+    parser.add_argument('--disable-git', action='store_true', default=False, help='Disable git repository creation and commit operations')
+    parser.add_argument('--cache', default='off', choices=['read', 'write', 'off'], help='LLM response cache shared by all projects (default: off)')
+    parser.add_argument('--cache-dir', default=None, help='LLM response cache directory (default: <output_dir>/.cache/llm)')
+    add_run_limit_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        logger.error(f"Can't load batch manifest: {e}")
+        sys.exit(1)
+
+    results = run_batch(
+        entries,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        max_llm_requests=args.max_llm_requests,
+        max_run_commands=args.max_run_commands,
+        use_mock=args.mock,
+        disable_git=args.disable_git,
+        jobs=args.jobs,
+        cache_mode=args.cache,
+        cache_dir=args.cache_dir,
+        run_defaults=run_limits(args),
+        build_slots=args.build_slots
+    )
+    with open(os.path.join(args.output_dir, "batch_summary.json"), "w") as f:
+        json.dump([r.to_dict() for r in results], f, indent=2)
+    print(format_summary(results))
+    if any(r.status == "failed" for r in results):
+        sys.exit(1)
+
+def transcripts_main(argv):
+    """Entry point for `replay.py transcripts list|grep|extract`."""
+    from core.backend.client.transcript_store import TranscriptReader, summarize
+    logger = logging.getLogger(__name__)
+    parser = argparse.ArgumentParser(prog='replay.py transcripts', description='Inspect the LLM transcript of a project version')
+    parser.add_argument('--output_dir', default='replay_output', help='Output directory (default: replay_output)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    list_parser = subparsers.add_parser('list', help='List all exchanges')
+    list_parser.add_argument('version', help='<project>/<version> or a version directory')
+    grep_parser = subparsers.add_parser('grep', help='List exchanges whose request or response matches a regular expression')
+    grep_parser.add_argument('pattern', help='Regular expression')
+    grep_parser.add_argument('version', help='<project>/<version> or a version directory')
+    grep_parser.add_argument('-i', '--ignore-case', action='store_true', help='Match case-insensitively')
+    extract_parser = subparsers.add_parser('extract', help='Print one exchange as JSON')
+    extract_parser.add_argument('version', help='<project>/<version> or a version directory')
+    extract_parser.add_argument('request_number', type=int, help='Number of the exchange, as shown by list')
+    extract_parser.add_argument('--part', default='all', choices=['all', 'request', 'response'], help='Part of the exchange to print')
+    args = parser.parse_args(argv)
+
+    version_dir = os.path.join(args.output_dir, args.version)
+    if not os.path.isdir(version_dir):
+        version_dir = args.version
+    client_dir = os.path.join(version_dir, "client")
+    if not os.path.isdir(client_dir):
+        logger.error(f"No client transcripts found in {version_dir}")
+        sys.exit(1)
+    reader = TranscriptReader(client_dir)
+
+    if args.command == 'list':
+        for record in reader:
+            print(summarize(record))
+    elif args.command == 'grep':
+        matches = [summarize(record) for record in reader.grep(args.pattern, ignore_case=args.ignore_case)]
+        for line in matches:
+            print(line)
+        if not matches:
+            sys.exit(1)
+    elif args.command == 'extract':
+        try:
+            record = reader.get(args.request_number)
+        except KeyError:
+            logger.error(f"No exchange {args.request_number} in {client_dir}")
+            sys.exit(1)
+        print(json.dumps(record if args.part == 'all' else record[args.part], indent=2, ensure_ascii=False))
+
+def index_main(command, argv):
+    """Entry point for `replay.py list|stats <project>`."""
+    from core.backend.project_index import ProjectIndex, format_versions, format_stats
+    logger = logging.getLogger(__name__)
+    parser = argparse.ArgumentParser(prog=f'replay.py {command}', description='List the versions of a project' if command == 'list' else 'Show run statistics of a project')
+    parser.add_argument('project_name', help='Name of the project')
+    parser.add_argument('--output_dir', default='replay_output', help='Output directory (default: replay_output)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the index from the version directories first')
+    if command == 'list':
+        parser.add_argument('--status', default=None, help='Only list versions with this status, e.g. finished_running_program')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    project_dir = os.path.join(args.output_dir, args.project_name)
+    if not os.path.isdir(project_dir):
+        logger.error(f"No project directory {project_dir}")
+        sys.exit(1)
+    index = ProjectIndex(project_dir)
+    if args.rebuild:
+        index.rebuild()
+    if command == 'list':
+        records = index.versions(status=args.status)
+        print(json.dumps([asdict(r) for r in records], indent=2) if args.json else format_versions(records))
+    else:
+        stats = index.stats()
+        print(json.dumps(stats, indent=2) if args.json else format_stats(stats))
+    index.close()
 
 def main():
     """Main entry point for the replay CLI."""
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
     logger = logging.getLogger(__name__)
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'transcripts':
+        transcripts_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] in ('list', 'stats'):
+        index_main(sys.argv[1], sys.argv[2:])
+        return
     parser = argparse.ArgumentParser(description='Process input prompts and generate code using Claude AI')
     parser.add_argument('--step', action='store_true', help='Run a single step and save state')
     parser.add_argument('--setup_only', action='store_true', help='Only setup and preprocess, do not run all steps')
@@ -16,10 +158,23 @@ def main():
     parser.add_argument('--llm', default='claude_code', choices=['claude_code', 'anthropic_api'], help='LLM backend to use (default: claude_code)')
     parser.add_argument('--version', default='latest', help='Project version to use for step mode (default: latest)')
     parser.add_argument('--disable-git', action='store_true', default=False, help='Disable git repository creation and commit operations')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of independent nodes to run concurrently in a full run (default: 1)')
+    parser.add_argument('--cache', default='off', choices=['read', 'write', 'off'], help='LLM response cache: read serves and stores, write only stores, off bypasses it (default: off)')
+    parser.add_argument('--cache-dir', default=None, help='LLM response cache directory (default: <output_dir>/.cache/llm)')
+    parser.add_argument('--replay-from', default=None, help='Serve LLM responses from the transcripts of a previous run, given as <project>/<version>')
+    parser.add_argument('--replay-mismatch', default='error', choices=['error', 'warn'], help='What to do when a request differs from the recording (default: error)')
+    parser.add_argument('--stream', action='store_true', help='Stream anthropic_api responses and write files as they arrive')
+    parser.add_argument('--shared-git', action='store_true', help='Keep all versions in one project repository (<project>/repo.git), one branch per version')
     parser.add_argument('input_prompt_file', nargs='?', help='Path to the input prompt file (for new run)')
     parser.add_argument('project_name', nargs='?', help='Name of the project (for new run)')
     parser.add_argument('--output_dir', default='replay_output', help='Output directory (for new run)')
+    add_run_limit_arguments(parser)
     args = parser.parse_args()
+    configure_run_defaults(run_limits(args))
+    if args.build_slots:
+        jobserver = Jobserver.create(args.build_slots)
+        configure_jobserver(jobserver)
+        atexit.register(jobserver.close)
     
     if args.step:
         # In step mode, if only one positional argument is provided, it's the project_name
@@ -37,14 +192,22 @@ def main():
                 version=args.version,
                 use_mock=args.mock,
                 llm_backend=args.llm,
-                disable_git=args.disable_git
+                disable_git=args.disable_git,
+                cache_mode=args.cache,
+                cache_dir=args.cache_dir,
+                replay_from=args.replay_from,
+                replay_mismatch=args.replay_mismatch,
+                stream=args.stream,
+                shared_git=args.shared_git,
+                lock=True
             )
         except FileNotFoundError as e:
             logger.error(f"Can't load replay from project directory: {e}")
             sys.exit(1)
         if runner.has_steps():
+            # The step journal records the step; run_step writes a snapshot when the journal compacts
             runner.run_step()
-            runner.save_state()
+            runner.close()
         else:
             logger.info("No more steps to run.")
             sys.exit(42)
@@ -58,13 +221,17 @@ def main():
             project_name=args.project_name,
             output_dir=args.output_dir
         )
-        runner = Replay.from_recipe(input_config, use_mock=args.mock, llm_backend=args.llm, disable_git=args.disable_git)
+        runner = Replay.from_recipe(input_config, use_mock=args.mock, llm_backend=args.llm, disable_git=args.disable_git,
+                                    cache_mode=args.cache, cache_dir=args.cache_dir,
+                                    replay_from=args.replay_from, replay_mismatch=args.replay_mismatch,
+                                    stream=args.stream, shared_git=args.shared_git)
         if args.setup_only:
             runner.compile()
             runner.save_state()
         else:
-            runner.run_all()
+            runner.run_all(max_workers=args.jobs)
             runner.save_state()
+        runner.close()
 
 if __name__ == "__main__":
     main()
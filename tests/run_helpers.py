@@ -0,0 +1,16 @@
+from types import SimpleNamespace
+
+from core.backend.run_log_store import RunLogStore
+from core.prompt_preprocess2.ir.ir import Opcode
+
+
+def run_replay(tmp_path):
+    """Just enough of a Replay for RunNodeProcessor: code_dir is tmp_path, logs go to tmp_path/run_logs."""
+    run_logs_dir = tmp_path / "run_logs"
+    return SimpleNamespace(code_dir=str(tmp_path), run_logs_dir=str(run_logs_dir),
+                           run_logs=RunLogStore(str(run_logs_dir)),
+                           state=SimpleNamespace(execution=SimpleNamespace(memory=[])))
+
+
+def run_node(command, **contents):
+    return {'id': '2', 'opcode': Opcode.RUN, 'contents': {"command": command, **contents}}
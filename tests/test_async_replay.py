@@ -0,0 +1,83 @@
+import asyncio
+
+from core.backend.replay import Replay, InputConfig
+
+
+class AsyncClient:
+    """Stub client exposing an awaitable messages.acreate that records overlap."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self.messages = self
+
+    def create(self, **kwargs):
+        raise AssertionError("the async path must not call the blocking client")
+
+    async def acreate(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+
+        class Content:
+            text = '{"files": []}'
+
+        class Response:
+            content = [Content()]
+            usage = {}
+        return Response()
+
+
+def _make_replay(tmp_path, name, client, prompt):
+    prompt_file = tmp_path / f"{name}.txt"
+    prompt_file.write_text(prompt)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir(exist_ok=True)
+    input_config = InputConfig(
+        input_prompt_file=str(prompt_file),
+        project_name=name,
+        output_dir=str(output_dir)
+    )
+    return Replay.from_recipe(input_config, client=client, llm_backend="anthropic_api", disable_git=True)
+
+
+def test_replays_share_one_event_loop(tmp_path):
+    client = AsyncClient()
+    replays = [_make_replay(tmp_path, f"epic{i}", client, "/PROMPT Edit @code:a.py\n") for i in range(3)]
+
+    async def main():
+        await asyncio.gather(*(replay.run_all_async() for replay in replays))
+
+    asyncio.run(main())
+
+    assert client.max_active == 3
+    assert all(not replay.has_steps() for replay in replays)
+
+
+def test_run_step_async_runs_commands(tmp_path):
+    client = AsyncClient(delay=0)
+    replay = _make_replay(tmp_path, "run", client, '/RUN @command:"echo hello"\n')
+
+    asyncio.run(replay.run_all_async())
+
+    run_nodes = [data for _, data in replay.state.execution.epic.graph.nodes(data=True)
+                 if data['opcode'].name == 'RUN']
+    assert run_nodes[0]['contents']['exit_code'] == 0
+    stdout_file = run_nodes[0]['contents']['stdout_file']
+    assert (tmp_path / "output" / "run" / "1" / "replay" / "run_logs" / stdout_file).read_text() == "hello\n"
+
+
+def test_async_dag_scheduler_overlaps_disjoint_prompts(tmp_path):
+    client = AsyncClient()
+    replay = _make_replay(tmp_path, "dag", client,
+                          "/PROMPT Edit @code:a.py\n\n/PROMPT Edit @code:b.py\n\n/PROMPT Edit @code:c.py\n")
+
+    asyncio.run(replay.run_all_async(max_workers=4))
+
+    # The PROMPT nodes write different files, and each works on its own copy of the memory
+    assert client.max_active == 3
+    assert replay.state.execution.step_count == client.calls + 1  # + EXIT node
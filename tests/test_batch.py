@@ -0,0 +1,97 @@
+import json
+import asyncio
+import threading
+
+import pytest
+
+from core.backend.batch import BatchEntry, BatchResult, load_manifest, run_batch, format_summary
+from core.backend.limits import ConcurrencyLimit
+
+
+def test_load_manifest_resolves_relative_prompts(tmp_path):
+    manifest = tmp_path / "batch.json"
+    manifest.write_text(json.dumps([
+        {"prompt_file": "prompts/cosh.txt", "project_name": "cosh"},
+        {"prompt_file": "/abs/acos.txt", "project_name": "acos", "llm_backend": "anthropic_api", "repeat": 2},
+    ]))
+
+    entries = load_manifest(str(manifest))
+
+    assert entries[0] == BatchEntry(str(tmp_path / "prompts" / "cosh.txt"), "cosh")
+    assert entries[1] == BatchEntry("/abs/acos.txt", "acos", "anthropic_api", 2)
+
+
+def test_load_manifest_rejects_duplicate_projects(tmp_path):
+    manifest = tmp_path / "batch.json"
+    manifest.write_text(json.dumps([
+        {"prompt_file": "a.txt", "project_name": "cosh"},
+        {"prompt_file": "b.txt", "project_name": "cosh"},
+    ]))
+    with pytest.raises(ValueError):
+        load_manifest(str(manifest))
+
+
+def test_concurrency_limit_caps_holders():
+    limit = ConcurrencyLimit("test")
+    limit.configure(threading.Semaphore(1))
+    active = []
+    peak = []
+
+    def hold():
+        with limit:
+            active.append(1)
+            peak.append(len(active))
+            active.pop()
+
+    threads = [threading.Thread(target=hold) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 1
+
+
+def test_cancelled_async_acquire_gives_the_slot_back():
+    semaphore = threading.Semaphore(1)
+    limit = ConcurrencyLimit("test")
+    limit.configure(semaphore)
+    semaphore.acquire()
+
+    async def cancel_waiter():
+        async def wait():
+            async with limit:
+                pass
+        waiter = asyncio.ensure_future(wait())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The waiting thread gets the slot after the cancellation and must hand it back
+        semaphore.release()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(cancel_waiter())
+    assert semaphore.acquire(timeout=1)
+
+
+def test_run_batch_with_mock_client(tmp_path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("/PROMPT Write hello.py that prints hello\n")
+    entries = [
+        BatchEntry(str(prompt), "first", "anthropic_api", repeat=2),
+        BatchEntry(str(prompt), "second", "anthropic_api"),
+    ]
+
+    results = run_batch(entries, output_dir=str(tmp_path / "output"), workers=2,
+                        max_llm_requests=1, max_run_commands=1, use_mock=True, disable_git=True)
+
+    assert [(r.project_name, r.version) for r in results] == [("first", "1"), ("first", "2"), ("second", "1")]
+    assert all(r.status != "failed" and r.steps > 0 for r in results), results
+    summary = format_summary(results)
+    assert summary.splitlines()[0].split() == ["project", "version", "status", "steps", "duration"]
+    assert "3 runs, 0 failed" in summary
+
+
+def test_format_summary_reports_failures():
+    results = [BatchResult("cosh", None, "failed", 0, 1.0, error="boom")]
+    assert "1 runs, 1 failed" in format_summary(results)
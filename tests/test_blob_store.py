@@ -0,0 +1,83 @@
+import os
+
+from core.backend.blob_store import BlobStore
+from core.backend.replay import Replay, InputConfig
+
+
+def _tree(root, files):
+    for path, text in files.items():
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write(text)
+
+
+def test_unchanged_sources_are_not_hashed_again(tmp_path):
+    src = tmp_path / "template"
+    _tree(str(src), {"a.py": "a\n", "pkg/b.py": "b\n"})
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = store.ingest(str(src))
+    assert store.stats["hashed"] == 2
+
+    # A new store instance (the next version) reuses the stat cache
+    store = BlobStore(str(tmp_path / "blobs"))
+    assert store.ingest(str(src)).sha == first.sha
+    assert (store.stats["hashed"], store.stats["reused"]) == (0, 2)
+
+    _tree(str(src), {"pkg/b.py": "changed\n"})
+    changed = store.ingest(str(src))
+    assert changed.sha != first.sha
+    assert store.stats["hashed"] == 1
+    assert store.load_tree(changed.sha).entries == changed.entries
+
+
+def test_shared_copies_link_and_private_copies_are_independent(tmp_path):
+    src = tmp_path / "template"
+    _tree(str(src), {"a.py": "a\n", "empty/.keep": ""})
+    os.makedirs(src / "really_empty")
+    os.chmod(src / "a.py", 0o755)
+    store = BlobStore(str(tmp_path / "blobs"))
+    tree = store.ingest(str(src))
+
+    shared_1, shared_2, code = tmp_path / "v1", tmp_path / "v2", tmp_path / "code"
+    store.materialize(tree, str(shared_1))
+    store.materialize(tree, str(shared_2))
+    store.materialize(tree, str(code), private=True)
+
+    assert os.path.isdir(shared_1 / "really_empty")
+    assert os.access(code / "a.py", os.X_OK)
+    if store.stats["hardlinked"]:
+        assert os.stat(shared_1 / "a.py").st_ino == os.stat(shared_2 / "a.py").st_ino
+    assert os.stat(code / "a.py").st_ino != os.stat(shared_1 / "a.py").st_ino
+
+    (code / "a.py").write_text("edited\n")
+    assert (shared_1 / "a.py").read_text() == "a\n"
+    assert (shared_2 / "a.py").read_text() == "a\n"
+
+
+def test_single_file(tmp_path):
+    src = tmp_path / "doc.md"
+    src.write_text("# doc\n")
+    store = BlobStore(str(tmp_path / "blobs"))
+    store.materialize(store.ingest(str(src)), str(tmp_path / "out" / "doc.md"))
+    assert (tmp_path / "out" / "doc.md").read_text() == "# doc\n"
+
+
+def test_versions_share_reference_content(tmp_path):
+    _tree(str(tmp_path / "docs"), {"guide.md": "guide\n"})
+    _tree(str(tmp_path / "template"), {"main.py": "print('hi')\n"})
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("/DOCS docs\n\n/TEMPLATE template\n")
+
+    versions = []
+    for _ in range(2):
+        replay = Replay.from_recipe(InputConfig(input_prompt_file=str(prompt_file), project_name="shared",
+                                                output_dir=str(tmp_path / "output")), use_mock=True, disable_git=True)
+        replay.compile()
+        versions.append(replay)
+
+    for replay in versions:
+        assert open(os.path.join(replay.docs_dir, "docs", "guide.md")).read() == "guide\n"
+        assert open(os.path.join(replay.code_dir, "main.py")).read() == "print('hi')\n"
+    docs = [os.stat(os.path.join(replay.docs_dir, "docs", "guide.md")) for replay in versions]
+    assert docs[0].st_ino == docs[1].st_ino
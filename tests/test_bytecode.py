@@ -0,0 +1,60 @@
+from core.backend.replay import ExecutionState
+from core.prompt_preprocess2.processor3 import prompt_preprocess3
+from core.prompt_preprocess2.ir.bytecode import HALT, lower_to_bytecode
+from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+
+PROMPT = '/PROMPT Write @code:a.py\n\n/DEBUG_LOOP @command:"python a.py"\n\n/PROMPT Done\n'
+
+
+def _compile(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(PROMPT)
+    replay_dir = tmp_path / "replay"
+    replay_dir.mkdir()
+    return prompt_preprocess3(str(prompt_file), str(replay_dir))
+
+
+def _trace(program, conditions):
+    """Node names executed when the CONDITIONALs evaluate to the given results in turn."""
+    conditions = iter(conditions)
+    pc, trace = 0, []
+    while pc != HALT:
+        trace.append(program.node_name(pc))
+        condition = next(conditions) if program.opcode(pc) == Opcode.CONDITIONAL else None
+        pc = program.step(pc, condition)
+    return trace
+
+
+def test_debug_loop_lowers_to_back_edge(tmp_path):
+    program = _compile(tmp_path).program
+    # The FIX jumps back to the RUN instead of being emitted again
+    assert _trace(program, [False, False, True]) == [
+        "prompt_1", "run_6", "conditional_7", "fix_8", "run_6", "conditional_7", "fix_8",
+        "run_6", "conditional_7", "prompt_3", "exit_node_4"]
+    assert len(program) == 6
+    assert program.pc_of("run_6") == 1
+
+
+def test_program_round_trips_with_epic(tmp_path):
+    epic = _compile(tmp_path)
+    data = epic.to_dict()
+    assert set(data["program"]) == {"names", "code"}
+
+    loaded = EpicIR.from_dict(data).program
+    assert list(loaded.next) == list(epic.program.next)
+    assert list(loaded.alt) == list(epic.program.alt)
+    assert [loaded.node_name(pc) for pc in range(len(loaded))] == \
+        [epic.program.node_name(pc) for pc in range(len(epic.program))]
+
+
+def test_old_checkpoint_resumes_at_current_node(tmp_path):
+    epic = _compile(tmp_path)
+    data = {"current_node_id": "fix_8", "control_flow_graph_queue": ["fix_8"], "epic": epic.to_dict()}
+    del data["epic"]["program"]
+
+    # Epics saved before the bytecode stage are lowered when loaded
+    execution = ExecutionState.from_dict(data)
+    assert list(execution.epic.program.next) == list(epic.program.next)
+    assert execution.pc == 3
+    assert execution.epic.program.step(execution.pc) == lower_to_bytecode(epic).pc_of("run_6")
+    assert ExecutionState.from_dict({**data, "current_node_id": None}).pc == HALT
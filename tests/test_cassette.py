@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from core.backend.replay import Replay, InputConfig
+from core.backend.client.cassette import CassetteClient, CassetteMismatchError
+
+
+def _replay(tmp_path, prompt, **kwargs):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(prompt)
+    input_config = InputConfig(
+        input_prompt_file=str(prompt_file),
+        project_name="recorded",
+        output_dir=str(tmp_path / "output")
+    )
+    return Replay.from_recipe(input_config, llm_backend="anthropic_api", disable_git=True, **kwargs)
+
+
+def _read_code(replay):
+    files = {}
+    for root, _, names in os.walk(replay.code_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path) as f:
+                files[os.path.relpath(path, replay.code_dir)] = f.read()
+    return files
+
+
+PROMPT = "/PROMPT Write a.py @code:a.py\n\n/PROMPT Write b.py @code:b.py\n"
+
+
+def test_replay_from_serves_recorded_responses(tmp_path):
+    recorded = _replay(tmp_path, PROMPT, use_mock=True)
+    recorded.run_all()
+
+    replayed = _replay(tmp_path, PROMPT, replay_from="recorded/1")
+    replayed.run_all()
+
+    cassette = replayed.client.client
+    assert isinstance(cassette, CassetteClient)
+    assert cassette.remaining() == 0
+    assert _read_code(replayed) == _read_code(recorded)
+    # The replayed run records its own transcripts
+    assert len(os.listdir(os.path.join(replayed.version_dir, "client"))) == len(os.listdir(os.path.join(recorded.version_dir, "client")))
+
+
+def test_replay_from_detects_changed_requests(tmp_path):
+    _replay(tmp_path, PROMPT, use_mock=True).run_all()
+
+    changed = _replay(tmp_path, PROMPT.replace("Write b.py", "Write c.py"), replay_from="recorded/1")
+    with pytest.raises(CassetteMismatchError):
+        changed.run_all()
+
+
+def test_replay_from_warn_serves_changed_requests(tmp_path):
+    _replay(tmp_path, PROMPT, use_mock=True).run_all()
+
+    changed = _replay(tmp_path, PROMPT.replace("Write b.py", "Write c.py"), replay_from="recorded/1",
+                      replay_mismatch="warn")
+    changed.run_all()
+    assert changed.client.client.remaining() == 0
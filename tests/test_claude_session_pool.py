@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import sys
+
+from core.backend.client import claude_code_client_wrapper
+from core.backend.client.claude_code_client_wrapper import ClaudeCodeClientWrapper
+from core.backend.client.claude_session_pool import ClaudeSessionPool
+
+
+FAKE_CLI = '''import json, os, sys
+args = sys.argv[1:]
+if "--input-format" not in args:
+    sys.stderr.write("error: unknown option --input-format\\n")
+    sys.exit(1)
+resume = args[args.index("--resume") + 1] if "--resume" in args else None
+for turn, line in enumerate(sys.stdin, 1):
+    prompt = json.loads(line)["message"]["content"]
+    reply = {"pid": os.getpid(), "turn": turn, "resume": resume, "prompt": prompt}
+    print(json.dumps({"type": "system", "subtype": "init"}), flush=True)
+    print(json.dumps({"type": "assistant", "message": {"content": [{"type": "text", "text": json.dumps(reply)}]}}), flush=True)
+    print(json.dumps({"type": "result", "subtype": "success", "duration_ms": 1, "duration_api_ms": 1,
+                      "is_error": False, "num_turns": 1, "session_id": "session-%d" % os.getpid()}), flush=True)
+'''
+
+
+def _fake_cli(tmp_path, source=FAKE_CLI):
+    script = tmp_path / "claude"
+    script.write_text(f"#!{sys.executable}\n" + source)
+    script.chmod(0o755)
+    return str(script)
+
+
+def _wrapper(tmp_path, cli_path, max_turns=20):
+    wrapper = ClaudeCodeClientWrapper(str(tmp_path / "version"), max_session_turns=max_turns)
+    wrapper.session_pool.cli_path = cli_path
+    return wrapper
+
+
+def _ask(wrapper, text, system="system prompt"):
+    response = wrapper.messages.create(model="sonnet", system=system, messages=[{"role": "user", "content": text}])
+    return json.loads(response.content[0].text)
+
+
+def test_sessions_are_reused_and_recycled(tmp_path):
+    wrapper = _wrapper(tmp_path, _fake_cli(tmp_path), max_turns=2)
+    try:
+        first, second, third = (_ask(wrapper, f"request {i}") for i in range(3))
+        assert first["pid"] == second["pid"]
+        assert (first["turn"], second["turn"]) == (1, 2)
+        # The replacement session continues the conversation of the recycled one
+        assert third["pid"] != first["pid"]
+        assert third["resume"] == f"session-{second['pid']}"
+        # A different system prompt needs its own session
+        assert _ask(wrapper, "other", system="another prompt")["pid"] not in (first["pid"], third["pid"])
+        assert wrapper.session_pool.stats()["reused"] == 1
+    finally:
+        wrapper.close()
+
+
+def test_async_requests_use_the_pool(tmp_path):
+    wrapper = _wrapper(tmp_path, _fake_cli(tmp_path))
+
+    async def ask_twice():
+        kwargs = dict(model="sonnet", system="s", messages=[{"role": "user", "content": "hi"}])
+        return await asyncio.gather(wrapper.messages.acreate(**kwargs), wrapper.messages.acreate(**kwargs))
+
+    try:
+        replies = [json.loads(r.content[0].text) for r in asyncio.run(ask_twice())]
+        # Concurrent requests with the same key queue for one session, so the conversation stays linear
+        assert replies[0]["pid"] == replies[1]["pid"]
+        assert sorted(reply["turn"] for reply in replies) == [1, 2]
+        assert wrapper.session_pool.stats()["started"] == 1
+    finally:
+        wrapper.close()
+
+
+def test_dead_session_is_replaced(tmp_path):
+    wrapper = _wrapper(tmp_path, _fake_cli(tmp_path))
+    try:
+        first = _ask(wrapper, "one")
+        os.kill(first["pid"], 9)
+        assert _ask(wrapper, "two")["pid"] != first["pid"]
+    finally:
+        wrapper.close()
+
+
+def test_falls_back_to_one_shot_queries(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_query(prompt, options):
+        from claude_code_sdk import AssistantMessage, TextBlock
+        calls.append(prompt)
+        yield AssistantMessage(content=[TextBlock(text='{"files": []}')])
+
+    monkeypatch.setattr(claude_code_client_wrapper, "query", fake_query)
+    wrapper = _wrapper(tmp_path, _fake_cli(tmp_path, "import sys\nsys.exit(2)\n"))
+    try:
+        response = wrapper.messages.create(model="sonnet", system="s", messages=[{"role": "user", "content": "hi"}])
+        assert response.content[0].text == '{"files": []}'
+        assert wrapper.session_pool is None
+        assert calls == ["hi"]
+    finally:
+        wrapper.close()
+
+
+def test_pool_keys_on_working_directory():
+    from claude_code_sdk import ClaudeCodeOptions
+    a = ClaudeSessionPool.key(ClaudeCodeOptions(system_prompt="s", cwd="/a"))
+    b = ClaudeSessionPool.key(ClaudeCodeOptions(system_prompt="s", cwd="/b"))
+    assert a != b
@@ -0,0 +1,122 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+import networkx as nx
+
+from core.backend.code_index import CodeIndex
+from core.backend.ignore_rules import IgnoreRules
+from core.backend.processors.fix_node_processor import FixNodeProcessor
+from core.backend.run_log_store import RunLogStore
+from core.prompt_preprocess2.ir.ir import Opcode
+
+DROPOUT_TEMPLATE = os.path.join(os.path.dirname(__file__), "..", "examples", "templates", "ttnn",
+                                "unary_op_example_dropout")
+
+
+def _write(root, path, text=""):
+    full_path = root / path
+    full_path.parent.mkdir(parents=True, exist_ok=True)
+    full_path.write_text(text)
+
+
+def test_ignore_rules():
+    rules = IgnoreRules()
+    rules.add("", ["# comment", "*.log", "!keep.log", "/out", "tmp/", "docs/**/*.png"])
+    rules.add("sub", ["generated.py"])
+    assert rules.ignored("a/b/run.log", is_dir=False)
+    assert not rules.ignored("a/keep.log", is_dir=False)
+    assert rules.ignored("out", is_dir=True) and not rules.ignored("src/out", is_dir=True)
+    assert rules.ignored("src/tmp", is_dir=True) and not rules.ignored("src/tmp", is_dir=False)
+    assert rules.ignored("docs/a/b/figure.png", is_dir=False) and not rules.ignored("figure.png", is_dir=False)
+    assert rules.ignored("sub/x/generated.py", is_dir=False) and not rules.ignored("generated.py", is_dir=False)
+
+
+def test_index_is_recursive_respects_ignores_and_refreshes_incrementally(tmp_path):
+    _write(tmp_path, ".gitignore", "*.log\nbuild_out/\n")
+    _write(tmp_path, "pkg/.replayignore", "scratch.py\n")
+    _write(tmp_path, "pkg/__init__.py")
+    _write(tmp_path, "pkg/ops.py", "from .util import clamp\n\nclass Dropout:\n    def forward(self, x):\n        return clamp(x)\n")
+    _write(tmp_path, "pkg/util.py", "def clamp(x):\n    return x\n")
+    _write(tmp_path, "pkg/scratch.py", "def scratch():\n    pass\n")
+    _write(tmp_path, "main.py", "import pkg.ops\n")
+    _write(tmp_path, "run.log", "old output")
+    _write(tmp_path, "build_out/gen.py", "def generated():\n    pass\n")
+    _write(tmp_path, ".git/HEAD", "ref: refs/heads/main\n")
+
+    index = CodeIndex(str(tmp_path))
+    assert index.refresh() == 4
+    assert sorted(index.files) == ["main.py", "pkg/__init__.py", "pkg/ops.py", "pkg/util.py"]
+    assert index.files["pkg/ops.py"].symbols == {"Dropout", "forward"}
+    assert index.files["pkg/ops.py"].imports == ["pkg/util.py"]
+    assert index.files["main.py"].imports == ["pkg/ops.py"]
+    assert index.by_symbol["clamp"] == {"pkg/util.py"}
+
+    # Nothing changed: nothing is re-read
+    assert index.refresh() == 0
+    _write(tmp_path, "pkg/util.py", "def clamp(x, low=0.0):\n    return max(x, low)\n\ndef saturate(x):\n    return x\n")
+    os.remove(tmp_path / "main.py")
+    assert index.refresh() == 2
+    assert "main.py" not in index.files
+    assert index.by_symbol["saturate"] == {"pkg/util.py"}
+
+
+def test_dropout_template_selection(tmp_path):
+    code_dir = tmp_path / "code"
+    shutil.copytree(DROPOUT_TEMPLATE, code_dir)
+    index = CodeIndex(str(code_dir))
+
+    # A compiler error, printed with the path the file has in the tt-metal tree
+    selection = index.select([{
+        "kind": "compiler", "line": 72, "column": 40,
+        "file": "/work/tt-metal/ttnn/cpp/ttnn/operations/experimental/dropout/device/dropout_program_factory.cpp",
+        "message": "no matching function for call to 'ReaderDataMovementConfig'"}])
+    assert selection.editable == ["device/dropout_program_factory.cpp"]
+    assert selection.neighbours == ["device/dropout_program_factory.hpp", "device/dropout_device_operation_types.hpp"]
+
+    # A linker error names no file of the template, only a symbol one of them defines
+    selection = index.select([{"kind": "linker",
+                               "message": "undefined reference to `ttnn::operations::experimental::dropout::"
+                                          "DropoutProgramFactory::override_runtime_arguments'"}])
+    assert selection.editable == ["device/dropout_program_factory.cpp", "device/dropout_program_factory.hpp"]
+
+
+def _fix_replay(tmp_path, code_dir, run_contents):
+    run_logs_dir = tmp_path / "run_logs"
+    run_logs_dir.mkdir()
+    (run_logs_dir / "run_1_0_stderr.txt").write_text(run_contents.pop("stderr", ""))
+    (run_logs_dir / "run_1_0_stdout.txt").write_text("")
+    graph = nx.DiGraph()
+    graph.add_node("run_1", id="run_1", opcode=Opcode.RUN,
+                   contents={"command": "make", "stderr_file": "run_1_0_stderr.txt",
+                             "stdout_file": "run_1_0_stdout.txt", **run_contents})
+    return SimpleNamespace(code_dir=str(code_dir), run_logs_dir=str(run_logs_dir),
+                           run_logs=RunLogStore(str(run_logs_dir)), code_index=CodeIndex(str(code_dir)),
+                           state=SimpleNamespace(execution=SimpleNamespace(memory=[], epic=SimpleNamespace(graph=graph))))
+
+
+def test_fix_sends_the_selected_files(tmp_path):
+    code_dir = tmp_path / "code"
+    shutil.copytree(DROPOUT_TEMPLATE, code_dir)
+    fix_node = {'id': 'fix_1', 'contents': {"run_ref": "run_1"}}
+    replay = _fix_replay(tmp_path, code_dir, {"diagnostics": [{
+        "kind": "compiler", "file": "device/kernels/compute/dropout_kernel.cpp", "line": 12,
+        "message": "'dropout_tile_init' was not declared in this scope"}]})
+
+    llm_request = FixNodeProcessor()._prepare_llm_request(replay, fix_node)
+    assert [ref.path for ref in llm_request.code_to_edit] == ["device/kernels/compute/dropout_kernel.cpp"]
+    assert "device/kernels/compute/dropout_kernel.cpp" not in llm_request.read_only_files
+
+    # Without diagnostics the log tail is searched, subdirectories included
+    (tmp_path / "2").mkdir()
+    replay = _fix_replay(tmp_path / "2", code_dir, {
+        "stderr": "device/kernels/dataflow/unary_writer.cpp:30:5: error: expected ';' before '}' token\n"})
+    llm_request = FixNodeProcessor()._prepare_llm_request(replay, fix_node)
+    assert [ref.path for ref in llm_request.code_to_edit] == ["device/kernels/dataflow/unary_writer.cpp"]
+
+    # Nothing matches: every top-level file, as before the index
+    (tmp_path / "3").mkdir()
+    replay = _fix_replay(tmp_path / "3", code_dir, {"stderr": "Segmentation fault (core dumped)\n"})
+    llm_request = FixNodeProcessor()._prepare_llm_request(replay, fix_node)
+    assert sorted(ref.path for ref in llm_request.code_to_edit) == sorted(
+        name for name in os.listdir(code_dir) if os.path.isfile(code_dir / name))
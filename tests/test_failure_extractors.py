@@ -0,0 +1,181 @@
+import sys
+from types import SimpleNamespace
+
+import networkx as nx
+
+from core.backend.processors import failure_extractors
+from core.backend.processors.failure_extractors import Diagnostic, FailureExtractor, extract_failures, extractor
+from core.backend.processors.fix_node_processor import FixNodeProcessor
+from core.backend.processors.run_node_processor import RunNodeProcessor
+from core.backend.run_log_store import RunLogStore
+from core.prompt_preprocess2.ir.ir import Opcode
+
+PYTEST_OUTPUT = """\
+============================= test session starts ==============================
+collected 5 items
+
+test_sample.py .F.FF                                                     [100%]
+
+=================================== FAILURES ===================================
+__________________________________ test_math ___________________________________
+
+    def test_math():
+>       assert 1 + 1 == 3
+E       assert (1 + 1) == 3
+
+test_sample.py:10: AssertionError
+______________________________ TestThing.test_key ______________________________
+
+self = <test_sample.TestThing object at 0x7f>
+
+    def test_key(self):
+>       helper("b")
+
+test_sample.py:14:
+_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _
+
+    def helper(x):
+>       return {"a": 1}[x]
+E       KeyError: 'b'
+
+test_sample.py:4: KeyError
+=========================== short test summary info ============================
+FAILED test_sample.py::test_math - assert (1 + 1) == 3
+FAILED test_sample.py::TestThing::test_key - KeyError: 'b'
+2 failed, 3 passed in 0.11s
+"""
+
+JUNIT_REPORT = """\
+<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" errors="0" failures="2" tests="5">
+<testcase classname="test_sample" name="test_ok" time="0.001" />
+<testcase classname="test_sample" name="test_math" time="0.001">
+<failure message="assert (1 + 1) == 3">def test_math():
+&gt;       assert 1 + 1 == 3
+E       assert (1 + 1) == 3</failure></testcase>
+<testcase classname="test_sample.TestThing" name="test_key" time="0.001">
+<failure message="KeyError: 'b'">KeyError: 'b'</failure></testcase>
+<testcase classname="test_other" name="test_timeout" time="60.0">
+<error>Traceback (most recent call last):
+TimeoutError: took too long</error></testcase>
+</testsuite></testsuites>
+"""
+
+BUILD_OUTPUT = """\
+-- The CXX compiler identification is GNU 12.2.0
+CMake Error at CMakeLists.txt:3 (find_package):
+  By not providing "FindTTMetal.cmake" in CMAKE_MODULE_PATH this
+  project has asked CMake to find a package.
+
+  Could not find a package configuration file provided by "TTMetal".
+
+
+-- Configuring incomplete, errors occurred!
+[ 50%] Building CXX object CMakeFiles/kernel.dir/kernel.cpp.o
+kernel.cpp: In function 'int main()':
+kernel.cpp:4:5: error: 'unknown_t' was not declared in this scope
+    4 |     unknown_t x;
+      |     ^~~~~~~~~
+kernel.cpp:4:5: error: 'unknown_t' was not declared in this scope
+kernel.cpp:9:1: warning: unused variable 'y'
+/usr/bin/ld: /tmp/ccL8i5kF.o: in function `main':
+host.cpp:(.text+0x5): undefined reference to `launch()'
+collect2: error: ld returned 1 exit status
+Traceback (most recent call last):
+  File "run_kernel.py", line 12, in <module>
+    main()
+  File "run_kernel.py", line 8, in main
+    raise RuntimeError("device not found")
+RuntimeError: device not found
+"""
+
+
+def _formatted(diagnostics):
+    return [diagnostic.format() for diagnostic in diagnostics]
+
+
+def test_pytest_and_junit_failures_are_merged(tmp_path):
+    log = tmp_path / "stdout.txt"
+    log.write_text(PYTEST_OUTPUT)
+    report = tmp_path / "report.xml"
+    report.write_text(JUNIT_REPORT)
+
+    assert _formatted(extract_failures([str(log)])) == [
+        "test_sample.py::test_math (test_sample.py:10): assert (1 + 1) == 3",
+        "test_sample.py::TestThing::test_key (test_sample.py:4): KeyError: 'b'",
+    ]
+    # The JUnit report adds the errored test; the ones pytest printed aren't repeated
+    diagnostics = extract_failures([str(log)], str(report))
+    assert [diagnostic.test_id for diagnostic in diagnostics] == [
+        "test_sample.py::test_math", "test_sample.py::TestThing::test_key", "test_other::test_timeout"]
+    assert diagnostics[2].message == "TimeoutError: took too long"
+
+
+def test_build_failures(tmp_path):
+    log = tmp_path / "stderr.txt"
+    log.write_text(BUILD_OUTPUT)
+    diagnostics = extract_failures([str(log)])
+    assert _formatted(diagnostics) == [
+        "kernel.cpp:4:5: 'unknown_t' was not declared in this scope",
+        "host.cpp: undefined reference to `launch()'",
+        'CMakeLists.txt:3: By not providing "FindTTMetal.cmake" in CMAKE_MODULE_PATH this project has asked '
+        'CMake to find a package.',
+        "run_kernel.py:8: RuntimeError: device not found",
+    ]
+    assert [diagnostic.kind for diagnostic in diagnostics] == ["compiler", "linker", "cmake", "traceback"]
+
+
+def test_extractors_are_pluggable(tmp_path, monkeypatch):
+    monkeypatch.setattr(failure_extractors, "EXTRACTORS", dict(failure_extractors.EXTRACTORS))
+
+    @extractor("panic")
+    class PanicExtractor(FailureExtractor):
+        def __init__(self):
+            self.diagnostics = []
+
+        def feed(self, line):
+            if line.startswith("thread 'main' panicked at "):
+                self.diagnostics.append(Diagnostic("panic", line.split(" at ", 1)[1]))
+
+        def close(self):
+            return self.diagnostics
+
+    log = tmp_path / "stderr.txt"
+    log.write_text("thread 'main' panicked at src/main.rs:3:5\n")
+    assert "panic" in failure_extractors.EXTRACTORS
+    (diagnostic,) = extract_failures([str(log)], extractors=["panic"])
+    assert diagnostic.message == "src/main.rs:3:5"
+
+
+def test_fix_gets_diagnostics_instead_of_log_tails(tmp_path):
+    code_dir = tmp_path / "code"
+    code_dir.mkdir()
+    (code_dir / "test_sample.py").write_text("def test_math():\n    assert 1 + 1 == 3\n\ndef test_ok():\n    pass\n")
+    run_logs_dir = tmp_path / "run_logs"
+    graph = nx.DiGraph()
+    run_node = {'id': 'run_1', 'opcode': Opcode.RUN,
+                'contents': {"command": f"{sys.executable} -m pytest -q -p no:cacheprovider --junitxml=report.xml",
+                             "junit": "report.xml"}}
+    graph.add_node("run_1", **run_node)
+    replay = SimpleNamespace(code_dir=str(code_dir), run_logs_dir=str(run_logs_dir),
+                             run_logs=RunLogStore(str(run_logs_dir)),
+                             state=SimpleNamespace(execution=SimpleNamespace(memory=[], epic=SimpleNamespace(graph=graph))))
+
+    RunNodeProcessor().process(replay, graph.nodes["run_1"])
+    contents = graph.nodes["run_1"]["contents"]
+    assert contents['exit_code'] == 1
+    assert contents['diagnostics'] == [{"kind": "pytest", "message": "assert (1 + 1) == 3",
+                                        "file": "test_sample.py", "line": 2, "test_id": "test_sample.py::test_math"}]
+    assert contents['diagnostics_file'] == "run_1_0_diagnostics.txt"
+
+    llm_request = FixNodeProcessor()._prepare_llm_request(replay, {'id': 'fix_1', 'contents': {"run_ref": "run_1"}})
+    (run_log,) = llm_request.run_logs_files
+    assert run_log.path == "run_1_0_diagnostics.txt"
+    assert "- test_sample.py::test_math (test_sample.py:2): assert (1 + 1) == 3" in run_log.content
+    assert len(run_log.content) < len(replay.run_logs.read(contents['stdout_file'])) / 2
+
+    # A passing run leaves no stale diagnostics behind
+    (code_dir / "test_sample.py").write_text("def test_math():\n    assert 1 + 1 == 2\n")
+    RunNodeProcessor().process(replay, graph.nodes["run_1"])
+    assert contents['exit_code'] == 0
+    assert "diagnostics" not in contents and "diagnostics_file" not in contents
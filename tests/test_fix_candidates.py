@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import threading
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+
+from core.backend.replay import Replay, InputConfig
+from core.backend.processors.fix_candidates import FixCandidates, score_output
+from core.backend.processors.fix_node_processor import FixNodeProcessor, LLMRequest
+from core.prompt_preprocess2.ir.ir import Opcode
+
+FAILING = "import sys\nprint('error: not yet')\nsys.exit(1)\n"
+PASSING = "print('ok')\n"
+
+
+class CandidateClient:
+    """Stub client: the PROMPT writes a failing check.py, only the second FIX request fixes it."""
+
+    def __init__(self):
+        self.fix_calls = 0
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, **kwargs):
+        content = kwargs['messages'][0]['content']
+        contents = FAILING
+        if 'run_logs_files' in content:
+            with self._lock:
+                self.fix_calls += 1
+                if self.fix_calls == 2:
+                    contents = PASSING
+        text = json.dumps({"files": [{"path_and_filename": "check.py", "contents": contents}]})
+
+        class Content:
+            pass
+        Content.text = text
+
+        class Response:
+            content = [Content()]
+            usage = {}
+        return Response()
+
+
+def test_score_output_prefers_fewer_errors():
+    assert score_output("ok\n", "") > score_output("error: a\n", "error: b\n")
+
+
+def _run_candidates(tmp_path, client, **kwargs):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(
+        "/PROMPT Write check.py @code:check.py\n\n"
+        "/DEBUG_LOOP @command:\"python check.py\" @candidates:3\n"
+    )
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    input_config = InputConfig(
+        input_prompt_file=str(prompt_file),
+        project_name="candidates",
+        output_dir=str(output_dir)
+    )
+    replay = Replay.from_recipe(input_config, client=client, llm_backend="anthropic_api", disable_git=True, **kwargs)
+    replay.run_all()
+    return replay
+
+
+def test_debug_loop_candidates_promote_passing_fix(tmp_path):
+    output_dir = tmp_path / "output"
+    replay = _run_candidates(tmp_path, CandidateClient())
+
+    graph = replay.state.execution.epic.graph
+    run_node = next(data for _, data in graph.nodes(data=True) if data['opcode'] == Opcode.RUN)
+    fix_node = next(data for _, data in graph.nodes(data=True) if data['opcode'] == Opcode.FIX)
+    assert run_node['contents']['command'] == "python check.py"
+    assert fix_node['contents']['candidates'] == 3
+    rounds = fix_node['contents']['candidate_rounds']
+    assert len(rounds) == 1 and rounds[0]['passed']
+    assert run_node['contents']['exit_code'] == 0
+    assert (output_dir / "candidates" / "1" / "code" / "check.py").read_text() == PASSING
+
+
+def test_cached_candidates_send_distinct_requests(tmp_path):
+    client = CandidateClient()
+    replay = _run_candidates(tmp_path, client, cache_mode="read")
+
+    # One PROMPT entry plus one per candidate; identical requests would have shared an entry
+    assert client.fix_calls == 3
+    entries = [name for _, _, files in os.walk(replay.cache_dir) for name in files if name.endswith(".json")]
+    assert len(entries) == 4
+
+
+def _candidate_replay(tmp_path, llm_backend_name="anthropic_api"):
+    code_dir = tmp_path / "code"
+    code_dir.mkdir()
+    (code_dir / "check.py").write_text(FAILING)
+    graph = nx.DiGraph()
+    graph.add_node("run_1", id="run_1", opcode=Opcode.RUN, contents={"command": "python check.py"})
+    return SimpleNamespace(code_dir=str(code_dir), replay_dir=str(tmp_path / "replay"), client=None,
+                           llm_backend_name=llm_backend_name,
+                           state=SimpleNamespace(execution=SimpleNamespace(memory=[], epic=SimpleNamespace(graph=graph))))
+
+
+def test_losing_candidates_are_killed_and_removed(tmp_path):
+    replay = _candidate_replay(tmp_path)
+    started = tmp_path / "slow_started"
+    # The first answer passes; the second starts a check that would run for a minute
+    answers = [PASSING, f"import time\nopen({str(started)!r}, 'w').close()\ntime.sleep(60)\n"]
+    answers_lock = threading.Lock()
+    processor = FixNodeProcessor()
+
+    def send(replay, llm_request):
+        with answers_lock:
+            contents = answers.pop()
+        if contents == PASSING:
+            # Let the slow candidate start its check first
+            while not started.exists():
+                time.sleep(0.01)
+        return {"files": [{"path_and_filename": "check.py", "contents": contents}]}
+    processor._send_llm_request = send
+
+    node = {'id': 'fix_1', 'contents': {"run_ref": "run_1"}}
+    candidates = FixCandidates(processor, replay, node, 2)
+    began = time.monotonic()
+    winner = candidates.run(LLMRequest(prompt="", code_to_edit=[], read_only_files=[], run_logs_files=[], memory=[]))
+    assert winner.passed
+    assert (tmp_path / "code" / "check.py").read_text() == PASSING
+
+    # The slow check was killed rather than left holding its RUN slot, and both copies are gone
+    deadline = time.monotonic() + 10
+    while os.path.exists(candidates.work_dir) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(candidates.work_dir)
+    assert time.monotonic() - began < 30
+
+
+def test_candidates_refuse_claude_code(tmp_path):
+    replay = _candidate_replay(tmp_path, llm_backend_name="claude_code")
+    with pytest.raises(ValueError, match="claude_code"):
+        FixCandidates(FixNodeProcessor(), replay, {'id': 'fix_1', 'contents': {"run_ref": "run_1"}}, 2)
@@ -0,0 +1,149 @@
+import os
+import time
+import subprocess
+
+from core.backend.git_commit_engine import FastImportCommitEngine
+from core.backend.ignore_rules import IgnoreRules
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True, check=True).stdout
+
+
+def _write(repo, path, text):
+    full = os.path.join(repo, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+
+
+def _repo(tmp_path):
+    repo = str(tmp_path / "version")
+    os.makedirs(repo)
+    _git(repo, "init", "-q")
+    return repo
+
+
+def _engine(repo):
+    engine = FastImportCommitEngine(repo)
+    engine.start()
+    return engine
+
+
+def _changed_files(repo, rev="HEAD"):
+    return sorted(_git(repo, "show", "--name-status", "--format=", rev).splitlines())
+
+
+def test_commits_only_changed_paths(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "code/a.py", "a = 1\n")
+    _write(repo, "code/b.py", "b = 1\n")
+    _write(repo, "replay/run_logs/1.log", "ok\n")
+    _write(repo, "replay/candidates/.gitignore", "*\n")
+    _write(repo, "replay/candidates/0/code/a.py", "scratch\n")
+
+    engine = _engine(repo)
+    assert engine.commit("Initial project setup")
+    _write(repo, "code/a.py", "a = 2\n")
+    os.remove(os.path.join(repo, "replay/run_logs/1.log"))
+    assert engine.commit("Step 1")
+    assert engine.commit("Step 2")  # nothing changed: no commit
+    assert engine.close()
+
+    assert _git(repo, "log", "--format=%s").splitlines() == ["Step 1", "Initial project setup"]
+    assert _changed_files(repo) == ["D\treplay/run_logs/1.log", "M\tcode/a.py"]
+    assert "replay/candidates/0/code/a.py" not in _git(repo, "ls-files")
+    # The index follows the new HEAD, so the working tree is clean
+    assert _git(repo, "status", "--porcelain") == ""
+
+
+def test_flush_makes_commits_visible(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "a.txt", "1\n")
+    engine = _engine(repo)
+    engine.commit("first")
+    assert engine.flush()
+    assert _git(repo, "log", "--format=%s").strip() == "first"
+    engine.close()
+
+
+def test_refs_move_with_every_commit(tmp_path):
+    repo = _repo(tmp_path)
+    engine = _engine(repo)
+    for step in range(2):
+        _write(repo, "a.txt", f"{step}\n")
+        engine.commit(f"step {step}")
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        log = subprocess.run(["git", "log", "--format=%s"], cwd=repo, capture_output=True, text=True).stdout
+        if log.splitlines() == ["step 1", "step 0"]:
+            break
+        time.sleep(0.05)
+    # A run that crashes now, before any flush() or close(), keeps its step commits
+    engine._process.kill()
+    engine._process.wait()
+    assert _git(repo, "log", "--format=%s").splitlines() == ["step 1", "step 0"]
+
+
+def test_next_process_continues_from_stat_cache(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "a.txt", "1\n")
+    _write(repo, "b.txt", "2\n")
+    engine = _engine(repo)
+    engine.commit("first")
+    engine.close()
+
+    engine = _engine(repo)
+    assert not engine.full_snapshot
+    # Files written within the last seconds are re-read, but unchanged contents aren't committed
+    assert engine.commit("unchanged")
+    _write(repo, "b.txt", "3\n")
+    engine.commit("second")
+    engine.close()
+    assert _git(repo, "log", "--format=%s").splitlines() == ["second", "first"]
+    assert _changed_files(repo) == ["M\tb.txt"]
+
+
+def test_same_size_rewrite_within_racy_window_is_detected(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "a.txt", "1\n")
+    engine = _engine(repo)
+    engine.commit("first")
+    st = os.stat(os.path.join(repo, "a.txt"))
+    _write(repo, "a.txt", "2\n")
+    os.utime(os.path.join(repo, "a.txt"), ns=(st.st_atime_ns, st.st_mtime_ns))
+    engine.commit("second")
+    engine.close()
+    assert _git(repo, "show", "HEAD:a.txt") == "2\n"
+
+
+def test_missing_cache_snapshots_whole_tree(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "a.txt", "1\n")
+    _write(repo, "b.txt", "2\n")
+    engine = _engine(repo)
+    engine.commit("first")
+    engine.close()
+    os.remove(engine.cache_path)
+    os.remove(os.path.join(repo, "a.txt"))
+
+    engine = _engine(repo)
+    assert engine.full_snapshot
+    engine.commit("second")
+    engine.close()
+    assert _git(repo, "ls-tree", "-r", "--name-only", "HEAD").split() == ["b.txt"]
+
+
+def test_ignore_rules(tmp_path):
+    (tmp_path / "root").write_text("# build output\n*.o\nbuild/\n!keep.o\n")
+    (tmp_path / "sub").write_text("/local.txt\n")
+    rules = IgnoreRules()
+    rules.load(str(tmp_path / "root"), "")
+    rules.load(str(tmp_path / "sub"), "sub")
+    assert rules.ignored("x/y.o", False)
+    assert not rules.ignored("x/keep.o", False)
+    assert rules.ignored("build", True)
+    assert not rules.ignored("build", False)
+    assert rules.ignored("sub/local.txt", False)
+    assert not rules.ignored("sub/deeper/local.txt", False)
+    assert not rules.ignored("local.txt", False)
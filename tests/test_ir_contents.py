@@ -0,0 +1,98 @@
+import json
+import pickle
+
+import networkx as nx
+
+from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+from core.prompt_preprocess2.ir.contents import RunContents, ConditionalContents, make_contents
+from core.prompt_preprocess2.ir.graph import IRGraph
+
+
+def _epic():
+    epic = EpicIR()
+    run = epic.add_node(Opcode.RUN, {"command": "make test"})
+    conditional = epic.add_node(Opcode.CONDITIONAL, {"iteration_count": 0, "run_node_id": run})
+    fix = epic.add_node(Opcode.FIX, {"run_ref": run})
+    exit_node = epic.add_node(Opcode.EXIT)
+    epic.graph.add_edge(run, conditional)
+    epic.graph.add_edge(conditional, exit_node)
+    epic.graph.add_edge(conditional, fix)
+    epic.graph.add_edge(fix, run)
+    return epic, run, conditional, fix, exit_node
+
+
+def test_contents_behave_like_dicts():
+    contents = RunContents({"command": "make"})
+    assert isinstance(make_contents(Opcode.RUN), RunContents)
+    assert contents == {"command": "make"}
+    assert contents.get("exit_code") is None and "exit_code" not in contents
+    contents["exit_code"] = 2
+    contents["custom"] = [1]  # not a declared field
+    assert dict(contents) == {"command": "make", "exit_code": 2, "custom": [1]}
+    assert contents.setdefault("exit_code", 0) == 2
+    assert contents.pop("custom") == [1]
+    del contents["exit_code"]
+    assert len(contents) == 1 and list(contents) == ["command"]
+    assert not hasattr(contents, "__dict__")
+    assert json.dumps(contents.to_dict()) == '{"command": "make"}'
+
+
+def test_add_node_doesnt_share_contents():
+    epic = EpicIR()
+    first = epic.add_node(Opcode.EXIT)
+    second = epic.add_node(Opcode.EXIT)
+    epic.graph.nodes[first]["contents"]["marker"] = True
+    assert "marker" not in epic.graph.nodes[second]["contents"]
+
+    initial = {"command": "make"}
+    run = epic.add_node(Opcode.RUN, initial)
+    epic.graph.nodes[run]["contents"]["exit_code"] = 0
+    assert initial == {"command": "make"}
+
+
+def test_serialization_round_trip():
+    epic, run, conditional, _, _ = _epic()
+    epic.graph.nodes[conditional]["contents"]["condition"] = False
+    data = epic.to_dict()
+
+    # Same node-link layout as networkx writes, with the node counter id kept as node_id
+    plain = nx.node_link_data(nx.DiGraph(epic.graph))
+    assert [node["id"] for node in data["graph"]["nodes"]] == [node["id"] for node in plain["nodes"]]
+    assert data["graph"]["edges"] == plain["edges"]
+
+    loaded = EpicIR.from_dict(json.loads(json.dumps(data)))
+    assert loaded.to_dict() == data
+    attrs = loaded.graph.nodes[conditional]
+    assert attrs["opcode"] == Opcode.CONDITIONAL
+    assert attrs["id"] == "2"
+    assert isinstance(attrs["contents"], ConditionalContents)
+    assert attrs["contents"] == {"iteration_count": 0, "run_node_id": run, "condition": False}
+
+    # States saved by older networkx versions call the edges "links"
+    data["graph"]["links"] = data["graph"].pop("edges")
+    assert EpicIR.from_dict(data).to_dict()["graph"]["edges"] == plain["edges"]
+
+
+def test_graph_stores_integer_ids_in_arrays():
+    epic, run, conditional, fix, exit_node = _epic()
+    graph = epic.graph
+    assert isinstance(graph, IRGraph)
+    assert [graph.node_id(name) for name in (run, conditional, fix, exit_node)] == [0, 1, 2, 3]
+    assert [graph.node_name(i) for i in graph.successor_ids(graph.node_id(conditional))] == [exit_node, fix]
+    assert list(graph.predecessor_ids(graph.node_id(run))) == [graph.node_id(fix)]
+    assert list(graph.edge_list())[0] == (run, conditional, {})
+    assert graph._index.edge_attrs == {}
+
+    # The networkx API works on top of the arrays
+    assert list(graph.successors(conditional)) == [exit_node, fix]
+    assert nx.has_path(graph, fix, exit_node) and not nx.has_path(graph, exit_node, run)
+    graph.edges[conditional, fix]["label"] = "false"
+    assert graph.pred[fix][conditional] == {"label": "false"}
+    epic.remove_node(fix)
+    assert fix not in graph and list(graph.successors(conditional)) == [exit_node]
+    assert graph.in_degree(run) == 0 and graph.number_of_edges() == 2
+    again = epic.add_node(Opcode.FIX, {"run_ref": run})
+    assert graph.node_id(again) == 4
+
+    copy = pickle.loads(pickle.dumps(graph))
+    assert list(copy.edges) == list(graph.edges) and list(copy.nodes) == list(graph.nodes)
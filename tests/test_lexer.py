@@ -0,0 +1,58 @@
+import itertools
+
+import pytest
+
+from core.prompt_preprocess2.ir.ir import EpicIR
+from core.prompt_preprocess2.lexer import Span, tokenize_lines
+from core.prompt_preprocess2.pass_build_graph import pass_build_epic_graph
+
+PROMPT = """Notes before the first marker are skipped.
+/PROMPT Write a runner
+  that calls /RUN and /RUNNER,
+  see src/RUN/main.py
+
+  /RUN @command:"make test"
+/RUNNER is not a marker
+"""
+
+
+def _tokens(text):
+    return list(tokenize_lines(text.splitlines(keepends=True), source="prompt.txt"))
+
+
+def test_markers_only_at_line_start_and_token_boundary():
+    tokens = _tokens(PROMPT)
+    assert [token.marker for token in tokens] == ["/PROMPT", "/RUN"]
+    assert tokens[0].text == "Write a runner\n  that calls /RUN and /RUNNER,\n  see src/RUN/main.py"
+    assert tokens[1].text == '@command:"make test"\n/RUNNER is not a marker'
+    assert tokens[1].section == '/RUN @command:"make test"\n/RUNNER is not a marker'
+
+
+def test_spans_and_locations():
+    tokens = _tokens(PROMPT)
+    assert tokens[0].span == Span(2, 1, 4, 21)
+    assert tokens[1].span == Span(6, 3, 7, 23)
+    assert tokens[1].location == "prompt.txt:6:3"
+    assert _tokens("/EXIT\n\n")[0].span == Span(1, 1, 1, 5)
+
+
+def test_streams_large_input():
+    pasted_doc = ("pasted documentation line /PROMPT inside\n" for _ in range(200_000))
+    lines = itertools.chain(["/PROMPT Summarize\n"], pasted_doc, ["/RUN @command:true\n"], itertools.repeat("x\n"))
+    tokens = tokenize_lines(lines)
+    # The first token is complete once the next marker is read, without reading further
+    first = next(tokens)
+    assert first.span == Span(1, 1, 200_001, 40)
+    assert len(first.text) == len("Summarize\n") + 200_000 * 41 - 1
+
+
+def test_graph_nodes_keep_spans(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(PROMPT)
+    epic = pass_build_epic_graph(EpicIR(), str(prompt_file))
+    assert epic.graph.nodes["run_2"]["span"] == Span(6, 3, 7, 23)
+    assert epic.graph.nodes["prompt_1"]["span"] == Span(2, 1, 4, 21)
+
+    prompt_file.write_text("/PROMPT a\n/RUN make\n")
+    with pytest.raises(ValueError, match=r"prompt.txt:2:1: /RUN needs an @command:"):
+        pass_build_epic_graph(EpicIR(), str(prompt_file))
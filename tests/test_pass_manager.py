@@ -0,0 +1,91 @@
+from core.prompt_preprocess2.ir import analysis
+from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+from core.prompt_preprocess2.processor3 import build_initial_graph
+from core.prompt_preprocess2.passes.pass_registry import PassRegistry
+from core.prompt_preprocess2.passes.pass_insert_exit_node import pass_insert_exit_node
+from core.prompt_preprocess2.passes.pass_lower_debug_loop import pass_lower_debug_loop
+from core.prompt_preprocess2.passes.pass_lower_prompt_file_refs import pass_lower_prompt_file_refs
+from core.prompt_preprocess2.passes.pass_process_ro_markers import pass_process_ro_markers
+
+SECTIONS = 150
+
+
+def _registry():
+    registry = PassRegistry()
+    registry.register(pass_insert_exit_node, preserves=("nodes_by_opcode",))
+    registry.register(pass_lower_debug_loop, preserves=("nodes_by_opcode",))
+    registry.register(pass_lower_prompt_file_refs, preserves=("nodes_by_opcode",))
+    registry.register(pass_process_ro_markers, preserves=("nodes_by_opcode",))
+    return registry
+
+
+def _large_epic(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("".join(
+        f"/PROMPT Edit @code:m{i % 10}.py /RO lib{i}\n\n/DEBUG_LOOP @command:\"python m{i % 10}.py\"\n\n"
+        for i in range(SECTIONS)))
+    return build_initial_graph(str(prompt_file))
+
+
+def _scan(epic, opcode):
+    return [name for name, node_opcode in epic.graph.nodes(data='opcode') if node_opcode == opcode]
+
+
+def test_passes_share_one_opcode_index(tmp_path, monkeypatch):
+    calls = []
+    compute = analysis.ANALYSES["nodes_by_opcode"]
+    monkeypatch.setitem(analysis.ANALYSES, "nodes_by_opcode", lambda epic: calls.append(1) or compute(epic))
+
+    epic = _large_epic(tmp_path)
+    registry = _registry()
+    for pass_info in registry.get_all_passes():
+        epic = registry.run_pass(pass_info, epic)
+
+    # Built once, then kept up to date by the passes' node edits
+    assert len(calls) == 1
+    for opcode in Opcode:
+        assert epic.nodes_by_opcode(opcode) == _scan(epic, opcode)
+    assert len(epic.nodes_by_opcode(Opcode.CONDITIONAL)) == SECTIONS
+
+
+def test_stats_record_each_pass(tmp_path):
+    epic = _large_epic(tmp_path)
+    registry = _registry()
+    for pass_info in registry.get_all_passes():
+        epic = registry.run_pass(pass_info, epic)
+
+    stats = {stats.name: stats for stats in registry.stats}
+    assert list(stats) == ["insert_exit_node", "lower_debug_loop", "lower_prompt_file_refs", "process_ro_markers"]
+    assert stats["insert_exit_node"].node_delta == 1
+    # Each DEBUG_LOOP becomes RUN, CONDITIONAL and FIX
+    assert stats["lower_debug_loop"].node_delta == 2 * SECTIONS
+    assert stats["process_ro_markers"].node_delta == SECTIONS
+    assert stats["process_ro_markers"].edge_delta == SECTIONS
+    assert all(stats.seconds >= 0 for stats in registry.stats)
+    assert "lower_debug_loop" in registry.format_stats()
+
+
+def test_indexes_follow_node_edits_and_invalidation():
+    epic = EpicIR()
+    first = epic.add_node(Opcode.PROMPT, {"prompt": "a", "code_refs": ["a.py"]})
+    assert epic.nodes_by_opcode(Opcode.PROMPT) == [first]
+
+    second = epic.add_node(Opcode.PROMPT, {"prompt": "b", "code_refs": ["a.py"], "docs_refs": ["api.md"]})
+    epic.remove_node(first)
+    assert epic.nodes_by_opcode(Opcode.PROMPT) == [second]
+
+    # Edits straight on epic.graph need the analyses to be invalidated
+    epic.graph.add_node("run_x", opcode=Opcode.RUN, contents={})
+    assert epic.nodes_by_opcode(Opcode.RUN) == []
+    epic.invalidate_analyses()
+    assert epic.nodes_by_opcode(Opcode.RUN) == ["run_x"]
+
+
+def test_exit_node_follows_the_last_node():
+    epic = EpicIR()
+    first = epic.add_node(Opcode.PROMPT, {"prompt": "a"})
+    last = epic.add_node(Opcode.RUN, {"command": "make"})
+    epic.graph.add_edge(first, last)
+    pass_insert_exit_node(epic)
+    exit_node, = epic.nodes_by_opcode(Opcode.EXIT)
+    assert list(epic.graph.predecessors(exit_node)) == [last]
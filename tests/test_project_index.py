@@ -0,0 +1,70 @@
+import os
+import json
+import threading
+
+from core.backend.project_index import ProjectIndex, FINISHED
+
+
+def _version_dir(project_dir, version, state):
+    replay_dir = os.path.join(project_dir, version, "replay")
+    os.makedirs(replay_dir)
+    with open(os.path.join(replay_dir, "replay_state.json"), "w") as f:
+        json.dump(state, f)
+
+
+def test_allocates_versions_and_records_steps(tmp_path):
+    index = ProjectIndex(str(tmp_path))
+    assert index.latest_version() is None
+    assert index.allocate_version(prompt_file="prompt.txt") == "1"
+    assert index.allocate_version() == "2"
+    index.record_step("1", 1, "1", "PROMPT", duration=2.0)
+    index.record_step("1", 2, "2", "RUN", duration=4.0)
+    index.set_status("1", FINISHED)
+
+    records = index.versions()
+    assert [(r.version, r.status, r.step_count) for r in records] == [(1, FINISHED, 2), (2, "uninitialized", 0)]
+    assert records[0].prompt_file == "prompt.txt"
+    assert records[0].finished_at is not None
+    assert [r.version for r in index.versions(status=FINISHED)] == [1]
+
+    stats = index.stats()
+    assert stats["versions"] == 2
+    assert stats["steps"] == 2
+    assert stats["by_status"] == {FINISHED: 1, "uninitialized": 1}
+    assert stats["by_opcode"]["RUN"] == {"steps": 1, "mean_duration": 4.0}
+    index.close()
+
+
+def test_new_index_picks_up_existing_versions(tmp_path):
+    project_dir = str(tmp_path)
+    _version_dir(project_dir, "1", {"status": FINISHED, "execution": {"step_count": 5}})
+    _version_dir(project_dir, "7", {"status": "running_program"})
+    os.makedirs(os.path.join(project_dir, "latest"))
+
+    index = ProjectIndex(project_dir)
+    assert index.latest_version() == "7"
+    assert [(r.version, r.status, r.step_count) for r in index.versions()] == [(1, FINISHED, 5), (7, "running_program", 0)]
+    assert index.allocate_version() == "8"
+    # Known versions are not registered twice
+    index.register_version("7")
+    assert len(index.versions()) == 3
+
+
+def test_concurrent_allocations_are_unique(tmp_path):
+    project_dir = str(tmp_path)
+    ProjectIndex(project_dir).close()
+    allocated = []
+
+    def allocate():
+        # A separate connection per thread, like separate processes of a batch
+        index = ProjectIndex(project_dir)
+        for _ in range(10):
+            allocated.append(index.allocate_version())
+        index.close()
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(allocated, key=int) == [str(v) for v in range(1, 41)]
@@ -0,0 +1,91 @@
+import os
+import time
+
+from core.backend.replay import Replay, InputConfig
+from core.backend.client.response_cache import ResponseCache, digest_directories
+
+
+class CountingClient:
+    """Stub client that counts upstream requests."""
+
+    def __init__(self):
+        self.calls = 0
+        self.messages = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+
+        class Content:
+            text = '{"files": [{"path_and_filename": "a.py", "contents": "print(1)"}]}'
+
+        class Response:
+            content = [Content()]
+            model = kwargs.get("model")
+            usage = {"input_tokens": 1, "output_tokens": 1}
+        return Response()
+
+
+def _request(text):
+    return {"model": "m", "system": "s", "messages": [{"role": "user", "content": text}], "max_tokens": 10}
+
+
+def test_key_depends_on_request_and_files(tmp_path):
+    code = tmp_path / "code"
+    code.mkdir()
+    (code / "a.py").write_text("x = 1")
+    before = digest_directories([str(code)])
+    (code / "a.py").write_text("x = 2")
+    after = digest_directories([str(code)])
+
+    assert ResponseCache.key(_request("hi")) == ResponseCache.key(_request("hi"))
+    assert ResponseCache.key(_request("hi")) != ResponseCache.key(_request("bye"))
+    assert ResponseCache.key(_request("hi"), before) != ResponseCache.key(_request("hi"), after)
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=1000)
+    payload = {"content": ["x" * 200]}
+    keys = [ResponseCache.key(_request(str(i))) for i in range(6)]
+    for i, key in enumerate(keys):
+        cache.put(key, payload)
+        path = cache._path(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        if i == 0:
+            continue
+        # keep the first entry hot
+        assert cache.get(keys[0]) is not None
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache._scan_size() <= 1000
+
+
+def _run(tmp_path, client, cache_mode):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("/PROMPT Write a.py @code:a.py\n\n/PROMPT Improve a.py @code:a.py\n")
+    input_config = InputConfig(
+        input_prompt_file=str(prompt_file),
+        project_name="cached",
+        output_dir=str(tmp_path / "output")
+    )
+    replay = Replay.from_recipe(input_config, client=client, llm_backend="anthropic_api", disable_git=True,
+                                cache_mode=cache_mode)
+    replay.run_all()
+    return replay
+
+
+def test_rerun_is_served_from_cache(tmp_path):
+    client = CountingClient()
+    _run(tmp_path, client, "read")
+    first_calls = client.calls
+    assert first_calls > 0
+
+    second = _run(tmp_path, client, "read")
+    assert client.calls == first_calls
+    with open(os.path.join(second.code_dir, "a.py")) as f:
+        assert f.read() == "print(1)"
+
+    _run(tmp_path, client, "write")
+    assert client.calls == 2 * first_calls
+    _run(tmp_path, client, "off")
+    assert client.calls == 3 * first_calls
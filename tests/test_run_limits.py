@@ -0,0 +1,135 @@
+import os
+import time
+import shutil
+import asyncio
+
+import pytest
+
+from core.backend import limits
+from core.backend.jobserver import Jobserver
+from core.backend.limits import RunLimits
+from core.backend.processors.run_node_processor import RunNodeProcessor
+from core.backend.processors.run_output import run_streaming
+from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+from core.prompt_preprocess2.pass_build_graph import pass_build_epic_graph
+from core.prompt_preprocess2.passes.pass_lower_debug_loop import pass_lower_debug_loop
+from tests.run_helpers import run_node, run_replay
+
+# Jobs record how many of them run at once
+MAKEFILE = """\
+JOBS := 1 2 3 4 5 6
+all: $(JOBS)
+$(JOBS):
+\t@touch running.$@; ls running.* | wc -l >> counts; sleep 0.2; rm running.$@
+"""
+
+
+def test_timeout_kills_process_group(tmp_path):
+    replay = run_replay(tmp_path)
+    # The background sleep keeps the output pipes open after the shell is gone
+    node = run_node("echo started; sleep 30 & sleep 30", timeout=1)
+    started = time.monotonic()
+    RunNodeProcessor().process(replay, node)
+    assert time.monotonic() - started < 10
+
+    contents = node['contents']
+    assert contents['exit_code'] == 124
+    assert contents['timed_out'] is True
+    assert contents['rusage']['wall_seconds'] >= 1
+    assert "timed out after 1s" in replay.state.execution.memory[-1]
+
+
+def test_default_timeout_and_node_override(tmp_path, monkeypatch):
+    monkeypatch.setattr(limits, "RUN_DEFAULTS", RunLimits(timeout=1, memory_limit=1 << 30))
+    replay = run_replay(tmp_path)
+    node = run_node("sleep 30")
+    asyncio.run(RunNodeProcessor().process_async(replay, node))
+    assert node['contents']['exit_code'] == 124
+
+    node = run_node("sleep 1.5; echo slow but fine", timeout=20)
+    RunNodeProcessor().process(replay, node)
+    assert node['contents']['exit_code'] == 0
+    assert node['contents']['timed_out'] is False
+    assert limits.run_limits_for(node['contents']) == RunLimits(timeout=20, memory_limit=1 << 30)
+
+
+def test_rlimits_and_rusage(tmp_path):
+    logs = (str(tmp_path), str(tmp_path / "out"), str(tmp_path / "err"))
+    allocate = "python3 -c 'x = bytearray(512 * 1024 * 1024)'"
+    output = run_streaming(allocate, *logs, limits=RunLimits(memory_limit=256 << 20))
+    assert output.exit_code != 0
+    assert "MemoryError" in output.stderr.tail.text()
+
+    output = run_streaming("python3 -c 'while True: pass'", *logs, limits=RunLimits(cpu_limit=1))
+    assert output.exit_code != 0
+    assert output.rusage["cpu_seconds"] >= 0.9
+
+    touch = "python3 -c 'x = bytearray(64 * 1024 * 1024); x[::4096] = bytes(len(x) // 4096)'"
+    output = run_streaming(touch, *logs)
+    assert output.exit_code == 0
+    assert output.rusage["max_rss_kb"] >= 64 * 1024
+
+
+@pytest.mark.skipif(shutil.which("make") is None, reason="needs GNU make")
+def test_jobserver_shares_build_slots(tmp_path):
+    (tmp_path / "Makefile").write_text(MAKEFILE)
+    server = Jobserver.create(2)
+    try:
+        output = run_streaming("make; echo $MAKEFLAGS", str(tmp_path), str(tmp_path / "out"), str(tmp_path / "err"),
+                               jobserver=server)
+        assert output.exit_code == 0
+        assert f"--jobserver-auth={server.read_fd},{server.write_fd}" in output.stdout.tail.text()
+        counts = [int(line) for line in (tmp_path / "counts").read_text().split()]
+        assert len(counts) == 6 and max(counts) == 2
+        assert server.available == 2
+    finally:
+        server.close()
+    assert not os.path.exists(server.path)
+
+
+def test_jobserver_refills_lost_tokens():
+    server = Jobserver.create(3)
+    try:
+        with server.slot():
+            # A build killed while holding a token never gives it back
+            os.read(server.read_fd, 1)
+            assert server.available == 1
+        assert server.available == 3
+    finally:
+        server.close()
+
+
+def test_jobserver_release_during_acquire_keeps_pool_size(monkeypatch):
+    server = Jobserver.create(2)
+    try:
+        token = server.acquire()
+        read = os.read
+
+        def read_then_release(fd, size):
+            data = read(fd, size)
+            if fd == server.read_fd:
+                # The other holder finishes right after this token left the FIFO
+                monkeypatch.setattr(os, "read", read)
+                server.release(token)
+            return data
+        monkeypatch.setattr(os, "read", read_then_release)
+        with server.slot():
+            assert server.available == 1
+        assert server.available == 2
+    finally:
+        server.close()
+
+
+def test_limit_markers_are_parsed(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text('/RUN @command:"make" @timeout:600 @memory_limit:4G\n\n'
+                           '/DEBUG_LOOP @command:"pytest -x" @timeout:90 @cpu_limit:60\n\n/EXIT\n')
+    epic = pass_lower_debug_loop(pass_build_epic_graph(EpicIR(), str(prompt_file)))
+    assert epic.graph.nodes["run_1"]["contents"].to_dict() == {"command": "make", "timeout": 600.0,
+                                                                "memory_limit": 4 << 30}
+    (lowered_run,) = [node for node in epic.nodes_by_opcode(Opcode.RUN) if node != "run_1"]
+    assert limits.RunLimits.from_contents(epic.graph.nodes[lowered_run]["contents"]) == RunLimits(90.0, 60)
+
+    prompt_file.write_text('/RUN @command:"make" @memory_limit:lots\n')
+    with pytest.raises(ValueError, match=r"prompt.txt:1:1: Invalid @memory_limit: value 'lots'"):
+        pass_build_epic_graph(EpicIR(), str(prompt_file))
@@ -0,0 +1,102 @@
+import os
+import random
+
+from core.backend.processors.prompt_node_processor import PromptNodeProcessor
+from core.backend.processors.run_node_processor import RunNodeProcessor
+from core.backend import run_log_store
+from core.backend.run_log_store import RunLogStore, read_log, tail_lines
+from core.prompt_preprocess2.ir.ir import Opcode
+from tests.run_helpers import run_replay
+
+
+class _CountingFile:
+    def __init__(self, handle, reads):
+        self.handle, self.reads = handle, reads
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.handle.close()
+
+    def seek(self, *args):
+        return self.handle.seek(*args)
+
+    def read(self, size=-1):
+        data = self.handle.read(size)
+        self.reads.append(len(data))
+        return data
+
+
+def test_tail_lines_matches_readlines(tmp_path):
+    rng = random.Random(3)
+    path = tmp_path / "build.log"
+    for trailing in ("", "\n", "\r\n"):
+        lines = ["x" * rng.randrange(0, 300) + rng.choice(["\n", "\r\n"]) for _ in range(2000)]
+        path.write_bytes(("".join(lines).rstrip("\r\n") + trailing).encode())
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = f.readlines()
+        for n in (1, 2, 7, 100, 1999, 2000, 5000):
+            assert tail_lines(str(path), n, block_size=256) == expected[-n:]
+    path.write_text("")
+    assert tail_lines(str(path), 100) == []
+
+
+def test_tail_reads_only_the_end(tmp_path, monkeypatch):
+    path = tmp_path / "big.log"
+    with open(path, "w") as f:
+        for i in range(200_000):
+            f.write(f"compiling unit {i}\n")
+    tail = read_log(str(path), last_n_lines=100)
+    assert tail.splitlines()[-1] == "compiling unit 199999"
+    assert len([line for line in tail.splitlines() if line]) == 100
+    assert os.path.getsize(path) > 3_000_000
+    reads = []
+    monkeypatch.setattr(run_log_store, "open", lambda *args: _CountingFile(open(*args), reads), raising=False)
+    tail_lines(str(path), 100)
+    assert sum(reads) <= 2 * 64 * 1024
+
+
+def test_runs_are_indexed_and_earlier_iterations_compressed(tmp_path):
+    replay = run_replay(tmp_path)
+    node = {'id': 'run_3', 'opcode': Opcode.RUN, 'contents': {"command": "echo round; echo failed >&2; exit 1"}}
+    for _ in range(3):
+        RunNodeProcessor().process(replay, node)
+
+    runs = replay.run_logs.runs("run_3")
+    assert [run.iteration for run in runs] == [0, 1, 2]
+    assert all(run.exit_code == 1 and run.stdout_bytes == 6 and run.stderr_bytes == 7 for run in runs)
+    assert all(run.duration is not None for run in runs)
+    assert node['contents']['stderr_file'] == runs[-1].stderr_file == "run_3_2_stderr.txt"
+    assert sorted(os.listdir(replay.run_logs_dir)) == [
+        "index.jsonl", "run_3_0_stderr.txt.gz", "run_3_0_stdout.txt.gz", "run_3_1_stderr.txt.gz",
+        "run_3_1_stdout.txt.gz", "run_3_2_stderr.txt", "run_3_2_stdout.txt"]
+
+    # Compressed logs read like plain ones, and a reopened store continues the numbering
+    store = RunLogStore(replay.run_logs_dir)
+    assert store.read(runs[0].stderr_file) == "failed\n"
+    assert store.read(runs[0].stdout_file, last_n_lines=5) == "round\n"
+    assert store.latest("run_3") == runs[-1]
+    assert store.start("run_3").iteration == 3
+
+
+def test_prompt_reads_compressed_run_log_refs(tmp_path):
+    replay = run_replay(tmp_path)
+    replay.replay_dir = str(tmp_path)
+    node = {'id': 'run_3', 'opcode': Opcode.RUN, 'contents': {"command": "echo failed >&2; exit 1"}}
+    for _ in range(2):
+        RunNodeProcessor().process(replay, node)
+    assert not os.path.exists(os.path.join(replay.run_logs_dir, "run_3_0_stderr.txt"))
+
+    # @run_logs:run_3_0_stderr.txt still resolves after the log was gzipped
+    files = PromptNodeProcessor()._load_read_only_files([], [], ["run_3_0_stderr.txt", "missing.txt"], replay)
+    assert [(ref.path, ref.content) for ref in files] == [("run_3_0_stderr.txt", "failed\n")]
+
+
+def test_tail_lines_with_multibyte_characters(tmp_path):
+    path = tmp_path / "build.log"
+    path.write_text(("é" * 1000 + "\n") * 300 + "main.cpp:3:5: error: ‘foo’ was not declared\n", encoding="utf-8")
+    with open(path, 'r', encoding='utf-8') as f:
+        expected = f.readlines()
+    for n in range(1, 302):
+        assert tail_lines(str(path), n, block_size=777) == expected[-n:]
@@ -0,0 +1,77 @@
+import os
+import time
+import random
+import asyncio
+
+from core.backend.processors.run_node_processor import RunNodeProcessor
+from core.backend.run_log_store import RunLogStore
+from core.backend.processors.run_output import TailBuffer, run_streaming
+from core.prompt_preprocess2.ir.ir import EpicIR, Opcode
+from core.prompt_preprocess2.pass_build_graph import pass_build_epic_graph
+from core.prompt_preprocess2.passes.pass_lower_debug_loop import pass_lower_debug_loop
+from tests.run_helpers import run_node, run_replay
+
+BUILD = "echo compiling; echo 'kernel.cpp:12: error: unknown type' >&2; sleep 30; echo linked"
+
+
+def test_tail_buffer_keeps_last_bytes():
+    rng = random.Random(7)
+    tail, written = TailBuffer(100), b""
+    for _ in range(500):
+        chunk = bytes(rng.randrange(256) for _ in range(rng.randrange(0, 150)))
+        tail.write(chunk)
+        written += chunk
+        assert tail.getvalue() == written[-100:]
+
+
+def test_fail_fast_stops_build_at_first_error(tmp_path):
+    replay = run_replay(tmp_path)
+    node = run_node(BUILD, fail_fast=["error:"])
+    started = time.monotonic()
+    RunNodeProcessor().process(replay, node)
+    assert time.monotonic() - started < 10
+
+    contents = node['contents']
+    assert contents['exit_code'] == 1
+    assert contents['fail_fast_match'] == "kernel.cpp:12: error: unknown type"
+    with open(os.path.join(replay.run_logs_dir, contents['stdout_file'])) as f:
+        assert f.read() == "compiling\n"
+    assert "stopped at the first error: kernel.cpp:12" in replay.state.execution.memory[-1]
+
+
+def test_async_fail_fast(tmp_path):
+    replay = run_replay(tmp_path)
+    node = run_node(BUILD, fail_fast=["warning:", r"error: \w+"])
+    started = time.monotonic()
+    asyncio.run(RunNodeProcessor().process_async(replay, node))
+    assert time.monotonic() - started < 10
+    assert node['contents']['exit_code'] == 1
+    assert "stderr_file" in node['contents']
+
+
+def test_output_streams_to_file_with_bounded_tail(tmp_path):
+    output = run_streaming("yes build-line | head -n 200000", str(tmp_path), str(tmp_path / "out"), str(tmp_path / "err"),
+                           tail_bytes=1024)
+    assert output.exit_code == 0
+    assert output.stdout.size == os.path.getsize(tmp_path / "out") == 200000 * len("build-line\n")
+    assert output.stdout.tail.getvalue().endswith(b"build-line\n") and len(output.stdout.tail.getvalue()) == 1024
+    assert output.stderr.is_blank
+
+    # Blank logs aren't kept on the node
+    replay = run_replay(tmp_path)
+    node = run_node("echo ok")
+    RunNodeProcessor().process(replay, node)
+    assert node['contents']['exit_code'] == 0
+    assert "stderr_file" not in node['contents']
+    assert sorted(os.listdir(replay.run_logs_dir)) == sorted([RunLogStore.INDEX_FILE, node['contents']['stdout_file']])
+
+
+def test_fail_fast_markers_are_parsed(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text('/RUN @command:"make -j8" @fail_fast:"error:" @fail_fast:FAILED\n\n'
+                           '/DEBUG_LOOP @command:"make test" @fail_fast:"Error"\n\n/EXIT\n')
+    epic = pass_lower_debug_loop(pass_build_epic_graph(EpicIR(), str(prompt_file)))
+    assert epic.graph.nodes["run_1"]["contents"].to_dict() == {"command": "make -j8", "fail_fast": ["error:", "FAILED"]}
+    (lowered_run,) = [node for node in epic.nodes_by_opcode(Opcode.RUN) if node != "run_1"]
+    assert epic.graph.nodes[lowered_run]["contents"]["command"] == "make test"
+    assert epic.graph.nodes[lowered_run]["contents"]["fail_fast"] == ["Error"]
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from core.backend.node_memory import NodeMemory
+from core.backend.replay import Replay, InputConfig, ReplayStatus, ExecutionState
+from core.backend.scheduler import DagScheduler, NodeAccess, node_access
+from core.prompt_preprocess2.ir.ir import Opcode
+
+
+class SlowClient:
+    """Stub Anthropic client that records how many requests overlap."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+
+        class Content:
+            text = '{"files": []}'
+
+        class Response:
+            content = [Content()]
+            usage = {}
+        return Response()
+
+
+def _prompt_node(**contents):
+    return {'opcode': Opcode.PROMPT, 'contents': contents}
+
+
+def test_prompts_own_their_code_refs():
+    a = node_access(_prompt_node(code_refs=["a.py"], docs_refs=["doc1.md"]))
+    b = node_access(_prompt_node(code_refs=["b.py"], docs_refs=["doc1.md"]))
+    assert not a.conflicts_with(b)
+    assert a.writes == {"code:a.py"}
+    assert a.conflicts_with(node_access(_prompt_node(code_refs=["a.py"])))
+    # Without @code: references the LLM may write anywhere
+    unscoped = node_access(_prompt_node(docs_refs=["doc1.md"]))
+    assert unscoped.writes == {"code:*"}
+    assert unscoped.conflicts_with(a)
+
+
+def test_node_memory_merges_in_completion_order():
+    shared = ["start"]
+    run = NodeMemory(shared)
+    prompt = NodeMemory(shared)
+    execution = ExecutionState(shared_memory=shared)
+    with run.active():
+        execution.memory.append("ran make")
+    with prompt.active():
+        execution.memory = ["summary from the LLM"]
+    assert execution.memory == ["start"]
+
+    # The RUN finishes first; the PROMPT's replacement keeps what it appended
+    shared = run.merge(shared)
+    assert shared == ["start", "ran make"]
+    assert prompt.merge(shared) == ["summary from the LLM", "ran make"]
+    # The other way around the appended entry lands after the replacement
+    assert run.merge(prompt.merge(["start"])) == ["summary from the LLM", "ran make"]
+
+
+def test_run_owns_code_dir():
+    run = node_access({'opcode': Opcode.RUN, 'contents': {'command': 'make'}})
+    prompt = node_access(_prompt_node(code_refs=["a.py"]))
+    assert run.conflicts_with(prompt)
+    assert run.conflicts_with(node_access({'opcode': Opcode.FIX, 'contents': {'run_ref': 'run_1'}}))
+    # Content copied at compile time overlaps with anything
+    assert not run.conflicts_with(node_access({'opcode': Opcode.DOCS, 'contents': {}}))
+
+
+def test_control_flow_nodes_are_barriers():
+    conditional = node_access({'opcode': Opcode.CONDITIONAL, 'contents': {}})
+    assert conditional.barrier
+    assert conditional.conflicts_with(NodeAccess())
+    assert not NodeAccess().conflicts_with(NodeAccess())
+
+
+def _scheduled_replay(tmp_path, prompt, client):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(prompt)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    input_config = InputConfig(
+        input_prompt_file=str(prompt_file),
+        project_name="scheduler",
+        output_dir=str(output_dir)
+    )
+    replay = Replay.from_recipe(input_config, client=client, llm_backend="anthropic_api", disable_git=True)
+    replay.compile()
+    return replay
+
+
+def test_run_all_overlaps_disjoint_prompts_and_commits_when_idle(tmp_path):
+    client = SlowClient(delay=0.2)
+    replay = _scheduled_replay(tmp_path, "/PROMPT Edit @code:a.py\n\n/PROMPT Edit @code:b.py\n\n/PROMPT Edit @code:c.py\n",
+                               client)
+
+    commits = []
+    commit_step = replay.git_manager.commit_step
+
+    def record_commit(node, opcode, step):
+        commits.append(len(scheduler._in_flight))
+        commit_step(node, opcode, step)
+    replay.git_manager.commit_step = record_commit
+
+    scheduler = DagScheduler(replay, max_workers=4)
+    scheduler.run()
+
+    assert not replay.has_steps()
+    assert client.max_active >= 2
+    assert replay.state.execution.step_count == client.calls + 1  # + EXIT node
+    assert commits and all(in_flight == 0 for in_flight in commits)
+    assert replay.status == ReplayStatus.FINISHED_RUNNING_PROGRAM
+
+
+def test_run_all_serializes_prompts_on_the_same_file(tmp_path):
+    client = SlowClient(delay=0.05)
+    replay = _scheduled_replay(tmp_path, "/PROMPT Edit @code:a.py\n\n/PROMPT Edit @code:a.py\n", client)
+
+    DagScheduler(replay, max_workers=4).run()
+
+    assert client.calls == 2
+    assert client.max_active == 1
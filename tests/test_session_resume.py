@@ -0,0 +1,66 @@
+import json
+
+from core.backend.replay import Replay, InputConfig, ExecutionState
+from tests.test_claude_session_pool import _ask, _fake_cli, _wrapper
+
+
+def test_execution_state_round_trips_session_ids():
+    state = ExecutionState(session_id="main", branch_session_ids={"fix_4": "branch"})
+    restored = ExecutionState.from_dict(json.loads(json.dumps(state.to_dict())))
+    assert restored.session_id == "main"
+    assert restored.branch_session_ids == {"fix_4": "branch"}
+    # States saved before session ids were persisted still load
+    assert ExecutionState.from_dict({}).session_id is None
+
+
+def test_branches_keep_their_own_session(tmp_path):
+    recorded = []
+    wrapper = _wrapper(tmp_path, _fake_cli(tmp_path))
+    wrapper.on_session_id = lambda branch, session_id: recorded.append((branch, session_id))
+    try:
+        main = _ask(wrapper, "prompt")
+        main_session = wrapper.session_id
+        with wrapper.session_branch("fix_4"):
+            first_fix = _ask(wrapper, "fix 1")
+            second_fix = _ask(wrapper, "fix 2")
+        # The branch starts from the main conversation and then continues on its own
+        assert first_fix["resume"] == main_session
+        assert first_fix["pid"] != main["pid"]
+        assert second_fix["pid"] == first_fix["pid"]
+        assert wrapper.session_id == main_session
+        assert recorded[0] == (None, main_session)
+        assert recorded[-1] == ("fix_4", wrapper.branch_session_ids["fix_4"])
+    finally:
+        wrapper.close()
+
+
+def test_new_wrapper_resumes_saved_session(tmp_path):
+    cli = _fake_cli(tmp_path)
+    wrapper = _wrapper(tmp_path, cli)
+    try:
+        _ask(wrapper, "step 1")
+        saved = wrapper.session_id
+    finally:
+        wrapper.close()
+
+    resumed = _wrapper(tmp_path, cli)
+    resumed.session_id = saved
+    try:
+        assert _ask(resumed, "step 2")["resume"] == saved
+    finally:
+        resumed.close()
+
+
+def test_load_checkpoint_restores_session_ids(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("/PROMPT Write a.py @code:a.py\n")
+    output_dir = str(tmp_path / "output")
+    replay = Replay.from_recipe(InputConfig(input_prompt_file=str(prompt_file), project_name="stepped",
+                                            output_dir=output_dir), disable_git=True)
+    replay.client._record_session_id(None, "main-session")
+    replay.client._record_session_id("fix_4", "branch-session")
+    replay.save_state()
+
+    loaded = Replay.load_checkpoint("stepped", output_dir=output_dir, disable_git=True)
+    assert loaded.client.session_id == "main-session"
+    assert loaded.client.branch_session_ids == {"fix_4": "branch-session"}
@@ -0,0 +1,67 @@
+import os
+import subprocess
+
+from core.backend.git_manager import GitManager
+from core.prompt_preprocess2.ir.ir import Opcode
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True, check=True).stdout
+
+
+def _write(root, path, text):
+    full = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+
+
+def _version(project_dir, version, fast_import=True):
+    version_dir = os.path.join(project_dir, version)
+    _write(version_dir, "code/main.py", f"print({version})\n")
+    manager = GitManager(version_dir, fast_import=fast_import, shared_repo=os.path.join(project_dir, "repo.git"))
+    assert manager.initialize_repo()
+    return manager
+
+
+def test_versions_are_branches_of_one_repo(tmp_path):
+    project_dir = str(tmp_path / "cosh")
+    first = _version(project_dir, "1")
+    second = _version(project_dir, "2")
+    assert first.commit_initial()
+    assert second.commit_initial()
+    _write(second.version_dir, "code/main.py", "print('step')\n")
+    assert second.commit_step({"id": "1"}, Opcode.FIX, 1)
+    first.close()
+    second.close()
+
+    repo = os.path.join(project_dir, "repo.git")
+    assert os.path.isfile(os.path.join(first.version_dir, ".git"))
+    branches = _git(repo, "branch", "--format=%(refname:short)").split()
+    assert sorted(branches) == ["base", "v1", "v2"]
+    assert len(_git(repo, "log", "--format=%s", "v2").splitlines()) == 3
+    assert _git(repo, "show", "v1:code/main.py") == "print(1)\n"
+    # Versions share their history, so they can be compared directly
+    assert _git(repo, "diff", "--name-only", "v1", "v2") == "code/main.py\n"
+    assert _git(first.version_dir, "status", "--porcelain") == ""
+
+
+def test_subprocess_commits_in_worktree(tmp_path):
+    project_dir = str(tmp_path / "cosh")
+    manager = _version(project_dir, "1", fast_import=False)
+    assert manager.commit_initial()
+    assert _git(manager.version_dir, "rev-parse", "--abbrev-ref", "HEAD").strip() == "v1"
+    assert _git(manager.version_dir, "ls-files").split() == ["code/main.py"]
+
+
+def test_reused_version_number_resets_branch(tmp_path):
+    project_dir = str(tmp_path / "cosh")
+    manager = _version(project_dir, "1")
+    assert manager.commit_initial()
+    manager.close()
+    subprocess.run(["rm", "-rf", manager.version_dir], check=True)
+
+    manager = _version(project_dir, "1")
+    assert manager.commit_initial()
+    manager.close()
+    assert len(_git(os.path.join(project_dir, "repo.git"), "log", "--format=%s", "v1").splitlines()) == 2
@@ -0,0 +1,103 @@
+import os
+import json
+
+from core.backend.replay import Replay, InputConfig
+from core.backend.step_journal import StepJournal
+
+PROMPT = "/PROMPT Edit @code:a.py\n\n/RUN @command:echo hi\n\n/PROMPT Edit @code:a.py again\n"
+
+
+class Client:
+    """Stub client answering every request with no files and a memory note."""
+
+    def __init__(self):
+        self.messages = self
+
+    def create(self, **kwargs):
+        class Content:
+            text = '{"files": [], "memory": ["note"]}'
+
+        class Response:
+            content = [Content()]
+            usage = {}
+        return Response()
+
+
+def _make_replay(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text(PROMPT)
+    input_config = InputConfig(input_prompt_file=str(prompt_file), project_name="epic", output_dir=str(tmp_path / "output"))
+    return Replay.from_recipe(input_config, client=Client(), llm_backend="anthropic_api", disable_git=True)
+
+
+def _load(tmp_path):
+    return Replay.load_checkpoint("epic", output_dir=str(tmp_path / "output"), client=Client(),
+                                  llm_backend="anthropic_api", disable_git=True)
+
+
+def test_crashed_run_resumes_after_last_step(tmp_path):
+    replay = _make_replay(tmp_path)
+    for _ in range(3):
+        replay.run_step()
+    # No save_state(): the process "crashes" here
+
+    journal = StepJournal(replay.replay_dir).entries()
+    assert [entry["step"] for entry in journal] == [2, 3]
+    assert journal[0]["node"] == "run_2"
+    assert journal[0]["set"]["exit_code"] == 0
+    assert journal[0]["memory_append"] == ["Command `echo hi` completed successfully"]
+
+    resumed = _load(tmp_path)
+    assert resumed.state.to_dict() == replay.state.to_dict()
+
+
+def test_torn_last_line_is_ignored_and_cut(tmp_path):
+    replay = _make_replay(tmp_path)
+    for _ in range(3):
+        replay.run_step()
+    expected_step = replay.state.execution.step_count - 1
+    journal_path = os.path.join(replay.replay_dir, "step_journal.jsonl")
+    with open(journal_path, "rb") as f:
+        lines = f.readlines()
+    with open(journal_path, "wb") as f:
+        f.write(lines[0] + lines[1][:20])
+
+    resumed = _load(tmp_path)
+    assert resumed.state.execution.step_count == expected_step
+    assert resumed.state.execution.current_node_id == "prompt_3"
+    with open(journal_path, "rb") as f:
+        assert f.read() == lines[0]
+
+
+def test_snapshot_compacts_journal(tmp_path):
+    replay = _make_replay(tmp_path)
+    replay.journal.compact_every = 2
+    for _ in range(4):
+        replay.run_step()
+    # Steps 1 and 3 wrote snapshots, steps 2 and 4 deltas on top of them
+    assert [entry["step"] for entry in replay.journal.entries()] == [4]
+    with open(os.path.join(replay.replay_dir, "replay_state.json")) as f:
+        assert json.load(f)["execution"]["step_count"] == 3
+
+    replay.save_state()
+    assert replay.journal.entries() == []
+    resumed = _load(tmp_path)
+    assert resumed.state.to_dict() == replay.state.to_dict()
+    assert not resumed.has_steps()
+
+
+def test_step_invocations_compact_journal(tmp_path):
+    replay = _make_replay(tmp_path)
+    replay.run_step()  # writes the first snapshot
+    replay.close()
+    # Like `replay.py --step`: every step runs in a freshly loaded Replay, without save_state()
+    for _ in range(3):
+        replay = _load(tmp_path)
+        replay.journal.compact_every = 2
+        replay.run_step()
+        replay.close()
+
+    # Step 3 saw the journaled step 2 and snapshotted; step 4 is journaled on top
+    assert [entry["step"] for entry in replay.journal.entries()] == [4]
+    with open(os.path.join(replay.replay_dir, "replay_state.json")) as f:
+        assert json.load(f)["execution"]["step_count"] == 3
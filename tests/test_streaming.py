@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import random
+from contextlib import asynccontextmanager, contextmanager
+
+import pytest
+
+from core.backend.replay import Replay, InputConfig
+from core.backend.streaming import IncrementalFilesParser
+
+
+RESPONSE = json.dumps({
+    "files": [
+        {"path_and_filename": "a.py", "contents": "print('{a}')\n"},
+        {"path_and_filename": "b/c.py", "contents": "x = \"]}\\\"\"\n"},
+    ],
+    "notes": {"files": [1, 2]},
+})
+
+
+def test_parser_reports_files_for_any_chunking():
+    expected = json.loads(RESPONSE)["files"]
+    text = "Here you go:\n" + RESPONSE + "\nDone {really}."
+    rng = random.Random(0)
+    for _ in range(100):
+        parser = IncrementalFilesParser()
+        files = []
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 12)
+            files.extend(parser.feed(text[position:position + size]))
+            position += size
+        assert files == expected
+        # Reported files aren't kept, only the rest of the response is
+        assert parser.result() == {"files": [], "notes": {"files": [1, 2]}}
+
+
+def test_parser_reports_file_before_response_is_complete():
+    parser = IncrementalFilesParser()
+    first_file_end = RESPONSE.index("}, {") + 1
+    assert parser.feed(RESPONSE[:first_file_end]) == [json.loads(RESPONSE)["files"][0]]
+
+
+class _StreamingMessages:
+    def __init__(self, text):
+        self.text = text
+        self.seen_files = []
+
+    @contextmanager
+    def stream(self, **kwargs):
+        messages = self
+
+        class Stream:
+            @property
+            def text_stream(self):
+                for i in range(0, len(messages.text), 7):
+                    yield messages.text[i:i + 7]
+
+            def get_final_message(self):
+                return type("Message", (), {"content": [type("Block", (), {"text": messages.text})()],
+                                            "model": kwargs["model"], "usage": {"output_tokens": 1}})()
+        yield Stream()
+
+
+class _StreamingClient:
+    def __init__(self, text):
+        self.messages = _StreamingMessages(text)
+
+
+class _AsyncStreamingMessages:
+    def __init__(self, text):
+        self.text = text
+
+    @asynccontextmanager
+    async def stream(self, **kwargs):
+        messages = self
+
+        class Stream:
+            @property
+            def text_stream(self):
+                return self._chunks()
+
+            async def _chunks(self):
+                for i in range(0, len(messages.text), 7):
+                    await asyncio.sleep(0)
+                    yield messages.text[i:i + 7]
+
+            async def get_final_message(self):
+                return type("Message", (), {"usage": {"output_tokens": 1}})()
+        yield Stream()
+
+
+class _BlockingOnlyMessages:
+    def create(self, **kwargs):
+        raise AssertionError("the native async stream must be used")
+
+
+def test_replay_streams_files_into_code_dir(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("/PROMPT Write two files @code:a.py\n")
+    input_config = InputConfig(input_prompt_file=str(prompt_file), project_name="streamed",
+                               output_dir=str(tmp_path / "output"))
+    replay = Replay.from_recipe(input_config, client=_StreamingClient(RESPONSE), llm_backend="anthropic_api",
+                                disable_git=True, stream=True)
+    events = []
+    replay.llm_backend.stream_callback = events.append
+    replay.run_all()
+
+    with open(os.path.join(replay.code_dir, "b", "c.py")) as f:
+        assert f.read() == json.loads(RESPONSE)["files"][1]["contents"]
+    file_events = [event.path for event in events if event.kind == "file"]
+    assert file_events[:2] == ["a.py", "b/c.py"]
+    assert events[0].kind == "first_text"
+    assert events[-1].kind == "done"
+
+
+@pytest.mark.parametrize("transport", ["blocking", "native"])
+def test_async_replay_streams_files_into_code_dir(tmp_path, transport):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("/PROMPT Write two files @code:a.py\n")
+    input_config = InputConfig(input_prompt_file=str(prompt_file), project_name="streamed",
+                               output_dir=str(tmp_path / "output"))
+    client = _StreamingClient(RESPONSE)
+    if transport == "native":
+        client.messages = _BlockingOnlyMessages()
+    replay = Replay.from_recipe(input_config, client=client, llm_backend="anthropic_api",
+                                disable_git=True, stream=True)
+    if transport == "native":
+        replay.llm_backend.async_client = type("AsyncClient", (), {"messages": _AsyncStreamingMessages(RESPONSE)})()
+    events = []
+    replay.llm_backend.stream_callback = events.append
+    asyncio.run(replay.run_all_async())
+
+    with open(os.path.join(replay.code_dir, "b", "c.py")) as f:
+        assert f.read() == json.loads(RESPONSE)["files"][1]["contents"]
+    assert [event.path for event in events if event.kind == "file"][:2] == ["a.py", "b/c.py"]
+    assert events[-1].kind == "done"
@@ -0,0 +1,53 @@
+import gzip
+import json
+import os
+
+from core.backend.client.transcript_store import TranscriptWriter, TranscriptReader, INDEX_FILE, TRANSCRIPT_FILE
+
+
+def _write(client_dir, count):
+    writer = TranscriptWriter(str(client_dir))
+    for i in range(count):
+        writer.append({"model": "m", "messages": [{"role": "user", "content": f"prompt {i}"}]},
+                      {"content": [{"text": f"answer {i}"}]})
+    return writer
+
+
+def test_append_and_random_access(tmp_path):
+    _write(tmp_path, 3)
+    reader = TranscriptReader(str(tmp_path))
+
+    assert len(reader) == 3
+    assert reader.get(2)["response"]["content"][0]["text"] == "answer 1"
+    assert [r["request_number"] for r in reader] == [1, 2, 3]
+    assert [r["request_number"] for r in reader.grep("PROMPT 2", ignore_case=True)] == [3]
+    # The transcript is a plain gzip stream of JSON lines
+    with gzip.open(tmp_path / TRANSCRIPT_FILE, "rt") as f:
+        assert len(f.readlines()) == 3
+
+
+def test_writer_continues_numbering(tmp_path):
+    _write(tmp_path, 2)
+    writer = _write(tmp_path, 1)
+    assert writer.count == 3
+    assert TranscriptReader(str(tmp_path)).get(3)["request"]["messages"][0]["content"] == "prompt 0"
+
+
+def test_missing_index_is_rebuilt(tmp_path):
+    _write(tmp_path, 3)
+    os.remove(tmp_path / INDEX_FILE)
+
+    reader = TranscriptReader(str(tmp_path))
+    assert [e["request_number"] for e in reader.index()] == [1, 2, 3]
+    assert reader.get(3)["response"]["content"][0]["text"] == "answer 2"
+    assert os.path.exists(tmp_path / INDEX_FILE)
+
+
+def test_reads_legacy_combined_files(tmp_path):
+    combined = {"request": {"model": "m"}, "response": {"content": [{"text": "old"}]},
+                "metadata": {"request_number": 1, "timestamp": "20250101_000000"}}
+    (tmp_path / "request_001_20250101_000000_combined.json").write_text(json.dumps(combined))
+
+    reader = TranscriptReader(str(tmp_path))
+    assert reader.is_legacy
+    assert [r["response"]["content"][0]["text"] for r in reader] == ["old"]
@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pytest
+
+from core.backend.project_index import ProjectIndex
+from core.backend.replay import Replay
+from core.dir_preprocessing import create_symlink_safely
+
+
+def test_parallel_allocations_get_distinct_directories(tmp_path):
+    project_dir = str(tmp_path / "cosh")
+    os.makedirs(project_dir)
+    # A directory the index doesn't know about must not be handed out again
+    os.makedirs(os.path.join(project_dir, "1"))
+    Replay._get_next_version(project_dir)  # builds the index, which now knows 1
+    os.makedirs(os.path.join(project_dir, "3"))
+    allocated = []
+
+    def allocate():
+        for _ in range(5):
+            allocated.append(Replay._get_next_version(project_dir))
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(allocated)) == 20
+    assert "3" not in allocated
+    assert all(os.path.isdir(os.path.join(project_dir, version)) for version in allocated)
+    # The skipped directory is indexed from disk rather than left as an allocation
+    index = ProjectIndex(project_dir)
+    try:
+        record = next(record for record in index.versions() if record.version == 3)
+    finally:
+        index.close()
+    assert record.created_at == os.path.getctime(os.path.join(project_dir, "3"))
+
+
+def test_latest_symlink_is_replaced_in_place(tmp_path):
+    for version in ("1", "2"):
+        os.makedirs(tmp_path / version)
+    latest = str(tmp_path / "latest")
+    create_symlink_safely(str(tmp_path / "1"), latest)
+    create_symlink_safely(str(tmp_path / "2"), latest)
+    assert os.readlink(latest) == "2"
+    assert sorted(os.listdir(tmp_path)) == ["1", "2", "latest"]
+
+    # A real directory in the way is never deleted or copied over
+    os.unlink(latest)
+    os.makedirs(latest)
+    (tmp_path / "latest" / "notes.txt").write_text("mine")
+    with pytest.raises(OSError):
+        create_symlink_safely(str(tmp_path / "1"), latest)
+    assert os.listdir(latest) == ["notes.txt"]
+    assert sorted(os.listdir(tmp_path)) == ["1", "2", "latest"]
+
+
+def test_version_lock_serializes_holders(tmp_path):
+    project_dir = str(tmp_path)
+    first = Replay._lock_version(project_dir, "1")
+    events = []
+
+    def second_holder():
+        lock = Replay._lock_version(project_dir, "1")
+        events.append("second")
+        lock.close()
+
+    thread = threading.Thread(target=second_holder)
+    thread.start()
+    thread.join(timeout=0.3)
+    assert thread.is_alive()
+    events.append("first released")
+    first.close()
+    thread.join(timeout=5)
+    assert events == ["first released", "second"]
+    # Other versions are not affected
+    Replay._lock_version(project_dir, "2").close()